@@ -0,0 +1,72 @@
+"""
+基准测试：批量文本分析吞吐（texts/s），逐条 analyze_social_signal 流程 vs BatchTextAnalyzer
+
+用法（在 backend/ 目录下）：
+    python -m benchmarks.bench_batch_analysis --sizes 1000 10000 100000
+
+- per-text：与 DecoderService.analyze_social_signal 相同的逐条计算
+  （TextFeatures 统计 / jieba 关键词 / 情感倾向 + classify_by_rules 规则场景）
+- batch：BatchTextAnalyzer.analyze（整块拼接后一次扫描、一次分词、矩阵打分）
+文本由短句与长段落按 4:1 混合，并追加序号保证互不相同（不命中扫描缓存）。
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, List
+
+from benchmarks.bench_lexicon_matcher import LONG_TEXT, SHORT_TEXTS
+from services.classifier_service import ClassifierService
+from services.decoder.batch_analyzer import BatchTextAnalyzer
+from services.decoder.keyword_extractor import JIEBA_AVAILABLE
+from services.decoder.text_features import TextFeatures
+
+
+def _make_texts(size: int) -> List[str]:
+    pool = SHORT_TEXTS + [LONG_TEXT[:200]]
+    return [f"{pool[i % len(pool)]} {i}" for i in range(size)]
+
+
+def _throughput(func: Callable[[List[str]], object], texts: List[str]) -> float:
+    start = time.perf_counter()
+    func(texts)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    if JIEBA_AVAILABLE:
+        import jieba
+
+        jieba.initialize()
+    classifier = ClassifierService(ai_service=None)
+    analyzer = BatchTextAnalyzer()
+
+    def per_text(texts: List[str]) -> object:
+        results = []
+        for text in texts:
+            features = TextFeatures(text)
+            scene, confidence = classifier.classify_by_rules(text, features)
+            results.append((features.stats, features.keywords(args.top_k), features.sentiment, scene, confidence))
+        return results
+
+    def batch(texts: List[str]) -> object:
+        return analyzer.analyze(texts, top_k=args.top_k)
+
+    # 预热（jieba 词典、权重矩阵、模板索引）
+    batch(_make_texts(100))
+    per_text(_make_texts(100))
+
+    for size in args.sizes:
+        texts = _make_texts(size)
+        print(f"{size} texts")
+        for label, func in (("per-text", per_text), ("batch", batch)):
+            print(f"  {label:<9} {_throughput(func, texts):,.0f} texts/s")
+
+
+if __name__ == "__main__":
+    main()
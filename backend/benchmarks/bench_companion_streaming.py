@@ -0,0 +1,78 @@
+"""
+基准测试：陪伴回复的首字节延迟，整段返回 vs 流式转发
+
+用法（在 backend/ 目录下）：
+    python -m benchmarks.bench_companion_streaming --replies 40 --concurrency 8
+
+假 provider（benchmarks.fake_openai，后台线程）先等待 --ttft 秒，再每隔 --per-token 秒产出一个 token，约 --tokens 个；
+stream=True 时按 OpenAI 的 SSE 格式（chat.completion.chunk）逐段发出，否则生成完毕后一次返回。
+分别用 AIService.generate_reply 和 generate_reply_stream 生成 --replies 条回复，
+报告调用方拿到第一段文本的延迟（p50 / p99）和整段回复的总耗时。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+from benchmarks.bench_fused_decode import _percentile
+from benchmarks.fake_openai import FakeOpenAI, build_content
+from services.ai_service import AIService
+
+
+async def _run(ai: AIService, streaming: bool, replies: int, concurrency: int, expected: str) -> Dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    first_byte: List[float] = []
+    total: List[float] = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            if streaming:
+                parts: List[str] = []
+                async for delta in ai.generate_reply_stream(f"今天在学校有点累 #{i}"):
+                    if not parts:
+                        first_byte.append(time.perf_counter() - start)
+                    parts.append(delta)
+                reply = "".join(parts)
+            else:
+                reply = await ai.generate_reply(f"今天在学校有点累 #{i}")
+                first_byte.append(time.perf_counter() - start)
+            total.append(time.perf_counter() - start)
+            assert reply == expected, reply
+
+    await asyncio.gather(*(one(i) for i in range(replies)))
+    return {
+        "first_p50": _percentile(first_byte, 0.5) * 1000,
+        "first_p99": _percentile(first_byte, 0.99) * 1000,
+        "total_p50": _percentile(total, 0.5) * 1000,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--replies", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ttft", type=float, default=0.3, help="首 token 延迟（秒）")
+    parser.add_argument("--per-token", type=float, default=0.01, help="每个输出 token 的延迟（秒）")
+    parser.add_argument("--tokens", type=int, default=150, help="每条回复的 token 数")
+    args = parser.parse_args()
+
+    fake = FakeOpenAI(ttft=args.ttft, per_token=args.per_token, latency_dist="fixed", reply_tokens=args.tokens)
+    ai = fake.ai_service()
+    ai._config_loaded = True  # 不从配置服务加载 provider，始终使用假 provider
+    try:
+        for label, streaming in (("full", False), ("stream", True)):
+            result = await _run(ai, streaming, args.replies, args.concurrency, build_content("companion", [], args.tokens))
+            print(
+                f"{label:<7} first byte p50={result['first_p50']:.0f} ms  p99={result['first_p99']:.0f} ms  "
+                f"total p50={result['total_p50']:.0f} ms"
+            )
+    finally:
+        await ai.gateway.aclose()
+        fake.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
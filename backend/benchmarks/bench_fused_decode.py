@@ -0,0 +1,122 @@
+"""
+基准测试：use_ai 解码的端到端 LLM 延迟，多调用路径 vs 融合解码（一次结构化请求）
+
+用法（在 backend/ 目录下）：
+    python -m benchmarks.bench_fused_decode --decodes 100 --concurrency 10
+
+假 provider（uvicorn，后台线程）按「首 token 延迟（对数正态抖动）+ 输出 token 数 × 每 token 延迟」模拟耗时，
+输出 token 数取 max_tokens × --fill：
+- multi：依次发出 三级精炼（150）、AI 风险检测（200）、ASD 翻译（300）、语义分析（200）四次请求
+  （括号内为各调用点的 max_tokens，与现有服务一致）
+- fused：FusedDecoder.decode 一次请求（max_tokens=700）
+每次解码使用不同文本，不命中响应缓存。报告每次解码 LLM 部分的 p50 / p99 延迟。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from typing import Dict, List
+
+from fastapi import FastAPI
+
+from benchmarks.bench_lexicon_matcher import SHORT_TEXTS
+from benchmarks.fake_openai import start_in_thread
+from services.decoder.fused_decoder import FusedDecoder
+from services.llm_cache import LLMResponseCache
+from services.llm_gateway import LLMGateway
+from services.rules.active import get_active_rules
+
+FUSED_CONTENT = json.dumps({
+    "scene": {"final_scene": "拒绝", "confidence": 0.8, "reason": "委婉推迟"},
+    "risk": {"risk_level": "low", "reasons": [], "suggestions": []},
+    "translation": {"simple_explanation": "对方现在不想做这件事", "why": "对方可能累了",
+                    "what_to_do": ["说好的", "换一天再问"], "do_not": ["不要一直追问"]},
+    "intent": {"intent": "推迟", "topics": ["约定"], "summary": "对方想改天"},
+}, ensure_ascii=False)
+
+# 多调用路径：(调用点, max_tokens)
+MULTI_CALLS = [("decoder.refine", 150), ("risk.detect", 200), ("decoder.translate", 300), ("decoder.semantic", 200)]
+
+
+def _fake_provider(ttft: float, per_token: float, fill: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(payload: dict):
+        tokens = int(payload.get("max_tokens", 256) * fill)
+        await asyncio.sleep(ttft * random.lognormvariate(0, 0.35) + tokens * per_token)
+        return {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": FUSED_CONTENT}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 300, "completion_tokens": tokens, "total_tokens": 300 + tokens},
+        }
+
+    return app
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def _run(mode: str, gateway: LLMGateway, decodes: int, concurrency: int) -> Dict[str, float]:
+    fused_decoder = FusedDecoder(gateway=gateway)
+    rules = get_active_rules()
+    level1 = {"category": "拒绝", "confidence": 0.6}
+    level2 = {"direction": "negative", "emotion_type": "失望"}
+    base_risk = {"risk_level": "low", "reasons": [], "suggestions": []}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(i: int) -> None:
+        text = f"{SHORT_TEXTS[i % len(SHORT_TEXTS)]} {mode} {i}"
+        async with semaphore:
+            start = time.perf_counter()
+            if mode == "multi":
+                for endpoint, max_tokens in MULTI_CALLS:
+                    await gateway.chat_json(endpoint, [{"role": "user", "content": text}], max_tokens=max_tokens)
+            else:
+                assert await fused_decoder.decode(text, rules, level1, level2, base_risk) is not None
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(decodes)))
+    return {
+        "p50": statistics.median(latencies),
+        "p99": _percentile(latencies, 0.99),
+        "calls": len(MULTI_CALLS) if mode == "multi" else 1,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--decodes", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--ttft", type=float, default=0.35, help="首 token 延迟中位数（秒）")
+    parser.add_argument("--per-token", type=float, default=0.004, help="每个输出 token 的延迟（秒）")
+    parser.add_argument("--fill", type=float, default=0.6, help="输出 token 数 / max_tokens")
+    args = parser.parse_args()
+
+    random.seed(0)
+    server, base_url = start_in_thread(_fake_provider(args.ttft, args.per_token, args.fill))
+    gateway = LLMGateway(api_key="bench", base_url=base_url, cache=LLMResponseCache(size=0))
+    try:
+        for mode in ("multi", "fused"):
+            result = await _run(mode, gateway, args.decodes, args.concurrency)
+            print(
+                f"{mode:<6} {result['calls']} call(s)/decode  "
+                f"p50={result['p50']:.0f} ms  p99={result['p99']:.0f} ms"
+            )
+    finally:
+        await gateway.aclose()
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+基准测试：关键词提取对事件循环的阻塞，事件循环内直接分词 vs 进程池
+
+用法（在 backend/ 目录下）：
+    python -m benchmarks.bench_keyword_pool --requests 200 --concurrency 20
+
+- inline：在协程中直接调用 jieba（改造前 EmotionService / /decoder/keywords 的行为）
+- pool：KeywordExtractor.extract（进程池，缓存关闭以测量实际分词）
+同时运行一个每 5ms 唤醒一次的心跳协程，统计心跳延迟（事件循环被阻塞的时间）的 p50/p99/max。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+import jieba.analyse
+
+from benchmarks.bench_lexicon_matcher import LONG_TEXT
+from services.decoder.keyword_extractor import KeywordExtractor
+
+HEARTBEAT_INTERVAL = 0.005
+
+
+async def _heartbeat(lags: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append((time.perf_counter() - start - HEARTBEAT_INTERVAL) * 1000)
+
+
+async def _run(mode: str, extractor: KeywordExtractor, requests: int, concurrency: int) -> Dict[str, float]:
+    texts = [f"{LONG_TEXT[:400]} {i}" for i in range(requests)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(text: str) -> None:
+        async with semaphore:
+            if mode == "inline":
+                jieba.analyse.extract_tags(text, topK=10, withWeight=True)
+                await asyncio.sleep(0)
+            else:
+                await extractor.extract(text, 10)
+
+    lags: List[float] = []
+    stop = asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(text) for text in texts))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await heartbeat
+    lags.sort()
+    return {
+        "throughput": requests / elapsed,
+        "lag_p50_ms": statistics.median(lags) if lags else 0.0,
+        "lag_p99_ms": lags[int(len(lags) * 0.99) - 1] if lags else 0.0,
+        "lag_max_ms": lags[-1] if lags else 0.0,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    jieba.initialize()
+    extractor = KeywordExtractor(cache_size=0, pool_workers=args.workers)
+    await asyncio.to_thread(extractor.start)
+    try:
+        for mode in ("inline", "pool"):
+            result = await _run(mode, extractor, args.requests, args.concurrency)
+            print(
+                f"{mode:<7} {result['throughput']:.0f} req/s  loop lag p50={result['lag_p50_ms']:.1f} ms  "
+                f"p99={result['lag_p99_ms']:.1f} ms  max={result['lag_max_ms']:.1f} ms"
+            )
+    finally:
+        extractor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+基准测试：逐个 `keyword in text` 的线性扫描 vs Aho-Corasick 单次扫描
+
+用法（在 backend/ 目录下）：
+    python -m benchmarks.bench_lexicon_matcher --iterations 2000
+
+- linear scan：每个词库各扫描一次（场景、情感倾向、情绪、极端词、风险、敏感词）
+- linear decode：按一次解码中各消费方的实际调用次数扫描（场景 / 情感倾向 / 情绪各两次）
+- aho-corasick：自动机只扫描一次（不走 scan() 的 LRU 缓存，测的是冷扫描耗时）
+分别对短文本（单句）和长文本（多段对话拼接）输出 p50/p99。
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from services.rules.lexicons import default_lexicons
+from services.rules.matcher import LexiconMatcher
+
+SHORT_TEXTS = [
+    "算了，改天吧",
+    "你能不能帮我看看这个作业？",
+    "烦死了，别说了",
+    "谢谢你，今天真的很开心",
+    "我好难过，真的受不了了",
+]
+
+LONG_TEXT = (
+    "今天在学校里同学问我周末要不要一起去公园，我说可能吧，到时候再说。"
+    "后来老师批评了我，说作业不应该这样写，我有点尴尬，也有点难过。"
+    "回家以后妈妈说没关系，会好的，别担心，下次认真一点就可以了。"
+    "可是我还是觉得很烦，压力大，不知道该怎么办，希望有人能帮帮我。"
+) * 8
+
+
+def _measure(func: Callable[[str], object], texts: List[str], iterations: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    for i in range(iterations):
+        text = texts[i % len(texts)]
+        start = time.perf_counter()
+        func(text)
+        latencies.append((time.perf_counter() - start) * 1_000_000)
+    latencies.sort()
+    return {
+        "p50_us": statistics.median(latencies),
+        "p99_us": latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    lexicons = default_lexicons()
+    build_start = time.perf_counter()
+    matcher = LexiconMatcher.build(lexicons)
+    build_ms = (time.perf_counter() - build_start) * 1000
+
+    def linear(text: str) -> int:
+        text_lower = text.lower()
+        hits = 0
+        for labels in lexicons.values():
+            for words in labels.values():
+                hits += sum(1 for word in words if word in text_lower)
+        return hits
+
+    # 一次解码中各词库被扫描的次数：classify_by_rules + BehaviorClassifier 关键词、
+    # DecoderService + EmotionDirectionClassifier 情感倾向、两处情绪类型、风险 / 敏感 / 极端词各一次
+    decode_passes = {"scene": 2, "sentiment": 2, "emotion": 2, "extreme": 1, "risk": 1, "sensitive": 1}
+
+    def linear_decode(text: str) -> int:
+        text_lower = text.lower()
+        hits = 0
+        for lexicon, passes in decode_passes.items():
+            for _ in range(passes):
+                for words in lexicons[lexicon].values():
+                    hits += sum(1 for word in words if word in text_lower)
+        return hits
+
+    def automaton(text: str) -> object:
+        return matcher._scan(text.lower())
+
+    print(f"automaton: {len(matcher.words)} words, built in {build_ms:.2f} ms")
+    for name, texts in (("short", SHORT_TEXTS), ("long", [LONG_TEXT])):
+        print(f"{name} input ({sum(len(t) for t in texts) // len(texts)} chars avg)")
+        for label, func in (
+            ("linear scan", linear),
+            ("linear decode", linear_decode),
+            ("aho-corasick", automaton),
+        ):
+            result = _measure(func, texts, args.iterations)
+            print(f"  {label:<14} p50={result['p50_us']:.1f} us  p99={result['p99_us']:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+基准测试：批量解码中的 AI 场景分类，逐条请求 vs LLM 微批
+
+用法（在 backend/ 目录下）：
+    python -m benchmarks.bench_llm_batching --texts 50 --batch 16
+
+假 provider（uvicorn，后台线程）按「首 token 延迟 + 输出 token 数 × 每 token 延迟」模拟耗时，
+每条结果约 --item-tokens 个输出 token，prompt token 数按提示字符数 / 2 估算。
+两种模式都并发提交 --texts 条文本（与 /decoder/batch-decode 的并发解码一致），
+--concurrency 为网关调用点并发上限；报告总耗时、provider 调用次数、每批耗时与每条文本的 token 数。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import re
+import time
+from typing import Any, Dict
+
+from fastapi import FastAPI
+
+from benchmarks.fake_openai import start_in_thread
+from benchmarks.bench_lexicon_matcher import SHORT_TEXTS
+from services.ai_service import AIService
+from services.classifier_service import ClassifierService, build_scene_batch_messages
+from services.llm_batcher import LLMMicroBatcher
+from services.llm_cache import LLMResponseCache
+from services.llm_gateway import LLMGateway
+from services.near_duplicate_cache import NearDuplicateCache
+
+_ITEMS_RE = re.compile(r"文本列表（JSON）：(\[.*?\])\n")
+
+
+def _fake_provider(ttft: float, per_token: float, item_tokens: int, counters: Dict[str, int]) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(payload: dict):
+        prompt = payload["messages"][-1]["content"]
+        match = _ITEMS_RE.search(prompt)
+        if match:
+            ids = [item["id"] for item in json.loads(match.group(1))]
+            content = {"results": [{"id": i, "scene": "拒绝", "confidence": 0.8, "reason": "委婉拒绝"} for i in ids]}
+        else:
+            ids = [0]
+            content = {"scene": "拒绝", "confidence": 0.8, "reason": "委婉拒绝"}
+        completion_tokens = item_tokens * len(ids)
+        prompt_tokens = sum(len(message["content"]) for message in payload["messages"]) // 2
+        counters["calls"] += 1
+        counters["tokens"] += prompt_tokens + completion_tokens
+        await asyncio.sleep(ttft + completion_tokens * per_token)
+        return {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(content, ensure_ascii=False)},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    return app
+
+
+async def _run(gateway: LLMGateway, batch: int, texts: int, counters: Dict[str, int]) -> Dict[str, Any]:
+    classifier = ClassifierService(
+        ai_service=AIService(gateway=gateway), ai_cache=NearDuplicateCache("bench", capacity=0)
+    )
+    # max_batch=1 时 enabled 为 False，classify_by_ai 走逐条请求
+    classifier.scene_batcher = LLMMicroBatcher(
+        "bench.scene_batch", build_scene_batch_messages, max_tokens_per_item=80,
+        max_batch=batch, gateway=gateway, temperature=0.3,
+    )
+    counters.update(calls=0, tokens=0)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        classifier.classify_by_ai(f"{SHORT_TEXTS[i % len(SHORT_TEXTS)]} #{i}") for i in range(texts)
+    ))
+    elapsed = time.perf_counter() - start
+    assert all(scene == "拒绝" for scene, _ in results)
+    return {
+        "ms": elapsed * 1000,
+        "calls": counters["calls"],
+        "tokens_per_text": counters["tokens"] / texts,
+        "batcher": classifier.scene_batcher.stats(),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=4, help="网关调用点并发上限")
+    parser.add_argument("--ttft", type=float, default=0.4, help="首 token 延迟（秒）")
+    parser.add_argument("--per-token", type=float, default=0.004, help="每个输出 token 的延迟（秒）")
+    parser.add_argument("--item-tokens", type=int, default=40, help="每条结果的输出 token 数")
+    args = parser.parse_args()
+
+    counters = {"calls": 0, "tokens": 0}
+    server, base_url = start_in_thread(_fake_provider(args.ttft, args.per_token, args.item_tokens, counters))
+    gateway = LLMGateway(
+        api_key="bench", base_url=base_url, cache=LLMResponseCache(size=0), endpoint_concurrency=args.concurrency
+    )
+    try:
+        single = await _run(gateway, 1, args.texts, counters)
+        print(
+            f"per-text  {args.texts} texts  {single['ms']:.0f} ms  "
+            f"provider calls={single['calls']}  tokens/text={single['tokens_per_text']:.0f}"
+        )
+        batched = await _run(gateway, args.batch, args.texts, counters)
+        stats = batched["batcher"]
+        print(
+            f"batched   {args.texts} texts  {batched['ms']:.0f} ms  "
+            f"provider calls={batched['calls']}  avg batch={stats['avg_batch_size']}  "
+            f"ms/batch={stats['avg_batch_ms']:.0f}  tokens/text={stats['tokens_per_item']:.0f}"
+        )
+    finally:
+        await gateway.aclose()
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""
+基准测试：慢速 LLM provider 下的并发请求吞吐，同步 OpenAI 客户端 vs LLMGateway
+
+用法（在 backend/ 目录下）：
+    python -m benchmarks.bench_llm_gateway --requests 200 --concurrency 50 --delay 0.3
+
+在后台线程启动 OpenAI 兼容的假 provider（benchmarks.fake_openai，每次 chat.completions 固定延迟 --delay 秒），
+然后以 --concurrency 个并发协程发出 --requests 次调用：
+- sync：协程中直接调用同步 OpenAI 客户端（改造前各服务的行为，阻塞事件循环）
+- gateway：LLMGateway.chat（共享 AsyncOpenAI 连接池 + 全局 / 调用点并发上限）
+同时运行一个每 5ms 唤醒一次的心跳协程，统计事件循环被阻塞的时间。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+import httpx
+from openai import OpenAI
+
+from benchmarks.fake_openai import FakeOpenAI
+from services.llm_gateway import LLMGateway
+
+HEARTBEAT_INTERVAL = 0.005
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+async def _heartbeat(lags: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append((time.perf_counter() - start - HEARTBEAT_INTERVAL) * 1000)
+
+
+async def _run(mode: str, base_url: str, requests: int, concurrency: int) -> Dict[str, float]:
+    sync_client = OpenAI(api_key="bench", base_url=base_url, max_retries=0, http_client=httpx.Client())
+    gateway = LLMGateway(
+        api_key="bench",
+        base_url=base_url,
+        max_concurrency=concurrency,
+        endpoint_concurrency=concurrency,
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            if mode == "sync":
+                resp = sync_client.chat.completions.create(model="fake", messages=MESSAGES)
+                assert resp.choices[0].message.content
+            else:
+                assert await gateway.chat("bench", MESSAGES)
+
+    lags: List[float] = []
+    stop = asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await heartbeat
+    await gateway.aclose()
+    sync_client.close()
+    lags.sort()
+    return {
+        "throughput": requests / elapsed,
+        "lag_p99_ms": lags[int(len(lags) * 0.99) - 1] if lags else 0.0,
+        "lag_max_ms": lags[-1] if lags else 0.0,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.3)
+    parser.add_argument("--sync-requests", type=int, default=20, help="sync 模式的请求数（串行执行，耗时 = 请求数 × delay）")
+    args = parser.parse_args()
+
+    fake = FakeOpenAI(ttft=args.delay, per_token=0, latency_dist="fixed")
+    base_url = fake.start()
+    try:
+        for mode, requests in (("sync", args.sync_requests), ("gateway", args.requests)):
+            result = await _run(mode, base_url, requests, args.concurrency)
+            print(
+                f"{mode:<8} {requests:>5} requests  {result['throughput']:.1f} req/s  "
+                f"loop lag p99={result['lag_p99_ms']:.1f} ms  max={result['lag_max_ms']:.1f} ms"
+            )
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
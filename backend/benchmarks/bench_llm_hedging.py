@@ -0,0 +1,120 @@
+"""
+基准测试：两个本地 OpenAI 兼容假 provider 上的对冲请求与失败转移
+
+用法（在 backend/ 目录下）：
+    python -m benchmarks.bench_llm_hedging --calls 400 --concurrency 20
+
+- primary：延迟大多为 --fast 秒，按 --tail-rate 的比例落入 --slow 秒的长尾
+- secondary：稳定的 --secondary 秒
+- 分别在关闭 / 开启对冲时发出 --calls 次调用（先用 LLM_HEDGE_MIN_SAMPLES 次调用积累延迟样本），报告 p50 / p99
+  以及对冲次数、备用 provider 胜出次数
+- 最后让 primary 对每个请求返回 500，确认调用全部转移到 secondary
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+from typing import Any, Dict, List
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from benchmarks.bench_fused_decode import _percentile
+from benchmarks.fake_openai import start_in_thread
+from services.llm_cache import LLMResponseCache
+from services.llm_gateway import LLMGateway
+from services.llm_providers import LLMProvider
+
+MESSAGES = [{"role": "user", "content": "这句话是什么意思？"}]
+
+
+def _fake_provider(name: str, fast: float, slow: float, tail_rate: float, state: Dict[str, Any]) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(payload: dict):
+        if state.get("fail"):
+            return JSONResponse({"error": {"message": "upstream overloaded"}}, status_code=500)
+        await asyncio.sleep(slow if random.random() < tail_rate else fast)
+        return {
+            "id": f"chatcmpl-{name}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", name),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": name}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+        }
+
+    return app
+
+
+async def _run(gateway: LLMGateway, calls: int, concurrency: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    answers: Dict[str, int] = {}
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            content = await gateway.chat("bench.hedge", MESSAGES, cache=False)
+            latencies.append((time.perf_counter() - start) * 1000)
+            answers[content] = answers.get(content, 0) + 1
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return {"p50": statistics.median(latencies), "p99": _percentile(latencies, 0.99), "answers": answers}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--fast", type=float, default=0.05, help="primary 常规延迟（秒）")
+    parser.add_argument("--slow", type=float, default=1.5, help="primary 长尾延迟（秒）")
+    parser.add_argument("--tail-rate", type=float, default=0.05, help="primary 落入长尾的比例")
+    parser.add_argument("--secondary", type=float, default=0.08, help="secondary 延迟（秒）")
+    args = parser.parse_args()
+
+    random.seed(0)
+    # 失败转移阶段每个请求都会记录一条 provider 失败日志
+    logging.getLogger("services.llm_providers").setLevel(logging.ERROR)
+    primary_state: Dict[str, Any] = {}
+    primary_server, primary_url = start_in_thread(
+        _fake_provider("primary", args.fast, args.slow, args.tail_rate, primary_state)
+    )
+    secondary_server, secondary_url = start_in_thread(
+        _fake_provider("secondary", args.secondary, args.secondary, 0.0, {})
+    )
+    try:
+        for hedge in (False, True):
+            gateway = LLMGateway(
+                cache=LLMResponseCache(size=0),
+                providers=[
+                    LLMProvider("primary", api_key="bench", base_url=primary_url, model="fake"),
+                    LLMProvider("secondary", api_key="bench", base_url=secondary_url, model="fake"),
+                ],
+            )
+            pool = gateway.pool
+            pool.hedge_enabled = hedge
+            await _run(gateway, pool.hedge_min_samples, 1)  # 积累延迟样本
+            result = await _run(gateway, args.calls, args.concurrency)
+            stats = pool.stats()
+            print(
+                f"hedge={'on ' if hedge else 'off'}  p50={result['p50']:.0f} ms  p99={result['p99']:.0f} ms  "
+                f"hedged={stats['hedged']} hedge_won={stats['hedge_won']} answers={result['answers']}"
+            )
+            if hedge:
+                primary_state["fail"] = True
+                result = await _run(gateway, 50, 10)
+                print(f"primary failing: failovers={pool.stats()['failovers']} answers={result['answers']}")
+            await gateway.aclose()
+    finally:
+        primary_server.should_exit = True
+        secondary_server.should_exit = True
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
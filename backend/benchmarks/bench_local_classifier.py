@@ -0,0 +1,102 @@
+"""
+基准测试：本地场景模型（字符 n-gram 朴素贝叶斯）的准确率、推理延迟和级联中免去的 LLM 升级
+
+用法（在 backend/ 目录下）：
+    python -m benchmarks.bench_local_classifier --texts 4000
+
+用规则词库的关键词拼出 --texts 条口语化文本（部分混入第二个场景的关键词），
+由假 provider 的场景标注（benchmarks.fake_openai.label_scene，代替 LLM）给出标签，按 8:2 划分训练 / 留出集；
+报告训练耗时、留出集准确率、各置信度阈值的覆盖率、单条推理 p50 / p99，
+以及留出集文本经过级联策略时，没有 / 有本地模型两种情况下升级到 LLM 的比例。
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import List
+
+from benchmarks.fake_openai import label_scene
+from services.decoder.behavior_classifier import BehaviorClassifier
+from services.decoder.cascade import CascadePolicy
+from services.decoder.local_classifier import (
+    LabeledText,
+    LocalSceneClassifier,
+    evaluate,
+    fit_temperature,
+    split_samples,
+    train_model,
+)
+from services.decoder.text_features import TextFeatures
+from services.rules.active import get_active_rules
+
+PREFIXES = ("", "嗯，", "其实", "我觉得", "那个，", "今天", "说实话", "唉，")
+SUFFIXES = ("", "吧", "。", "，你看呢？", "啊", "了", "……", "！")
+FILLERS = ("这件事", "上次那个", "跟同学", "在学校", "周末", "老师说的", "我们")
+
+
+def _corpus(count: int, seed: int) -> List[LabeledText]:
+    rng = random.Random(seed)
+    scene_keywords = {scene: words for scene, words in get_active_rules().scene_keywords.items() if words}
+    scenes = list(scene_keywords)
+    samples = []
+    for _ in range(count):
+        words = [rng.choice(scene_keywords[rng.choice(scenes)])]
+        if rng.random() < 0.3:
+            words.append(rng.choice(scene_keywords[rng.choice(scenes)]))
+        middle = rng.choice(FILLERS).join(words) if len(words) > 1 else rng.choice(FILLERS) + words[0]
+        text = f"{rng.choice(PREFIXES)}{middle}{rng.choice(SUFFIXES)}"
+        samples.append(LabeledText(text, label_scene(text)[0]))
+    return samples
+
+
+def _escalation_rate(policy: CascadePolicy, behavior: BehaviorClassifier, samples: List[LabeledText]) -> float:
+    rules = get_active_rules()
+    emotion = behavior.classifier.emotion_classifier
+    escalated = 0
+    for sample in samples:
+        features = TextFeatures(sample.text, rules)
+        level1 = behavior.classify(sample.text, features)
+        level2 = emotion.classify(sample.text, features)
+        escalated += policy.decide(level1, level2, rules, sample.text)["escalate"]
+    return escalated / len(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=4000)
+    parser.add_argument("--min-confidence", type=float, default=0.85)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    samples = _corpus(args.texts, args.seed)
+    train_set, test_set = split_samples(samples, 0.2, args.seed)
+    start = time.perf_counter()
+    model = train_model(train_set)
+    fit_temperature(model, test_set)
+    print(
+        f"train  {len(train_set)} texts  {len(model.classes)} scenes  {len(model.vocab)} grams  "
+        f"T={model.temperature}  {(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+    metrics = evaluate(model, test_set)
+    print(
+        f"eval   {metrics['samples']} texts  accuracy={metrics['accuracy']:.3f}  macro-F1={metrics['macro_f1']:.3f}  "
+        f"latency p50={metrics['latency_us_p50']:.0f} us  p99={metrics['latency_us_p99']:.0f} us"
+    )
+    for row in metrics["thresholds"]:
+        accuracy = f"{row['accuracy']:.3f}" if row["accuracy"] is not None else "-"
+        print(f"       confidence >= {row['threshold']:.2f}  coverage={row['coverage']:.3f}  accuracy={accuracy}")
+
+    behavior = BehaviorClassifier()
+    without = LocalSceneClassifier(enabled=False)
+    with_model = LocalSceneClassifier(min_confidence=args.min_confidence, enabled=True, model=model)
+    rate_without = _escalation_rate(CascadePolicy(local_classifier=without), behavior, test_set)
+    rate_with = _escalation_rate(CascadePolicy(local_classifier=with_model), behavior, test_set)
+    print(
+        f"cascade  escalated to LLM: rules only={rate_without:.3f}  "
+        f"rules + local model={rate_with:.3f}  (min confidence {args.min_confidence})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+基准测试：每请求构建服务对象图 vs 进程级服务容器
+
+用法（在 backend/ 目录下）：
+    python -m benchmarks.bench_service_container --requests 200
+
+对比两种方式处理同一批 /decoder/analyze 等价请求时的
+单请求耗时（p50/p99）和单请求新分配内存（tracemalloc）。
+analyze_social_signal 是协程（关键词提取走进程池），每个请求在同一个事件循环中逐个 await。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List
+
+from core.container import ServiceContainer
+from services.decoder_service import DecoderService
+
+SAMPLE_TEXTS = [
+    "算了，改天吧",
+    "你能不能帮我看看这个作业？",
+    "烦死了，别说了",
+    "谢谢你，今天真的很开心",
+    "也许下次我们可以一起去",
+]
+
+
+async def _measure(handler: Callable[[str], Awaitable[Any]], requests: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    allocated: List[int] = []
+    tracemalloc.start()
+    for i in range(requests):
+        text = SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        await handler(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+        _, peak = tracemalloc.get_traced_memory()
+        allocated.append(max(0, peak - before))
+    tracemalloc.stop()
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1],
+        "avg_alloc_kb": statistics.mean(allocated) / 1024,
+    }
+
+
+async def per_request_handler(text: str) -> Dict[str, Any]:
+    """旧方式：每个请求都构建完整的 DecoderService 对象图"""
+    return await DecoderService().analyze_social_signal(text)
+
+
+async def run(requests: int) -> None:
+    container = ServiceContainer()
+    container.startup()
+    decoder = container.decoder_service
+
+    try:
+        # 预热：让 jieba 词典、prompt 模板缓存和关键词进程池都已就绪，只比较构建开销
+        await per_request_handler(SAMPLE_TEXTS[0])
+        await decoder.analyze_social_signal(SAMPLE_TEXTS[0])
+
+        before = await _measure(per_request_handler, requests)
+        after = await _measure(decoder.analyze_social_signal, requests)
+    finally:
+        await container.shutdown()
+
+    print(f"{'mode':<14}{'p50 (ms)':>12}{'p99 (ms)':>12}{'alloc/req (KB)':>18}")
+    for name, result in (("per-request", before), ("container", after)):
+        print(
+            f"{name:<14}{result['p50_ms']:>12.3f}{result['p99_ms']:>12.3f}"
+            f"{result['avg_alloc_kb']:>18.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
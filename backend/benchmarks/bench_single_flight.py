@@ -0,0 +1,79 @@
+"""
+基准测试：并发的相同 AI 场景分类请求，逐个请求 vs single-flight 合并
+
+用法（在 backend/ 目录下）：
+    python -m benchmarks.bench_single_flight --views 20 --texts 5
+
+模拟 --views 个页面同时加载，每个页面对同一组 --texts 条文本调用 classify_by_ai
+（如家长和孩子同时查看同一段对话的解码结果）。假 provider（benchmarks.fake_openai）每次调用耗时 --latency 秒。
+关闭响应缓存 / 近似重复缓存 / 微批后，分别直接调用未合并的 classify_by_ai（__wrapped__）和合并后的版本，
+报告 provider 调用次数、被合并的重复调用数和总耗时。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict
+
+from benchmarks.bench_lexicon_matcher import SHORT_TEXTS
+from benchmarks.fake_openai import FakeOpenAI
+from services.classifier_service import ClassifierService, build_scene_batch_messages
+from services.llm_batcher import LLMMicroBatcher
+from services.near_duplicate_cache import NearDuplicateCache
+from services.single_flight import get_single_flight
+
+
+def _provider_calls(fake: FakeOpenAI) -> int:
+    return sum(counts["requests"] for counts in fake.stats().values())
+
+
+async def _run(classifier: ClassifierService, coalesce: bool, views: int, texts: int,
+               fake: FakeOpenAI) -> Dict[str, Any]:
+    classify = classifier.classify_by_ai
+    if not coalesce:
+        classify = ClassifierService.classify_by_ai.__wrapped__.__get__(classifier)
+    group = get_single_flight("ClassifierService.classify_by_ai")
+    followers = group.stats()["follower"]
+    fake.reset_stats()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        classify(SHORT_TEXTS[i]) for _ in range(views) for i in range(texts)
+    ))
+    elapsed = time.perf_counter() - start
+    assert all(result is not None for result in results)
+    return {
+        "ms": elapsed * 1000,
+        "calls": _provider_calls(fake),
+        "suppressed": group.stats()["follower"] - followers,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--views", type=int, default=20, help="同时加载的页面数")
+    parser.add_argument("--texts", type=int, default=5, help="每个页面分类的文本数")
+    parser.add_argument("--latency", type=float, default=0.5, help="provider 每次调用的耗时（秒）")
+    args = parser.parse_args()
+
+    fake = FakeOpenAI(ttft=args.latency, per_token=0, latency_dist="fixed")
+    ai = fake.ai_service()
+    gateway = ai.gateway
+    classifier = ClassifierService(ai_service=ai, ai_cache=NearDuplicateCache("bench", capacity=0))
+    classifier.scene_batcher = LLMMicroBatcher(
+        "bench.scene_batch", build_scene_batch_messages, max_tokens_per_item=80, max_batch=1, gateway=gateway
+    )
+    try:
+        for label, coalesce in (("duplicate", False), ("single-flight", True)):
+            result = await _run(classifier, coalesce, args.views, args.texts, fake)
+            print(
+                f"{label:<14} {args.views * args.texts} calls  {result['ms']:.0f} ms  "
+                f"provider calls={result['calls']}  suppressed={result['suppressed']}"
+            )
+    finally:
+        await gateway.aclose()
+        fake.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""
+基准测试：解码流水线各同步阶段的 CPU 时间，逐阶段各自计算特征 vs 共用一份 TextFeatures
+
+用法（在 backend/ 目录下）：
+    python -m benchmarks.bench_text_features --iterations 2000 --repeat 5
+
+阶段：一级行为分类、二级情绪方向、基础风险词检测、基础分析（统计 / 词频关键词 / 情感倾向）
+- per-stage：每个阶段不传 features，各自构建 TextFeatures（等价于改造前各阶段分别
+  做小写化、扫描、统计与情感打分；自动机扫描仍走 scan() 的 LRU 缓存）
+- shared：与 DecoderOrchestrator.decode 一致，构建一次 TextFeatures 传给所有阶段
+每次迭代使用不同的文本（末尾追加序号），避免命中跨迭代缓存；计时使用 process_time，
+重复 --repeat 轮取最小值（同 timeit）。
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, Dict, List
+
+from services.classifier_service import ClassifierService
+from services.decoder.behavior_classifier import BehaviorClassifier
+from services.decoder.text_features import TextFeatures
+from benchmarks.bench_lexicon_matcher import LONG_TEXT, SHORT_TEXTS
+
+
+def _measure(func: Callable[[str], object], texts: List[str], iterations: int, repeat: int) -> Dict[str, float]:
+    totals = []
+    for round_index in range(repeat):
+        inputs = [f"{texts[i % len(texts)]} {round_index}-{i}" for i in range(iterations)]
+        start = time.process_time()
+        for text in inputs:
+            func(text)
+        totals.append(time.process_time() - start)
+    return {"cpu_us_per_decode": min(totals) / iterations * 1_000_000}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    classifier = ClassifierService(ai_service=None)
+    emotion = classifier.emotion_classifier
+    behavior = BehaviorClassifier(classifier=classifier)
+
+    def risk_words(features: TextFeatures) -> object:
+        # RiskDetectionService._detect_base_risk / 敏感词检测读取的命中
+        hits = features.hits
+        return hits.matched("risk", "high_risk"), hits.matched("risk", "medium_risk"), hits.count("sensitive", "sensitive")
+
+    def basic(features: TextFeatures) -> object:
+        # DecoderOrchestrator._analyze_basic
+        return features.stats, features.frequent_words(10), emotion._detect_sentiment_tendency(features.text, features)
+
+    def per_stage(text: str) -> object:
+        behavior.classify(text)
+        emotion.classify(text)
+        risk_words(TextFeatures(text))
+        return basic(TextFeatures(text))
+
+    def shared(text: str) -> object:
+        features = TextFeatures(text)
+        behavior.classify(text, features)
+        emotion.classify(text, features)
+        risk_words(features)
+        return basic(features)
+
+    for name, texts in (("short", SHORT_TEXTS), ("long", [LONG_TEXT])):
+        print(f"{name} input ({sum(len(t) for t in texts) // len(texts)} chars avg)")
+        results = {}
+        for label, func in (("per-stage", per_stage), ("shared", shared)):
+            func(texts[0])  # 预热（模板索引、正则编译）
+            results[label] = _measure(func, texts, args.iterations, args.repeat)["cpu_us_per_decode"]
+            print(f"  {label:<10} cpu={results[label]:.1f} us/decode")
+        saved = 1 - results["shared"] / results["per-stage"]
+        print(f"  saved      {saved:.0%}")
+
+
+if __name__ == "__main__":
+    main()
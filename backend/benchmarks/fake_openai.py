@@ -0,0 +1,479 @@
+"""
+本地 OpenAI 兼容的假 provider：压测 / 基准测试 AI 路径时代替真实 provider
+
+用法（在 backend/ 目录下）：
+    python -m benchmarks.fake_openai --port 9100 --ttft 0.4 --per-token 0.01 --error-rate 0.02
+    # 另一个终端：后端指向假 provider
+    OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:9100/v1 python serve.py
+
+进程内使用（基准测试）：
+    fake = FakeOpenAI(ttft=0.2)
+    fake.start()
+    ai = fake.ai_service()          # AIService(gateway=fake.gateway())
+    ...
+    await ai.gateway.aclose(); fake.stop()
+
+- POST /v1/chat/completions：按 prompt 识别调用族（scene / scene_batch / refine_batch / fused / risk /
+  translate / semantic / summary / companion），JSON 族返回符合各服务解析格式（fused 为 FUSED_DECODE_SCHEMA）的内容；
+  场景按当前规则词库的关键词命中确定，风险按风险词确定，同一输入结果稳定；
+  支持 stream=True（chat.completion.chunk SSE，stream_options.include_usage 时最后附带 usage）
+- POST /v1/embeddings：字符 bigram 哈希到 --dimensions 维并归一化（相似文本的向量相近），支持 encoding_format=base64
+- 延迟：首 token 延迟按 --latency-dist（fixed / lognormal / exponential）围绕 --ttft 抖动，
+  --tail-rate 比例的请求改用 --tail-ttft；之后每个输出 token 再等 --per-token 秒
+- 故障：--error-rate 比例的请求返回 --error-status 中的状态码（OpenAI 错误格式，429 带 Retry-After），
+  --stream-abort-rate 比例的流式请求在输出一半时断开连接
+- 各调用族的请求数、错误数和 token 数见 GET /stats
+"""
+from __future__ import annotations
+
+import argparse
+import array
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from services.ai_service import AIService
+from services.llm_cache import LLMResponseCache
+from services.llm_gateway import LLMGateway
+from services.prompt_budget import estimate_tokens
+from services.rules.active import get_active_rules
+
+FAMILIES = (
+    "scene", "scene_batch", "refine_batch", "fused", "risk", "translate", "semantic", "summary", "companion",
+)
+LATENCY_DISTRIBUTIONS = ("fixed", "lognormal", "exponential")
+
+_TEXT_RE = re.compile(r"(?:文本|原文)：(.*)")
+_ITEMS_RE = re.compile(r"文本列表（JSON）：(\[.*?\])\n", re.S)
+
+_REPLY_SENTENCES = (
+    "听起来这件事让你有些困扰。",
+    "我们可以一步一步来看。",
+    "先深呼吸，给自己一点时间。",
+    "你可以直接告诉对方你的感受。",
+    "如果不确定对方的意思，可以礼貌地问一句。",
+    "你已经做得很好了。",
+)
+
+
+class StreamAborted(Exception):
+    """模拟流式输出中途断开"""
+
+
+def detect_family(messages: List[Dict[str, Any]], response_format: Optional[Dict[str, Any]] = None) -> str:
+    """按 prompt 内容识别调用族（与各服务的 prompt 模板对应）"""
+    prompt = "\n".join(str(message.get("content", "")) for message in messages)
+    schema = (response_format or {}).get("json_schema") or {}
+    if schema.get("name") == "fused_decode" or "一次完成四项任务" in prompt:
+        return "fused"
+    if '"results"' in prompt:
+        return "refine_batch" if '"final_scene"' in prompt else "scene_batch"
+    if '"risk_level"' in prompt:
+        return "risk"
+    if '"simple_explanation"' in prompt:
+        return "translate"
+    if '"intent"' in prompt and '"topics"' in prompt:
+        return "semantic"
+    if '"scene"' in prompt:
+        return "scene"
+    if "Update the summary" in prompt:
+        return "summary"
+    return "companion"
+
+
+def _target_text(messages: List[Dict[str, Any]]) -> str:
+    prompt = str(messages[-1].get("content", "")) if messages else ""
+    matches = _TEXT_RE.findall(prompt)
+    return matches[-1].strip() if matches else prompt.strip()
+
+
+def _batch_items(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    match = _ITEMS_RE.search(str(messages[-1].get("content", "")) if messages else "")
+    if match is None:
+        return []
+    try:
+        items = json.loads(match.group(1))
+    except ValueError:
+        return []
+    return [item for item in items if isinstance(item, dict)]
+
+
+def label_scene(text: str) -> Tuple[str, float]:
+    """关键词命中最多的场景；都未命中时按文本哈希选一个（置信度较低）"""
+    scene_keywords = get_active_rules().scene_keywords
+    hits = {scene: sum(word in text for word in words) for scene, words in scene_keywords.items()}
+    scene, count = max(hits.items(), key=lambda item: item[1], default=("其他", 0))
+    if count:
+        return scene, round(min(0.95, 0.65 + 0.1 * count), 2)
+    scenes = list(scene_keywords) + ["其他"]
+    digest = int(hashlib.md5(text.encode("utf-8")).hexdigest(), 16)
+    return scenes[digest % len(scenes)], 0.55
+
+
+def label_risk(text: str) -> Tuple[str, List[str]]:
+    risk_words = get_active_rules().risk_words
+    for level, key in (("high", "high_risk"), ("medium", "medium_risk")):
+        found = [word for word in risk_words.get(key, []) if word in text]
+        if found:
+            return level, [f"出现风险词：{word}" for word in found[:3]]
+    return "low", []
+
+
+def _risk(text: str) -> Dict[str, Any]:
+    level, reasons = label_risk(text)
+    suggestions = {
+        "high": ["立即联系信任的人或专业机构", "不要独处"],
+        "medium": ["关注对方的情绪变化", "适时表达关心"],
+        "low": [],
+    }[level]
+    return {"risk_level": level, "reasons": reasons, "suggestions": suggestions}
+
+
+def _translation(text: str, scene: str) -> Dict[str, Any]:
+    return {
+        "simple_explanation": f"对方在表达「{scene}」。",
+        "why": f"对方说「{text[:20]}」，是想让你知道他的想法。",
+        "what_to_do": ["先说你听到了", "如果不明白，直接问对方的意思"],
+        "do_not": ["不要一直追问"],
+    }
+
+
+def _intent(text: str, scene: str) -> Dict[str, Any]:
+    return {"intent": scene, "topics": [scene, "日常交流"], "summary": text[:50]}
+
+
+def build_content(family: str, messages: List[Dict[str, Any]], reply_tokens: int) -> str:
+    """调用族对应的回复内容（JSON 族为 JSON 字符串）"""
+    if family in ("scene_batch", "refine_batch"):
+        scene_key = "final_scene" if family == "refine_batch" else "scene"
+        results = []
+        for item in _batch_items(messages):
+            scene, confidence = label_scene(str(item.get("text", "")))
+            results.append({"id": item.get("id"), scene_key: scene, "confidence": confidence, "reason": "关键词匹配"})
+        return json.dumps({"results": results}, ensure_ascii=False)
+
+    text = _target_text(messages)
+    scene, confidence = label_scene(text)
+    if family == "scene":
+        content: Any = {"scene": scene, "confidence": confidence, "reason": "关键词匹配"}
+    elif family == "fused":
+        content = {
+            "scene": {"final_scene": scene, "confidence": confidence, "reason": "关键词匹配"},
+            "risk": _risk(text),
+            "translation": _translation(text, scene),
+            "intent": _intent(text, scene),
+        }
+    elif family == "risk":
+        content = _risk(text)
+    elif family == "translate":
+        translation = _translation(text, scene)
+        content = {**translation, "what_to_do": "；".join(translation["what_to_do"])}
+        content.pop("do_not")
+    elif family == "semantic":
+        content = _intent(text, scene)
+    elif family == "summary":
+        return "用户在谈论最近的社交困扰，陪伴者给了分步骤的建议。"
+    else:
+        parts: List[str] = []
+        while estimate_tokens("".join(parts)) < reply_tokens:
+            parts.append(_REPLY_SENTENCES[len(parts) % len(_REPLY_SENTENCES)])
+        return "".join(parts)
+    return json.dumps(content, ensure_ascii=False)
+
+
+def embed_text(text: str, dimensions: int) -> List[float]:
+    """字符 bigram 带符号哈希到 dimensions 维，L2 归一化"""
+    vector = [0.0] * dimensions
+    grams = [text[i:i + 2] for i in range(max(1, len(text) - 1))]
+    for gram in grams:
+        digest = hashlib.md5(gram.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def _error(status: int) -> JSONResponse:
+    error_type = {429: "rate_limit_exceeded", 503: "service_unavailable"}.get(status, "server_error")
+    headers = {"Retry-After": "1"} if status == 429 else None
+    return JSONResponse(
+        {"error": {"message": f"fake provider injected {status}", "type": error_type, "code": error_type}},
+        status_code=status,
+        headers=headers,
+    )
+
+
+class FakeOpenAI:
+    """OpenAI 兼容的假 provider（FastAPI 应用 + 可选的后台线程 uvicorn）"""
+
+    def __init__(
+        self,
+        ttft: float = 0.3,
+        per_token: float = 0.005,
+        latency_dist: str = "lognormal",
+        sigma: float = 0.35,
+        tail_rate: float = 0.0,
+        tail_ttft: float = 2.0,
+        error_rate: float = 0.0,
+        error_status: Sequence[int] = (500, 429, 503),
+        stream_abort_rate: float = 0.0,
+        reply_tokens: int = 80,
+        stream_chunk_chars: int = 4,
+        dimensions: int = 1536,
+        seed: Optional[int] = None,
+    ) -> None:
+        if latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency_dist must be one of {LATENCY_DISTRIBUTIONS}")
+        self.ttft = ttft
+        self.per_token = per_token
+        self.latency_dist = latency_dist
+        self.sigma = sigma
+        self.tail_rate = tail_rate
+        self.tail_ttft = tail_ttft
+        self.error_rate = error_rate
+        self.error_status = tuple(error_status) or (500,)
+        self.stream_abort_rate = stream_abort_rate
+        self.reply_tokens = reply_tokens
+        self.stream_chunk_chars = max(1, stream_chunk_chars)
+        self.dimensions = dimensions
+        self.random = random.Random(seed)
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self.server: Optional[uvicorn.Server] = None
+        self.base_url: Optional[str] = None
+        self.app = self._build_app()
+
+    def sample_ttft(self) -> float:
+        base = self.tail_ttft if self.random.random() < self.tail_rate else self.ttft
+        if self.latency_dist == "lognormal":
+            return base * self.random.lognormvariate(0, self.sigma)
+        if self.latency_dist == "exponential":
+            return self.random.expovariate(1 / base) if base > 0 else 0.0
+        return base
+
+    def _record(self, family: str, **values: int) -> None:
+        counts = self._counts.setdefault(
+            family, {"requests": 0, "errors": 0, "streamed": 0, "aborted": 0, "prompt_tokens": 0, "completion_tokens": 0},
+        )
+        for name, value in values.items():
+            counts[name] += value
+
+    def stats(self) -> Dict[str, Any]:
+        return {family: dict(counts) for family, counts in self._counts.items()}
+
+    def reset_stats(self) -> None:
+        self._counts.clear()
+
+    def _inject_error(self, family: str) -> Optional[JSONResponse]:
+        if self.error_rate and self.random.random() < self.error_rate:
+            self._record(family, requests=1, errors=1)
+            return _error(self.random.choice(self.error_status))
+        return None
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Fake OpenAI")
+
+        @app.get("/v1/models")
+        async def models():
+            return {"object": "list", "data": [
+                {"id": name, "object": "model", "created": 0, "owned_by": "fake"}
+                for name in ("gpt-4o-mini", "deepseek-chat", "text-embedding-3-small")
+            ]}
+
+        @app.post("/v1/chat/completions")
+        async def chat_completions(payload: dict):
+            messages = payload.get("messages") or []
+            family = detect_family(messages, payload.get("response_format"))
+            error = self._inject_error(family)
+            if error is not None:
+                return error
+
+            content = build_content(family, messages, self.reply_tokens)
+            finish_reason = "stop"
+            max_tokens = payload.get("max_tokens") or payload.get("max_completion_tokens")
+            if max_tokens and estimate_tokens(content) > max_tokens:
+                # 与真实 provider 一致：超出 max_tokens 时截断，finish_reason 为 length
+                while content and estimate_tokens(content) > max_tokens:
+                    content = content[:-1]
+                finish_reason = "length"
+            usage = {
+                "prompt_tokens": sum(estimate_tokens(str(m.get("content", ""))) for m in messages),
+                "completion_tokens": estimate_tokens(content),
+            }
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            self._record(family, requests=1, prompt_tokens=usage["prompt_tokens"],
+                         completion_tokens=usage["completion_tokens"])
+            model = payload.get("model", "fake")
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+            if payload.get("stream"):
+                self._record(family, streamed=1)
+                include_usage = bool((payload.get("stream_options") or {}).get("include_usage"))
+                return StreamingResponse(
+                    self._stream(family, completion_id, model, content, finish_reason,
+                                 usage if include_usage else None),
+                    media_type="text/event-stream",
+                )
+
+            await asyncio.sleep(self.sample_ttft() + usage["completion_tokens"] * self.per_token)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": finish_reason,
+                }],
+                "usage": usage,
+            }
+
+        @app.post("/v1/embeddings")
+        async def embeddings(payload: dict):
+            inputs = payload.get("input")
+            texts = [inputs] if isinstance(inputs, str) else [str(item) for item in inputs or []]
+            error = self._inject_error("embedding")
+            if error is not None:
+                return error
+            dimensions = int(payload.get("dimensions") or self.dimensions)
+            tokens = sum(estimate_tokens(text) for text in texts)
+            self._record("embedding", requests=1, prompt_tokens=tokens)
+            await asyncio.sleep(self.sample_ttft())
+            data = []
+            for index, text in enumerate(texts):
+                vector: Any = embed_text(text, dimensions)
+                if payload.get("encoding_format") == "base64":
+                    vector = base64.b64encode(array.array("f", vector).tobytes()).decode("ascii")
+                data.append({"object": "embedding", "index": index, "embedding": vector})
+            return {
+                "object": "list",
+                "data": data,
+                "model": payload.get("model", "text-embedding-3-small"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }
+
+        @app.get("/stats")
+        async def stats():
+            return self.stats()
+
+        return app
+
+    async def _stream(
+        self,
+        family: str,
+        completion_id: str,
+        model: str,
+        content: str,
+        finish_reason: str,
+        usage: Optional[Dict[str, int]],
+    ):
+        def chunk(choices: List[Dict[str, Any]], **extra: Any) -> str:
+            body = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": choices,
+                **extra,
+            }
+            return f"data: {json.dumps(body, ensure_ascii=False)}\n\n"
+
+        pieces = [content[i:i + self.stream_chunk_chars] for i in range(0, len(content), self.stream_chunk_chars)]
+        abort_at = len(pieces) // 2 if self.stream_abort_rate and self.random.random() < self.stream_abort_rate else -1
+        await asyncio.sleep(self.sample_ttft())
+        yield chunk([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        for index, piece in enumerate(pieces):
+            if index == abort_at:
+                self._record(family, aborted=1)
+                raise StreamAborted(completion_id)
+            yield chunk([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            await asyncio.sleep(estimate_tokens(piece) * self.per_token)
+        yield chunk([{"index": 0, "delta": {}, "finish_reason": finish_reason}])
+        if usage is not None:
+            yield chunk([], usage=usage)
+        yield "data: [DONE]\n\n"
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """在后台线程启动，返回 base_url（…/v1）"""
+        self.server, self.base_url = start_in_thread(self.app, host, port)
+        return self.base_url
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.should_exit = True
+            self.server = None
+
+    def gateway(self, **kwargs: Any) -> LLMGateway:
+        """指向假 provider 的 LLM 网关（默认关闭响应缓存）"""
+        if self.base_url is None:
+            self.start()
+        kwargs.setdefault("cache", LLMResponseCache(size=0))
+        return LLMGateway(api_key="fake", base_url=self.base_url, **kwargs)
+
+    def ai_service(self, **kwargs: Any) -> AIService:
+        return AIService(gateway=self.gateway(**kwargs))
+
+
+def start_in_thread(app: FastAPI, host: str = "127.0.0.1", port: int = 0) -> Tuple[uvicorn.Server, str]:
+    """在后台线程运行 uvicorn（port=0 时取空闲端口），返回 (server, base_url)"""
+    if not port:
+        with socket.socket() as sock:
+            sock.bind((host, 0))
+            port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://{host}:{port}/v1"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft", type=float, default=0.3, help="首 token 延迟中位数（秒）")
+    parser.add_argument("--per-token", type=float, default=0.005, help="每个输出 token 的延迟（秒）")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--sigma", type=float, default=0.35, help="lognormal 抖动")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="走长尾延迟的请求比例")
+    parser.add_argument("--tail-ttft", type=float, default=2.0, help="长尾请求的首 token 延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误状态码的请求比例")
+    parser.add_argument("--error-status", default="500,429,503", help="注入的错误状态码（逗号分隔，随机选取）")
+    parser.add_argument("--stream-abort-rate", type=float, default=0.0, help="中途断开的流式请求比例")
+    parser.add_argument("--reply-tokens", type=int, default=80, help="陪伴回复的 token 数")
+    parser.add_argument("--dimensions", type=int, default=1536, help="embedding 维度")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    fake = FakeOpenAI(
+        ttft=args.ttft,
+        per_token=args.per_token,
+        latency_dist=args.latency_dist,
+        sigma=args.sigma,
+        tail_rate=args.tail_rate,
+        tail_ttft=args.tail_ttft,
+        error_rate=args.error_rate,
+        error_status=[int(status) for status in args.error_status.split(",") if status.strip()],
+        stream_abort_rate=args.stream_abort_rate,
+        reply_tokens=args.reply_tokens,
+        dimensions=args.dimensions,
+        seed=args.seed,
+    )
+    uvicorn.run(fake.app, host=args.host, port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
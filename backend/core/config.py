@@ -10,8 +10,105 @@ class Settings:
     )
     MONGO_URI: str | None = os.getenv("MONGO_URI")
     MONGO_DB: str = os.getenv("MONGO_DB", "app")
+    # Mongo 连接池配置（进程内所有 DBService 共用一个连接池）
+    MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+    MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+    MONGO_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = int(
+        os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")
+    )
     CHROMA_PATH: str = os.getenv("CHROMA_PATH", "./.chroma")
+    # 编译后的规则快照（python -m services.rules.snapshot 构建）
+    RULE_SNAPSHOT_PATH: str = os.getenv("RULE_SNAPSHOT_PATH", "./.cache/rule_snapshot.bin")
+    # 模板 pattern 索引检查 prompt/*.json mtime 的最小间隔（秒）
+    TEMPLATE_INDEX_CHECK_INTERVAL: float = float(os.getenv("TEMPLATE_INDEX_CHECK_INTERVAL", "5"))
+    # 定期从配置服务重新编译规则版本的间隔（秒，0 表示只在本 worker 修改配置时重新编译）
+    RULE_REFRESH_INTERVAL: float = float(os.getenv("RULE_REFRESH_INTERVAL", "30"))
+    # 批量文本分析每个分块的文本数（分块拼接后整体扫描 / 分词）
+    BATCH_ANALYSIS_CHUNK_SIZE: int = int(os.getenv("BATCH_ANALYSIS_CHUNK_SIZE", "5000"))
+    # 批量文本分析每次请求最多的文本数；开启 use_ai（逐条 LLM 语义分析）时的上限
+    BATCH_ANALYSIS_MAX_TEXTS: int = int(os.getenv("BATCH_ANALYSIS_MAX_TEXTS", "100000"))
+    BATCH_ANALYSIS_MAX_AI_TEXTS: int = int(os.getenv("BATCH_ANALYSIS_MAX_AI_TEXTS", "200"))
+    # 关键词提取：LRU 缓存条数、进程池大小（0 表示改用线程池）、同时在途的池任务上限、每个池任务的文本数
+    KEYWORD_CACHE_SIZE: int = int(os.getenv("KEYWORD_CACHE_SIZE", "10000"))
+    KEYWORD_POOL_WORKERS: int = int(os.getenv("KEYWORD_POOL_WORKERS", "2"))
+    KEYWORD_POOL_MAX_PENDING: int = int(os.getenv("KEYWORD_POOL_MAX_PENDING", "32"))
+    KEYWORD_POOL_BATCH_SIZE: int = int(os.getenv("KEYWORD_POOL_BATCH_SIZE", "256"))
     OPENAI_API_KEY: str | None = os.getenv("OPENAI_API_KEY")
+    OPENAI_BASE_URL: str | None = os.getenv("OPENAI_BASE_URL")
+    # 配置服务 LLM_PROVIDER.deepseek 未给出 api_key / base_url 时使用
+    DEEPSEEK_API_KEY: str | None = os.getenv("DEEPSEEK_API_KEY")
+    DEEPSEEK_BASE_URL: str | None = os.getenv("DEEPSEEK_BASE_URL")
+    # LLM 网关：单次调用超时（秒，含排队）、全局并发上限、每个调用点的默认并发上限，
+    # 按调用点覆盖（如 "decoder.semantic=4,companion.reply=32"）、SDK 自动重试次数（默认 2，与 OpenAI SDK 一致）
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "20"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+    LLM_ENDPOINT_CONCURRENCY: int = int(os.getenv("LLM_ENDPOINT_CONCURRENCY", "16"))
+    LLM_ENDPOINT_LIMITS: str = os.getenv("LLM_ENDPOINT_LIMITS", "")
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    # LLM 网关 httpx 连接池大小
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    # 对冲请求：主 provider 超过该调用点最近成功延迟的分位数仍未返回时向备用 provider 再发一份；
+    # 每个调用点保留的延迟样本数、开始对冲前需要的最少样本数、对冲等待的下限（秒）
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+    LLM_HEDGE_WINDOW: int = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+    LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+    LLM_HEDGE_MIN_DELAY: float = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.3"))
+    # 按调用点覆盖 max_tokens（如 "companion.reply=512,decoder.translate=400"，未列出的使用调用方给出的值）；
+    # 流式调用是否请求 provider 在最后一个分块中返回 usage（provider 不支持 stream_options 时设为 false，改为估算）
+    LLM_MAX_TOKENS: str = os.getenv("LLM_MAX_TOKENS", "")
+    LLM_STREAM_INCLUDE_USAGE: bool = os.getenv("LLM_STREAM_INCLUDE_USAGE", "true").lower() == "true"
+    # LLM 用量按天聚合：进程内保留的天数、写入 Mongo llm_usage_daily 的间隔（秒，0 表示只在退出时写入）
+    LLM_USAGE_RETENTION_DAYS: int = int(os.getenv("LLM_USAGE_RETENTION_DAYS", "7"))
+    LLM_USAGE_FLUSH_INTERVAL: float = float(os.getenv("LLM_USAGE_FLUSH_INTERVAL", "30"))
+    # LLM 微批（AI 场景分类 / 三级精炼）：每批最多条数（1 表示不合并）、凑批的最长等待（毫秒）
+    LLM_BATCH_MAX_SIZE: int = int(os.getenv("LLM_BATCH_MAX_SIZE", "16"))
+    LLM_BATCH_LINGER_MS: float = float(os.getenv("LLM_BATCH_LINGER_MS", "20"))
+    # /decoder/batch-decode 每次请求最多的文本数（各条文本按 LLM_BATCH_MAX_SIZE 条并发解码）
+    DECODER_BATCH_MAX_TEXTS: int = int(os.getenv("DECODER_BATCH_MAX_TEXTS", "200"))
+    # LLM 响应缓存：内存层条数（0 关闭缓存）、有效期（秒）、持久层（auto/mongo/disk/none）及本地文件路径
+    LLM_CACHE_SIZE: int = int(os.getenv("LLM_CACHE_SIZE", "2000"))
+    LLM_CACHE_TTL: float = float(os.getenv("LLM_CACHE_TTL", "86400"))
+    LLM_CACHE_BACKEND: str = os.getenv("LLM_CACHE_BACKEND", "auto")
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", "./.cache/llm_cache.sqlite3")
+    # 只缓存 temperature 不高于该值的调用；列出的调用点不论 temperature 都缓存
+    LLM_CACHE_MAX_TEMPERATURE: float = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0"))
+    LLM_CACHE_ENDPOINTS: str = os.getenv(
+        "LLM_CACHE_ENDPOINTS", "classifier.scene,risk.detect,decoder.semantic,decoder.translate,decoder.fused"
+    )
+    # 近似重复缓存（AI 场景分类 / 三级精炼）：每个调用点的条数、Jaccard 相似度阈值、
+    # 只做精确匹配的短文本长度（规范化后字符数）、命中后抽样复核的比例
+    NEAR_DUP_CACHE_SIZE: int = int(os.getenv("NEAR_DUP_CACHE_SIZE", "5000"))
+    NEAR_DUP_THRESHOLD: float = float(os.getenv("NEAR_DUP_THRESHOLD", "0.7"))
+    NEAR_DUP_MIN_CHARS: int = int(os.getenv("NEAR_DUP_MIN_CHARS", "6"))
+    NEAR_DUP_AUDIT_RATE: float = float(os.getenv("NEAR_DUP_AUDIT_RATE", "0.02"))
+    # 解码的 AI 路径：multi（精炼 / 风险分别请求）或 fused（一次结构化请求）；
+    # provider 不支持 json_schema 响应格式时把 DECODER_FUSED_STRICT_SCHEMA 设为 false
+    DECODER_AI_MODE: str = os.getenv("DECODER_AI_MODE", "multi")
+    DECODER_FUSED_STRICT_SCHEMA: bool = os.getenv("DECODER_FUSED_STRICT_SCHEMA", "true").lower() == "true"
+    # 本地场景分类模型（python -m services.decoder.local_classifier train 生成）：规则置信度不足时先用本地模型，
+    # 置信度不低于 LOCAL_CLASSIFIER_MIN_CONFIDENCE 时不再请求 LLM；各 worker 检查模型文件更新的间隔（秒，0 表示只在 reload 时加载）
+    LOCAL_CLASSIFIER_ENABLED: bool = os.getenv("LOCAL_CLASSIFIER_ENABLED", "true").lower() == "true"
+    LOCAL_CLASSIFIER_PATH: str = os.getenv("LOCAL_CLASSIFIER_PATH", "./.cache/local_scene_model.npz")
+    LOCAL_CLASSIFIER_MIN_CONFIDENCE: float = float(os.getenv("LOCAL_CLASSIFIER_MIN_CONFIDENCE", "0.85"))
+    LOCAL_CLASSIFIER_RELOAD_INTERVAL: float = float(os.getenv("LOCAL_CLASSIFIER_RELOAD_INTERVAL", "60"))
+    # 延迟预算（毫秒，0 表示不限时；请求里的 latency_budget_ms 优先）：超出预算的 LLM / 外部模型阶段
+    # 先返回规则结果并标记 degraded，调用转入后台完成；后台任务上限、后台结果的保留时间（秒）
+    DECODER_LATENCY_BUDGET_MS: float = float(os.getenv("DECODER_LATENCY_BUDGET_MS", "0"))
+    COMPANION_LATENCY_BUDGET_MS: float = float(os.getenv("COMPANION_LATENCY_BUDGET_MS", "0"))
+    REALTIME_LATENCY_BUDGET_MS: float = float(os.getenv("REALTIME_LATENCY_BUDGET_MS", "0"))
+    LATENCY_BUDGET_MAX_BACKGROUND: int = int(os.getenv("LATENCY_BUDGET_MAX_BACKGROUND", "256"))
+    LATENCY_BUDGET_RESULT_TTL: float = float(os.getenv("LATENCY_BUDGET_RESULT_TTL", "600"))
+    # Prompt token 预算（估算 token 数，0 表示不限制）：陪伴回复 prompt（含检索文档）、PromptCompiler 编译结果；
+    # 陪伴对话取最近多少条历史、其中原文进入 prompt 的条数（更早的折叠为滚动摘要）、摘要长度上限、摘要缓存的用户数
+    COMPANION_PROMPT_MAX_TOKENS: int = int(os.getenv("COMPANION_PROMPT_MAX_TOKENS", "1500"))
+    PROMPT_COMPILER_MAX_TOKENS: int = int(os.getenv("PROMPT_COMPILER_MAX_TOKENS", "1000"))
+    COMPANION_HISTORY_FETCH: int = int(os.getenv("COMPANION_HISTORY_FETCH", "30"))
+    COMPANION_RECENT_MESSAGES: int = int(os.getenv("COMPANION_RECENT_MESSAGES", "6"))
+    PROMPT_SUMMARY_MAX_TOKENS: int = int(os.getenv("PROMPT_SUMMARY_MAX_TOKENS", "200"))
+    PROMPT_SUMMARY_CACHE_SIZE: int = int(os.getenv("PROMPT_SUMMARY_CACHE_SIZE", "2000"))
     TEXT_EMOTION_PROVIDER: str = os.getenv("TEXT_EMOTION_PROVIDER", "heuristic")
     VOICE_EMOTION_PROVIDER: str = os.getenv("VOICE_EMOTION_PROVIDER", "heuristic")
     FACE_EMOTION_PROVIDER: str = os.getenv("FACE_EMOTION_PROVIDER", "heuristic")
@@ -0,0 +1,124 @@
+"""
+应用级服务容器：每个进程只构建一次服务对象图，由 FastAPI lifespan 管理生命周期
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:  # 仅用于类型标注，避免导入期加载整个服务层
+    from services.ai_service import AIService
+    from services.classifier_service import ClassifierService
+    from services.companion_service import CompanionService
+    from services.dashboard_service import DashboardService
+    from services.decoder.decoder_orchestrator import DecoderOrchestrator
+    from services.decoder_service import DecoderService
+    from services.emotion_service import EmotionService
+    from services.intervention_service import InterventionService
+    from services.progress_service import ProgressService
+    from services.risk_detection import RiskDetectionService
+    from services.template_service import TemplateService
+
+
+class ServiceContainer:
+    """
+    持有进程内共享的服务实例。
+
+    原先每个请求都会重新构建 DecoderService -> AIService / ClassifierService /
+    TemplateService / RiskDetectionService / DecoderOrchestrator 整棵对象图，
+    这里在启动时构建一次，之后通过 `Depends` 注入到路由处理函数中。
+    """
+
+    def __init__(self) -> None:
+        self.started = False
+        self.ai_service: Optional["AIService"] = None
+        self.template_service: Optional["TemplateService"] = None
+        self.classifier: Optional["ClassifierService"] = None
+        self.risk_detection: Optional["RiskDetectionService"] = None
+        self.orchestrator: Optional["DecoderOrchestrator"] = None
+        self.decoder_service: Optional["DecoderService"] = None
+        self.emotion_service: Optional["EmotionService"] = None
+        self.progress_service: Optional["ProgressService"] = None
+        self.intervention_service: Optional["InterventionService"] = None
+        self.companion_service: Optional["CompanionService"] = None
+        self.dashboard_service: Optional["DashboardService"] = None
+
+    def startup(self) -> None:
+        """构建服务对象图（幂等）"""
+        if self.started:
+            return
+
+        from services.ai_service import AIService
+        from services.classifier_service import ClassifierService
+        from services.companion_service import CompanionService
+        from services.dashboard_service import DashboardService
+        from services.decoder.decoder_orchestrator import DecoderOrchestrator
+        from services.decoder_service import DecoderService
+        from services.emotion_service import EmotionService
+        from services.intervention_service import InterventionService
+        from services.progress_service import ProgressService
+        from services.risk_detection import RiskDetectionService
+        from services.template_service import TemplateService
+
+        self.ai_service = AIService()
+        self.template_service = TemplateService()
+        self.classifier = ClassifierService(ai_service=self.ai_service)
+        self.risk_detection = RiskDetectionService(ai_service=self.ai_service)
+        self.orchestrator = DecoderOrchestrator(
+            classifier=self.classifier,
+            template_service=self.template_service,
+            risk_detection=self.risk_detection,
+        )
+        self.decoder_service = DecoderService(
+            ai_service=self.ai_service,
+            classifier=self.classifier,
+            template_service=self.template_service,
+            risk_detection=self.risk_detection,
+            orchestrator=self.orchestrator,
+        )
+        self.emotion_service = EmotionService(
+            decoder=self.decoder_service,
+            ai_service=self.ai_service,
+        )
+        self.progress_service = ProgressService()
+        self.intervention_service = InterventionService(
+            emotion_service=self.emotion_service,
+            decoder_service=self.decoder_service,
+        )
+        self.companion_service = CompanionService(ai_service=self.ai_service)
+        self.dashboard_service = DashboardService(
+            emotion_service=self.emotion_service,
+            progress_service=self.progress_service,
+            intervention_service=self.intervention_service,
+            companion_service=self.companion_service,
+            decoder_service=self.decoder_service,
+        )
+        self.started = True
+
+    async def shutdown(self) -> None:
+        """
+        进程退出前调用，依次：取消超出延迟预算的后台调用、关闭 LLM 连接池、关闭关键词提取进程池、
+        写入尚未落库的 LLM 用量（包含前几步中结束的调用）、最后关闭共享的 Mongo 连接池
+        """
+        from services.db_service import close_mongo_client
+        from services.decoder.keyword_extractor import get_keyword_extractor
+        from services.llm_gateway import get_llm_gateway
+        from services.llm_usage import get_llm_usage_ledger
+        from services.latency_budget import cancel_background_tasks
+
+        await cancel_background_tasks()
+        await get_llm_gateway().aclose()
+        get_keyword_extractor().shutdown()
+        await get_llm_usage_ledger().flush()
+        close_mongo_client()
+        self.started = False
+
+
+_container_instance: Optional[ServiceContainer] = None
+
+
+def get_container() -> ServiceContainer:
+    """获取服务容器单例"""
+    global _container_instance
+    if _container_instance is None:
+        _container_instance = ServiceContainer()
+    return _container_instance
@@ -0,0 +1,55 @@
+"""
+Prometheus 指标工具：未安装 prometheus_client 时退化为空操作
+"""
+from __future__ import annotations
+
+from typing import Any, Sequence
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram
+except Exception:  # prometheus_client 未安装时兜底
+    Counter = Gauge = Histogram = None  # type: ignore
+
+
+class _NoopMetric:
+    """与 prometheus_client 指标接口一致的空实现"""
+
+    def labels(self, *args: Any, **kwargs: Any) -> "_NoopMetric":
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+    def observe(self, value: float) -> None:
+        pass
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Any:
+    if Counter is None:
+        return _NoopMetric()
+    return Counter(name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Any:
+    if Gauge is None:
+        return _NoopMetric()
+    return Gauge(name, documentation, labelnames)
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] | None = None,
+) -> Any:
+    if Histogram is None:
+        return _NoopMetric()
+    if buckets is None:
+        return Histogram(name, documentation, labelnames)
+    return Histogram(name, documentation, labelnames, buckets=buckets)
@@ -0,0 +1,247 @@
+"""
+启动预热：加载 jieba 词典、解析 prompt 模板、导入服务模块、加载规则快照、编译分类规则、
+建立 LLM provider 池、启动关键词提取进程池，
+并检查 Mongo / Chroma，可用后才将应用标记为 ready
+
+Mongo 启动时不可达时在后台按指数退避持续重试（/health/ready 期间返回 503），
+首次 ping 成功后创建索引，再将应用标记为 ready
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.config import settings
+from core.container import ServiceContainer
+
+logger = logging.getLogger(__name__)
+
+# 进程启动时间（模块首次导入时记录），用于计算冷启动耗时
+PROCESS_START = time.monotonic()
+
+_BACKEND_ROOT = Path(__file__).resolve().parents[1]
+
+# Mongo 不可达时的重试间隔（秒）：从 _MONGO_RETRY_INITIAL 开始翻倍，最长 _MONGO_RETRY_MAX
+_MONGO_RETRY_INITIAL = 1.0
+_MONGO_RETRY_MAX = 30.0
+
+
+class WarmupState:
+    """预热进度与就绪状态"""
+
+    def __init__(self) -> None:
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.ready = False
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.checks: Dict[str, Dict[str, Any]] = {}
+        self.first_request_logged = False
+
+    @property
+    def cold_start_ms(self) -> Optional[float]:
+        if self.finished_at is None:
+            return None
+        return round((self.finished_at - PROCESS_START) * 1000, 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "status": "ready" if self.ready else "starting",
+            "cold_start_ms": self.cold_start_ms,
+            "steps": self.steps,
+            "checks": self.checks,
+        }
+
+
+warmup_state = WarmupState()
+
+
+def _import_service_modules() -> int:
+    """导入 services 下所有模块，避免首个请求在处理函数中触发导入"""
+    count = 0
+    for path in sorted((_BACKEND_ROOT / "services").rglob("*.py")):
+        module = ".".join(path.relative_to(_BACKEND_ROOT).with_suffix("").parts)
+        if module.endswith(".__init__"):
+            module = module[: -len(".__init__")]
+        try:
+            importlib.import_module(module)
+            count += 1
+        except Exception as exc:
+            logger.warning("Warm-up import of %s failed: %s", module, exc)
+    return count
+
+
+def _load_prompt_templates() -> int:
+    """解析 prompt/*.json（结果进入 PromptService 的 lru_cache）"""
+    from services.prompt_service import get_prompt_service
+
+    service = get_prompt_service()
+    count = 0
+    for info in service.list_templates():
+        try:
+            service.load_template(info["name"])
+            count += 1
+        except Exception as exc:
+            logger.warning("Warm-up load of prompt %s failed: %s", info["name"], exc)
+    return count
+
+
+def _load_rule_snapshot() -> str:
+    """加载（必要时重建）规则快照并构建模板 pattern 索引，返回源哈希前缀"""
+    from services.rules.snapshot import get_rule_snapshot
+    from services.rules.template_index import get_template_index
+
+    snapshot = get_rule_snapshot()
+    get_template_index()
+    return snapshot.source_hash[:12]
+
+
+async def _load_active_rules() -> Dict[str, Any]:
+    """从配置服务编译规则版本（关键词 / 风险词 / 阈值）"""
+    from services.rules.active import get_rule_registry
+
+    rules = await get_rule_registry().reload()
+    return rules.info()
+
+
+async def _load_llm_providers() -> List[str]:
+    """按配置服务的 LLM_PROVIDER 配置为每个 provider 建立常驻客户端（对冲 / 失败转移）"""
+    from services.llm_gateway import get_llm_gateway
+
+    return await get_llm_gateway().load_providers()
+
+
+def _start_keyword_pool() -> int:
+    """启动关键词提取进程池（每个 worker 各自一个，不在 preload 主进程中创建）"""
+    from services.decoder.keyword_extractor import get_keyword_extractor
+
+    return get_keyword_extractor().start()
+
+
+def preload_shared_assets() -> Dict[str, Any]:
+    """
+    同步预加载只读资源（供 preload-then-fork 启动器在主进程中调用）：
+    导入服务模块与大型三方库、加载 jieba 词典、解析 prompt 模板、加载规则快照。
+    fork 后各 worker 通过写时复制共享这些内存页。
+    """
+    from services.decoder_service import init_jieba
+
+    timings: Dict[str, Any] = {}
+    for name, func in (
+        ("import_services", _import_service_modules),
+        ("jieba", init_jieba),
+        ("prompt_templates", _load_prompt_templates),
+        ("rule_snapshot", _load_rule_snapshot),
+    ):
+        start = time.perf_counter()
+        func()
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+    for module in ("chromadb", "langchain", "openai"):
+        try:
+            importlib.import_module(module)
+        except Exception:
+            pass  # 可选依赖
+    return timings
+
+
+async def _check_mongo() -> Dict[str, Any]:
+    from services.db_service import DBService
+
+    db = DBService()
+    if db._client is None:
+        return {"status": "skipped", "required": False, "detail": "MONGO_URI not set, using memory store"}
+    try:
+        await db._client.admin.command("ping")
+        return {"status": "ok", "required": True}
+    except Exception as exc:
+        return {"status": "error", "required": True, "detail": str(exc)}
+
+
+async def _ensure_indexes() -> bool:
+    from services.db_service import DBService
+
+    await DBService().ensure_indexes()
+    return True
+
+
+def _check_chroma() -> Dict[str, Any]:
+    from services.vector_service import VectorService
+
+    service = VectorService()
+    if service._client is None:
+        # 向量检索可降级为内存模式，不影响就绪
+        return {"status": "skipped", "required": False, "detail": f"chroma unavailable at {settings.CHROMA_PATH}"}
+    try:
+        service._client.heartbeat()
+        return {"status": "ok", "required": False}
+    except Exception as exc:
+        return {"status": "error", "required": False, "detail": str(exc)}
+
+
+async def _wait_for_mongo() -> None:
+    """ping 成功且索引创建完成（或未配置 Mongo）后返回；失败时按指数退避重试"""
+    delay = _MONGO_RETRY_INITIAL
+    attempts = 0
+    while True:
+        attempts += 1
+        check = await _check_mongo()
+        # 索引只在首次 ping 成功后创建一次，不在查询路径上懒加载
+        if check["status"] == "ok" and await _run_step("mongo_indexes", _ensure_indexes) is None:
+            check = {"status": "error", "required": True, "detail": "index creation failed"}
+        check["attempts"] = attempts
+        warmup_state.checks["mongo"] = check
+        if check["status"] != "error":
+            return
+        logger.warning(
+            "Mongo not ready (attempt %d): %s; retrying in %.0f s", attempts, check.get("detail"), delay
+        )
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, _MONGO_RETRY_MAX)
+
+
+async def _run_step(name: str, func, *args) -> Any:
+    start = time.perf_counter()
+    try:
+        if asyncio.iscoroutinefunction(func):
+            result = await func(*args)
+        else:
+            # CPU/IO 密集的加载放到线程中，预热期间 /health 仍可响应
+            result = await asyncio.to_thread(func, *args)
+        warmup_state.steps[name] = {"status": "ok", "result": result}
+        return result
+    except Exception as exc:
+        warmup_state.steps[name] = {"status": "error", "detail": str(exc)}
+        logger.warning("Warm-up step %s failed: %s", name, exc)
+        return None
+    finally:
+        warmup_state.steps[name]["ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+
+async def run_warmup(container: ServiceContainer) -> Dict[str, Any]:
+    """执行全部预热步骤，完成后将应用标记为 ready"""
+    from services.decoder_service import init_jieba
+
+    warmup_state.started_at = time.monotonic()
+
+    await _run_step("import_services", _import_service_modules)
+    await _run_step("jieba", init_jieba)
+    await _run_step("prompt_templates", _load_prompt_templates)
+    await _run_step("rule_snapshot", _load_rule_snapshot)
+    await _run_step("classification_rules", _load_active_rules)
+    await _run_step("llm_providers", _load_llm_providers)
+    await _run_step("keyword_pool", _start_keyword_pool)
+
+    warmup_state.checks["chroma"] = await asyncio.to_thread(_check_chroma)
+    await _wait_for_mongo()
+
+    warmup_state.finished_at = time.monotonic()
+    warmup_state.ready = all(
+        check["status"] != "error" for check in warmup_state.checks.values() if check.get("required")
+    )
+    logger.info(
+        "Warm-up finished: cold start %.1f ms, ready=%s", warmup_state.cold_start_ms, warmup_state.ready
+    )
+    return warmup_state.snapshot()
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from starlette.requests import HTTPConnection
+
+from core.container import ServiceContainer, get_container
+
+if TYPE_CHECKING:
+    from services.companion_service import CompanionService
+    from services.dashboard_service import DashboardService
+    from services.decoder_service import DecoderService
+    from services.emotion_service import EmotionService
+    from services.intervention_service import InterventionService
+    from services.progress_service import ProgressService
+    from services.template_service import TemplateService
+
+
+def get_service_container(request: HTTPConnection) -> ServiceContainer:
+    """获取 lifespan 中构建好的服务容器（未经 lifespan 启动时按需构建；HTTP 和 WebSocket 路由通用）"""
+    container = getattr(request.app.state, "container", None) or get_container()
+    if not container.started:
+        container.startup()
+    return container
+
+
+def get_decoder_service(request: HTTPConnection) -> "DecoderService":
+    return get_service_container(request).decoder_service
+
+
+def get_emotion_service(request: HTTPConnection) -> "EmotionService":
+    return get_service_container(request).emotion_service
+
+
+def get_progress_service(request: HTTPConnection) -> "ProgressService":
+    return get_service_container(request).progress_service
+
+
+def get_intervention_service(request: HTTPConnection) -> "InterventionService":
+    return get_service_container(request).intervention_service
+
+
+def get_companion_service(request: HTTPConnection) -> "CompanionService":
+    return get_service_container(request).companion_service
+
+
+def get_dashboard_service(request: HTTPConnection) -> "DashboardService":
+    return get_service_container(request).dashboard_service
+
+
+def get_template_service(request: HTTPConnection) -> "TemplateService":
+    return get_service_container(request).template_service
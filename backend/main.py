@@ -1,9 +1,27 @@
 """
 FastAPI 应用主入口
 """
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from core.config import settings
+from core.container import get_container
+from core.warmup import PROCESS_START, run_warmup, warmup_state
+from services.rules.active import get_rule_registry
+from services.llm_usage import get_llm_usage_ledger
+from services.decoder.local_classifier import get_local_scene_classifier
+
+try:
+    from prometheus_fastapi_instrumentator import Instrumentator
+except Exception:  # 未安装时不暴露 /metrics
+    Instrumentator = None  # type: ignore
+
+logger = logging.getLogger(__name__)
 
 # 导入所有路由
 from routers import (
@@ -20,11 +38,43 @@ from routers import (
     auth,
 )
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时构建进程级服务容器并在后台预热，退出时释放"""
+    container = get_container()
+    container.startup()
+    app.state.container = container
+    # 预热在后台执行：/health 立即可用，/health/ready 在预热完成后才返回 ready
+    warmup_task = asyncio.create_task(run_warmup(container))
+    background_tasks = [warmup_task]
+    if settings.RULE_REFRESH_INTERVAL > 0:
+        # 其它 worker 上的规则配置变更通过定期 reload 在本 worker 生效
+        background_tasks.append(
+            asyncio.create_task(get_rule_registry().run_refresh_loop(settings.RULE_REFRESH_INTERVAL))
+        )
+    if settings.LOCAL_CLASSIFIER_ENABLED and settings.LOCAL_CLASSIFIER_RELOAD_INTERVAL > 0:
+        # 离线训练写入新的本地场景模型后，各 worker 按 mtime 自动切换
+        background_tasks.append(asyncio.create_task(
+            get_local_scene_classifier().run_reload_loop(settings.LOCAL_CLASSIFIER_RELOAD_INTERVAL)
+        ))
+    if settings.LLM_USAGE_FLUSH_INTERVAL > 0:
+        # LLM 用量按天聚合在进程内，定期合并写入 llm_usage_daily
+        background_tasks.append(
+            asyncio.create_task(get_llm_usage_ledger().run_flush_loop(settings.LLM_USAGE_FLUSH_INTERVAL))
+        )
+    yield
+    for task in background_tasks:
+        task.cancel()
+    await container.shutdown()
+
+
 # 创建 FastAPI 应用
 app = FastAPI(
     title=settings.APP_NAME,
     description="ASD 康复辅助应用后端 API",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # 配置 CORS
@@ -36,6 +86,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Prometheus 指标（HTTP 指标 + Mongo 连接池等服务层指标）
+if Instrumentator is not None:
+    Instrumentator().instrument(app).expose(app, include_in_schema=False)
+
+
+@app.middleware("http")
+async def log_first_request(request: Request, call_next):
+    """记录首个业务请求的延迟"""
+    if warmup_state.first_request_logged or request.url.path.startswith("/health"):
+        return await call_next(request)
+    start = time.perf_counter()
+    response = await call_next(request)
+    if not warmup_state.first_request_logged:
+        warmup_state.first_request_logged = True
+        logger.info(
+            "First request %s %s took %.1f ms (%.1f s after process start, ready=%s)",
+            request.method,
+            request.url.path,
+            (time.perf_counter() - start) * 1000,
+            time.monotonic() - PROCESS_START,
+            warmup_state.ready,
+        )
+    return response
+
+
 # 注册路由
 app.include_router(companion.router, prefix="/companion", tags=["companion"])
 app.include_router(decoder.router, prefix="/decoder", tags=["decoder"])
@@ -66,6 +141,13 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/health/ready")
+async def health_ready():
+    """就绪检查：启动预热完成且必需依赖可用前返回 503"""
+    snapshot = warmup_state.snapshot()
+    return JSONResponse(snapshot, status_code=200 if warmup_state.ready else 503)
+
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import APIRouter, Depends, Query, HTTPException
 
 from dependencies.auth import require_roles
@@ -55,13 +57,139 @@ async def admin_interventions(user_id: str | None = None, limit: int = 50):
     return plans
 
 
+@router.get("/db/pool")
+async def db_pool_stats():
+    """Mongo 连接池使用情况"""
+    from services.db_service import get_pool_stats
+
+    return get_pool_stats()
+
+
+@router.get("/keywords/stats")
+async def keyword_extractor_stats():
+    """关键词提取缓存命中率与进程池队列深度（仅当前 worker）"""
+    from services.decoder.keyword_extractor import get_keyword_extractor
+
+    return get_keyword_extractor().stats()
+
+
+@router.get("/llm/stats")
+async def llm_gateway_stats():
+    """LLM 网关并发上限、在途调用数与各调用点的调用结果统计（仅当前 worker）"""
+    from services.llm_gateway import get_llm_gateway
+
+    return get_llm_gateway().stats()
+
+
+@router.get("/llm/usage")
+async def llm_usage(
+    days: int = Query(7, ge=1, le=90),
+    group_by: str = Query("day,stage", description="逗号分隔：day / stage / endpoint / provider / model / cache / user_id"),
+    user_id: str | None = Query(None),
+):
+    """LLM 用量：调用数、prompt / completion token（含估算部分）、延迟与被 max_tokens 截断的次数，按天汇总"""
+    from services.llm_usage import get_llm_usage_ledger
+
+    fields = [field.strip() for field in group_by.split(",") if field.strip()]
+    return {
+        "days": days,
+        "group_by": fields,
+        "rows": await get_llm_usage_ledger().query(days=days, group_by=fields, user_id=user_id),
+    }
+
+
+@router.get("/llm/near-duplicate-cache")
+async def near_duplicate_cache_stats():
+    """近似重复缓存命中率、命中相似度与抽样复核一致率（仅当前 worker）"""
+    from services.near_duplicate_cache import near_duplicate_cache_stats as collect_stats
+
+    return {"caches": collect_stats()}
+
+
+@router.get("/llm/batches")
+async def llm_batch_stats():
+    """LLM 微批：每批平均条数、平均耗时与每条文本摊到的 token 数（仅当前 worker）"""
+    from services.llm_batcher import llm_batcher_stats
+
+    return {"batchers": llm_batcher_stats()}
+
+
+@router.get("/prompt/summaries")
+async def conversation_summary_stats():
+    """陪伴对话滚动摘要：缓存用户数、命中 / 增量折叠 / 重建次数与后台 LLM 重写结果（仅当前 worker）"""
+    from services.companion.conversation_summary import get_conversation_summarizer
+
+    return get_conversation_summarizer().stats()
+
+
+@router.get("/single-flight")
+async def single_flight_stats():
+    """合并的并发重复调用：各组 leader / follower（被合并的重复调用）次数（仅当前 worker；LLM 网关的合并见 /admin/llm/stats）"""
+    from services.single_flight import single_flight_stats as collect_stats
+
+    return {"groups": collect_stats()}
+
+
+@router.get("/decoder/cascade")
+async def decoder_cascade_stats():
+    """解码级联策略：升级到 LLM / 跳过的次数、原因分布与避免的 LLM 调用比例（仅当前 worker）"""
+    from services.decoder.cascade import get_cascade_policy
+
+    return get_cascade_policy().stats()
+
+
+@router.get("/decoder/local-model")
+async def local_scene_model_stats():
+    """本地场景模型：当前模型版本 / 训练时的留出集指标、采用 / 置信度不足次数（仅当前 worker）"""
+    from services.decoder.local_classifier import get_local_scene_classifier
+
+    return get_local_scene_classifier().stats()
+
+
+@router.post("/decoder/local-model/reload")
+async def reload_local_scene_model():
+    """立即检查模型文件并在更新时替换（仅作用于当前 worker；其余 worker 按 LOCAL_CLASSIFIER_RELOAD_INTERVAL 自动切换）"""
+    from services.decoder.local_classifier import get_local_scene_classifier
+
+    classifier = get_local_scene_classifier()
+    swapped = await asyncio.to_thread(classifier.reload)
+    return {"swapped": swapped, **classifier.stats()}
+
+
+@router.get("/latency-budget")
+async def latency_budget_stats():
+    """超出延迟预算、转入后台完成的调用数与后台结果存储（仅当前 worker）"""
+    from services.latency_budget import latency_budget_stats as collect_stats
+
+    return collect_stats()
+
+
+@router.get("/rules")
+async def active_rules():
+    """当前生效的规则版本"""
+    from services.rules.active import get_active_rules
+
+    rules = get_active_rules()
+    return {**rules.info(), "built_at": rules.built_at, "thresholds": rules.thresholds}
+
+
+@router.post("/rules/reload")
+async def reload_rules():
+    """立即从配置服务重新编译规则版本"""
+    from services.rules.active import get_rule_registry
+
+    rules = await get_rule_registry().reload()
+    return rules.info()
+
+
 @router.post("/templates/reload")
 async def reload_templates():
-    from services.admin_service import AdminService
+    """重新加载 prompt 模板并重建模板 pattern 索引（仅作用于当前 worker）"""
+    from services.rules.template_index import get_template_index
 
-    service = AdminService()
-    service.reload_templates_cache()
-    return {"message": "Templates reloaded"}
+    index = get_template_index()
+    index.rebuild()
+    return {"message": "Templates reloaded", "index": index.stats()}
 
 
 
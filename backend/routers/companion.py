@@ -1,27 +1,39 @@
-from fastapi import APIRouter, Query
-from pydantic import BaseModel
-from typing import Optional
+import json
+import logging
+
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Any, Dict, Optional
+from dependencies.services import get_companion_service
+from services.companion_service import CompanionService
 
 
 class ChatRequest(BaseModel):
     user_id: Optional[str] = None
     message: str
     context: Optional[dict] = None
+    # 延迟预算（毫秒，默认 COMPANION_LATENCY_BUDGET_MS）：超出时先返回固定回复并标记 degraded
+    latency_budget_ms: Optional[int] = Field(None, ge=0)
 
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def _dump_event(event: Dict[str, Any]) -> str:
+    # done 事件的 context 里有 Mongo 文档（ObjectId / datetime）
+    return json.dumps(event, ensure_ascii=False, default=str)
 
 
 @router.post("/chat")
-async def chat(payload: ChatRequest):
+async def chat(payload: ChatRequest, service: CompanionService = Depends(get_companion_service)):
     """AI 陪伴对话"""
-    from services.companion_service import CompanionService
-    
-    service = CompanionService()
     result = await service.chat(
         user_id=payload.user_id or "u1",
         message=payload.message,
-        style=payload.context.get("style") if payload.context else None
+        style=payload.context.get("style") if payload.context else None,
+        latency_budget_ms=payload.latency_budget_ms,
     )
     
     # 处理返回结果，提取回复文本
@@ -34,19 +46,74 @@ async def chat(payload: ChatRequest):
         "reply": reply_text,
         "response": reply_text,  # 兼容前端字段名
         "message": reply_text,   # 兼容前端字段名
+        "degraded": result.get("degraded", False) if isinstance(result, dict) else False,
         "data": result,  # 保留完整数据
     }
 
 
+@router.post("/chat/stream")
+async def chat_stream(payload: ChatRequest, service: CompanionService = Depends(get_companion_service)):
+    """
+    AI 陪伴对话（流式，SSE）：provider 每产出一段文本推送一个 delta 事件，
+    生成结束并记录对话后推送 done 事件（完整回复和上下文，字段同 /chat 的 data）；不使用延迟预算
+    """
+    async def events():
+        try:
+            async for event in service.chat_stream(
+                user_id=payload.user_id or "u1",
+                message=payload.message,
+                style=payload.context.get("style") if payload.context else None,
+            ):
+                yield f"event: {event['type']}\ndata: {_dump_event(event)}\n\n"
+        except Exception as exc:
+            logger.exception("Companion stream failed")
+            yield f"event: error\ndata: {_dump_event({'type': 'error', 'message': str(exc)})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # 关闭反向代理（nginx）缓冲，否则客户端要等整段回复生成完才收到
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws/chat")
+async def chat_ws(websocket: WebSocket, service: CompanionService = Depends(get_companion_service)):
+    """
+    AI 陪伴对话（流式，WebSocket）：客户端每发送一条 ChatRequest 格式的 JSON，
+    服务端依次推送 {"type": "delta"} 和 {"type": "done"} 消息；同一连接可连续对话
+    """
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                payload = ChatRequest.model_validate_json(await websocket.receive_text())
+            except ValidationError as exc:
+                await websocket.send_text(_dump_event({"type": "error", "message": exc.errors()}))
+                continue
+            try:
+                async for event in service.chat_stream(
+                    user_id=payload.user_id or "u1",
+                    message=payload.message,
+                    style=payload.context.get("style") if payload.context else None,
+                ):
+                    await websocket.send_text(_dump_event(event))
+            except WebSocketDisconnect:
+                raise
+            except Exception as exc:
+                logger.exception("Companion stream failed")
+                await websocket.send_text(_dump_event({"type": "error", "message": str(exc)}))
+    except WebSocketDisconnect:
+        pass
+
+
 @router.get("/history")
 async def get_chat_history(
     user_id: str = Query(..., description="用户ID"),
-    limit: int = Query(50, ge=1, le=200, description="返回数量")
+    limit: int = Query(50, ge=1, le=200, description="返回数量"),
+    service: CompanionService = Depends(get_companion_service),
 ):
     """获取对话历史"""
-    from services.companion_service import CompanionService
-    
-    service = CompanionService()
     history_result = await service.list_history(user_id, limit=limit)
     
     # 处理返回结果
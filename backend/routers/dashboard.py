@@ -1,13 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from dependencies.services import get_dashboard_service
+from services.dashboard_service import DashboardService
 
 router = APIRouter()
 
 
 @router.get("/stats")
-async def get_dashboard_stats():
+async def get_dashboard_stats(service: DashboardService = Depends(get_dashboard_service)):
     """获取仪表板统计数据"""
-    from services.dashboard_service import DashboardService
-    
-    service = DashboardService()
     stats = await service.get_stats()
     return stats
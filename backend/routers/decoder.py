@@ -1,6 +1,12 @@
-from fastapi import APIRouter, Query
-from pydantic import BaseModel
-from typing import Optional, List
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import Optional, List, Literal
+from core.config import settings
+from dependencies.services import get_decoder_service, get_template_service
+from services.decoder_service import DecoderService
+from services.template_service import TemplateService
 
 
 class DecodeRequest(BaseModel):
@@ -8,15 +14,29 @@ class DecodeRequest(BaseModel):
     user_id: Optional[str] = None  # 用户 ID（用于记录日志）
     use_ai: Optional[bool] = False  # 是否使用 AI 进行深度语义分析
     save_log: Optional[bool] = False  # 是否保存到数据库
+    ai_mode: Optional[Literal["multi", "fused"]] = None  # AI 解码路径（默认使用 DECODER_AI_MODE）
+    # 延迟预算（毫秒，默认 DECODER_LATENCY_BUDGET_MS）：LLM 超出预算时返回规则结果并标记 degraded
+    latency_budget_ms: Optional[int] = Field(None, ge=0)
 
 
 class BatchDecodeRequest(BaseModel):
-    texts: List[str]  # 批量文本列表
+    texts: List[str] = Field(..., max_length=settings.DECODER_BATCH_MAX_TEXTS)  # 批量文本列表
     user_id: Optional[str] = None
     use_ai: Optional[bool] = False
     save_log: Optional[bool] = False
 
 
+class BatchAnalyzeRequest(BaseModel):
+    texts: List[str] = Field(..., max_length=settings.BATCH_ANALYSIS_MAX_TEXTS)  # 批量文本列表
+    use_ai: Optional[bool] = False  # 是否逐条使用 AI 进行语义分析（最多 BATCH_ANALYSIS_MAX_AI_TEXTS 条）
+    top_k: int = Field(10, ge=1, le=50)  # 每条文本返回的关键词数量
+
+
+class BatchKeywordsRequest(BaseModel):
+    texts: List[str]  # 批量文本列表
+    top_k: int = Field(10, ge=1, le=50)  # 每条文本返回的关键词数量
+
+
 class FeedbackRequest(BaseModel):
     log_id: Optional[str] = None  # 日志ID（如果提供）
     user_id: str
@@ -30,25 +50,47 @@ router = APIRouter()
 
 
 @router.post("/analyze")
-def analyze_social_signal(payload: DecodeRequest):
+async def analyze_social_signal(
+    payload: DecodeRequest,
+    decoder: DecoderService = Depends(get_decoder_service),
+):
     """分析社交信号：关键词、情感、语义等（基础版本）"""
-    from services.decoder_service import DecoderService
-    
-    decoder = DecoderService()
-    result = decoder.analyze_social_signal(payload.text, use_ai=payload.use_ai)
+    result = await decoder.analyze_social_signal(payload.text, use_ai=payload.use_ai)
     return result
 
 
+@router.post("/batch-analyze")
+async def batch_analyze_social_signal(
+    payload: BatchAnalyzeRequest,
+    decoder: DecoderService = Depends(get_decoder_service),
+):
+    """批量分析社交信号：关键词、情感、规则场景（每条结果与 /analyze 相同）"""
+    if payload.use_ai and len(payload.texts) > settings.BATCH_ANALYSIS_MAX_AI_TEXTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"use_ai supports at most {settings.BATCH_ANALYSIS_MAX_AI_TEXTS} texts per request",
+        )
+    results = await decoder.analyze_batch(payload.texts, use_ai=payload.use_ai, top_k=payload.top_k)
+    return {
+        "count": len(results),
+        "results": results
+    }
+
+
 @router.post("/decode")
-async def decode_social_signal(payload: DecodeRequest):
+async def decode_social_signal(
+    payload: DecodeRequest,
+    decoder: DecoderService = Depends(get_decoder_service),
+):
     """完整的社交解码：场景分类 + ASD 翻译 + 行为建议 + 风险检测 + 个性化建议"""
-    from services.decoder_service import DecoderService
     from services.db_service import DBService
     from services.personalization_service import PersonalizationService
     from core.utils import utc_now_iso
     
-    decoder = DecoderService()
-    result = await decoder.decode_social_signal(payload.text, use_ai=payload.use_ai, user_id=payload.user_id)
+    result = await decoder.decode_social_signal(
+        payload.text, use_ai=payload.use_ai, user_id=payload.user_id, ai_mode=payload.ai_mode,
+        latency_budget_ms=payload.latency_budget_ms
+    )
     
     # 添加个性化建议（如果有用户ID）
     if payload.user_id:
@@ -67,6 +109,8 @@ async def decode_social_signal(payload: DecodeRequest):
             "input_text": payload.text,
             "scene_category": result.get("scene", {}).get("scene", "未知"),
             "scene_confidence": result.get("scene", {}).get("confidence", 0.0),
+            # 场景来源（multi / fused 为 LLM 给出，可作为本地场景模型的训练标签）
+            "scene_source": result.get("ai_mode"),
             "translation": result.get("asd_translation", {}),
             "suggestion": result.get("suggestion", {}),
             "risk": result.get("risk", {}),
@@ -79,24 +123,35 @@ async def decode_social_signal(payload: DecodeRequest):
 
 
 @router.get("/keywords")
-def extract_keywords(
+async def extract_keywords(
     text: str = Query(..., description="要分析的文本"),
-    top_k: int = Query(10, ge=1, le=50, description="返回关键词数量")
+    top_k: int = Query(10, ge=1, le=50, description="返回关键词数量"),
+    decoder: DecoderService = Depends(get_decoder_service),
 ):
     """提取关键词"""
-    from services.decoder_service import DecoderService
-    
-    decoder = DecoderService()
-    keywords = decoder.extract_keywords(text, top_k=top_k)
+    keywords = await decoder.aextract_keywords(text, top_k=top_k)
     return {"text": text, "keywords": keywords}
 
 
+@router.post("/keywords/batch")
+async def extract_keywords_batch(
+    payload: BatchKeywordsRequest,
+    decoder: DecoderService = Depends(get_decoder_service),
+):
+    """批量提取关键词"""
+    keywords = await decoder.aextract_keywords_batch(payload.texts, top_k=payload.top_k)
+    return {
+        "count": len(keywords),
+        "results": [{"text": text, "keywords": items} for text, items in zip(payload.texts, keywords)]
+    }
+
+
 @router.get("/sentiment")
-def detect_sentiment(text: str = Query(..., description="要分析的文本")):
+def detect_sentiment(
+    text: str = Query(..., description="要分析的文本"),
+    decoder: DecoderService = Depends(get_decoder_service),
+):
     """检测情感倾向"""
-    from services.decoder_service import DecoderService
-    
-    decoder = DecoderService()
     sentiment = decoder.detect_sentiment_tendency(text)
     return {"text": text, "sentiment": sentiment}
 
@@ -151,19 +206,27 @@ async def get_personalized_suggestion(
 
 
 @router.post("/batch-decode")
-async def batch_decode_social_signal(payload: BatchDecodeRequest):
+async def batch_decode_social_signal(
+    payload: BatchDecodeRequest,
+    decoder: DecoderService = Depends(get_decoder_service),
+):
     """批量解码社交信号"""
-    from services.decoder_service import DecoderService
     from services.db_service import DBService
     from services.personalization_service import PersonalizationService
     from core.utils import utc_now_iso
     
-    decoder = DecoderService()
+    # 各条文本并发解码：需要 AI 分类 / 精炼的文本在 LLM 微批中合并为少数几次请求；
+    # 同时在途的文本数不超过一个微批的大小，避免大批量请求在网关排队时整体超时（网关超时包含排队时间）
+    semaphore = asyncio.Semaphore(max(1, settings.LLM_BATCH_MAX_SIZE))
+
+    async def decode_one(text: str):
+        async with semaphore:
+            return await decoder.decode_social_signal(text, use_ai=payload.use_ai, user_id=payload.user_id)
+
+    decoded = await asyncio.gather(*(decode_one(text) for text in payload.texts))
     results = []
     
-    for text in payload.texts:
-        result = await decoder.decode_social_signal(text, use_ai=payload.use_ai, user_id=payload.user_id)
-        
+    for text, result in zip(payload.texts, decoded):
         # 添加个性化建议
         if payload.user_id:
             personalization_service = PersonalizationService()
@@ -181,6 +244,7 @@ async def batch_decode_social_signal(payload: BatchDecodeRequest):
                 "input_text": text,
                 "scene_category": result.get("scene", {}).get("scene", "未知"),
                 "scene_confidence": result.get("scene", {}).get("confidence", 0.0),
+                "scene_source": result.get("ai_mode"),
                 "translation": result.get("asd_translation", {}),
                 "suggestion": result.get("suggestion", {}),
                 "risk": result.get("risk", {}),
@@ -228,17 +292,15 @@ async def submit_feedback(payload: FeedbackRequest):
 async def find_similar_scenes(
     text: str = Query(..., description="要匹配的文本"),
     user_id: Optional[str] = Query(None, description="用户ID（用于查找历史记录）"),
-    top_k: int = Query(5, ge=1, le=20, description="返回相似场景数量")
+    top_k: int = Query(5, ge=1, le=20, description="返回相似场景数量"),
+    decoder: DecoderService = Depends(get_decoder_service),
+    template_service: TemplateService = Depends(get_template_service),
 ):
     """查找相似场景（基于历史记录和相似度计算）"""
-    from services.decoder_service import DecoderService
     from services.db_service import DBService
     from services.scene_similarity_service import SceneSimilarityService
-    from services.template_service import TemplateService
     
-    decoder = DecoderService()
     similarity_service = SceneSimilarityService()
-    template_service = TemplateService()
     
     current_result = await decoder.decode_social_signal(text, use_ai=False)
     current_scene = current_result.get("scene", {}).get("scene", "未知")
@@ -285,12 +347,10 @@ async def find_similar_scenes(
 @router.get("/classification-trace")
 async def get_classification_trace(
     text: str = Query(..., description="要分析的文本"),
-    use_ai: bool = Query(True, description="是否使用AI进行三级分类")
+    use_ai: bool = Query(True, description="是否使用AI进行三级分类"),
+    decoder: DecoderService = Depends(get_decoder_service),
 ):
     """获取分类追踪信息（用于后台展示和调试）"""
-    from services.decoder_service import DecoderService
-    
-    decoder = DecoderService()
     result = await decoder.decode_social_signal(text, use_ai=use_ai)
     
     # 返回分类追踪信息
@@ -4,6 +4,8 @@ from typing import Optional, List
 
 from dependencies.auth import get_current_user, ensure_can_read_user
 from models.user_model import User
+from dependencies.services import get_emotion_service
+from services.emotion_service import EmotionService
 
 
 class EmotionRequest(BaseModel):
@@ -23,11 +25,11 @@ router = APIRouter()
 
 
 @router.post("/detect")
-async def detect_emotion(payload: EmotionRequest):
+async def detect_emotion(
+    payload: EmotionRequest,
+    service: EmotionService = Depends(get_emotion_service),
+):
     """检测用户当前情绪状态"""
-    from services.emotion_service import EmotionService
-    
-    service = EmotionService()
     result = await service.detect_user_emotion(payload.text, user_id=payload.user_id)
     return result
 
@@ -38,12 +40,10 @@ async def get_emotion_history(
     days: int = Query(7, ge=1, le=30, description="查询天数"),
     limit: int = Query(100, ge=1, le=500, description="返回数量"),
     current_user: User = Depends(get_current_user),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """获取用户情绪历史记录"""
-    from services.emotion_service import EmotionService
-
     ensure_can_read_user(current_user, user_id)
-    service = EmotionService()
     records = await service.get_emotion_history(user_id, days=days, limit=limit)
     return {
         "count": len(records),
@@ -56,12 +56,10 @@ async def analyze_emotion_trend(
     user_id: str = Query(..., description="用户ID"),
     days: int = Query(7, ge=1, le=30, description="分析天数"),
     current_user: User = Depends(get_current_user),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """分析用户情绪趋势"""
-    from services.emotion_service import EmotionService
-
     ensure_can_read_user(current_user, user_id)
-    service = EmotionService()
     trend = await service.analyze_emotion_trend(user_id, days=days)
     return trend
 
@@ -71,12 +69,10 @@ async def get_intervention_suggestion(
     user_id: str = Query(..., description="用户ID"),
     current_emotion: Optional[str] = Query(None, description="当前情绪（可选）"),
     current_user: User = Depends(get_current_user),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """获取情绪干预建议"""
-    from services.emotion_service import EmotionService
-
     ensure_can_read_user(current_user, user_id)
-    service = EmotionService()
     suggestion = await service.get_intervention_suggestion(user_id, current_emotion)
     return suggestion
 
@@ -85,12 +81,10 @@ async def get_intervention_suggestion(
 async def assess_emotion_health(
     user_id: str = Query(..., description="用户ID"),
     current_user: User = Depends(get_current_user),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """评估用户情绪健康状态"""
-    from services.emotion_service import EmotionService
-
     ensure_can_read_user(current_user, user_id)
-    service = EmotionService()
     health = await service.assess_emotion_health(user_id)
     return health
 
@@ -103,13 +97,11 @@ async def create_emotion_diary(
     tags: Optional[str] = Query(None, description="标签（逗号分隔）"),
     context: Optional[str] = Query(None, description="上下文信息"),
     current_user: User = Depends(get_current_user),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """创建情绪日记条目"""
-    from services.emotion_service import EmotionService
-
     # 写入：孩子只能记录自己的情绪日记；其他角色沿用读取权限规则
     ensure_can_read_user(current_user, user_id)
-    service = EmotionService()
     tag_list = tags.split(",") if tags else None
     result = await service.create_emotion_diary(
         user_id=user_id,
@@ -127,12 +119,10 @@ async def get_emotion_diary(
     emotion: Optional[str] = Query(None, description="情绪过滤"),
     limit: int = Query(50, ge=1, le=200, description="返回数量"),
     current_user: User = Depends(get_current_user),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """获取情绪日记"""
-    from services.emotion_service import EmotionService
-
     ensure_can_read_user(current_user, user_id)
-    service = EmotionService()
     result = await service.get_emotion_diary(
         user_id=user_id,
         emotion_filter=emotion,
@@ -146,12 +136,10 @@ async def generate_emotion_report(
     user_id: str = Query(..., description="用户ID"),
     period: str = Query("week", description="报告周期：week/month"),
     current_user: User = Depends(get_current_user),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """生成情绪报告"""
-    from services.emotion_service import EmotionService
-
     ensure_can_read_user(current_user, user_id)
-    service = EmotionService()
     report = await service.generate_emotion_report(user_id, period=period)
     return report
 
@@ -162,12 +150,10 @@ async def check_emotion_alert(
     current_emotion: str = Query(..., description="当前情绪"),
     intensity: float = Query(..., ge=0.0, le=1.0, description="情绪强度"),
     current_user: User = Depends(get_current_user),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """检查情绪预警"""
-    from services.emotion_service import EmotionService
-
     ensure_can_read_user(current_user, user_id)
-    service = EmotionService()
     alert = await service.check_emotion_alert(user_id, current_emotion, intensity)
     return alert
 
@@ -177,12 +163,10 @@ async def get_emotion_insights(
     user_id: str = Query(..., description="用户ID"),
     days: int = Query(7, ge=1, le=30, description="分析天数"),
     current_user: User = Depends(get_current_user),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """获取情绪洞察（结合社交解码数据）"""
-    from services.emotion_service import EmotionService
-
     ensure_can_read_user(current_user, user_id)
-    service = EmotionService()
     insights = await service.get_emotion_insights(user_id, days=days)
     return insights
 
@@ -192,12 +176,10 @@ async def get_emotion_summary(
     user_id: str = Query(..., description="用户ID"),
     days: int = Query(1, ge=1, le=14, description="摘要天数"),
     current_user: User = Depends(get_current_user),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """获取情绪摘要（自然语言）"""
-    from services.emotion_service import EmotionService
-
     ensure_can_read_user(current_user, user_id)
-    service = EmotionService()
     summary = await service.generate_emotion_summary(user_id, days=days)
     return summary
 
@@ -207,12 +189,10 @@ async def get_emotion_visualization(
     user_id: str = Query(..., description="用户ID"),
     days: int = Query(7, ge=1, le=30, description="分析天数"),
     current_user: User = Depends(get_current_user),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """获取情绪可视化数据（用于图表展示）"""
-    from services.emotion_service import EmotionService
-
     ensure_can_read_user(current_user, user_id)
-    service = EmotionService()
     data = await service.get_emotion_visualization_data(user_id, days=days)
     return data
 
@@ -225,12 +205,10 @@ async def set_emotion_goal(
     target_value: Optional[float] = Query(None, description="目标值"),
     deadline: Optional[str] = Query(None, description="截止日期"),
     current_user: User = Depends(get_current_user),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """设置情绪目标"""
-    from services.emotion_service import EmotionService
-
     ensure_can_read_user(current_user, user_id)
-    service = EmotionService()
     result = await service.set_emotion_goal(
         user_id=user_id,
         goal_type=goal_type,
@@ -246,12 +224,10 @@ async def track_emotion_goal(
     user_id: str = Query(..., description="用户ID"),
     goal_id: Optional[str] = Query(None, description="目标ID"),
     current_user: User = Depends(get_current_user),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """追踪情绪目标进度"""
-    from services.emotion_service import EmotionService
-
     ensure_can_read_user(current_user, user_id)
-    service = EmotionService()
     result = await service.track_emotion_goal(user_id, goal_id=goal_id)
     return result
 
@@ -262,12 +238,10 @@ async def compare_emotion_periods(
     period1_days: int = Query(7, ge=1, le=30, description="第一个时间段（天数）"),
     period2_days: int = Query(7, ge=1, le=30, description="第二个时间段（天数）"),
     current_user: User = Depends(get_current_user),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """对比两个时间段的情绪状态"""
-    from services.emotion_service import EmotionService
-
     ensure_can_read_user(current_user, user_id)
-    service = EmotionService()
     result = await service.compare_emotion_periods(user_id, period1_days, period2_days)
     return result
 
@@ -277,22 +251,20 @@ async def get_emotion_statistics(
     user_id: str = Query(..., description="用户ID"),
     days: int = Query(30, ge=1, le=90, description="统计天数"),
     current_user: User = Depends(get_current_user),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """获取情绪统计数据（综合）"""
-    from services.emotion_service import EmotionService
-
     ensure_can_read_user(current_user, user_id)
-    service = EmotionService()
     stats = await service.get_emotion_statistics(user_id, days=days)
     return stats
 
 
 @router.post("/reminder")
-async def create_emotion_reminder(payload: ReminderRequest):
+async def create_emotion_reminder(
+    payload: ReminderRequest,
+    service: EmotionService = Depends(get_emotion_service),
+):
     """设置情绪提醒"""
-    from services.emotion_service import EmotionService
-    
-    service = EmotionService()
     reminder = await service.set_emotion_reminder(
         user_id=payload.user_id,
         frequency=payload.frequency,
@@ -305,24 +277,20 @@ async def create_emotion_reminder(payload: ReminderRequest):
 
 @router.get("/reminder")
 async def list_emotion_reminders(
-    user_id: str = Query(..., description="用户ID")
+    user_id: str = Query(..., description="用户ID"),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """列出情绪提醒"""
-    from services.emotion_service import EmotionService
-    
-    service = EmotionService()
     reminders = await service.list_emotion_reminders(user_id)
     return {"count": len(reminders), "reminders": reminders}
 
 
 @router.get("/reminder/check")
 async def check_emotion_reminders(
-    user_id: str = Query(..., description="用户ID")
+    user_id: str = Query(..., description="用户ID"),
+    service: EmotionService = Depends(get_emotion_service),
 ):
     """检查是否需要提醒"""
-    from services.emotion_service import EmotionService
-    
-    service = EmotionService()
     result = await service.check_emotion_reminders(user_id)
     return result
 
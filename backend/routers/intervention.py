@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, Query
 from pydantic import BaseModel
 from typing import Optional
+from dependencies.services import get_intervention_service
+from services.intervention_service import InterventionService
 
 
 class PlanRequest(BaseModel):
@@ -21,10 +23,10 @@ router = APIRouter()
 
 
 @router.post("/plan")
-async def generate_plan(payload: PlanRequest):
-    from services.intervention_service import InterventionService
-
-    service = InterventionService()
+async def generate_plan(
+    payload: PlanRequest,
+    service: InterventionService = Depends(get_intervention_service),
+):
     plan = await service.generate_plan(
         user_id=payload.user_id,
         goal=payload.goal,
@@ -39,18 +41,16 @@ async def generate_plan(payload: PlanRequest):
 async def list_plans(
     user_id: str = Query(..., description="用户 ID"),
     limit: int = Query(10, ge=1, le=50, description="返回数量"),
+    service: InterventionService = Depends(get_intervention_service),
 ):
-    from services.intervention_service import InterventionService
-
-    service = InterventionService()
     return await service.list_plans(user_id, limit=limit)
 
 
 @router.post("/plan/progress")
-async def update_plan_progress(payload: PlanProgressRequest):
-    from services.intervention_service import InterventionService
-
-    service = InterventionService()
+async def update_plan_progress(
+    payload: PlanProgressRequest,
+    service: InterventionService = Depends(get_intervention_service),
+):
     result = await service.record_progress(
         plan_id=payload.plan_id,
         status=payload.status,
@@ -91,12 +91,10 @@ async def auto_match_intervention(
     emotion: str = Query(..., description="当前情绪"),
     intensity: float = Query(..., ge=0.0, le=1.0, description="情绪强度"),
     scene: Optional[str] = Query(None, description="社交场景"),
-    text: Optional[str] = Query(None, description="原始文本")
+    text: Optional[str] = Query(None, description="原始文本"),
+    service: InterventionService = Depends(get_intervention_service),
 ):
     """自动匹配干预模板（用于实时检测）"""
-    from services.intervention_service import InterventionService
-    
-    service = InterventionService()
     result = await service.auto_match_intervention(
         user_id=user_id,
         emotion=emotion,
@@ -1,7 +1,10 @@
 from typing import Optional
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, Query
+from pydantic import BaseModel, Field
+
+from dependencies.services import get_emotion_service
+from services.emotion_service import EmotionService
 
 
 class VoiceFeaturePayload(BaseModel):
@@ -23,6 +26,8 @@ class RealTimeEmotionRequest(BaseModel):
     text: Optional[str] = None
     voice_features: Optional[VoiceFeaturePayload] = None
     face_features: Optional[FaceFeaturePayload] = None
+    # 延迟预算（毫秒，默认 REALTIME_LATENCY_BUDGET_MS）：外部情绪模型超出预算时改用启发式结果
+    latency_budget_ms: Optional[int] = Field(None, ge=0)
 
 
 router = APIRouter()
@@ -32,7 +37,8 @@ router = APIRouter()
 async def analyze_realtime_emotion(
     payload: RealTimeEmotionRequest,
     fusion_strategy: Optional[str] = Query(None, description="融合策略：weighted/negative_priority/dynamic_weight/voting"),
-    fusion_weights: Optional[str] = Query(None, description="融合权重（JSON格式，如：{\"text\":0.5,\"voice\":0.3,\"face\":0.2}）")
+    fusion_weights: Optional[str] = Query(None, description="融合权重（JSON格式，如：{\"text\":0.5,\"voice\":0.3,\"face\":0.2}）"),
+    emotion_service: EmotionService = Depends(get_emotion_service),
 ):
     """实时情绪识别入口：支持文本/语音/人脸多模态"""
     from services.realtime_emotion_service import RealTimeEmotionService
@@ -55,12 +61,17 @@ async def analyze_realtime_emotion(
         except json.JSONDecodeError:
             weights = None
 
-    service = RealTimeEmotionService(fusion_strategy=strategy, fusion_weights=weights)
+    service = RealTimeEmotionService(
+        fusion_strategy=strategy,
+        fusion_weights=weights,
+        emotion_service=emotion_service,
+    )
     result = await service.analyze(
         user_id=payload.user_id,
         text=payload.text,
         voice_features=payload.voice_features.dict() if payload.voice_features else None,
         face_features=payload.face_features.dict() if payload.face_features else None,
+        latency_budget_ms=payload.latency_budget_ms,
     )
     return result
 
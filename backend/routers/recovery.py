@@ -7,6 +7,9 @@ from datetime import datetime, timedelta
 
 from dependencies.auth import get_current_user, ensure_can_read_user
 from models.user_model import User
+from dependencies.services import get_emotion_service, get_progress_service
+from services.emotion_service import EmotionService
+from services.progress_service import ProgressService
 
 
 router = APIRouter()
@@ -17,18 +20,12 @@ async def get_recovery_statistics(
     user_id: str = Query(..., description="用户ID"),
     days: int = Query(30, ge=1, le=90, description="统计天数"),
     current_user: User = Depends(get_current_user),
+    progress_service: ProgressService = Depends(get_progress_service),
+    emotion_service: EmotionService = Depends(get_emotion_service),
 ):
     """获取详细的进度统计数据"""
-    from services.progress_service import ProgressService
-    from services.emotion_service import EmotionService
-    from services.decoder_service import DecoderService
-
     # 统一读取权限判断
     ensure_can_read_user(current_user, user_id)
-
-    progress_service = ProgressService()
-    emotion_service = EmotionService()
-    decoder_service = DecoderService()
     
     # 获取进度数据
     progress_summary = await progress_service.get_summary(user_id, days=days)
@@ -93,16 +90,14 @@ async def get_growth_curve(
     days: int = Query(30, ge=7, le=90, description="统计天数"),
     metric: str = Query("completion", description="指标类型：completion/emotion/social"),
     current_user: User = Depends(get_current_user),
+    progress_service: ProgressService = Depends(get_progress_service),
+    emotion_service: EmotionService = Depends(get_emotion_service),
 ):
     """获取成长曲线数据（时间序列）"""
-    from services.progress_service import ProgressService
-    from services.emotion_service import EmotionService
     from services.db_service import DBService
 
     ensure_can_read_user(current_user, user_id)
 
-    progress_service = ProgressService()
-    emotion_service = EmotionService()
     db_service = DBService()
     
     # 生成日期范围
@@ -204,16 +199,14 @@ async def get_activity_records(
     limit: int = Query(50, ge=1, le=200, description="返回数量"),
     category: Optional[str] = Query(None, description="分类过滤"),
     current_user: User = Depends(get_current_user),
+    progress_service: ProgressService = Depends(get_progress_service),
+    emotion_service: EmotionService = Depends(get_emotion_service),
 ):
     """获取活动记录"""
-    from services.progress_service import ProgressService
-    from services.emotion_service import EmotionService
     from services.db_service import DBService
 
     ensure_can_read_user(current_user, user_id)
 
-    progress_service = ProgressService()
-    emotion_service = EmotionService()
     db_service = DBService()
     
     # 获取所有活动数据
@@ -275,16 +268,14 @@ async def get_activity_records(
 async def get_achievements(
     user_id: str = Query(..., description="用户ID"),
     current_user: User = Depends(get_current_user),
+    progress_service: ProgressService = Depends(get_progress_service),
+    emotion_service: EmotionService = Depends(get_emotion_service),
 ):
     """获取成就徽章"""
-    from services.progress_service import ProgressService
-    from services.emotion_service import EmotionService
     from services.db_service import DBService
 
     ensure_can_read_user(current_user, user_id)
 
-    progress_service = ProgressService()
-    emotion_service = EmotionService()
     db_service = DBService()
     
     achievements = []
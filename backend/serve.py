@@ -0,0 +1,355 @@
+"""
+生产环境启动器：preload-then-fork
+
+主进程先加载只读资源（jieba 词典、prompt 模板、chromadb/langchain/openai 等模块），
+然后 fork 出 N 个 uvicorn worker 共享同一个监听 socket。fork 后的内存页以写时复制
+方式在 worker 之间共享，避免每个 worker 各自加载一份。
+
+用法（在 backend/ 目录下，仅支持 Linux/macOS）：
+    python serve.py --workers 4 --port 8000
+
+信号：
+    SIGTERM / SIGINT  优雅停止所有 worker 后退出
+    SIGHUP            滚动重启：先拉起新 worker，再优雅停止旧 worker
+    SIGUSR1           立即输出每个 worker 的内存占用
+
+worker 异常退出（退出码非 0 或被信号杀死）后按指数退避补齐；--crash-window 秒内崩溃达到
+--max-worker-crashes 次时主进程停止所有 worker 并以退出码 1 退出，交给外层的进程管理器处理。
+
+注意：Mongo 客户端在 worker 内由 lifespan 懒创建，主进程不会在 fork 前建立任何连接。
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+logger = logging.getLogger("serve")
+
+# worker 崩溃后补齐的等待时间：从 _RESPAWN_BACKOFF_INITIAL 秒开始，窗口内每多一次崩溃翻倍，最长 _RESPAWN_BACKOFF_MAX 秒
+_RESPAWN_BACKOFF_INITIAL = 0.5
+_RESPAWN_BACKOFF_MAX = 30.0
+
+
+def read_memory_kb(pid: int) -> Dict[str, int]:
+    """读取 /proc/<pid>/smaps_rollup 中的 Rss / Pss / Shared / Private（单位 KB）"""
+    fields = {"Rss": 0, "Pss": 0, "Shared_Clean": 0, "Shared_Dirty": 0, "Private_Clean": 0, "Private_Dirty": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r", encoding="utf-8") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in fields:
+                    fields[key] = int(rest.split()[0])
+    except OSError:
+        return {}
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "shared": fields["Shared_Clean"] + fields["Shared_Dirty"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+class PreforkServer:
+    """主进程：预加载资源、管理 worker 生命周期"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        workers: int,
+        max_requests: int,
+        max_requests_jitter: int,
+        max_worker_memory_mb: int,
+        graceful_timeout: int,
+        report_interval: int,
+        log_level: str,
+        max_worker_crashes: int = 10,
+        crash_window: int = 60,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.max_worker_memory_mb = max_worker_memory_mb
+        self.graceful_timeout = graceful_timeout
+        self.report_interval = report_interval
+        self.log_level = log_level
+        self.max_worker_crashes = max_worker_crashes
+        self.crash_window = crash_window
+
+        self.app = None
+        self.sock: Optional[socket.socket] = None
+        self.workers: Dict[int, float] = {}  # pid -> 启动时间
+        self.retiring: Dict[int, float] = {}  # pid -> 发送 SIGTERM 的时间
+        self._stopping = False
+        self._reload_requested = False
+        self._report_requested = False
+        self._last_report = 0.0
+        self.crashes: Deque[float] = deque()  # 窗口内 worker 崩溃的时间
+        self._respawn_at = 0.0
+        self.exit_code = 0
+
+    # ===== 主进程 =====
+
+    def preload(self) -> None:
+        """在主进程中加载应用与只读资源"""
+        start = time.perf_counter()
+        from core.warmup import preload_shared_assets
+        from main import app
+
+        self.app = app
+        timings = preload_shared_assets()
+        # 冻结当前对象，避免 worker 中的 GC 遍历触碰这些页导致写时复制失效
+        gc.collect()
+        gc.freeze()
+        logger.info(
+            "Preloaded shared assets in %.1f ms %s, master rss=%s KB",
+            (time.perf_counter() - start) * 1000,
+            timings,
+            read_memory_kb(os.getpid()).get("rss"),
+        )
+
+    def bind(self) -> None:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        self.sock = sock
+
+    def run(self) -> int:
+        self.bind()
+        self.preload()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+        signal.signal(signal.SIGUSR1, self._handle_report)
+
+        logger.info("Master %s listening on %s:%s with %s workers", os.getpid(), self.host, self.port, self.num_workers)
+        for _ in range(self.num_workers):
+            self.spawn_worker()
+
+        while not self._stopping:
+            self.reap_workers()
+            if self._reload_requested:
+                self._reload_requested = False
+                self.rolling_restart()
+            self.check_worker_memory()
+            self.kill_stale_retiring()
+            while (
+                len(self.workers) < self.num_workers
+                and not self._stopping
+                and time.monotonic() >= self._respawn_at
+            ):
+                self.spawn_worker()
+            if self._report_requested or (
+                self.report_interval and time.monotonic() - self._last_report >= self.report_interval
+            ):
+                self._report_requested = False
+                self.report_memory()
+            time.sleep(0.5)
+
+        self.shutdown()
+        return self.exit_code
+
+    def spawn_worker(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            # worker 不能返回到主进程的循环中：任何异常都以非 0 退出码结束，由主进程按崩溃处理
+            try:
+                exit_code = self._run_worker()
+            except BaseException:
+                logger.exception("Worker %s failed", os.getpid())
+                exit_code = 1
+            os._exit(exit_code)
+        self.workers[pid] = time.monotonic()
+        logger.info("Spawned worker %s", pid)
+        return pid
+
+    def reap_workers(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.retiring:
+                self.retiring.pop(pid, None)
+                logger.info("Worker %s retired", pid)
+            elif pid in self.workers:
+                self.workers.pop(pid, None)
+                # max_requests 触发的正常退出或异常崩溃，主循环会补齐 worker 数量（崩溃后按退避时间补齐）
+                exit_code = os.waitstatus_to_exitcode(status)
+                if exit_code == 0:
+                    logger.info("Worker %s exited, respawning", pid)
+                else:
+                    self.record_crash(pid, exit_code)
+
+    def record_crash(self, pid: int, exit_code: int) -> None:
+        """记录一次 worker 崩溃：推迟下一次补齐；窗口内崩溃次数达到上限时停止主进程"""
+        now = time.monotonic()
+        self.crashes.append(now)
+        while now - self.crashes[0] > self.crash_window:
+            self.crashes.popleft()
+        if self.max_worker_crashes and len(self.crashes) >= self.max_worker_crashes:
+            if self._stopping:
+                return
+            logger.error(
+                "Worker %s exited with status %s: %s crashes within %ss, stopping master",
+                pid, exit_code, len(self.crashes), self.crash_window,
+            )
+            self._stopping = True
+            self.exit_code = 1
+            return
+        delay = min(_RESPAWN_BACKOFF_MAX, _RESPAWN_BACKOFF_INITIAL * 2 ** (len(self.crashes) - 1))
+        self._respawn_at = max(self._respawn_at, now + delay)
+        logger.warning(
+            "Worker %s exited with status %s (%s crashes within %ss), respawning in %.1fs",
+            pid, exit_code, len(self.crashes), self.crash_window, delay,
+        )
+
+    def retire_worker(self, pid: int) -> None:
+        """优雅停止单个 worker（uvicorn 收到 SIGTERM 后处理完在途请求再退出）"""
+        self.workers.pop(pid, None)
+        self.retiring[pid] = time.monotonic()
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            self.retiring.pop(pid, None)
+
+    def kill_stale_retiring(self) -> None:
+        now = time.monotonic()
+        for pid, since in list(self.retiring.items()):
+            if now - since > self.graceful_timeout:
+                logger.warning("Worker %s did not exit within %ss, killing", pid, self.graceful_timeout)
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    self.retiring.pop(pid, None)
+
+    def rolling_restart(self) -> None:
+        old = list(self.workers)
+        logger.info("Rolling restart of %s workers", len(old))
+        for _ in range(self.num_workers):
+            self.spawn_worker()
+        for pid in old:
+            self.retire_worker(pid)
+
+    def check_worker_memory(self) -> None:
+        if not self.max_worker_memory_mb:
+            return
+        for pid in list(self.workers):
+            private_kb = read_memory_kb(pid).get("private", 0)
+            if private_kb > self.max_worker_memory_mb * 1024:
+                logger.info("Recycling worker %s: private memory %s KB over limit", pid, private_kb)
+                self.retire_worker(pid)
+
+    def report_memory(self) -> None:
+        self._last_report = time.monotonic()
+        for pid in sorted(self.workers):
+            mem = read_memory_kb(pid)
+            if not mem:
+                continue
+            logger.info(
+                "Worker %s memory: rss=%.1f MB pss=%.1f MB shared=%.1f MB private=%.1f MB",
+                pid,
+                mem["rss"] / 1024,
+                mem["pss"] / 1024,
+                mem["shared"] / 1024,
+                mem["private"] / 1024,
+            )
+
+    def shutdown(self) -> None:
+        logger.info("Stopping %s workers", len(self.workers))
+        for pid in list(self.workers):
+            self.retire_worker(pid)
+        while self.retiring:
+            self.reap_workers()
+            self.kill_stale_retiring()
+            time.sleep(0.2)
+        if self.sock is not None:
+            self.sock.close()
+
+    def _handle_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _handle_reload(self, signum, frame) -> None:
+        self._reload_requested = True
+
+    def _handle_report(self, signum, frame) -> None:
+        self._report_requested = True
+
+    # ===== worker 进程 =====
+
+    def _run_worker(self) -> int:
+        """运行 uvicorn，返回 worker 进程的退出码"""
+        import uvicorn
+
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGUSR1):
+            signal.signal(sig, signal.SIG_DFL)
+        random.seed()
+        limit = None
+        if self.max_requests:
+            limit = self.max_requests + random.randint(0, self.max_requests_jitter)
+        config = uvicorn.Config(
+            self.app,
+            lifespan="on",
+            log_level=self.log_level,
+            limit_max_requests=limit,
+            timeout_graceful_shutdown=self.graceful_timeout,
+        )
+        server = uvicorn.Server(config)
+        server.run(sockets=[self.sock])
+        # lifespan 启动失败（预热 / 容器初始化出错）时 run() 正常返回但从未开始服务，按崩溃退出
+        return 0 if server.started else 3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Preload-then-fork production launcher")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("MAX_REQUESTS", "0")),
+                        help="worker 处理多少个请求后自动回收（0 表示不限制）")
+    parser.add_argument("--max-requests-jitter", type=int, default=int(os.getenv("MAX_REQUESTS_JITTER", "0")))
+    parser.add_argument("--max-worker-memory-mb", type=int, default=int(os.getenv("MAX_WORKER_MEMORY_MB", "0")),
+                        help="worker 私有内存超过该值（MB）时回收（0 表示不限制）")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", "30")))
+    parser.add_argument("--report-interval", type=int, default=int(os.getenv("MEMORY_REPORT_INTERVAL", "300")),
+                        help="输出 worker 内存占用的间隔秒数（0 表示只在 SIGUSR1 时输出）")
+    parser.add_argument("--max-worker-crashes", type=int, default=int(os.getenv("MAX_WORKER_CRASHES", "10")),
+                        help="--crash-window 秒内 worker 崩溃达到该次数时停止主进程（0 表示不限制）")
+    parser.add_argument("--crash-window", type=int, default=int(os.getenv("WORKER_CRASH_WINDOW", "60")))
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    server = PreforkServer(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter,
+        max_worker_memory_mb=args.max_worker_memory_mb,
+        graceful_timeout=args.graceful_timeout,
+        report_interval=args.report_interval,
+        log_level=args.log_level,
+        max_worker_crashes=args.max_worker_crashes,
+        crash_window=args.crash_window,
+    )
+    raise SystemExit(server.run())
+
+
+if __name__ == "__main__":
+    main()
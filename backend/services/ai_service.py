@@ -1,99 +1,95 @@
-from typing import Optional, List
-from core.config import settings
-
-try:
-    from openai import OpenAI  # SDK v1.x
-except Exception:  # 未安装 openai 时兜底
-    OpenAI = None  # type: ignore
+import logging
+from typing import AsyncIterator, Optional, List
 
 from services.config_service import get_config_service
+from services.llm_gateway import LLMGateway, get_llm_gateway
+
+logger = logging.getLogger(__name__)
 
 
 class AIService:
-    def __init__(self):
+    def __init__(self, gateway: Optional[LLMGateway] = None):
         self.config_service = get_config_service()
-        self._client: Optional[OpenAI] = None
+        # 所有 LLM 调用经由进程内共享的异步网关（连接池 / 超时 / 并发上限）
+        self.gateway = gateway or get_llm_gateway()
         self._provider = "openai"  # 默认provider
-        self._model = "gpt-4o-mini"  # 默认模型
-        
-        # 初始化时使用默认配置
-        if settings.OPENAI_API_KEY and OpenAI is not None:
-            self._client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self._config_loaded = False
+    
+    @property
+    def available(self) -> bool:
+        """是否配置了 LLM（无 OPENAI_API_KEY 或 openai 包时为 False，调用方降级为规则逻辑）"""
+        return self.gateway.available
     
     async def _load_provider_config(self):
-        """从配置服务加载LLM Provider配置（异步）"""
+        """从配置服务加载LLM Provider配置（异步）：默认 provider 为主，其余 provider 作为对冲 / 转移备用"""
         try:
             config = await self.config_service.get_llm_provider_config()
             self._provider = config.get("default_provider", "openai")
-            
-            provider_config = config.get(self._provider, {})
-            self._model = provider_config.get("model", "gpt-4o-mini")
-            
-            # 如果provider是deepseek，需要特殊处理
-            if self._provider == "deepseek" and OpenAI is not None:
-                api_key = provider_config.get("api_key") or settings.OPENAI_API_KEY
-                base_url = provider_config.get("base_url", "https://api.deepseek.com/v1")
-                if api_key:
-                    try:
-                        self._client = OpenAI(api_key=api_key, base_url=base_url)
-                    except Exception:
-                        pass
+            await self.gateway.load_providers(config)
         except Exception:
             pass  # 使用默认配置
 
     def simple_reply(self, text: str) -> str:
         return f"AI reply: {text}"
 
-    def generate_reply(self, prompt: str, context_chunks: Optional[List[str]] = None) -> str:
+    def _reply_messages(self, prompt: str, context_chunks: Optional[List[str]]) -> List[dict]:
         context = "\n\n".join(context_chunks or [])
         full_prompt = (
             "You are a helpful assistant. Use provided context when relevant.\n"
             f"Context:\n{context}\n\nUser: {prompt}\nAssistant:"
         )
+        return [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": full_prompt},
+        ]
+
+    async def generate_reply(self, prompt: str, context_chunks: Optional[List[str]] = None) -> str:
         # 无 OPENAI_API_KEY 或 openai 包时，降级为本地规则回复
-        if self._client is None:
+        if not self.available:
             return self.simple_reply(prompt)
         try:
-            # 尝试加载配置（如果还没有加载）
-            if not hasattr(self, '_config_loaded'):
-                try:
-                    import asyncio
-                    loop = asyncio.get_event_loop()
-                    if loop.is_running():
-                        # 如果已经在事件循环中，跳过异步加载
-                        pass
-                    else:
-                        loop.run_until_complete(self._load_provider_config())
-                except Exception:
-                    pass
+            # 首次调用时加载 Provider 配置
+            if not self._config_loaded:
                 self._config_loaded = True
+                await self._load_provider_config()
             
-            resp = self._client.chat.completions.create(
-                model=self._model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": full_prompt},
-                ],
+            return await self.gateway.chat(
+                "companion.reply",
+                self._reply_messages(prompt, context_chunks),
                 temperature=0.4,
                 max_tokens=256,
             )
-            return resp.choices[0].message.content or ""
         except Exception:
-            # 出错时兜底
+            # 出错（含超时）时兜底
             return self.simple_reply(prompt)
 
+    async def generate_reply_stream(
+        self, prompt: str, context_chunks: Optional[List[str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        流式版 generate_reply：逐段产出 provider 生成的文本
+
+        未配置 LLM 或第一段文本之前出错时一次产出本地兜底回复；中途出错时保留已产出的部分并结束
+        """
+        if not self.available:
+            yield self.simple_reply(prompt)
+            return
+        started = False
+        try:
+            if not self._config_loaded:
+                self._config_loaded = True
+                await self._load_provider_config()
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+            async for delta in self.gateway.chat_stream(
+                "companion.reply",
+                self._reply_messages(prompt, context_chunks),
+                temperature=0.4,
+                max_tokens=256,
+            ):
+                started = True
+                yield delta
+        except Exception as exc:
+            if not started:
+                yield self.simple_reply(prompt)
+            else:
+                logger.warning("Streaming companion reply interrupted: %s", exc)
@@ -1,4 +1,5 @@
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
+import json
 import re
 
 try:
@@ -7,77 +8,116 @@ try:
 except Exception:
     AI_AVAILABLE = False
 
-from services.config_service import get_config_service
+from services.decoder.emotion_direction import EmotionDirectionClassifier
+from services.decoder.local_classifier import get_local_scene_classifier
+from services.decoder.text_features import TextFeatures
+from services.rules.matcher import LexiconMatcher
+from services.rules.active import get_active_rules
+from services.near_duplicate_cache import NearDuplicateCache, get_near_duplicate_cache
+from services.llm_batcher import get_llm_batcher
+from services.single_flight import single_flight
+
+
+SCENE_SYSTEM_PROMPT = "你是一个社交场景分析专家，擅长识别对话中的社交场景类型。"
+
+SCENE_CATEGORIES = """- 拒绝：礼貌或直接的拒绝
+- 冲突：争吵、不满、对抗
+- 暗示：间接表达、暗示性语言
+- 情绪：表达情感状态
+- 请求：提出要求
+- 请求帮助：请求他人帮助
+- 提出改进建议：提出改进建议
+- 失望：表达失望情绪
+- 无聊：表达无聊感受
+- 高兴：表达高兴情绪
+- 尴尬：表达尴尬感受
+- 恐惧：表达恐惧或担心
+- 惊讶：表达惊讶
+- 回应感谢：回应他人的感谢
+- 安慰：安慰他人
+- 抱怨：抱怨某些事情
+- 赞美：表扬、肯定
+- 批评：批评、否定
+- 其他：不属于以上类别"""
+
+
+def build_scene_batch_messages(texts: List[str]) -> List[Dict[str, str]]:
+    """微批场景分类：多条文本一次请求，按 id 返回结果数组"""
+    items = json.dumps([{"id": i, "text": text} for i, text in enumerate(texts)], ensure_ascii=False)
+    prompt = f"""分别分析下面每条文本的社交场景类型，从以下类别中选择最合适的一个：
+{SCENE_CATEGORIES}
+
+文本列表（JSON）：{items}
+
+请以JSON格式返回，每条文本一项，id 与输入一致：
+{{
+    "results": [{{"id": 0, "scene": "场景类型", "confidence": 0.0-1.0之间的置信度, "reason": "简要说明原因"}}]
+}}"""
+    return [
+        {"role": "system", "content": SCENE_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
 
 
 class ClassifierService:
     """社交场景分类器：识别拒绝、冲突、暗示、情绪、请求等场景"""
     
-    def __init__(self):
-        self.ai_service = None
-        if AI_AVAILABLE:
-            from services.ai_service import AIService
+    def __init__(
+        self,
+        ai_service: Optional["AIService"] = None,
+        emotion_classifier: Optional[EmotionDirectionClassifier] = None,
+        ai_cache: Optional[NearDuplicateCache] = None,
+    ):
+        # 允许由服务容器注入共享实例，未注入时自行构建
+        self.ai_service = ai_service
+        if self.ai_service is None and AI_AVAILABLE:
             self.ai_service = AIService()
         
-        self.config_service = get_config_service()
-        
-        # 规则关键词库（第一层：快速分类）
-        # 默认关键词，可以从配置服务加载
-        self.scene_keywords = {
-            "拒绝": ["算了", "改天", "不方便", "下次", "以后", "不用了", "不用", "不必", "不需要", "不用麻烦"],
-            "冲突": ["烦", "讨厌", "又这样", "够了", "别说了", "闭嘴", "走开", "滚", "烦死了"],
-            "暗示": ["可能", "也许", "或者", "考虑", "看看", "再说", "到时候", "如果"],
-            "情绪": ["开心", "高兴", "难过", "伤心", "生气", "愤怒", "失望", "担心", "害怕"],
-            "请求": ["可以", "能不能", "请", "帮", "麻烦", "希望", "想要", "需要"],
-            "请求帮助": ["帮帮我", "能帮我", "可以帮我", "需要帮助", "求助", "帮忙"],
-            "提出改进建议": ["建议", "可以改进", "最好", "应该", "不如", "试试"],
-            "失望": ["失望", "没想到", "以为", "可惜", "遗憾"],
-            "无聊": ["无聊", "没意思", "没劲", "好无聊", "真无聊"],
-            "高兴": ["高兴", "开心", "快乐", "愉快", "兴奋", "太棒了"],
-            "尴尬": ["尴尬", "不好意思", "难为情", "不好意思", "有点尴尬"],
-            "恐惧": ["害怕", "恐惧", "担心", "担心", "不安", "害怕"],
-            "惊讶": ["惊讶", "没想到", "居然", "竟然", "天哪", "哇"],
-            "回应感谢": ["谢谢", "感谢", "多谢", "太感谢了", "谢谢你"],
-            "安慰": ["别难过", "没关系", "会好的", "别担心", "我理解"],
-            "抱怨": ["抱怨", "真烦", "太糟糕", "受不了", "真麻烦"],
-            "赞美": ["好", "棒", "优秀", "厉害", "不错", "很好", "太好了", "真棒"],
-            "批评": ["不好", "差", "糟糕", "不行", "不对", "错了", "不应该"]
-        }
+        # 第二层情感打分只依赖纯规则词库，复用二级分类器，避免每次构建 DecoderService
+        self.emotion_classifier = emotion_classifier or EmotionDirectionClassifier()
+        
+        # AI 分类结果按文本相似度缓存：只差标点、语气词或个别字的输入复用已有结果
+        self.ai_cache = ai_cache or get_near_duplicate_cache("classifier.scene")
+        
+        # 并发的 AI 分类请求合并为一次结构化请求（LLM_BATCH_MAX_SIZE 为 1 时不合并）
+        self.scene_batcher = get_llm_batcher(
+            "classifier.scene_batch",
+            build_scene_batch_messages,
+            max_tokens_per_item=80,
+            gateway=self.ai_service.gateway if self.ai_service else None,
+            temperature=0.3,
+        )
+        
+        # 用 LLM 标注蒸馏的本地场景模型（第三层中先于 AI 分类）
+        self.local_classifier = get_local_scene_classifier()
+        
+    @property
+    def scene_keywords(self) -> Dict[str, List[str]]:
+        """规则关键词库（第一层：快速分类）：快照默认值 + 配置服务中的关键词，随规则版本热更新"""
+        return get_active_rules().scene_keywords
     
-    async def _load_classification_rules(self):
-        """从配置服务加载分类规则"""
-        try:
-            rules = await self.config_service.get_behavior_classification_rules()
-            scene_keywords = rules.get("scene_keywords", {})
-            if scene_keywords:
-                # 合并配置的关键词（保留默认值作为fallback）
-                for scene, keywords in scene_keywords.items():
-                    if scene in self.scene_keywords:
-                        # 合并关键词列表
-                        existing = set(self.scene_keywords[scene])
-                        new = set(keywords)
-                        self.scene_keywords[scene] = list(existing | new)
-                    else:
-                        self.scene_keywords[scene] = keywords
-        except Exception:
-            pass  # 使用默认关键词
+    @property
+    def matcher(self) -> LexiconMatcher:
+        """当前规则版本的自动机（全部词库共用）"""
+        return get_active_rules().matcher
     
-    def classify_by_rules(self, text: str) -> Tuple[str, float]:
+    def classify_by_rules(self, text: str, features: Optional[TextFeatures] = None) -> Tuple[str, float]:
         """第一层：基于规则关键词的快速分类（优化版）"""
-        text_lower = text.lower()
+        features = features or TextFeatures(text)
+        hits = features.hits
         scores = {}
         
-        for scene, keywords in self.scene_keywords.items():
+        # 只遍历有命中的场景（顺序与词库一致）
+        for scene in hits.labels("scene"):
             score = 0
             # 计算关键词匹配（考虑词频和位置）
-            for keyword in keywords:
-                if keyword in text_lower:
-                    # 长关键词权重更高
-                    weight = len(keyword) / 10.0 + 1.0
-                    score += weight
-                    # 如果关键词在句子开头，额外加分
-                    if text_lower.startswith(keyword) or text_lower.find(f" {keyword}") >= 0:
-                        score += 0.5
+            for keyword in hits.matched("scene", scene):
+                # 长关键词权重更高
+                weight = len(keyword) / 10.0 + 1.0
+                score += weight
+                # 如果关键词在句子开头，额外加分
+                if hits.starts_word(keyword):
+                    score += 0.5
             
             if score > 0:
                 scores[scene] = score
@@ -92,13 +132,10 @@ class ClassifierService:
         confidence = min(0.85, 0.5 + (best_scene[1] / max(total_score, 1)) * 0.35)
         return best_scene[0], confidence
     
-    def classify_by_sentiment_and_keywords(self, text: str) -> Tuple[str, float]:
+    def classify_by_sentiment_and_keywords(self, text: str, features: Optional[TextFeatures] = None) -> Tuple[str, float]:
         """第二层：情感 + 关键词加权分类"""
-        from services.decoder_service import DecoderService
-        
-        decoder = DecoderService()
-        sentiment = decoder.detect_sentiment_tendency(text)
-        keywords = decoder.extract_keywords(text, top_k=5)
+        features = features or TextFeatures(text)
+        sentiment = features.sentiment
         
         # 结合情感和关键词
         sentiment_type = sentiment["sentiment"]
@@ -108,7 +145,7 @@ class ClassifierService:
         # 情感导向的场景判断
         if negative_score > positive_score and negative_score > 2:
             # 负面情绪 + 冲突关键词
-            if any(kw in text for kw in self.scene_keywords["冲突"]):
+            if any(kw in text for kw in features.rules.scene_keywords["冲突"]):
                 return "冲突", 0.75
             return "情绪", 0.7
         
@@ -116,38 +153,45 @@ class ClassifierService:
             return "情绪", 0.7
         
         # 关键词加权
-        rule_scene, rule_conf = self.classify_by_rules(text)
+        rule_scene, rule_conf = self.classify_by_rules(text, features)
         if rule_conf > 0.6:
             return rule_scene, rule_conf
         
         return "未知", 0.5
     
-    def classify_by_ai(self, text: str) -> Tuple[str, float]:
-        """第三层：GPT 语义分类（最高精度）"""
-        if not self.ai_service or not self.ai_service._client:
+    # 同一文本的并发分类（同一页面多处解码、家长 / 孩子同时查看）只请求一次
+    @single_flight()
+    async def classify_by_ai(self, text: str) -> Tuple[str, float]:
+        """第三层：GPT 语义分类（最高精度，经由 LLM 网关异步调用；近似重复的输入复用缓存结果）"""
+        if not self.ai_service or not self.ai_service.available:
             return "未知", 0.0
         
+        cached = self.ai_cache.lookup(text)
+        if cached is not None and not self.ai_cache.should_audit():
+            return cached[0]
+        
+        result = await self._classify_by_ai_uncached(text)
+        if result is None:
+            return cached[0] if cached is not None else ("未知", 0.0)
+        if cached is not None:
+            # 抽样复核：比较缓存结果与本次 provider 结果的场景是否一致
+            self.ai_cache.record_audit(cached[0][0] == result[0])
+        self.ai_cache.put(text, result)
+        return result
+    
+    async def _classify_by_ai_uncached(self, text: str) -> Optional[Tuple[str, float]]:
+        """请求 provider 做场景分类（优先合并进微批），失败返回 None"""
+        if self.scene_batcher.enabled:
+            entry = await self.scene_batcher.submit(text)
+            if entry is not None:
+                try:
+                    return entry.get("scene", "未知"), float(entry.get("confidence", 0.5))
+                except (TypeError, ValueError):
+                    pass
+            # 整批失败或缺少这一条时退回单条请求
         try:
             prompt = f"""分析以下文本的社交场景类型，从以下类别中选择最合适的一个：
-- 拒绝：礼貌或直接的拒绝
-- 冲突：争吵、不满、对抗
-- 暗示：间接表达、暗示性语言
-- 情绪：表达情感状态
-- 请求：提出要求
-- 请求帮助：请求他人帮助
-- 提出改进建议：提出改进建议
-- 失望：表达失望情绪
-- 无聊：表达无聊感受
-- 高兴：表达高兴情绪
-- 尴尬：表达尴尬感受
-- 恐惧：表达恐惧或担心
-- 惊讶：表达惊讶
-- 回应感谢：回应他人的感谢
-- 安慰：安慰他人
-- 抱怨：抱怨某些事情
-- 赞美：表扬、肯定
-- 批评：批评、否定
-- 其他：不属于以上类别
+{SCENE_CATEGORIES}
 
 文本：{text}
 
@@ -158,31 +202,31 @@ class ClassifierService:
     "reason": "简要说明原因"
 }}"""
             
-            resp = self.ai_service._client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "你是一个社交场景分析专家，擅长识别对话中的社交场景类型。"},
+            result = await self.ai_service.gateway.chat_json(
+                "classifier.scene",
+                [
+                    {"role": "system", "content": SCENE_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.3,
-                max_tokens=150,
-                response_format={"type": "json_object"}
+                max_tokens=150
             )
-            
-            import json
-            result = json.loads(resp.choices[0].message.content or "{}")
             scene = result.get("scene", "未知")
             confidence = float(result.get("confidence", 0.5))
             return scene, confidence
         except Exception:
-            return "未知", 0.0
+            return None
     
-    def classify(self, text: str, use_ai: bool = True) -> Dict[str, Any]:
+    async def classify(self, text: str, use_ai: bool = True) -> Dict[str, Any]:
         """综合分类：三层识别框架"""
+        features = TextFeatures(text)
+        # 升级到下一层的置信度阈值（分类器配置 confidence_threshold，随规则版本热更新）
+        threshold = float(features.rules.classifier_rules.get("confidence_threshold", 0.7))
+        
         # 第一层：规则分类（最快）
-        rule_scene, rule_conf = self.classify_by_rules(text)
+        rule_scene, rule_conf = self.classify_by_rules(text, features)
         
-        if rule_conf >= 0.7:
+        if rule_conf >= threshold:
             # 规则分类置信度高，直接返回
             return {
                 "scene": rule_scene,
@@ -192,9 +236,9 @@ class ClassifierService:
             }
         
         # 第二层：情感+关键词加权
-        sentiment_scene, sentiment_conf = self.classify_by_sentiment_and_keywords(text)
+        sentiment_scene, sentiment_conf = self.classify_by_sentiment_and_keywords(text, features)
         
-        if sentiment_conf >= 0.7:
+        if sentiment_conf >= threshold:
             return {
                 "scene": sentiment_scene,
                 "confidence": sentiment_conf,
@@ -202,9 +246,17 @@ class ClassifierService:
                 "reason": "基于情感和关键词分析"
             }
         
-        # 第三层：AI 分类（如果启用）
+        # 第三层：AI 分类（如果启用）；本地模型足够可信时不再请求 LLM
         if use_ai:
-            ai_scene, ai_conf = self.classify_by_ai(text)
+            local = self.local_classifier.classify(text)
+            if local is not None and local["confidence"] > sentiment_conf:
+                return {
+                    "scene": local["final_scene"],
+                    "confidence": local["confidence"],
+                    "method": "本地模型",
+                    "reason": local["reason"]
+                }
+            ai_scene, ai_conf = await self.classify_by_ai(text)
             if ai_conf > sentiment_conf:
                 return {
                     "scene": ai_scene,
@@ -1,31 +1,116 @@
 from __future__ import annotations
 
-from typing import Dict, Any, Optional
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, Any, List, Optional, Set, Tuple
 
+from core.config import settings
 from services.ai_service import AIService
+from services.companion.conversation_summary import get_conversation_summarizer
 from services.companion.memory_manager import MemoryManager
 from services.companion.style_controller import StyleController
 from services.companion.template_injector import TemplateInjector
 from services.companion.safety_controller import SafetyController
+from services.latency_budget import LatencyBudget
+from services.llm_usage import llm_usage_user
+from services.prompt_budget import PromptBudgetResult, PromptSection, fit_sections, render_history
+
+logger = logging.getLogger(__name__)
+
+# 回复超出延迟预算时先返回的固定回复（不写入对话记录；LLM 回复在后台完成后补记为本轮的助手消息）
+FALLBACK_REPLY = "我收到你的消息了，正在认真想怎么回答。你可以先深呼吸一下，稍后再发一次，或者继续告诉我发生了什么。"
 
 
 class CompanionCore:
     """组合各子模块，生成最终回复"""
 
-    def __init__(self):
-        self.ai = AIService()
+    def __init__(self, ai: Optional[AIService] = None):
+        self.ai = ai or AIService()
         self.memory_manager = MemoryManager()
         self.style_controller = StyleController()
         self.template_injector = TemplateInjector()
         self.safety_controller = SafetyController()
+        # 补记超预算回复的后台任务（事件循环只持有弱引用）
+        self._late_logs: Set["asyncio.Task[None]"] = set()
+        self.summarizer = get_conversation_summarizer()
         self.persona = (
             "You are an empathetic companion for neurodivergent users. "
             "Provide concise, supportive, actionable replies. "
             "Avoid judgment, use simple language, and offer step-by-step guidance when possible."
         )
 
-    async def handle_chat(self, user_id: str, message: str, style: Optional[str]) -> Dict[str, Any]:
-        history = await self.memory_manager.fetch_history(user_id, limit=6)
+    async def handle_chat(
+        self,
+        user_id: str,
+        message: str,
+        style: Optional[str],
+        latency_budget_ms: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        budget = LatencyBudget(
+            settings.COMPANION_LATENCY_BUDGET_MS if latency_budget_ms is None else latency_budget_ms
+        )
+        # 本轮的 LLM 调用（回复、摘要刷新、安全检查）计入该用户的用量
+        with llm_usage_user(user_id):
+            turn = await self._prepare_turn(user_id, message, style)
+            user_logged = asyncio.Event()
+            completed, reply = await budget.run(
+                "companion.reply",
+                self.ai.generate_reply(turn["prompt"], turn["documents"]),
+                on_complete=lambda late_reply: self._attach_late_reply(user_id, late_reply, user_logged),
+            )
+            try:
+                # 超出预算时本轮只记录用户消息，兜底回复不进入历史和摘要
+                safety = await self._finish_turn(user_id, message, reply if completed else None)
+            finally:
+                user_logged.set()
+            if not completed:
+                reply = FALLBACK_REPLY
+
+        return {
+            "reply": reply,
+            "degraded": budget.degraded,
+            "latency_budget": budget.info(),
+            "context": self._turn_context(turn, safety),
+        }
+
+    async def stream_chat(
+        self,
+        user_id: str,
+        message: str,
+        style: Optional[str],
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式对话：provider 每产出一段文本就产出 {"type": "delta", "text": ...}；
+        生成结束后记录对话、做安全检查，最后产出 {"type": "done", ...}（字段与 handle_chat 的返回值一致）；
+        客户端中途断开时记录用户消息和已发出的部分回复
+        """
+        # 跨 yield 设置：生成器始终在消费它的请求任务中推进
+        with llm_usage_user(user_id):
+            turn = await self._prepare_turn(user_id, message, style)
+            parts: list[str] = []
+            try:
+                async for delta in self.ai.generate_reply_stream(turn["prompt"], turn["documents"]):
+                    parts.append(delta)
+                    yield {"type": "delta", "text": delta}
+            finally:
+                # 客户端中途断开（生成器被取消 / 关闭）时同样记录本轮：用户消息和已生成的部分回复；
+                # shield 避免写入过程被再次取消打断
+                reply = "".join(parts)
+                safety = await asyncio.shield(self._finish_turn(user_id, message, reply or None))
+        yield {
+            "type": "done",
+            "reply": reply,
+            "degraded": False,
+            "context": self._turn_context(turn, safety),
+        }
+
+    async def _prepare_turn(self, user_id: str, message: str, style: Optional[str]) -> Dict[str, Any]:
+        """生成回复前的准备：历史、Profile、风格、场景上下文、检索结果和按 token 预算装配的 prompt"""
+        history = await self.memory_manager.fetch_history(user_id, limit=settings.COMPANION_HISTORY_FETCH)
+        # 最近几条原文进入 prompt，更早的折叠为滚动摘要
+        split = max(0, len(history) - settings.COMPANION_RECENT_MESSAGES)
+        summary = self.summarizer.summarize(user_id, history[:split])
+        history = history[split:]
         
         # 获取用户Profile以自动调整语气
         profile = None
@@ -46,24 +131,52 @@ class CompanionCore:
         scene_context = self.template_injector.build_scene_context(message)
         retrieval = self.memory_manager.store_and_retrieve(user_id, message)
 
-        prompt = self._build_prompt(history, message, style_instruction, scene_context)
-        reply = self.ai.generate_reply(prompt, retrieval["documents"])
+        prompt, documents, budget = self._build_prompt(
+            history, summary, message, style_instruction, scene_context, retrieval["documents"]
+        )
+        return {
+            "history": history,
+            "profile": profile,
+            "style_instruction": style_instruction,
+            "scene_context": scene_context,
+            "retrieval": retrieval,
+            "prompt": prompt,
+            "documents": documents,
+            "prompt_budget": budget,
+        }
 
+    async def _finish_turn(self, user_id: str, message: str, reply: Optional[str]) -> Dict[str, Any]:
+        """回复生成后：记录本轮对话并做安全检查（reply 为 None 表示回复仍在后台生成，只记录用户消息）"""
         await self.memory_manager.log_message(user_id, "user", message)
-        await self.memory_manager.log_message(user_id, "assistant", reply)
+        if reply is not None:
+            await self.memory_manager.log_message(user_id, "assistant", reply)
+
+        return self.safety_controller.review(message)
+
+    def _attach_late_reply(self, user_id: str, reply: str, user_logged: asyncio.Event) -> None:
+        """超出预算的回复在后台完成：等本轮用户消息写入后补记为助手消息"""
 
-        safety = self.safety_controller.review(message)
+        async def _log() -> None:
+            await user_logged.wait()
+            try:
+                await self.memory_manager.log_message(user_id, "assistant", reply)
+            except Exception as exc:
+                logger.warning("Failed to log late companion reply for %s: %s", user_id, exc)
 
+        task = asyncio.get_running_loop().create_task(_log())
+        self._late_logs.add(task)
+        task.add_done_callback(self._late_logs.discard)
+
+    @staticmethod
+    def _turn_context(turn: Dict[str, Any], safety: Dict[str, Any]) -> Dict[str, Any]:
         return {
-            "reply": reply,
-            "context": {
-                "history": history,
-                "retrieval": retrieval["raw"],
-                "scene": scene_context,
-                "style": style_instruction,
-                "safety": safety,
-                "profile_used": profile is not None,  # 指示是否使用了Profile
-            },
+            "history": turn["history"],
+            "retrieval": turn["retrieval"]["raw"],
+            "scene": turn["scene_context"],
+            "style": turn["style_instruction"],
+            "safety": safety,
+            "profile_used": turn["profile"] is not None,  # 指示是否使用了Profile
+            "prompt_tokens": turn["prompt_budget"].info(),
         }
 
     async def history(self, user_id: str, limit: int = 20) -> Dict[str, Any]:
@@ -73,24 +186,40 @@ class CompanionCore:
     def _build_prompt(
         self,
         history: list[Dict[str, Any]],
+        summary: str,
         user_message: str,
         style_instruction: str,
         scene_context: Dict[str, Any],
-    ) -> str:
-        history_text = ""
-        for log in history:
-            speaker = "User" if log.get("role") == "user" else "Companion"
-            history_text += f"{speaker}: {log.get('content', '')}\n"
+        documents: List[str],
+    ) -> Tuple[str, List[str], PromptBudgetResult]:
+        """
+        按 COMPANION_PROMPT_MAX_TOKENS 装配 prompt，返回（prompt，保留的检索文档，装配结果）
+
+        超出预算时依次收缩：靠后的检索文档 -> 场景说明 -> 较早对话摘要 -> 对话历史（保留最近的轮次）-> 风格指令；
+        persona 和用户消息不截断
+        """
+        sections = [
+            PromptSection("persona", self.persona, required=True),
+            PromptSection("style", style_instruction, priority=80),
+            PromptSection("scene", scene_context.get("context_text", ""), priority=40, min_tokens=20),
+            PromptSection("summary", summary, priority=50, keep="tail", min_tokens=20),
+            PromptSection("history", render_history(history), priority=70, keep="tail"),
+            PromptSection("message", user_message, required=True),
+            *(
+                PromptSection(f"doc:{i}", document, priority=30, min_tokens=30)
+                for i, document in enumerate(documents)
+            ),
+        ]
+        budget = fit_sections(sections, settings.COMPANION_PROMPT_MAX_TOKENS, site="companion.reply")
+        summary_text = budget.text("summary")
 
         prompt = (
             f"{self.persona}\n\n"
-            f"{style_instruction}\n"
-            f"Scene context:\n{scene_context.get('context_text', '')}\n\n"
-            f"Conversation history:\n{history_text}\n"
+            f"{budget.text('style')}\n"
+            f"Scene context:\n{budget.text('scene')}\n\n"
+            + (f"Summary of earlier conversation:\n{summary_text}\n\n" if summary_text else "")
+            + f"Conversation history:\n{budget.text('history')}\n\n"
             f"New user message: {user_message}\n"
             "Respond as the companion:"
         )
-        return prompt
-
-
-
+        return prompt, budget.texts("doc:"), budget
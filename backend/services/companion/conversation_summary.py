@@ -0,0 +1,169 @@
+"""
+对话滚动摘要：最近 COMPANION_RECENT_MESSAGES 条消息原文进入 prompt，更早的消息折叠进按用户缓存的摘要
+
+- 缓存记录摘要覆盖到的最后一条消息；之后再有消息滑出最近窗口时，只把新滑出的消息并入摘要
+- 并入时先用抽取式摘要（每条消息取开头，拼到旧摘要后，超出 PROMPT_SUMMARY_MAX_TOKENS 时丢掉最早的部分）立即返回，
+  同时在后台请求 LLM 重写摘要（调用点 companion.summary），完成后替换缓存，下一轮起使用；
+  未配置 LLM 时一直使用抽取式摘要
+- 缓存为进程内 LRU（PROMPT_SUMMARY_CACHE_SIZE 个用户）
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import settings
+from core.metrics import counter
+from services.llm_gateway import LLMGateway, get_llm_gateway
+from services.prompt_budget import render_history, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+PROMPT_SUMMARY_REQUESTS = counter(
+    "prompt_summary_requests_total", "Rolling conversation summary lookups by outcome", ["outcome"]
+)
+
+# 抽取式摘要中每条消息保留的字符数
+_EXTRACT_CHARS = 60
+
+_conversation_summarizer_instance: Optional["ConversationSummarizer"] = None
+
+
+def message_key(message: Dict[str, Any]) -> str:
+    """消息的稳定标识：优先用 Mongo _id，否则按角色 / 时间 / 内容计算"""
+    if message.get("_id") is not None:
+        return str(message["_id"])
+    raw = f"{message.get('role')}|{message.get('created_at') or message.get('timestamp')}|{message.get('content')}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def extractive_summary(previous: str, messages: List[Dict[str, Any]], max_tokens: int) -> str:
+    lines = [previous] if previous else []
+    for message in messages:
+        content = str(message.get("content", "")).strip().replace("\n", " ")
+        if not content:
+            continue
+        if len(content) > _EXTRACT_CHARS:
+            content = content[:_EXTRACT_CHARS] + "…"
+        speaker = "User" if message.get("role") == "user" else "Companion"
+        lines.append(f"{speaker}: {content}")
+    return truncate_to_tokens("\n".join(lines), max_tokens, keep="tail")
+
+
+class ConversationSummarizer:
+    """按用户缓存的滚动摘要"""
+
+    def __init__(
+        self,
+        capacity: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        gateway: Optional[LLMGateway] = None,
+    ) -> None:
+        self.capacity = settings.PROMPT_SUMMARY_CACHE_SIZE if capacity is None else capacity
+        self.max_tokens = max_tokens or settings.PROMPT_SUMMARY_MAX_TOKENS
+        self.gateway = gateway or get_llm_gateway()
+        # user_id -> (摘要覆盖到的最后一条消息, 摘要)
+        self._summaries: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+        self._refreshing: Dict[str, "asyncio.Task[None]"] = {}
+        self._counts: Dict[str, int] = {"hit": 0, "fold": 0, "rebuild": 0, "llm_refresh": 0, "llm_error": 0}
+
+    def summarize(self, user_id: str, older: List[Dict[str, Any]]) -> str:
+        """返回覆盖 older（按时间从早到晚，已滑出最近窗口的消息）的摘要"""
+        if not older:
+            return ""
+        last_key = message_key(older[-1])
+        cached = self._summaries.get(user_id)
+        if cached is not None:
+            self._summaries.move_to_end(user_id)
+            covered_key, summary = cached
+            if covered_key == last_key:
+                self._record("hit")
+                return summary
+            keys = [message_key(message) for message in older]
+            if covered_key in keys:
+                # 只把新滑出窗口的消息并入摘要
+                new_messages = older[keys.index(covered_key) + 1:]
+                self._record("fold")
+            else:
+                # 窗口已越过上次摘要的位置（或历史被清理），在旧摘要之后并入全部较早消息
+                new_messages = older
+                self._record("rebuild")
+        else:
+            summary, new_messages = "", older
+            self._record("rebuild")
+
+        summary = extractive_summary(summary, new_messages, self.max_tokens)
+        self._store(user_id, last_key, summary)
+        self._schedule_refresh(user_id, last_key, cached[1] if cached else "", new_messages)
+        return summary
+
+    def _store(self, user_id: str, last_key: str, summary: str) -> None:
+        self._summaries[user_id] = (last_key, summary)
+        self._summaries.move_to_end(user_id)
+        while len(self._summaries) > self.capacity:
+            self._summaries.popitem(last=False)
+
+    def _schedule_refresh(
+        self, user_id: str, last_key: str, previous: str, new_messages: List[Dict[str, Any]]
+    ) -> None:
+        if not self.gateway.available or user_id in self._refreshing:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(
+                self._refresh(user_id, last_key, previous, new_messages)
+            )
+        except RuntimeError:
+            return
+        self._refreshing[user_id] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(user_id, None))
+
+    async def _refresh(
+        self, user_id: str, last_key: str, previous: str, new_messages: List[Dict[str, Any]]
+    ) -> None:
+        prompt = (
+            f"Previous summary:\n{previous or '(none)'}\n\n"
+            f"New messages:\n{render_history(new_messages)}\n\n"
+            f"Update the summary of this conversation between a neurodivergent user and a companion "
+            f"in at most {self.max_tokens} tokens. Keep facts about the user, their feelings, "
+            "ongoing problems and any advice already given. Reply with the summary only."
+        )
+        try:
+            summary = await self.gateway.chat(
+                "companion.summary",
+                [{"role": "user", "content": prompt}],
+                temperature=0,
+                max_tokens=self.max_tokens,
+            )
+        except Exception as exc:
+            self._record("llm_error")
+            logger.warning("Conversation summary refresh failed for %s: %s", user_id, exc)
+            return
+        cached = self._summaries.get(user_id)
+        # 期间摘要已前进到更新的消息时丢弃这次结果
+        if summary and cached is not None and cached[0] == last_key:
+            self._store(user_id, last_key, truncate_to_tokens(summary.strip(), self.max_tokens))
+            self._record("llm_refresh")
+
+    def _record(self, outcome: str) -> None:
+        self._counts[outcome] += 1
+        PROMPT_SUMMARY_REQUESTS.labels(outcome=outcome).inc()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._summaries),
+            "capacity": self.capacity,
+            "max_tokens": self.max_tokens,
+            "refreshing": len(self._refreshing),
+            **self._counts,
+        }
+
+
+def get_conversation_summarizer() -> ConversationSummarizer:
+    """获取对话滚动摘要单例"""
+    global _conversation_summarizer_instance
+    if _conversation_summarizer_instance is None:
+        _conversation_summarizer_instance = ConversationSummarizer()
+    return _conversation_summarizer_instance
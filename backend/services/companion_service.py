@@ -2,19 +2,30 @@ from __future__ import annotations
 
 from __future__ import annotations
 
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Dict, Any, Optional
 
+from services.ai_service import AIService
 from services.companion.companion_core import CompanionCore
 
 
 class CompanionService:
     """Orchestrator wrapper for companion module (legacy entrypoint)."""
 
-    def __init__(self):
-        self.core = CompanionCore()
-
-    async def chat(self, user_id: str, message: str, style: Optional[str] = None) -> Dict[str, Any]:
-        return await self.core.handle_chat(user_id, message, style)
+    def __init__(self, ai_service: Optional[AIService] = None):
+        self.core = CompanionCore(ai=ai_service)
+
+    async def chat(
+        self,
+        user_id: str,
+        message: str,
+        style: Optional[str] = None,
+        latency_budget_ms: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        return await self.core.handle_chat(user_id, message, style, latency_budget_ms=latency_budget_ms)
+
+    def chat_stream(self, user_id: str, message: str, style: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """流式对话：逐段产出 delta 事件，最后产出 done 事件"""
+        return self.core.stream_chat(user_id, message, style)
 
     async def list_history(self, user_id: str, limit: int = 20) -> Dict[str, Any]:
         return await self.core.history(user_id, limit)
@@ -7,6 +7,7 @@ from typing import Dict, Any, List, Optional
 from enum import Enum
 from functools import lru_cache
 from services.db_service import DBService
+from services.rules.lexicons import RISK_KEYWORDS
 from core.utils import utc_now_iso
 
 
@@ -125,6 +126,9 @@ class ConfigService:
         # 清除缓存
         self._clear_cache(category, key)
         
+        # 规则类配置变更后重新编译规则版本并原子替换
+        await self._reload_rules(category)
+        
         return {
             "message": "Config updated",
             "category": category.value,
@@ -188,8 +192,8 @@ class ConfigService:
         """获取默认配置"""
         defaults = {
             ConfigCategory.RISK_KEYWORDS: {
-                "high_risk": {"words": ["想死", "不想活了", "绝望", "崩溃", "自杀", "自残"]},
-                "medium_risk": {"words": ["难过", "痛苦", "受不了", "压力大", "焦虑", "害怕"]}
+                "high_risk": {"words": list(RISK_KEYWORDS["high_risk"])},
+                "medium_risk": {"words": list(RISK_KEYWORDS["medium_risk"])}
             },
             ConfigCategory.BEHAVIOR_CLASSIFICATION: {
                 "scene_keywords": {
@@ -253,6 +257,12 @@ class ConfigService:
             for k in keys_to_remove:
                 self._config_cache.pop(k, None)
     
+    async def _reload_rules(self, category: ConfigCategory) -> None:
+        from services.rules.active import RULE_CATEGORIES, get_rule_registry
+        
+        if category in RULE_CATEGORIES:
+            await get_rule_registry().reload()
+    
     def clear_all_cache(self):
         """清除所有缓存"""
         self._config_cache.clear()
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from services.emotion_service import EmotionService
 from services.progress_service import ProgressService
@@ -12,12 +12,22 @@ from services.decoder_service import DecoderService
 class DashboardService:
     """聚合情绪 / 社交 / 干预等核心指标，供仪表盘使用"""
 
-    def __init__(self):
-        self.emotion_service = EmotionService()
-        self.progress_service = ProgressService()
-        self.intervention_service = InterventionService()
-        self.companion_service = CompanionService()
-        self.decoder_service = DecoderService()
+    def __init__(
+        self,
+        emotion_service: Optional[EmotionService] = None,
+        progress_service: Optional[ProgressService] = None,
+        intervention_service: Optional[InterventionService] = None,
+        companion_service: Optional[CompanionService] = None,
+        decoder_service: Optional[DecoderService] = None,
+    ):
+        self.decoder_service = decoder_service or DecoderService()
+        self.emotion_service = emotion_service or EmotionService(decoder=self.decoder_service)
+        self.progress_service = progress_service or ProgressService()
+        self.intervention_service = intervention_service or InterventionService(
+            emotion_service=self.emotion_service,
+            decoder_service=self.decoder_service,
+        )
+        self.companion_service = companion_service or CompanionService()
 
     async def user_overview(self, user_id: str) -> Dict[str, Any]:
         emotion_stats = await self.emotion_service.get_emotion_statistics(user_id, days=30)
@@ -1,29 +1,143 @@
 from typing import Any, Dict, List, Optional, Iterable, Tuple
 from datetime import datetime
 from core.config import settings
+from core.metrics import counter, gauge, histogram
 
 try:
     from motor.motor_asyncio import AsyncIOMotorClient
-    from pymongo import ASCENDING, DESCENDING
+    from pymongo import ASCENDING, DESCENDING, monitoring
 except Exception:  # motor 未安装时兜底
     AsyncIOMotorClient = None  # type: ignore
+    monitoring = None  # type: ignore
 
 
 # 全局内存存储（用于单例模式）
 _memory_logs: List[Dict[str, Any]] = []
 
+# 进程级共享的 Mongo 客户端（内部维护连接池）
+_mongo_client: Optional[AsyncIOMotorClient] = None
+
+MONGO_POOL_CONNECTIONS = gauge(
+    "mongo_pool_connections", "Open connections in the Mongo pool"
+)
+MONGO_POOL_IN_USE = gauge(
+    "mongo_pool_connections_in_use", "Connections currently checked out of the Mongo pool"
+)
+MONGO_POOL_CHECKOUT_SECONDS = histogram(
+    "mongo_pool_checkout_seconds", "Time spent waiting to check out a Mongo connection"
+)
+MONGO_POOL_CHECKOUT_FAILURES = counter(
+    "mongo_pool_checkout_failures_total", "Failed Mongo connection checkouts", ["reason"]
+)
+
+_pool_stats: Dict[str, int] = {
+    "connections": 0,
+    "in_use": 0,
+    "created_total": 0,
+    "closed_total": 0,
+    "checkouts_total": 0,
+    "checkout_failures_total": 0,
+    "pool_cleared_total": 0,
+}
+
+
+if monitoring is not None:
+
+    class _PoolMetricsListener(monitoring.ConnectionPoolListener):
+        """记录连接池使用情况（连接数、借出数、等待时间）"""
+
+        def pool_created(self, event):
+            pass
+
+        def pool_ready(self, event):
+            pass
+
+        def pool_cleared(self, event):
+            _pool_stats["pool_cleared_total"] += 1
+
+        def pool_closed(self, event):
+            pass
+
+        def connection_created(self, event):
+            _pool_stats["connections"] += 1
+            _pool_stats["created_total"] += 1
+            MONGO_POOL_CONNECTIONS.set(_pool_stats["connections"])
+
+        def connection_ready(self, event):
+            pass
+
+        def connection_closed(self, event):
+            _pool_stats["connections"] = max(0, _pool_stats["connections"] - 1)
+            _pool_stats["closed_total"] += 1
+            MONGO_POOL_CONNECTIONS.set(_pool_stats["connections"])
+
+        def connection_check_out_started(self, event):
+            pass
+
+        def connection_check_out_failed(self, event):
+            _pool_stats["checkout_failures_total"] += 1
+            MONGO_POOL_CHECKOUT_FAILURES.labels(reason=str(event.reason)).inc()
+
+        def connection_checked_out(self, event):
+            _pool_stats["in_use"] += 1
+            _pool_stats["checkouts_total"] += 1
+            MONGO_POOL_IN_USE.set(_pool_stats["in_use"])
+            duration = getattr(event, "duration", None)
+            if duration is not None:
+                MONGO_POOL_CHECKOUT_SECONDS.observe(duration)
+
+        def connection_checked_in(self, event):
+            _pool_stats["in_use"] = max(0, _pool_stats["in_use"] - 1)
+            MONGO_POOL_IN_USE.set(_pool_stats["in_use"])
+
+
+def get_mongo_client() -> Optional[AsyncIOMotorClient]:
+    """获取进程级共享的 Mongo 客户端（首次调用时创建连接池）"""
+    global _mongo_client
+    if _mongo_client is None and settings.MONGO_URI and AsyncIOMotorClient is not None:
+        _mongo_client = AsyncIOMotorClient(
+            settings.MONGO_URI,
+            maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+            serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            event_listeners=[_PoolMetricsListener()],
+        )
+    return _mongo_client
+
+
+def close_mongo_client() -> None:
+    """关闭共享客户端（应用退出时调用）"""
+    global _mongo_client
+    if _mongo_client is not None:
+        _mongo_client.close()
+        _mongo_client = None
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """连接池使用情况快照"""
+    return {
+        "enabled": _mongo_client is not None,
+        "max_pool_size": settings.MONGO_MAX_POOL_SIZE,
+        "min_pool_size": settings.MONGO_MIN_POOL_SIZE,
+        "max_idle_time_ms": settings.MONGO_MAX_IDLE_TIME_MS,
+        "server_selection_timeout_ms": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        **_pool_stats,
+    }
+
 
 class DBService:
     _indexes_initialized: bool = False
 
     def __init__(self):
-        self._client: Optional[AsyncIOMotorClient] = None
+        # 所有 DBService 实例共用同一个客户端，不再各自创建连接池
+        self._client: Optional[AsyncIOMotorClient] = get_mongo_client()
         self._db = None
-        if settings.MONGO_URI and AsyncIOMotorClient is not None:
-            self._client = AsyncIOMotorClient(settings.MONGO_URI)
+        if self._client is not None:
             self._db = self._client[settings.MONGO_DB]
 
     async def ensure_indexes(self) -> None:
+        """创建索引（应用启动时调用一次）"""
         if self._db is None or DBService._indexes_initialized:
             return
         # 日志索引
@@ -40,6 +154,10 @@ class DBService:
                 [("email", ASCENDING)],
             ]
         )
+        # LLM 响应缓存持久层：到期自动删除
+        await self._db.llm_cache.create_index("expires_at", expireAfterSeconds=0)
+        # LLM 按天用量：按日期范围查询
+        await self._db.llm_usage_daily.create_index([("day", ASCENDING), ("user_id", ASCENDING)])
         DBService._indexes_initialized = True
 
     async def add_log(self, item: Dict[str, Any]) -> Dict[str, Any]:
@@ -118,7 +236,6 @@ class DBService:
         - 支持 sort / limit / skip（用于分页）
         """
         if self._db is not None:
-            await self.ensure_indexes()
             cursor = self._db.logs.find(query, projection or None)
             if sort:
                 cursor = cursor.sort(sort)
@@ -146,7 +263,6 @@ class DBService:
     async def aggregate_logs(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         if self._db is None:
             return []
-        await self.ensure_indexes()
         cursor = self._db.logs.aggregate(pipeline, allowDiskUse=True)
         return await cursor.to_list(length=None)
 
@@ -0,0 +1,240 @@
+"""
+批量文本分析：与 DecoderService.analyze_social_signal 返回相同结构，但整批一起处理
+
+- 一个分块内的文本用换行拼接后整体处理：自动机只扫描一次，jieba 只分词一次
+  （换行不属于任何词库词，也会切断 jieba 的分词块，结果与逐条处理一致）
+- 命中结果整理为稀疏「文档 × 词」矩阵（COO：doc / word_id），与按规则版本缓存的
+  词库权重矩阵相乘，得到每条文本的情感倾向计数和场景得分
+- 文本统计按字符码位（NumPy）和正则匹配起点（按文档 bincount）向量化计算
+"""
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.config import settings
+from services.decoder.keyword_extractor import get_keyword_extractor
+from services.rules.active import ActiveRules, get_active_rules
+from services.rules.matcher import LexiconMatcher
+
+SEPARATOR = "\n"
+
+_ENGLISH_RE = re.compile(r'[a-zA-Z]+')
+_NUMBER_RE = re.compile(r'\d+')
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_WORD_SPLIT_RE = re.compile(r'\S+')
+
+_batch_analyzer_instance: Optional["BatchTextAnalyzer"] = None
+
+
+class _LexiconWeights:
+    """自动机词表对应的权重矩阵（行：word_id）"""
+
+    def __init__(self, matcher: LexiconMatcher) -> None:
+        self.scene_labels = list(matcher.label_order.get("scene", []))
+        scene_columns = {label: i for i, label in enumerate(self.scene_labels)}
+        sentiment_columns = {"positive": 0, "negative": 1}
+        n_words = len(matcher.words)
+        # 词在某标签词表中出现的次数（与逐词 `word in text` 计数一致，含词表重复项）
+        self.sentiment = np.zeros((n_words, 2), dtype=np.float64)
+        self.scene = np.zeros((n_words, len(self.scene_labels)), dtype=np.float64)
+        for word_id, entries in enumerate(matcher.entries):
+            for lexicon, label, _ in entries:
+                if lexicon == "sentiment" and label in sentiment_columns:
+                    self.sentiment[word_id, sentiment_columns[label]] += 1
+                elif lexicon == "scene":
+                    self.scene[word_id, scene_columns[label]] += 1
+        # 场景关键词权重：长关键词权重更高
+        self.scene_weight = np.array([len(word) / 10.0 + 1.0 for word in matcher.words], dtype=np.float64)
+
+
+@lru_cache(maxsize=4)
+def _lexicon_weights(matcher: LexiconMatcher) -> _LexiconWeights:
+    # 按自动机实例缓存：规则版本不变时权重矩阵只构建一次
+    return _LexiconWeights(matcher)
+
+
+def _codepoints(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode("utf-32-le"), dtype="<u4")
+
+
+def _doc_offsets(lengths: np.ndarray) -> np.ndarray:
+    """拼接文本中每条文本的起始位置（文本之间有一个分隔符）"""
+    offsets = np.zeros(len(lengths), dtype=np.int64)
+    if len(lengths) > 1:
+        offsets[1:] = np.cumsum(lengths[:-1] + 1)
+    return offsets
+
+
+def _count_matches(pattern: re.Pattern, joined: str, offsets: np.ndarray) -> np.ndarray:
+    """正则在每条文本中的匹配次数"""
+    starts = np.fromiter((m.start() for m in pattern.finditer(joined)), dtype=np.int64)
+    docs = np.searchsorted(offsets, starts, side="right") - 1
+    return np.bincount(docs, minlength=len(offsets))
+
+
+class BatchTextAnalyzer:
+    """批量文本分析器（统计 / 关键词 / 情感倾向 / 规则场景）"""
+
+    def __init__(self, chunk_size: Optional[int] = None) -> None:
+        self.chunk_size = max(1, chunk_size or settings.BATCH_ANALYSIS_CHUNK_SIZE)
+
+    def analyze(
+        self,
+        texts: Sequence[str],
+        top_k: int = 10,
+        rules: Optional[ActiveRules] = None,
+    ) -> List[Dict[str, Any]]:
+        """分析一批文本，结果顺序与输入一致（整批使用同一个规则版本）"""
+        rules = rules or get_active_rules()
+        results: List[Dict[str, Any]] = []
+        for start in range(0, len(texts), self.chunk_size):
+            results.extend(self._analyze_chunk(list(texts[start:start + self.chunk_size]), top_k, rules))
+        return results
+
+    def _analyze_chunk(self, texts: List[str], top_k: int, rules: ActiveRules) -> List[Dict[str, Any]]:
+        stats = self._stats(texts)
+        sentiments, scenes = self._score_lexicons(texts, rules)
+        keywords = self._keywords(texts, top_k)
+        snapshot = rules.info()
+        return [
+            {
+                "text": text,
+                "stats": stats[i],
+                "keywords": keywords[i],
+                "sentiment": sentiments[i],
+                "scene": scenes[i],
+                "semantic": None,
+                "rule_snapshot": snapshot,
+            }
+            for i, text in enumerate(texts)
+        ]
+
+    # ===== 文本统计 =====
+
+    def _stats(self, texts: List[str]) -> List[Dict[str, Any]]:
+        n = len(texts)
+        lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=n)
+        offsets = _doc_offsets(lengths)
+        joined = SEPARATOR.join(texts)
+
+        codepoints = _codepoints(joined)
+        doc_of_char = np.repeat(np.arange(n), lengths + 1)[:len(codepoints)]
+        chinese = (codepoints >= 0x4E00) & (codepoints <= 0x9FFF)
+        chinese_chars = np.bincount(doc_of_char[chinese], minlength=n)
+
+        total_chars = lengths.tolist()
+        total_words = _count_matches(_WORD_SPLIT_RE, joined, offsets).tolist()
+        columns = zip(
+            total_chars,
+            total_words,
+            chinese_chars.tolist(),
+            _count_matches(_ENGLISH_RE, joined, offsets).tolist(),
+            _count_matches(_NUMBER_RE, joined, offsets).tolist(),
+            _count_matches(_PUNCTUATION_RE, joined, offsets).tolist(),
+        )
+        return [
+            {
+                "total_chars": chars,
+                "total_words": words,
+                "chinese_chars": chinese_count,
+                "english_words": english,
+                "numbers": numbers,
+                "punctuation": punctuation,
+                "avg_word_length": chars / words if words > 0 else 0,
+            }
+            for chars, words, chinese_count, english, numbers, punctuation in columns
+        ]
+
+    # ===== 词库打分（稀疏文档-词矩阵 × 权重矩阵） =====
+
+    def _score_lexicons(
+        self, texts: List[str], rules: ActiveRules
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        n = len(texts)
+        matcher = rules.matcher
+        weights = _lexicon_weights(matcher)
+        n_words = max(len(matcher.words), 1)
+
+        lowered = [text.lower() for text in texts]
+        offsets = _doc_offsets(np.fromiter((len(text) for text in lowered), dtype=np.int64, count=n))
+        joined = SEPARATOR.join(lowered)
+
+        positions = matcher.scan_positions(joined)
+        word_ids = np.fromiter(
+            (word_id for word_id, starts in positions.items() for _ in starts), dtype=np.int64
+        )
+        starts = np.fromiter((start for starts in positions.values() for start in starts), dtype=np.int64)
+        docs = np.searchsorted(offsets, starts, side="right") - 1
+
+        # 词出现在文本开头或紧跟空格之后（场景打分加分项）
+        codepoints = _codepoints(joined)
+        at_word_start = (starts == offsets[docs]) | (codepoints[np.maximum(starts - 1, 0)] == ord(" "))
+
+        # 同一文本中重复出现的词只计一次（与 `word in text` 一致）
+        keys, inverse = np.unique(docs * n_words + word_ids, return_inverse=True)
+        starts_word = np.zeros(len(keys), dtype=bool)
+        np.logical_or.at(starts_word, inverse, at_word_start)
+        doc_u = keys // n_words
+        word_u = keys % n_words
+
+        sentiment_counts = np.zeros((n, 2), dtype=np.float64)
+        np.add.at(sentiment_counts, doc_u, weights.sentiment[word_u])
+        scene_scores = np.zeros((n, len(weights.scene_labels)), dtype=np.float64)
+        if weights.scene_labels:
+            term_weight = weights.scene_weight[word_u] + 0.5 * starts_word
+            np.add.at(scene_scores, doc_u, weights.scene[word_u] * term_weight[:, None])
+
+        return self._sentiments(sentiment_counts), self._scenes(scene_scores, weights.scene_labels)
+
+    @staticmethod
+    def _sentiments(counts: np.ndarray) -> List[Dict[str, Any]]:
+        results = []
+        for positive_count, negative_count in counts.astype(np.int64).tolist():
+            if positive_count > negative_count:
+                sentiment = "positive"
+                confidence = min(0.9, 0.5 + (positive_count - negative_count) * 0.1)
+            elif negative_count > positive_count:
+                sentiment = "negative"
+                confidence = min(0.9, 0.5 + (negative_count - positive_count) * 0.1)
+            else:
+                sentiment = "neutral"
+                confidence = 0.5
+            results.append({
+                "sentiment": sentiment,
+                "confidence": confidence,
+                "positive_score": positive_count,
+                "negative_score": negative_count
+            })
+        return results
+
+    @staticmethod
+    def _scenes(scores: np.ndarray, labels: List[str]) -> List[Dict[str, Any]]:
+        """与 ClassifierService.classify_by_rules 相同的归一化（同分取词库顺序靠前的场景）"""
+        if not labels:
+            return [{"scene": "未知", "confidence": 0.0} for _ in range(len(scores))]
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(scores)), best]
+        totals = scores.sum(axis=1)
+        confidence = np.minimum(0.85, 0.5 + (best_scores / np.maximum(totals, 1)) * 0.35)
+        return [
+            {"scene": labels[index], "confidence": conf} if score > 0 else {"scene": "未知", "confidence": 0.0}
+            for index, score, conf in zip(best.tolist(), best_scores.tolist(), confidence.tolist())
+        ]
+
+    # ===== 关键词 =====
+
+    def _keywords(self, texts: List[str], top_k: int) -> List[List[Dict[str, Any]]]:
+        """jieba TF-IDF：重复文本只算一次，未命中缓存的文本整块一次分词"""
+        return get_keyword_extractor().extract_batch_sync(texts, top_k)
+
+
+def get_batch_analyzer() -> BatchTextAnalyzer:
+    """获取批量文本分析器单例"""
+    global _batch_analyzer_instance
+    if _batch_analyzer_instance is None:
+        _batch_analyzer_instance = BatchTextAnalyzer()
+    return _batch_analyzer_instance
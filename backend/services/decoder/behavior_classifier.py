@@ -1,22 +1,31 @@
 """一级分类器：行为类别（规则 + 模板匹配）"""
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Tuple, List, Optional
 import re
 from services.classifier_service import ClassifierService
 from services.template_service import TemplateService
 from services.prompt_service import get_prompt_service
 from services.config_service import get_config_service
+from services.rules.template_index import TemplatePatternIndex, get_template_index
+from services.decoder.text_features import TextFeatures
 
 
 class BehaviorClassifier:
     """一级分类器：基于规则关键词和模板匹配的行为类别识别"""
     
-    def __init__(self):
-        self.classifier = ClassifierService()
-        self.template_service = TemplateService()
+    def __init__(
+        self,
+        classifier: Optional[ClassifierService] = None,
+        template_service: Optional[TemplateService] = None,
+        template_index: Optional[TemplatePatternIndex] = None,
+    ):
+        self.classifier = classifier or ClassifierService()
+        self.template_service = template_service or TemplateService()
         self.prompt_service = get_prompt_service()
         self.config_service = get_config_service()
+        # 全部模板 patterns 的预编译索引，请求路径不再读取 prompt 文件
+        self.template_index = template_index or get_template_index()
     
-    def classify(self, text: str) -> Dict[str, Any]:
+    def classify(self, text: str, features: Optional[TextFeatures] = None) -> Dict[str, Any]:
         """
         一级分类：行为类别识别
         
@@ -30,13 +39,13 @@ class BehaviorClassifier:
                 "explanation": "分类原因说明"
             }
         """
-        text_lower = text.lower()
+        features = features or TextFeatures(text)
         
         # 1. 规则关键词匹配
-        rule_result = self._classify_by_rules(text_lower)
+        rule_result = self._classify_by_rules(features)
         
         # 2. 模板匹配（从PromptService加载的模板）
-        template_result = self._classify_by_template(text_lower)
+        template_result = self._classify_by_template(features.text_lower)
         
         # 3. 综合判断
         if rule_result["confidence"] >= 0.7 and template_result["confidence"] >= 0.7:
@@ -76,16 +85,12 @@ class BehaviorClassifier:
                     "matched_keywords": []
                 }
     
-    def _classify_by_rules(self, text_lower: str) -> Dict[str, Any]:
+    def _classify_by_rules(self, features: TextFeatures) -> Dict[str, Any]:
         """基于规则关键词分类（复用ClassifierService）"""
-        scene, confidence = self.classifier.classify_by_rules(text_lower)
+        scene, confidence = self.classifier.classify_by_rules(features.text, features)
         
-        # 提取匹配的关键词
-        matched_keywords = []
-        scene_keywords = self.classifier.scene_keywords.get(scene, [])
-        for keyword in scene_keywords:
-            if keyword in text_lower:
-                matched_keywords.append(keyword)
+        # 提取匹配的关键词（复用同一次自动机扫描的结果）
+        matched_keywords = features.hits.matched("scene", scene)
         
         return {
             "category": scene,
@@ -95,53 +100,20 @@ class BehaviorClassifier:
         }
     
     def _classify_by_template(self, text_lower: str) -> Dict[str, Any]:
-        """基于PromptService模板匹配"""
-        best_match = None
-        best_score = 0.0
-        best_template_name = None
-        
+        """基于PromptService模板匹配（使用预编译的模板 pattern 索引，一次扫描完成打分）"""
         try:
-            # 获取所有模板
-            templates = self.prompt_service.list_templates()
-            
-            for template_info in templates:
-                template_name = template_info["name"]
-                try:
-                    template = self.prompt_service.load_template(template_name)
-                    
-                    # 检查模板中的patterns
-                    sub_scenes = template.get("sub_scenes", [])
-                    for sub_scene in sub_scenes:
-                        patterns = sub_scene.get("patterns", [])
-                        scene_type = sub_scene.get("type", "")
-                        
-                        # 计算匹配分数
-                        score = 0.0
-                        matched_patterns = []
-                        
-                        for pattern in patterns:
-                            if pattern.lower() in text_lower:
-                                # 长模式权重更高
-                                weight = len(pattern) / 10.0 + 1.0
-                                score += weight
-                                matched_patterns.append(pattern)
-                        
-                        if score > best_score:
-                            best_score = score
-                            best_match = scene_type or template_name
-                            best_template_name = template_name
-                            
-                except FileNotFoundError:
-                    continue
-                except Exception:
-                    continue
+            self.template_index.refresh_if_stale()
+            sub_scene, best_score = self.template_index.best_match(text_lower)
             
             # 归一化置信度
-            if best_score > 0:
+            if sub_scene is not None:
+                best_match = sub_scene["type"] or sub_scene["template"]
+                best_template_name = sub_scene["template"]
                 confidence = min(0.9, 0.5 + (best_score / 10.0) * 0.4)
             else:
-                confidence = 0.0
                 best_match = "未知"
+                best_template_name = None
+                confidence = 0.0
             
             return {
                 "category": best_match,
@@ -0,0 +1,126 @@
+"""
+分类级联策略：决定一次解码是否需要升级到 LLM（三级精炼 / 融合解码）
+
+只有以下情况才升级（其余直接采用一级分类结果，不请求 provider）：
+- 一级分类（规则 / 模板）置信度低于 CLASSIFIER_RULES.confidence_threshold
+- 二级情绪方向为 risky
+- 一级场景的情感极性与二级情绪方向相反（如「赞美」但情绪方向为 negative）
+CLASSIFIER_RULES.use_ai_refinement 为 false 时从不升级。阈值随规则版本热更新。
+
+因置信度不足或极性不一致而升级时，先问本地场景模型（services.decoder.local_classifier）：
+本地模型足够可信时不升级（reason 为 local_model，结果在 local_model 字段）。情绪方向为 risky 时始终升级。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from core.metrics import counter
+from services.decoder.local_classifier import LocalSceneClassifier, get_local_scene_classifier
+from services.rules.active import ActiveRules
+
+DECODER_CASCADE_DECISIONS = counter(
+    "decoder_cascade_decisions_total", "Decode cascade decisions (escalate to the LLM or not)", ["outcome", "reason"]
+)
+
+# 场景的情感极性（未列出的场景视为中性，不参与一致性判断）
+SCENE_POLARITY: Dict[str, str] = {
+    "拒绝": "negative",
+    "冲突": "negative",
+    "失望": "negative",
+    "无聊": "negative",
+    "尴尬": "negative",
+    "恐惧": "negative",
+    "抱怨": "negative",
+    "批评": "negative",
+    "烦躁": "negative",
+    "高兴": "positive",
+    "回应感谢": "positive",
+    "安慰": "positive",
+    "赞美": "positive",
+    "赞同": "positive",
+}
+
+# 可由本地模型代替 LLM 的升级原因
+LOCAL_MODEL_REASONS = ("low_confidence", "disagreement")
+
+_cascade_policy_instance: Optional["CascadePolicy"] = None
+
+
+class CascadePolicy:
+    """置信度门控：规则足够可信且与情绪方向一致时跳过 LLM"""
+
+    def __init__(self, local_classifier: Optional[LocalSceneClassifier] = None) -> None:
+        self.local_classifier = local_classifier or get_local_scene_classifier()
+        self._counts: Dict[str, int] = {"escalated": 0, "skipped": 0}
+        self._reasons: Dict[str, int] = {}
+
+    def decide(
+        self,
+        level1_result: Dict[str, Any],
+        level2_result: Dict[str, Any],
+        rules: ActiveRules,
+        text: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Args:
+            text: 原始文本（提供时升级前先问本地模型）
+
+        Returns:
+            {
+                "escalate": True | False,
+                "reason": "low_confidence" | "risky" | "disagreement" | "confident" | "disabled" | "local_model",
+                "threshold": 0.7,
+                "level1_confidence": 0.0-1.0,
+                "local_model": {"final_scene", "confidence", "reason", "model_version"} | None
+            }
+        """
+        classifier_rules = rules.classifier_rules
+        threshold = float(classifier_rules.get("confidence_threshold", 0.7))
+        confidence = float(level1_result.get("confidence", 0.0))
+        direction = level2_result.get("direction", "neutral")
+        polarity = SCENE_POLARITY.get(level1_result.get("category", "未知"))
+
+        if not classifier_rules.get("use_ai_refinement", True):
+            escalate, reason = False, "disabled"
+        elif confidence < threshold:
+            escalate, reason = True, "low_confidence"
+        elif direction == "risky":
+            escalate, reason = True, "risky"
+        elif polarity is not None and direction in ("positive", "negative") and direction != polarity:
+            escalate, reason = True, "disagreement"
+        else:
+            escalate, reason = False, "confident"
+
+        local = None
+        if escalate and reason in LOCAL_MODEL_REASONS and direction != "risky" and text is not None:
+            local = self.local_classifier.classify(text)
+            if local is not None:
+                escalate, reason = False, "local_model"
+
+        outcome = "escalated" if escalate else "skipped"
+        self._counts[outcome] += 1
+        self._reasons[reason] = self._reasons.get(reason, 0) + 1
+        DECODER_CASCADE_DECISIONS.labels(outcome=outcome, reason=reason).inc()
+        return {
+            "escalate": escalate,
+            "reason": reason,
+            "threshold": threshold,
+            "level1_confidence": confidence,
+            "local_model": local,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        total = self._counts["escalated"] + self._counts["skipped"]
+        return {
+            **self._counts,
+            "reasons": dict(self._reasons),
+            "llm_call_rate_avoided": round(self._counts["skipped"] / total, 4) if total else 0.0,
+        }
+
+
+def get_cascade_policy() -> CascadePolicy:
+    """获取分类级联策略单例"""
+    global _cascade_policy_instance
+    if _cascade_policy_instance is None:
+        _cascade_policy_instance = CascadePolicy()
+    return _cascade_policy_instance
@@ -1,28 +1,61 @@
 """Decoder协调器：整合3级分类器 + ASD简化引擎"""
 from typing import Dict, Any, Optional
+from core.config import settings
+from services.classifier_service import ClassifierService
+from services.template_service import TemplateService
 from services.decoder.behavior_classifier import BehaviorClassifier
-from services.decoder.emotion_direction import EmotionDirectionClassifier
 from services.decoder.ai_refiner import AIRefiner
 from services.decoder.asd_simplifier import ASDSimplifier
 from services.risk_detection import RiskDetectionService
+from services.rules.active import get_active_rules
+from services.decoder.text_features import TextFeatures
+from services.near_duplicate_cache import get_near_duplicate_cache
+from services.decoder.fused_decoder import FusedDecoder, level3_from_fused, level3_from_scene, translation_from_fused
+from services.decoder.refine_batch import ENDPOINT as REFINE_BATCH_ENDPOINT, build_refine_batch_messages, refine_item
+from services.llm_batcher import get_llm_batcher
+from services.decoder.cascade import CascadePolicy, get_cascade_policy
+from services.latency_budget import LatencyBudget
 
 
 class DecoderOrchestrator:
     """Decoder协调器：显式3级分类 + ASD降复杂度引擎"""
     
-    def __init__(self):
-        self.behavior_classifier = BehaviorClassifier()
-        self.emotion_classifier = EmotionDirectionClassifier()
+    def __init__(
+        self,
+        classifier: Optional[ClassifierService] = None,
+        template_service: Optional[TemplateService] = None,
+        risk_detection: Optional[RiskDetectionService] = None,
+        fused_decoder: Optional[FusedDecoder] = None,
+        cascade_policy: Optional[CascadePolicy] = None,
+    ):
+        self.template_service = template_service or TemplateService()
+        self.behavior_classifier = BehaviorClassifier(
+            classifier=classifier,
+            template_service=self.template_service,
+        )
+        self.emotion_classifier = self.behavior_classifier.classifier.emotion_classifier
         self.ai_refiner = AIRefiner()
+        # 三级精炼结果按文本相似度缓存（同一规则快照、同样的一、二级分类结果内复用）
+        self.refine_cache = get_near_duplicate_cache("decoder.refine")
+        # 并发解码中需要精炼的文本合并为一次结构化请求（LLM_BATCH_MAX_SIZE 为 1 时逐条精炼）
+        self.refine_batcher = get_llm_batcher(
+            REFINE_BATCH_ENDPOINT, build_refine_batch_messages, max_tokens_per_item=80, temperature=0.3
+        )
         self.asd_simplifier = ASDSimplifier()
-        self.risk_detection = RiskDetectionService()
+        self.risk_detection = risk_detection or RiskDetectionService()
+        # 融合解码：一次结构化请求完成精炼 / 风险 / 翻译 / 意图（ai_mode="fused"）
+        self.fused_decoder = fused_decoder or FusedDecoder()
+        # 级联策略：规则置信度足够且与情绪方向一致时不升级到 LLM
+        self.cascade_policy = cascade_policy or get_cascade_policy()
     
     async def decode(
         self, 
         text: str, 
         use_ai: bool = True,
         enable_asd_simplification: bool = True,
-        user_id: Optional[str] = None
+        user_id: Optional[str] = None,
+        ai_mode: Optional[str] = None,
+        latency_budget_ms: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         完整的社交解码流程
@@ -32,6 +65,9 @@ class DecoderOrchestrator:
             use_ai: 是否使用AI（三级分类和ASD简化）
             enable_asd_simplification: 是否启用ASD降复杂度处理
             user_id: 用户ID（用于Profile个性化风险检测）
+            ai_mode: "multi"（精炼 / 风险分别请求）或 "fused"（一次结构化请求），默认 DECODER_AI_MODE
+            latency_budget_ms: 延迟预算（毫秒），默认 DECODER_LATENCY_BUDGET_MS；
+                LLM 阶段超出预算时返回规则结果，调用在后台完成并写入缓存
         
         Returns:
             {
@@ -39,32 +75,72 @@ class DecoderOrchestrator:
                 "classification_trace": {
                     "level1_behavior": {...},  # 一级分类结果
                     "level2_emotion": {...},   # 二级分类结果
-                    "level3_refinement": {...} # 三级分类结果
+                    "level3_refinement": {...}, # 三级分类结果
+                    "cascade": {...} | None    # 是否升级到 LLM 及原因（use_ai 时）
                 },
                 "final_scene": "最终场景类型",
                 "confidence": 0.0-1.0,
                 "asd_translation": {...},      # ASD降复杂度结果
                 "risk_analysis": {...},        # 风险检测
                 "suggestion": {...},           # 行为建议
-                "analysis": {...}              # 基础分析（统计、关键词等）
+                "analysis": {...},             # 基础分析（统计、关键词等）
+                "semantic": {...} | None,      # 意图 / 主题 / 总结（仅融合解码）
+                "ai_mode": "multi" | "fused" | "local" | "rules",  # 实际使用的 AI 路径
+                "degraded": True | False,      # 是否有 LLM 阶段超出延迟预算（改用规则结果）
+                "latency_budget": {"budget_ms": 800, "degraded": False, "missed_stages": []},
+                "rule_snapshot": {"version": 1, "hash": "..."}  # 使用的规则版本
             }
         """
+        # 延迟预算从解码开始计时
+        budget = LatencyBudget(
+            settings.DECODER_LATENCY_BUDGET_MS if latency_budget_ms is None else latency_budget_ms
+        )
+        # 记录本次解码开始时生效的规则版本
+        rules = get_active_rules()
+        # 文本特征（自动机命中、统计、情感倾向）只计算一次，各阶段共用
+        features = TextFeatures(text, rules)
+        
         # 一级分类：行为类别
-        level1_result = self.behavior_classifier.classify(text)
+        level1_result = self.behavior_classifier.classify(text, features)
         
         # 二级分类：情绪方向
-        level2_result = self.emotion_classifier.classify(text)
+        level2_result = self.emotion_classifier.classify(text, features)
+        
+        # 级联门控：只有规则置信度不足、情绪方向为风险或与一级场景不一致时才请求 LLM
+        # （规则不确定时先问本地场景模型，足够可信则同样不请求 LLM）
+        cascade = self.cascade_policy.decide(level1_result, level2_result, rules, text) if use_ai else None
+        escalate = cascade is not None and cascade["escalate"]
+        
+        # 融合解码：规则风险在本地完成，精炼 / 风险 / 翻译 / 意图合并为一次请求
+        fused = None
+        base_risk = None
+        if escalate and (ai_mode or settings.DECODER_AI_MODE) == "fused" and self.fused_decoder.available:
+            base_risk = await self.risk_detection.detect(text, use_ai=False, user_id=user_id, features=features)
+            # 超出预算时 fused 为 None，退回规则结果；请求在后台完成并写入网关响应缓存
+            _, fused = await budget.run(
+                "decoder.fused", self.fused_decoder.decode(text, rules, level1_result, level2_result, base_risk)
+            )
         
         # 三级分类：AI精炼（如果启用）
-        if use_ai:
-            level3_result = self.ai_refiner.refine(text, level1_result, level2_result)
-            final_scene = level3_result.get("final_scene", level1_result.get("category", "未知"))
-            final_confidence = level3_result.get("confidence", level1_result.get("confidence", 0.5))
-        else:
+        level3_result = None
+        if fused is not None:
+            ai_path = "fused"
+            level3_result = level3_from_fused(fused, level1_result)
+        elif escalate and base_risk is None:
+            ai_path = "multi"
+            # 超出预算时精炼在后台完成并写入近似重复缓存
+            _, level3_result = await budget.run(
+                "decoder.refine", self._refine(text, rules.fingerprint, level1_result, level2_result)
+            )
+        if level3_result is None and cascade is not None and cascade["local_model"] is not None:
+            ai_path = "local"
+            level3_result = level3_from_scene(cascade["local_model"], level1_result, "本地模型")
+        if level3_result is None:
+            ai_path = "rules"
             level3_result = {
                 "final_scene": level1_result.get("category", "未知"),
                 "confidence": level1_result.get("confidence", 0.5),
-                "reason": "AI未启用，使用一级分类结果",
+                "reason": self._rules_only_reason(cascade, base_risk is not None, budget.degraded),
                 "refinements": {
                     "category_changed": False,
                     "original_category": level1_result.get("category", "未知"),
@@ -72,8 +148,8 @@ class DecoderOrchestrator:
                     "confidence_boost": 0.0
                 }
             }
-            final_scene = level1_result.get("category", "未知")
-            final_confidence = level1_result.get("confidence", 0.5)
+        final_scene = level3_result.get("final_scene", level1_result.get("category", "未知"))
+        final_confidence = level3_result.get("confidence", level1_result.get("confidence", 0.5))
         
         # ASD降复杂度处理（如果启用）
         asd_translation = None
@@ -84,25 +160,37 @@ class DecoderOrchestrator:
                 final_scene, 
                 emotion_direction
             )
+            if fused is not None:
+                asd_translation = translation_from_fused(fused, asd_translation)
         
         # 风险检测（如果提供了user_id，会使用Profile进行个性化检测）
-        risk_analysis = await self.risk_detection.detect(text, use_ai=use_ai, user_id=user_id)
+        if base_risk is None and use_ai and budget.limited and self.risk_detection.ai_service.available:
+            # 有延迟预算时规则风险先在本地完成，AI 风险检测超出预算则只用规则结果
+            risk_analysis = await self.risk_detection.detect(text, use_ai=False, user_id=user_id, features=features)
+            completed, ai_risk = await budget.run("risk.detect", self.risk_detection._detect_with_ai(text))
+            if completed:
+                risk_analysis = self.risk_detection.merge_ai_risk(risk_analysis, ai_risk)
+        elif base_risk is None:
+            risk_analysis = await self.risk_detection.detect(text, use_ai=use_ai, user_id=user_id, features=features)
+        elif fused is not None:
+            risk_analysis = self.risk_detection.merge_ai_risk(base_risk, fused["risk"])
+        else:
+            risk_analysis = base_risk
         
         # 行为建议（从模板获取）
-        from services.template_service import TemplateService
-        template_service = TemplateService()
-        suggestion = template_service.get_suggestion(final_scene, text)
+        suggestion = self.template_service.get_suggestion(final_scene, text)
         
         # 基础分析（统计、关键词等）
         # 避免循环导入，直接调用基础方法
-        basic_analysis = self._analyze_basic(text, use_ai)
+        basic_analysis = self._analyze_basic(features, use_ai)
         
         return {
             "text": text,
             "classification_trace": {
                 "level1_behavior": level1_result,
                 "level2_emotion": level2_result,
-                "level3_refinement": level3_result
+                "level3_refinement": level3_result,
+                "cascade": cascade
             },
             "final_scene": final_scene,
             "confidence": final_confidence,
@@ -113,9 +201,56 @@ class DecoderOrchestrator:
                 "stats": basic_analysis.get("stats", {}),
                 "keywords": basic_analysis.get("keywords", []),
                 "sentiment": basic_analysis.get("sentiment", {})
-            }
+            },
+            "semantic": fused["intent"] if fused is not None else None,
+            "ai_mode": ai_path,
+            "degraded": budget.degraded,
+            "latency_budget": budget.info(),
+            "rule_snapshot": rules.info()
         }
     
+    @staticmethod
+    def _rules_only_reason(cascade: Optional[Dict[str, Any]], fused_failed: bool, over_budget: bool = False) -> str:
+        """未使用 AI 精炼时 level3_refinement.reason 的说明"""
+        if cascade is None:
+            return "AI未启用，使用一级分类结果"
+        if over_budget:
+            return "AI精炼超出延迟预算（后台继续完成），使用一级分类结果"
+        if fused_failed:
+            return "AI融合解码失败，使用一级分类结果"
+        if cascade["reason"] == "disabled":
+            return "AI精炼已在分类器配置中关闭，使用一级分类结果"
+        return (
+            f"一级分类置信度 {cascade['level1_confidence']:.2f} 不低于阈值 {cascade['threshold']:.2f}"
+            "且与情绪方向一致，跳过AI精炼"
+        )
+    
+    async def _refine(
+        self,
+        text: str,
+        rules_fingerprint: str,
+        level1_result: Dict[str, Any],
+        level2_result: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """三级AI精炼：近似重复的输入复用缓存结果，不再请求 provider；其余合并进微批请求"""
+        scope = f"{rules_fingerprint[:12]}|{level1_result.get('category')}|{level2_result.get('direction')}"
+        cached = self.refine_cache.lookup(text, scope)
+        if cached is not None and not self.refine_cache.should_audit():
+            return dict(cached[0])
+        
+        level3_result = None
+        if self.refine_batcher.enabled:
+            entry = await self.refine_batcher.submit(refine_item(text, level1_result, level2_result))
+            if entry is not None:
+                level3_result = level3_from_scene(entry, level1_result, "AI批量精炼")
+        if level3_result is None:
+            # 微批关闭、整批失败或缺少这一条时逐条精炼
+            level3_result = self.ai_refiner.refine(text, level1_result, level2_result)
+        if cached is not None:
+            self.refine_cache.record_audit(cached[0].get("final_scene") == level3_result.get("final_scene"))
+        self.refine_cache.put(text, dict(level3_result), scope)
+        return level3_result
+    
     def get_classification_explanation(self, classification_trace: Dict[str, Any]) -> str:
         """生成分类解释（用于后台展示）"""
         level1 = classification_trace.get("level1_behavior", {})
@@ -142,37 +277,26 @@ class DecoderOrchestrator:
         if refinements.get("category_changed"):
             lines.append(f"- ⚠️ 分类已修正：{refinements.get('original_category')} → {refinements.get('final_category')}")
         
+        cascade = classification_trace.get("cascade")
+        if cascade:
+            escalated = "是" if cascade.get("escalate") else "否"
+            lines.append(f"- 升级到AI：{escalated}（{cascade.get('reason', '')}，阈值 {cascade.get('threshold', 0.0):.2f}）")
+        
         return "\n".join(lines)
     
-    def _analyze_basic(self, text: str, use_ai: bool) -> Dict[str, Any]:
+    def _analyze_basic(self, features: TextFeatures, use_ai: bool) -> Dict[str, Any]:
         """基础分析（避免循环导入）"""
-        import re
-        from collections import Counter
-        
         # 文本统计
-        chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
-        english_words = len(re.findall(r'[a-zA-Z]+', text))
-        total_chars = len(text)
-        total_words = len(text.split())
-        
         stats = {
-            "total_chars": total_chars,
-            "total_words": total_words,
-            "chinese_chars": chinese_chars,
-            "english_words": english_words,
-            "avg_word_length": total_chars / total_words if total_words > 0 else 0
+            key: features.stats[key]
+            for key in ("total_chars", "total_words", "chinese_chars", "english_words", "avg_word_length")
         }
         
         # 简单关键词提取（词频）
-        words = re.findall(r'\w+', text.lower())
-        word_freq = Counter(words)
-        stop_words = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这'}
-        filtered = {w: f for w, f in word_freq.items() if len(w) > 1 and w not in stop_words}
-        sorted_words = sorted(filtered.items(), key=lambda x: x[1], reverse=True)[:10]
-        keywords = [{"word": word, "weight": float(freq) / len(words) if words else 0.0} for word, freq in sorted_words]
+        keywords = features.frequent_words(10)
         
         # 情感倾向（使用二级分类器的结果）
-        sentiment = self.emotion_classifier._detect_sentiment_tendency(text)
+        sentiment = self.emotion_classifier._detect_sentiment_tendency(features.text, features)
         
         return {
             "stats": stats,
@@ -1,7 +1,9 @@
 """二级分类器：情绪方向（positive / neutral / negative / risky）"""
-from typing import Dict, Any
-import re
-from collections import Counter
+from typing import Dict, Any, Optional
+
+from services.decoder.text_features import TextFeatures
+from services.rules.active import get_active_rules
+from services.rules.matcher import LexiconMatcher
 
 
 class EmotionDirectionClassifier:
@@ -10,10 +12,19 @@ class EmotionDirectionClassifier:
     def __init__(self):
         pass
     
-    def classify(self, text: str) -> Dict[str, Any]:
+    @property
+    def matcher(self) -> LexiconMatcher:
+        """当前规则版本的自动机"""
+        return get_active_rules().matcher
+    
+    def classify(self, text: str, features: Optional[TextFeatures] = None) -> Dict[str, Any]:
         """
         二级分类：情绪方向识别
         
+        Args:
+            text: 输入文本
+            features: 解码流水线共享的文本特征（未传入时自行计算）
+        
         Returns:
             {
                 "direction": "positive" | "neutral" | "negative" | "risky",
@@ -24,14 +35,16 @@ class EmotionDirectionClassifier:
                 "explanation": "分类原因说明"
             }
         """
+        features = features or TextFeatures(text)
+        
         # 1. 基础情感倾向（直接实现，避免循环导入）
-        sentiment_result = self._detect_sentiment_tendency(text)
+        sentiment_result = self._detect_sentiment_tendency(text, features)
         
         # 2. 情绪类型识别
-        emotion_result = self._classify_emotion_type(text, sentiment_result)
+        emotion_result = self._classify_emotion_type(text, sentiment_result, features)
         
         # 3. 风险检测（负面情绪 + 高强度）
-        is_risky = self._detect_risk(sentiment_result, emotion_result)
+        is_risky = self._detect_risk(sentiment_result, emotion_result, features)
         
         # 4. 确定情绪方向
         direction = self._determine_direction(sentiment_result, emotion_result, is_risky)
@@ -49,62 +62,32 @@ class EmotionDirectionClassifier:
             "explanation": self._generate_explanation(direction, sentiment_result, emotion_result, is_risky)
         }
     
-    def _detect_sentiment_tendency(self, text: str) -> Dict[str, Any]:
+    def _detect_sentiment_tendency(self, text: str, features: Optional[TextFeatures] = None) -> Dict[str, Any]:
         """检测情感倾向（避免循环导入，直接实现）"""
-        # 积极词汇
-        positive_words = ['好', '棒', '开心', '高兴', '喜欢', '爱', '满意', '成功', '优秀', '美好', '快乐', '幸福']
-        # 消极词汇
-        negative_words = ['坏', '差', '难过', '伤心', '讨厌', '恨', '失望', '失败', '糟糕', '痛苦', '悲伤', '愤怒']
-        
-        positive_count = sum(1 for word in positive_words if word in text)
-        negative_count = sum(1 for word in negative_words if word in text)
-        
-        if positive_count > negative_count:
-            sentiment = "positive"
-            confidence = min(0.9, 0.5 + (positive_count - negative_count) * 0.1)
-        elif negative_count > positive_count:
-            sentiment = "negative"
-            confidence = min(0.9, 0.5 + (negative_count - positive_count) * 0.1)
-        else:
-            sentiment = "neutral"
-            confidence = 0.5
-        
+        features = features or TextFeatures(text)
         return {
-            "sentiment": sentiment,
-            "confidence": confidence,
-            "positive_score": positive_count,
-            "negative_score": negative_count,
+            **features.sentiment,
             "text": text  # 保存文本用于后续处理
         }
     
-    def _classify_emotion_type(self, text: str, sentiment: Dict[str, Any]) -> Dict[str, Any]:
+    def _classify_emotion_type(
+        self,
+        text: str,
+        sentiment: Dict[str, Any],
+        features: Optional[TextFeatures] = None
+    ) -> Dict[str, Any]:
         """分类情绪类型（复用EmotionService逻辑）"""
-        text_lower = text.lower()
-        
-        # 情绪关键词映射
-        emotion_keywords = {
-            "开心": ["开心", "高兴", "快乐", "愉快", "兴奋", "太棒了", "太好了", "真棒"],
-            "难过": ["难过", "伤心", "悲伤", "沮丧", "失落", "想哭"],
-            "生气": ["生气", "愤怒", "恼火", "烦躁", "讨厌", "烦死了"],
-            "焦虑": ["焦虑", "担心", "不安", "紧张", "害怕", "恐惧"],
-            "平静": ["平静", "放松", "舒服", "安心", "稳定"],
-            "疲惫": ["累", "疲惫", "疲倦", "困", "没精神"],
-            "失望": ["失望", "绝望", "无奈", "遗憾"],
-            "尴尬": ["尴尬", "不好意思", "难为情"],
-            "惊讶": ["惊讶", "震惊", "没想到", "居然"],
-            "无聊": ["无聊", "没意思", "空虚"]
-        }
+        features = features or TextFeatures(text)
         
         # 匹配情绪关键词
         emotion_type = "平静"
         intensity = 0.5
         
-        for emotion, keywords in emotion_keywords.items():
-            matches = sum(1 for keyword in keywords if keyword in text_lower)
-            if matches > 0:
-                emotion_type = emotion
-                intensity = min(1.0, 0.5 + matches * 0.15)
-                break
+        hits = features.hits
+        emotion = hits.first_label("emotion")
+        if emotion is not None:
+            emotion_type = emotion
+            intensity = min(1.0, 0.5 + hits.count("emotion", emotion) * 0.15)
         
         # 如果没有匹配到，基于情感倾向推断
         if emotion_type == "平静":
@@ -121,7 +104,12 @@ class EmotionDirectionClassifier:
             "intensity": intensity
         }
     
-    def _detect_risk(self, sentiment: Dict[str, Any], emotion: Dict[str, Any]) -> bool:
+    def _detect_risk(
+        self,
+        sentiment: Dict[str, Any],
+        emotion: Dict[str, Any],
+        features: Optional[TextFeatures] = None
+    ) -> bool:
         """检测是否为风险情绪（负面 + 高强度）"""
         negative_emotions = ["难过", "生气", "焦虑", "失望", "疲惫"]
         emotion_type = emotion.get("emotion_type", "平静")
@@ -137,10 +125,11 @@ class EmotionDirectionClassifier:
             return True
         
         # 极端负面词汇
-        extreme_words = ["绝望", "想死", "不想活了", "崩溃", "受不了"]
-        # 从sentiment中获取text，如果没有则使用空字符串
-        text_lower = sentiment.get("text", "").lower() if isinstance(sentiment, dict) and "text" in sentiment else ""
-        if text_lower and any(word in text_lower for word in extreme_words):
+        if features is None:
+            # 从sentiment中获取text，如果没有则无法检测
+            text = sentiment.get("text", "") if isinstance(sentiment, dict) else ""
+            features = TextFeatures(text) if text else None
+        if features is not None and features.hits.count("extreme", "extreme") > 0:
             return True
         
         return False
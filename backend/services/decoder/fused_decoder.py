@@ -0,0 +1,198 @@
+"""
+融合解码：use_ai 时用一次结构化 JSON Schema 请求同时得到
+三级场景精炼、风险等级、ASD 简化翻译和意图（多调用路径需要 精炼 / 风险 / 翻译 / 语义 各一次往返）
+
+- 一、二级分类和规则风险检测仍在本地完成，结果作为提示放进请求，模型只做修正和补充
+- 返回值映射回原有字段：classification_trace.level3_refinement、asd_translation、risk_analysis、semantic
+- DECODER_FUSED_STRICT_SCHEMA=false 时改用 json_object（provider 不支持 json_schema 时），
+  schema 仍写在提示里
+- 调用失败返回 None，由协调器退回规则结果
+"""
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from core.config import settings
+from services.llm_gateway import LLMGateway, get_llm_gateway
+from services.rules.active import ActiveRules
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT = "decoder.fused"
+
+FUSED_DECODE_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "additionalProperties": False,
+    "required": ["scene", "risk", "translation", "intent"],
+    "properties": {
+        "scene": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["final_scene", "confidence", "reason"],
+            "properties": {
+                "final_scene": {"type": "string"},
+                "confidence": {"type": "number"},
+                "reason": {"type": "string"},
+            },
+        },
+        "risk": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["risk_level", "reasons", "suggestions"],
+            "properties": {
+                "risk_level": {"type": "string", "enum": ["low", "medium", "high"]},
+                "reasons": {"type": "array", "items": {"type": "string"}},
+                "suggestions": {"type": "array", "items": {"type": "string"}},
+            },
+        },
+        "translation": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["simple_explanation", "why", "what_to_do", "do_not"],
+            "properties": {
+                "simple_explanation": {"type": "string"},
+                "why": {"type": "string"},
+                "what_to_do": {"type": "array", "items": {"type": "string"}},
+                "do_not": {"type": "array", "items": {"type": "string"}},
+            },
+        },
+        "intent": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["intent", "topics", "summary"],
+            "properties": {
+                "intent": {"type": "string"},
+                "topics": {"type": "array", "items": {"type": "string"}},
+                "summary": {"type": "string"},
+            },
+        },
+    },
+}
+
+SYSTEM_PROMPT = (
+    "你是一个专门为自闭症患者提供社交理解的专家，擅长识别社交场景、情绪风险，"
+    "并把复杂语言转换为简明、清晰、无歧义的表达。"
+)
+
+
+class FusedDecoder:
+    """一次请求完成三级精炼 + 风险 + ASD 翻译 + 意图"""
+
+    def __init__(self, gateway: Optional[LLMGateway] = None, strict_schema: Optional[bool] = None) -> None:
+        self.gateway = gateway or get_llm_gateway()
+        self.strict_schema = settings.DECODER_FUSED_STRICT_SCHEMA if strict_schema is None else strict_schema
+
+    @property
+    def available(self) -> bool:
+        return self.gateway.available
+
+    def build_messages(
+        self,
+        text: str,
+        rules: ActiveRules,
+        level1_result: Dict[str, Any],
+        level2_result: Dict[str, Any],
+        base_risk: Dict[str, Any],
+    ) -> List[Dict[str, str]]:
+        scenes = "、".join(list(rules.scene_keywords) + ["其他"])
+        hints = {
+            "rule_scene": level1_result.get("category", "未知"),
+            "rule_confidence": round(float(level1_result.get("confidence", 0.0)), 2),
+            "emotion_direction": level2_result.get("direction", "neutral"),
+            "emotion_type": level2_result.get("emotion_type", ""),
+            "rule_risk_level": base_risk.get("risk_level", "low"),
+        }
+        prompt = f"""分析下面这句话，一次完成四项任务：
+1. scene：确认或修正社交场景类型（从以下类别中选择：{scenes}），给出 0.0-1.0 的置信度和简要原因
+2. risk：情绪风险和安全风险等级（low / medium / high），列出原因和建议
+3. translation：翻译为自闭症患者容易理解的简明表达——禁用比喻、隐喻、抽象表达，使用短句；
+   说明对方在做什么（simple_explanation）、为什么这样说（why）、你应该怎么做（what_to_do，分步骤）、不要做什么（do_not）
+4. intent：主要意图、3-5 个主题、50 字以内的总结
+
+规则分析结果（仅供参考）：{json.dumps(hints, ensure_ascii=False)}
+
+文本：{text}"""
+        if not self.strict_schema:
+            prompt += f"\n\n请严格按以下 JSON Schema 返回 JSON：\n{json.dumps(FUSED_DECODE_SCHEMA, ensure_ascii=False)}"
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ]
+
+    async def decode(
+        self,
+        text: str,
+        rules: ActiveRules,
+        level1_result: Dict[str, Any],
+        level2_result: Dict[str, Any],
+        base_risk: Dict[str, Any],
+    ) -> Optional[Dict[str, Any]]:
+        """返回符合 FUSED_DECODE_SCHEMA 的 dict，失败返回 None"""
+        if not self.available:
+            return None
+        if self.strict_schema:
+            response_format = {
+                "type": "json_schema",
+                "json_schema": {"name": "fused_decode", "strict": True, "schema": FUSED_DECODE_SCHEMA},
+            }
+        else:
+            response_format = {"type": "json_object"}
+        try:
+            result = await self.gateway.chat_json(
+                ENDPOINT,
+                self.build_messages(text, rules, level1_result, level2_result, base_risk),
+                temperature=0.3,
+                max_tokens=700,
+                response_format=response_format,
+            )
+        except Exception as exc:
+            logger.warning("Fused decode call failed: %s", exc)
+            return None
+        if not all(isinstance(result.get(key), dict) for key in FUSED_DECODE_SCHEMA["required"]):
+            logger.warning("Fused decode response missing sections: %s", sorted(result))
+            return None
+        return result
+
+
+def level3_from_fused(fused: Dict[str, Any], level1_result: Dict[str, Any]) -> Dict[str, Any]:
+    """融合结果 -> classification_trace.level3_refinement（与 AIRefiner.refine 的返回结构一致）"""
+    return level3_from_scene(fused["scene"], level1_result, "AI融合解码")
+
+
+def level3_from_scene(scene: Dict[str, Any], level1_result: Dict[str, Any], method: str) -> Dict[str, Any]:
+    """模型返回的 {final_scene, confidence, reason} -> classification_trace.level3_refinement"""
+    original = level1_result.get("category", "未知")
+    original_confidence = float(level1_result.get("confidence", 0.5))
+    final_scene = scene.get("final_scene") or original
+    try:
+        confidence = max(0.0, min(1.0, float(scene.get("confidence", original_confidence))))
+    except (TypeError, ValueError):
+        confidence = original_confidence
+    return {
+        "final_scene": final_scene,
+        "confidence": confidence,
+        "reason": scene.get("reason", ""),
+        "method": method,
+        "refinements": {
+            "category_changed": final_scene != original,
+            "original_category": original,
+            "final_category": final_scene,
+            "confidence_boost": round(confidence - original_confidence, 4),
+        },
+    }
+
+
+def translation_from_fused(fused: Dict[str, Any], asd_translation: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """融合结果覆盖 ASD 简化引擎的对应字段（字段名与 ASDSimplifier.simplify 的返回值一致）"""
+    translation = fused["translation"]
+    merged = dict(asd_translation or {})
+    actions = [step for step in translation.get("what_to_do", []) if step]
+    merged.update({
+        "simplified": translation.get("simple_explanation") or merged.get("simplified", ""),
+        "contextual_reason": translation.get("why") or merged.get("contextual_reason", ""),
+        "suggested_actions": actions or merged.get("suggested_actions", []),
+        "do_not": translation.get("do_not") or merged.get("do_not", []),
+    })
+    return merged
@@ -0,0 +1,292 @@
+"""
+关键词提取：jieba TF-IDF 放到有界进程池中执行，结果按文本哈希 + top_k 做 LRU 缓存
+
+- async 路径（/decoder/keywords、EmotionService.detect_user_emotion）通过进程池执行，
+  不再在事件循环线程里分词；同时在途的池任务数受 KEYWORD_POOL_MAX_PENDING 限制
+- 同步路径（TextFeatures.keywords、批量分析）在当前线程计算，但共用同一个缓存
+- 缓存键为规范化文本（首尾去空白、连续空白合并为一个空格）的 sha1 + top_k；
+  jieba 会把任意空白切成独立的词元并在 TF-IDF 中过滤掉，规范化不改变提取结果
+- 进程池子进程用 spawn 启动（避免在有事件循环和线程的 worker 中 fork），
+  各自加载 jieba 词典；KEYWORD_POOL_WORKERS=0 时退化为线程池
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import jieba
+    import jieba.analyse
+    JIEBA_AVAILABLE = True
+except Exception:
+    JIEBA_AVAILABLE = False
+
+from core.config import settings
+from core.metrics import counter, gauge, histogram
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = "\n"
+
+KEYWORD_CACHE_REQUESTS = counter(
+    "keyword_cache_requests_total", "Keyword extraction cache lookups", ["result"]
+)
+KEYWORD_POOL_QUEUE_DEPTH = gauge(
+    "keyword_pool_queue_depth", "Keyword extraction tasks submitted to the pool and not yet finished"
+)
+KEYWORD_POOL_TASK_SECONDS = histogram(
+    "keyword_pool_task_seconds", "Wall time of one keyword extraction pool task, including queueing"
+)
+
+Keywords = List[Tuple[str, float]]
+
+_keyword_extractor_instance: Optional["KeywordExtractor"] = None
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def extract_tags_batch(texts: Sequence[str], top_k: int) -> List[Keywords]:
+    """
+    一次分词完成多条文本的 TF-IDF 关键词提取（与 jieba.analyse.extract_tags 相同的过滤与权重）
+
+    文本用换行拼接后整体分词：换行会切断 jieba 的分词块，结果与逐条调用一致。
+    进程池子进程中执行，只依赖 jieba。
+    """
+    if not texts:
+        return []
+    if not JIEBA_AVAILABLE:
+        from services.decoder.text_features import frequent_words
+
+        return [[(item["word"], item["weight"]) for item in frequent_words(text, top_k)] for text in texts]
+
+    tfidf = jieba.analyse.default_tfidf
+    idf_freq, median_idf, stop_words = tfidf.idf_freq, tfidf.median_idf, tfidf.stop_words
+    boundaries = []
+    position = 0
+    for text in texts[:-1]:
+        position += len(text) + len(SEPARATOR)
+        boundaries.append(position)
+
+    freqs: List[Dict[str, float]] = [{} for _ in texts]
+    doc = 0
+    position = 0
+    for word in tfidf.tokenizer.cut(SEPARATOR.join(texts)):
+        while doc < len(boundaries) and position >= boundaries[doc]:
+            doc += 1
+        position += len(word)
+        if len(word.strip()) < 2 or word.lower() in stop_words:
+            continue
+        freq = freqs[doc]
+        freq[word] = freq.get(word, 0.0) + 1.0
+
+    results = []
+    for freq in freqs:
+        total = sum(freq.values())
+        for word in freq:
+            freq[word] *= idf_freq.get(word, median_idf) / total
+        results.append(sorted(freq.items(), key=itemgetter(1), reverse=True)[:top_k])
+    return results
+
+
+def _init_pool_worker() -> None:
+    if JIEBA_AVAILABLE:
+        jieba.setLogLevel(logging.WARNING)
+        jieba.initialize()
+
+
+def _as_dicts(keywords: Keywords) -> List[Dict[str, Any]]:
+    return [{"word": word, "weight": float(weight)} for word, weight in keywords]
+
+
+class KeywordExtractor:
+    """带 LRU 缓存的关键词提取器（async 路径走有界进程池）"""
+
+    def __init__(
+        self,
+        cache_size: Optional[int] = None,
+        pool_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ) -> None:
+        self.cache_size = settings.KEYWORD_CACHE_SIZE if cache_size is None else cache_size
+        self.pool_workers = settings.KEYWORD_POOL_WORKERS if pool_workers is None else pool_workers
+        self.max_pending = max(1, max_pending or settings.KEYWORD_POOL_MAX_PENDING)
+        self.batch_size = max(1, batch_size or settings.KEYWORD_POOL_BATCH_SIZE)
+        self._cache: "OrderedDict[Tuple[bytes, int], Keywords]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        self.hits = 0
+        self.misses = 0
+
+    # ===== 缓存 =====
+
+    def _cache_get(self, key: Tuple[bytes, int]) -> Optional[Keywords]:
+        with self._cache_lock:
+            keywords = self._cache.get(key)
+            if keywords is None:
+                self.misses += 1
+                KEYWORD_CACHE_REQUESTS.labels(result="miss").inc()
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            KEYWORD_CACHE_REQUESTS.labels(result="hit").inc()
+            return keywords
+
+    def _cache_put(self, key: Tuple[bytes, int], keywords: Keywords) -> None:
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = keywords
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # ===== 同步路径（当前线程计算） =====
+
+    def extract_sync(self, text: str, top_k: int = 10) -> List[Dict[str, Any]]:
+        return self.extract_batch_sync([text], top_k)[0]
+
+    def extract_batch_sync(self, texts: Sequence[str], top_k: int = 10) -> List[List[Dict[str, Any]]]:
+        keys, cached, missing = self._lookup(texts, top_k)
+        if missing:
+            for (normalized, key), keywords in zip(missing.items(), extract_tags_batch(list(missing), top_k)):
+                self._cache_put(key, keywords)
+                cached[key] = keywords
+        return [_as_dicts(cached[key]) for key in keys]
+
+    # ===== async 路径（进程池） =====
+
+    async def extract(self, text: str, top_k: int = 10) -> List[Dict[str, Any]]:
+        return (await self.extract_batch([text], top_k))[0]
+
+    async def extract_batch(self, texts: Sequence[str], top_k: int = 10) -> List[List[Dict[str, Any]]]:
+        """批量提取：先查缓存，未命中的文本按 KEYWORD_POOL_BATCH_SIZE 分块提交到进程池"""
+        if not JIEBA_AVAILABLE:
+            # 降级的词频统计开销很小，不值得跨进程
+            return self.extract_batch_sync(texts, top_k)
+        keys, cached, missing = self._lookup(texts, top_k)
+        if missing:
+            normalized = list(missing)
+            chunks = [normalized[i:i + self.batch_size] for i in range(0, len(normalized), self.batch_size)]
+            results = await asyncio.gather(*(self._run_in_pool(chunk, top_k) for chunk in chunks))
+            for chunk, chunk_results in zip(chunks, results):
+                for text, keywords in zip(chunk, chunk_results):
+                    key = missing[text]
+                    self._cache_put(key, keywords)
+                    cached[key] = keywords
+        return [_as_dicts(cached[key]) for key in keys]
+
+    def _lookup(self, texts: Sequence[str], top_k: int) -> Tuple[
+        List[Tuple[bytes, int]], Dict[Tuple[bytes, int], Keywords], Dict[str, Tuple[bytes, int]]
+    ]:
+        """返回（每条文本的缓存键，已缓存的结果，未命中的规范化文本 -> 缓存键），同一批中的重复文本只计算一次"""
+        keys: List[Tuple[bytes, int]] = []
+        cached: Dict[Tuple[bytes, int], Keywords] = {}
+        missing: Dict[str, Tuple[bytes, int]] = {}
+        for text in texts:
+            normalized = normalize_text(text)
+            key = hashlib.sha1(normalized.encode("utf-8")).digest(), top_k
+            keys.append(key)
+            if key in cached or normalized in missing:
+                continue
+            keywords = self._cache_get(key)
+            if keywords is None:
+                missing[normalized] = key
+            else:
+                cached[key] = keywords
+        return keys, cached, missing
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.pool_workers <= 0:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.pool_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_pool_worker,
+                )
+            return self._pool
+
+    async def _run_in_pool(self, texts: List[str], top_k: int) -> List[Keywords]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+        self._pending += 1
+        KEYWORD_POOL_QUEUE_DEPTH.inc()
+        start = time.perf_counter()
+        try:
+            async with self._semaphore:
+                pool = self._get_pool()
+                if pool is None:
+                    return await asyncio.to_thread(extract_tags_batch, texts, top_k)
+                loop = asyncio.get_running_loop()
+                try:
+                    return await loop.run_in_executor(pool, extract_tags_batch, texts, top_k)
+                except BrokenProcessPool:
+                    # 子进程异常退出：丢弃旧进程池（下次重建），本次在线程中完成
+                    logger.warning("Keyword pool broken, rebuilding on next use")
+                    self._discard_pool(pool)
+                    return await asyncio.to_thread(extract_tags_batch, texts, top_k)
+        finally:
+            self._pending -= 1
+            KEYWORD_POOL_QUEUE_DEPTH.dec()
+            KEYWORD_POOL_TASK_SECONDS.observe(time.perf_counter() - start)
+
+    def start(self) -> int:
+        """启动进程池并让每个子进程完成 jieba 词典加载（启动预热调用），返回子进程数"""
+        pool = self._get_pool()
+        if pool is None or not JIEBA_AVAILABLE:
+            return 0
+        futures = [pool.submit(extract_tags_batch, ["预热"], 1) for _ in range(self.pool_workers)]
+        for future in futures:
+            future.result()
+        return self.pool_workers
+
+    def _discard_pool(self, pool: ProcessPoolExecutor) -> None:
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        """进程退出前关闭进程池"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "cache_size": len(self._cache),
+            "cache_capacity": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "pool_workers": self.pool_workers,
+            "pool_started": self._pool is not None,
+            "queue_depth": self._pending,
+            "max_pending": self.max_pending,
+        }
+
+
+def get_keyword_extractor() -> KeywordExtractor:
+    """获取关键词提取器单例"""
+    global _keyword_extractor_instance
+    if _keyword_extractor_instance is None:
+        _keyword_extractor_instance = KeywordExtractor()
+    return _keyword_extractor_instance
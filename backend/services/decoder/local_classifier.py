@@ -0,0 +1,487 @@
+"""
+本地场景分类模型：用 LLM 标注的解码日志和用户反馈蒸馏出的字符 n-gram 朴素贝叶斯（NumPy），
+作为级联中规则与 LLM 之间的一级——规则置信度不足时先问本地模型，足够可信就不再请求 provider
+
+- 特征：小写、合并空白后的字符 1-3 gram（首尾加 ^ / $），按文档二值化；词表只保留出现在至少 min_count 条样本中的 gram
+- 模型：多项式朴素贝叶斯（加 alpha 平滑），对数概率以 (词表, 类别) 的 float32 矩阵保存；
+  预测 = 命中 gram 行求和 + 先验，再除以温度做 softmax（温度在留出集上按 NLL 拟合，校正朴素贝叶斯的过度自信）
+- 训练数据：decode 日志中 scene_source 为 multi / fused（LLM 给出的场景）的 (input_text, scene_category)，
+  以及 feedback_type 为 correct 的反馈（权重 --feedback-weight）；标为 incorrect 的 (文本, 场景) 从训练集中剔除。
+  本地模型 / 规则给出的标签（scene_source 为 local / rules）不参与训练，避免模型学习自己的输出
+- 模型文件为 np.savez（LOCAL_CLASSIFIER_PATH），写入临时文件后原子替换；各 worker 每 LOCAL_CLASSIFIER_RELOAD_INTERVAL 秒
+  检查 mtime，变化时在线程中加载并整体替换（请求处理中引用的旧模型不受影响），也可 POST /admin/decoder/local-model/reload
+
+离线训练 / 评估（在 backend/ 目录下）：
+    python -m services.decoder.local_classifier train                 # 从 Mongo 日志训练，写入 LOCAL_CLASSIFIER_PATH
+    python -m services.decoder.local_classifier train --data labels.jsonl --output /tmp/model.npz
+    python -m services.decoder.local_classifier eval --data labels.jsonl   # 评估当前模型（准确率 / 各阈值覆盖率 / 推理延迟）
+    python -m services.decoder.local_classifier export --output labels.jsonl  # 把训练样本导出为 JSONL（{"text", "scene", "weight"}）
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+LOCAL_CLASSIFIER_REQUESTS = counter(
+    "decoder_local_classifier_requests_total", "Local scene model lookups by outcome", ["outcome"]
+)
+LOCAL_CLASSIFIER_LATENCY = histogram(
+    "decoder_local_classifier_seconds", "Local scene model inference latency",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01),
+)
+
+MODEL_FORMAT = 1
+# 由 LLM 给出场景的解码路径（decode 日志的 scene_source）
+LLM_LABEL_SOURCES = ("multi", "fused")
+_TEMPERATURES = (0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 4.0, 6.0, 8.0, 12.0, 16.0, 24.0, 32.0)
+
+_local_scene_classifier_instance: Optional["LocalSceneClassifier"] = None
+
+
+class LabeledText(NamedTuple):
+    text: str
+    scene: str
+    weight: float = 1.0
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = (1, 3)) -> List[str]:
+    """去重后的字符 n-gram"""
+    padded = f"^{' '.join(text.lower().split())}$"
+    low, high = ngram_range
+    grams = set()
+    for n in range(low, high + 1):
+        grams.update(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return list(grams)
+
+
+class LocalSceneModel:
+    """训练好的字符 n-gram 朴素贝叶斯（只读）"""
+
+    def __init__(
+        self,
+        classes: Sequence[str],
+        vocab: Sequence[str],
+        log_prob: np.ndarray,
+        log_prior: np.ndarray,
+        temperature: float = 1.0,
+        ngram_range: Tuple[int, int] = (1, 3),
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.classes = list(classes)
+        self.vocab = {gram: index for index, gram in enumerate(vocab)}
+        self.log_prob = np.ascontiguousarray(log_prob, dtype=np.float32)  # (词表, 类别)
+        self.log_prior = np.asarray(log_prior, dtype=np.float32)
+        self.temperature = float(temperature)
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self.meta = meta or {}
+
+    @property
+    def version(self) -> str:
+        return str(self.meta.get("version", ""))
+
+    def _scores(self, text: str) -> np.ndarray:
+        vocab = self.vocab
+        columns = [vocab[gram] for gram in char_ngrams(text, self.ngram_range) if gram in vocab]
+        scores = self.log_prior.copy()
+        if columns:
+            scores += self.log_prob[columns].sum(axis=0)
+        return scores
+
+    def predict_proba(self, text: str, temperature: Optional[float] = None) -> np.ndarray:
+        scores = self._scores(text) / (temperature or self.temperature)
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        proba = self.predict_proba(text)
+        best = int(proba.argmax())
+        return self.classes[best], float(proba[best])
+
+    def save(self, path: Path) -> None:
+        """写入临时文件后原子替换（加载中的 worker 不会读到半个文件）"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        vocab = sorted(self.vocab, key=self.vocab.__getitem__)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as fh:
+            np.savez(
+                fh,
+                classes=np.array(self.classes),
+                vocab=np.array(vocab),
+                log_prob=self.log_prob,
+                log_prior=self.log_prior,
+                meta=np.array(json.dumps({
+                    **self.meta,
+                    "format": MODEL_FORMAT,
+                    "temperature": self.temperature,
+                    "ngram_range": list(self.ngram_range),
+                }, ensure_ascii=False)),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "LocalSceneModel":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("format") != MODEL_FORMAT:
+                raise ValueError(f"unsupported local model format {meta.get('format')}")
+            return cls(
+                classes=[str(name) for name in data["classes"]],
+                vocab=[str(gram) for gram in data["vocab"]],
+                log_prob=data["log_prob"],
+                log_prior=data["log_prior"],
+                temperature=meta.get("temperature", 1.0),
+                ngram_range=tuple(meta.get("ngram_range", (1, 3))),
+                meta=meta,
+            )
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "classes": len(self.classes),
+            "vocab": len(self.vocab),
+            "temperature": self.temperature,
+            **{key: self.meta[key] for key in ("trained_at", "samples", "metrics") if key in self.meta},
+        }
+
+
+def train_model(
+    samples: Sequence[LabeledText],
+    ngram_range: Tuple[int, int] = (1, 3),
+    alpha: float = 0.1,
+    min_count: int = 2,
+) -> LocalSceneModel:
+    """按样本权重累计 (类别, gram) 文档频次，得到平滑后的对数概率"""
+    if not samples:
+        raise ValueError("no training samples")
+    grams_per_sample = [char_ngrams(sample.text, ngram_range) for sample in samples]
+    doc_freq = Counter(gram for grams in grams_per_sample for gram in grams)
+    vocab = sorted(gram for gram, count in doc_freq.items() if count >= min_count)
+    vocab_index = {gram: index for index, gram in enumerate(vocab)}
+    classes = sorted({sample.scene for sample in samples})
+    class_index = {scene: index for index, scene in enumerate(classes)}
+
+    rows: List[int] = []
+    columns: List[int] = []
+    weights: List[float] = []
+    class_weight = np.zeros(len(classes), dtype=np.float64)
+    for sample, grams in zip(samples, grams_per_sample):
+        label = class_index[sample.scene]
+        class_weight[label] += sample.weight
+        for gram in grams:
+            column = vocab_index.get(gram)
+            if column is not None:
+                rows.append(label)
+                columns.append(column)
+                weights.append(sample.weight)
+
+    counts = np.bincount(
+        np.asarray(rows, dtype=np.int64) * len(vocab) + np.asarray(columns, dtype=np.int64),
+        weights=np.asarray(weights, dtype=np.float64),
+        minlength=len(classes) * len(vocab),
+    ).reshape(len(classes), len(vocab))
+    smoothed = counts + alpha
+    log_prob = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+    log_prior = np.log(class_weight) - np.log(class_weight.sum())
+    return LocalSceneModel(
+        classes, vocab, log_prob.T, log_prior, ngram_range=ngram_range,
+        meta={"alpha": alpha, "min_count": min_count},
+    )
+
+
+def fit_temperature(model: LocalSceneModel, samples: Sequence[LabeledText]) -> float:
+    """在留出集上选使负对数似然最小的温度（写回 model.temperature）"""
+    known = [sample for sample in samples if sample.scene in model.classes]
+    if not known:
+        return model.temperature
+    scores = np.stack([model._scores(sample.text) for sample in known])
+    labels = np.array([model.classes.index(sample.scene) for sample in known])
+    best, best_nll = model.temperature, float("inf")
+    for temperature in _TEMPERATURES:
+        scaled = scores / temperature
+        scaled -= scaled.max(axis=1, keepdims=True)
+        log_norm = np.log(np.exp(scaled).sum(axis=1))
+        nll = float((log_norm - scaled[np.arange(len(labels)), labels]).mean())
+        if nll < best_nll:
+            best, best_nll = temperature, nll
+    model.temperature = best
+    return best
+
+
+def evaluate(
+    model: LocalSceneModel,
+    samples: Sequence[LabeledText],
+    thresholds: Iterable[float] = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95),
+) -> Dict[str, Any]:
+    """
+    准确率、宏平均 F1，以及每个置信度阈值下的覆盖率（可免去的 LLM 调用比例）和被采用部分的准确率；
+    推理延迟为逐条 predict 的 p50 / p99（微秒）
+    """
+    if not samples:
+        return {"samples": 0}
+    predictions: List[Tuple[str, float]] = []
+    latencies: List[float] = []
+    for sample in samples:
+        start = time.perf_counter()
+        predictions.append(model.predict(sample.text))
+        latencies.append((time.perf_counter() - start) * 1e6)
+
+    total = len(samples)
+    correct = [prediction == sample.scene for (prediction, _), sample in zip(predictions, samples)]
+    f1_scores = []
+    for scene in sorted({sample.scene for sample in samples}):
+        tp = sum(1 for (p, _), s in zip(predictions, samples) if p == scene and s.scene == scene)
+        fp = sum(1 for (p, _), s in zip(predictions, samples) if p == scene and s.scene != scene)
+        fn = sum(1 for (p, _), s in zip(predictions, samples) if p != scene and s.scene == scene)
+        f1_scores.append(2 * tp / (2 * tp + fp + fn) if tp else 0.0)
+
+    by_threshold = []
+    for threshold in thresholds:
+        accepted = [ok for ok, (_, confidence) in zip(correct, predictions) if confidence >= threshold]
+        by_threshold.append({
+            "threshold": threshold,
+            "coverage": round(len(accepted) / total, 4),
+            "accuracy": round(sum(accepted) / len(accepted), 4) if accepted else None,
+        })
+    latencies.sort()
+    return {
+        "samples": total,
+        "accuracy": round(sum(correct) / total, 4),
+        "macro_f1": round(sum(f1_scores) / len(f1_scores), 4),
+        "thresholds": by_threshold,
+        "latency_us_p50": round(latencies[total // 2], 1),
+        "latency_us_p99": round(latencies[min(total - 1, int(total * 0.99))], 1),
+    }
+
+
+def split_samples(
+    samples: Sequence[LabeledText], holdout: float, seed: int = 0
+) -> Tuple[List[LabeledText], List[LabeledText]]:
+    """按文本划分（同一文本的多条样本落在同一侧），返回 (训练集, 留出集)"""
+    texts = sorted({sample.text for sample in samples})
+    random.Random(seed).shuffle(texts)
+    held = set(texts[:int(len(texts) * holdout)])
+    train = [sample for sample in samples if sample.text not in held]
+    test = [sample for sample in samples if sample.text in held]
+    return train, test
+
+
+async def load_training_samples(
+    limit: int = 200000,
+    feedback_weight: float = 3.0,
+    include_unsourced: bool = False,
+) -> List[LabeledText]:
+    """
+    从日志集合读取训练样本：LLM 给出场景的 decode 日志 + 确认正确的反馈；
+    include_unsourced 时也使用没有 scene_source 字段的旧日志（场景可能来自规则）
+    """
+    from services.db_service import DBService
+
+    db = DBService()
+    logs = await db.fetch_logs(
+        {"input_text": {"$exists": True}, "scene_category": {"$exists": True}},
+        limit=limit,
+        projection={"input_text": 1, "scene_category": 1, "scene_source": 1, "feedback_type": 1},
+        sort=[("timestamp", -1)],
+    )
+    rejected = {
+        (log["input_text"], log["scene_category"]) for log in logs if log.get("feedback_type") == "incorrect"
+    }
+    samples: List[LabeledText] = []
+    for log in logs:
+        text, scene = str(log.get("input_text") or "").strip(), log.get("scene_category")
+        if not text or not scene or scene == "未知" or (text, scene) in rejected:
+            continue
+        feedback = log.get("feedback_type")
+        if feedback is not None:
+            if feedback == "correct":
+                samples.append(LabeledText(text, scene, feedback_weight))
+            continue
+        source = log.get("scene_source")
+        if source in LLM_LABEL_SOURCES or (source is None and include_unsourced):
+            samples.append(LabeledText(text, scene))
+    return samples
+
+
+def read_jsonl(path: Path) -> List[LabeledText]:
+    samples = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                row = json.loads(line)
+                samples.append(LabeledText(row["text"], row["scene"], float(row.get("weight", 1.0))))
+    return samples
+
+
+class LocalSceneClassifier:
+    """级联使用的本地模型：按 mtime 热替换，置信度不低于 min_confidence 时给出场景"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        min_confidence: Optional[float] = None,
+        enabled: Optional[bool] = None,
+        model: Optional[LocalSceneModel] = None,
+    ) -> None:
+        self.path = Path(path or settings.LOCAL_CLASSIFIER_PATH)
+        self.min_confidence = (
+            settings.LOCAL_CLASSIFIER_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        )
+        self.enabled = settings.LOCAL_CLASSIFIER_ENABLED if enabled is None else enabled
+        self.model = model
+        self._mtime: Optional[float] = None
+        self._counts: Dict[str, int] = {"accepted": 0, "rejected": 0, "no_model": 0, "reloads": 0, "reload_errors": 0}
+        # 传入 model 时直接使用（基准测试 / 评估），否则从模型文件加载
+        if self.enabled and model is None:
+            self.reload()
+
+    def reload(self) -> bool:
+        """模型文件 mtime 变化时加载并替换，返回是否替换；加载失败时保留原模型"""
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            model = LocalSceneModel.load(self.path)
+        except Exception as exc:
+            self._counts["reload_errors"] += 1
+            logger.warning("Failed to load local scene model %s: %s", self.path, exc)
+            return False
+        self.swap(model)
+        self._mtime = mtime
+        logger.info("Loaded local scene model %s (%s)", self.path, model.version)
+        return True
+
+    def swap(self, model: Optional[LocalSceneModel]) -> None:
+        self.model = model
+        self._counts["reloads"] += 1
+
+    async def run_reload_loop(self, interval: float) -> None:
+        """定期检查模型文件（离线训练写入新模型后各 worker 自动切换）"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as exc:
+                logger.warning("Periodic local model reload failed: %s", exc)
+
+    def classify(self, text: str) -> Optional[Dict[str, Any]]:
+        """返回 {final_scene, confidence, reason, model_version}；未启用、无模型或置信度不足时返回 None"""
+        model = self.model
+        if not self.enabled or model is None:
+            self._record("no_model")
+            return None
+        start = time.perf_counter()
+        scene, confidence = model.predict(text)
+        LOCAL_CLASSIFIER_LATENCY.observe(time.perf_counter() - start)
+        if confidence < self.min_confidence:
+            self._record("rejected")
+            return None
+        self._record("accepted")
+        return {
+            "final_scene": scene,
+            "confidence": round(confidence, 4),
+            "reason": f"本地模型判定（置信度 {confidence:.2f}）",
+            "model_version": model.version,
+        }
+
+    def _record(self, outcome: str) -> None:
+        self._counts[outcome] += 1
+        LOCAL_CLASSIFIER_REQUESTS.labels(outcome=outcome).inc()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._counts["accepted"] + self._counts["rejected"]
+        return {
+            "enabled": self.enabled,
+            "path": str(self.path),
+            "min_confidence": self.min_confidence,
+            "model": self.model.info() if self.model is not None else None,
+            **self._counts,
+            "accept_rate": round(self._counts["accepted"] / lookups, 4) if lookups else 0.0,
+        }
+
+
+def get_local_scene_classifier() -> LocalSceneClassifier:
+    """获取本地场景分类模型单例"""
+    global _local_scene_classifier_instance
+    if _local_scene_classifier_instance is None:
+        _local_scene_classifier_instance = LocalSceneClassifier()
+    return _local_scene_classifier_instance
+
+
+def _load_samples(args: argparse.Namespace) -> List[LabeledText]:
+    if args.data:
+        return read_jsonl(Path(args.data))
+    return asyncio.run(load_training_samples(
+        limit=args.limit, feedback_weight=args.feedback_weight, include_unsourced=args.include_unsourced,
+    ))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train / evaluate the local scene classifier")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("train", "eval", "export"):
+        command = commands.add_parser(name)
+        command.add_argument("--data", help="JSONL 样本文件（{\"text\", \"scene\", \"weight\"}），缺省从 Mongo 日志读取")
+        command.add_argument("--limit", type=int, default=200000, help="最多读取的日志条数（最新的优先）")
+        command.add_argument("--feedback-weight", type=float, default=3.0, help="确认正确的反馈样本权重")
+        command.add_argument("--include-unsourced", action="store_true", help="也使用没有 scene_source 的旧日志")
+    train = commands.choices["train"]
+    train.add_argument("--output", default=settings.LOCAL_CLASSIFIER_PATH)
+    train.add_argument("--holdout", type=float, default=0.2, help="留出评估（并拟合温度）的文本比例")
+    train.add_argument("--alpha", type=float, default=0.1)
+    train.add_argument("--min-count", type=int, default=2)
+    train.add_argument("--seed", type=int, default=0)
+    commands.choices["eval"].add_argument("--model", default=settings.LOCAL_CLASSIFIER_PATH)
+    commands.choices["export"].add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    samples = _load_samples(args)
+    print(f"{len(samples)} samples, {len({s.scene for s in samples})} scenes")
+    if args.command == "export":
+        with open(args.output, "w", encoding="utf-8") as fh:
+            for sample in samples:
+                fh.write(json.dumps(sample._asdict(), ensure_ascii=False) + "\n")
+        return
+    if args.command == "eval":
+        print(json.dumps(evaluate(LocalSceneModel.load(Path(args.model)), samples), ensure_ascii=False, indent=2))
+        return
+
+    train_set, test_set = split_samples(samples, args.holdout, args.seed)
+    start = time.perf_counter()
+    model = train_model(train_set, alpha=args.alpha, min_count=args.min_count)
+    if test_set:
+        fit_temperature(model, test_set)
+    metrics = evaluate(model, test_set) if test_set else {}
+    model.meta.update({
+        "version": time.strftime("%Y%m%d%H%M%S"),
+        "trained_at": time.time(),
+        "samples": len(train_set),
+        "metrics": metrics,
+    })
+    model.save(Path(args.output))
+    print(json.dumps(metrics, ensure_ascii=False, indent=2))
+    print(
+        f"local scene model {args.output}: {len(model.classes)} scenes, {len(model.vocab)} grams, "
+        f"T={model.temperature} ({(time.perf_counter() - start):.1f} s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
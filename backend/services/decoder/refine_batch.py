@@ -0,0 +1,43 @@
+"""
+三级精炼微批：并发解码（/decoder/batch-decode 或同时到达的多个 /decoder/decode）中需要 AI 精炼的文本
+合并为一次结构化请求，每条返回 {final_scene, confidence, reason}
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List
+
+from services.rules.active import get_active_rules
+
+ENDPOINT = "decoder.refine_batch"
+
+SYSTEM_PROMPT = "你是一个社交场景分析专家，负责在规则分类的基础上确认或修正社交场景类型。"
+
+
+def refine_item(text: str, level1_result: Dict[str, Any], level2_result: Dict[str, Any]) -> Dict[str, Any]:
+    """一条待精炼输入（一、二级分类结果作为提示）"""
+    return {
+        "text": text,
+        "rule_scene": level1_result.get("category", "未知"),
+        "rule_confidence": round(float(level1_result.get("confidence", 0.0)), 2),
+        "emotion_direction": level2_result.get("direction", "neutral"),
+        "emotion_type": level2_result.get("emotion_type", ""),
+    }
+
+
+def build_refine_batch_messages(items: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    scenes = "、".join(list(get_active_rules().scene_keywords) + ["其他"])
+    payload = json.dumps([{"id": i, **item} for i, item in enumerate(items)], ensure_ascii=False)
+    prompt = f"""下面每条文本都附有规则分析结果（rule_scene / rule_confidence / emotion_direction，仅供参考）。
+请分别确认或修正每条文本的社交场景类型（从以下类别中选择：{scenes}），给出 0.0-1.0 的置信度和简要原因。
+
+文本列表（JSON）：{payload}
+
+请以JSON格式返回，每条文本一项，id 与输入一致：
+{{
+    "results": [{{"id": 0, "final_scene": "场景类型", "confidence": 0.8, "reason": "简要原因"}}]
+}}"""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
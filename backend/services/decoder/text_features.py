@@ -0,0 +1,112 @@
+"""文本特征：同一输入在解码流水线中只计算一次，各分类阶段共用"""
+from __future__ import annotations
+
+import re
+from collections import Counter
+from functools import cached_property
+from typing import Any, Dict, List, Optional
+
+from services.decoder.keyword_extractor import get_keyword_extractor
+from services.rules.active import ActiveRules, get_active_rules
+from services.rules.matcher import LexiconHits
+
+STOP_WORDS = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这'}
+
+# 中文按连续片段匹配再累加长度，比逐字匹配少生成大量单字符串
+_CHINESE_RE = re.compile(r'[\u4e00-\u9fff]+')
+_ENGLISH_RE = re.compile(r'[a-zA-Z]+')
+_NUMBER_RE = re.compile(r'\d+')
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_WORD_RE = re.compile(r'\w+')
+
+
+def rank_frequent_words(words: List[str], top_k: int = 10) -> List[Dict[str, Any]]:
+    """词频关键词（过滤停用词和单字符）"""
+    word_freq = Counter(words)
+    filtered = {w: f for w, f in word_freq.items() if len(w) > 1 and w not in STOP_WORDS}
+    sorted_words = sorted(filtered.items(), key=lambda x: x[1], reverse=True)[:top_k]
+    return [{"word": word, "weight": float(freq) / len(words) if words else 0.0} for word, freq in sorted_words]
+
+
+def frequent_words(text: str, top_k: int = 10) -> List[Dict[str, Any]]:
+    return rank_frequent_words(_WORD_RE.findall(text.lower()), top_k)
+
+
+class TextFeatures:
+    """
+    单次计算的文本特征（各属性首次访问时计算并缓存）
+
+    - text / text_lower: 原文与归一化文本
+    - rules: 本次处理固定使用的规则版本（整个流水线读取同一个版本）
+    - hits: 全部词库的自动机命中结果
+    - tokens: 归一化文本的词元列表（\\w+）
+    - stats: 文本统计
+    - sentiment: 情感倾向（基于 sentiment 词库命中数）
+    """
+
+    def __init__(self, text: str, rules: Optional[ActiveRules] = None) -> None:
+        self.text = text
+        self.text_lower = text.lower()
+        self.rules = rules or get_active_rules()
+        self._keywords: Dict[int, List[Dict[str, Any]]] = {}
+
+    @cached_property
+    def hits(self) -> LexiconHits:
+        return self.rules.matcher.scan(self.text_lower)
+
+    @cached_property
+    def tokens(self) -> List[str]:
+        return _WORD_RE.findall(self.text_lower)
+
+    @cached_property
+    def stats(self) -> Dict[str, Any]:
+        text = self.text
+        total_chars = len(text)
+        # 总词数（简单估算）
+        total_words = len(text.split())
+        return {
+            "total_chars": total_chars,
+            "total_words": total_words,
+            "chinese_chars": sum(map(len, _CHINESE_RE.findall(text))),
+            "english_words": len(_ENGLISH_RE.findall(text)),
+            "numbers": len(_NUMBER_RE.findall(text)),
+            "punctuation": len(_PUNCTUATION_RE.findall(text)),
+            "avg_word_length": total_chars / total_words if total_words > 0 else 0
+        }
+
+    @cached_property
+    def _sentiment(self) -> Dict[str, Any]:
+        positive_count = self.hits.count("sentiment", "positive")
+        negative_count = self.hits.count("sentiment", "negative")
+
+        if positive_count > negative_count:
+            sentiment = "positive"
+            confidence = min(0.9, 0.5 + (positive_count - negative_count) * 0.1)
+        elif negative_count > positive_count:
+            sentiment = "negative"
+            confidence = min(0.9, 0.5 + (negative_count - positive_count) * 0.1)
+        else:
+            sentiment = "neutral"
+            confidence = 0.5
+
+        return {
+            "sentiment": sentiment,
+            "confidence": confidence,
+            "positive_score": positive_count,
+            "negative_score": negative_count
+        }
+
+    @property
+    def sentiment(self) -> Dict[str, Any]:
+        # 返回副本：结果会被各阶段写入各自的响应
+        return dict(self._sentiment)
+
+    def frequent_words(self, top_k: int = 10) -> List[Dict[str, Any]]:
+        """词频关键词（过滤停用词和单字符）"""
+        return rank_frequent_words(self.tokens, top_k)
+
+    def keywords(self, top_k: int = 10) -> List[Dict[str, Any]]:
+        """TF-IDF 关键词（jieba 不可用时降级为词频关键词），经关键词提取器的 LRU 缓存"""
+        if top_k not in self._keywords:
+            self._keywords[top_k] = get_keyword_extractor().extract_sync(self.text, top_k)
+        return self._keywords[top_k]
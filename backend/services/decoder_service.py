@@ -1,6 +1,5 @@
+import asyncio
 from typing import Dict, List, Any, Optional
-import re
-from collections import Counter
 
 try:
     import jieba
@@ -9,100 +8,77 @@ try:
 except Exception:
     JIEBA_AVAILABLE = False
 
+_jieba_initialized = False
+
+
+def init_jieba() -> None:
+    """加载 jieba 词典（每个进程只执行一次，由启动预热调用；未预热时 jieba 会在首次分词时自行加载）"""
+    global _jieba_initialized
+    if JIEBA_AVAILABLE and not _jieba_initialized:
+        jieba.initialize()
+        _jieba_initialized = True
+
 from services.ai_service import AIService
 from services.classifier_service import ClassifierService
 from services.template_service import TemplateService
 from services.prompt_service import get_prompt_service
 from services.risk_detection import RiskDetectionService
 from services.decoder.decoder_orchestrator import DecoderOrchestrator
+from services.decoder.text_features import TextFeatures
+from services.decoder.batch_analyzer import get_batch_analyzer
+from services.decoder.keyword_extractor import KeywordExtractor, get_keyword_extractor
+from services.llm_usage import llm_usage_user
 
 
 class DecoderService:
     """社交解码服务：分析文本中的社交信号、关键词、语义等，专为 ASD 用户设计"""
     
-    def __init__(self):
-        self.ai_service = AIService()
-        self.classifier = ClassifierService()
-        self.template_service = TemplateService()
+    def __init__(
+        self,
+        ai_service: Optional[AIService] = None,
+        classifier: Optional[ClassifierService] = None,
+        template_service: Optional[TemplateService] = None,
+        risk_detection: Optional[RiskDetectionService] = None,
+        orchestrator: Optional[DecoderOrchestrator] = None,
+        keyword_extractor: Optional[KeywordExtractor] = None,
+    ):
+        # 依赖均可由服务容器注入（进程内共享），未注入时按原方式自行构建
+        self.ai_service = ai_service or AIService()
+        self.classifier = classifier or ClassifierService(ai_service=self.ai_service)
+        self.template_service = template_service or TemplateService()
         self.prompt_service = get_prompt_service()
-        self.risk_detection = RiskDetectionService()
+        self.keyword_extractor = keyword_extractor or get_keyword_extractor()
+        self.risk_detection = risk_detection or RiskDetectionService(ai_service=self.ai_service)
         # 新的协调器（显式3级分类 + ASD降复杂度）
-        self.orchestrator = DecoderOrchestrator()
-        if JIEBA_AVAILABLE:
-            # 初始化 jieba
-            jieba.initialize()
+        self.orchestrator = orchestrator or DecoderOrchestrator(
+            classifier=self.classifier,
+            template_service=self.template_service,
+            risk_detection=self.risk_detection,
+        )
     
     def extract_keywords(self, text: str, top_k: int = 10) -> List[Dict[str, Any]]:
-        """提取关键词"""
-        if JIEBA_AVAILABLE:
-            # 使用 TF-IDF 提取关键词
-            keywords = jieba.analyse.extract_tags(text, topK=top_k, withWeight=True)
-            return [{"word": word, "weight": float(weight)} for word, weight in keywords]
-        else:
-            # 降级：简单分词和词频统计
-            words = re.findall(r'\w+', text.lower())
-            word_freq = Counter(words)
-            # 过滤停用词和单字符
-            stop_words = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这'}
-            filtered = {w: f for w, f in word_freq.items() if len(w) > 1 and w not in stop_words}
-            sorted_words = sorted(filtered.items(), key=lambda x: x[1], reverse=True)[:top_k]
-            return [{"word": word, "weight": float(freq) / len(words) if words else 0.0} for word, freq in sorted_words]
+        """提取关键词（jieba TF-IDF，不可用时降级为词频统计；在当前线程计算，async 调用方请用 aextract_keywords）"""
+        return self.keyword_extractor.extract_sync(text, top_k)
+    
+    async def aextract_keywords(self, text: str, top_k: int = 10) -> List[Dict[str, Any]]:
+        """提取关键词（在进程池中执行，结果带 LRU 缓存）"""
+        return await self.keyword_extractor.extract(text, top_k)
+    
+    async def aextract_keywords_batch(self, texts: List[str], top_k: int = 10) -> List[List[Dict[str, Any]]]:
+        """批量提取关键词（未命中缓存的文本分块提交到进程池）"""
+        return await self.keyword_extractor.extract_batch(texts, top_k)
     
     def analyze_text_stats(self, text: str) -> Dict[str, Any]:
         """分析文本基础统计信息"""
-        # 中文字符数
-        chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
-        # 英文单词数
-        english_words = len(re.findall(r'[a-zA-Z]+', text))
-        # 数字
-        numbers = len(re.findall(r'\d+', text))
-        # 标点符号
-        punctuation = len(re.findall(r'[^\w\s]', text))
-        # 总字符数
-        total_chars = len(text)
-        # 总词数（简单估算）
-        total_words = len(text.split())
-        
-        return {
-            "total_chars": total_chars,
-            "total_words": total_words,
-            "chinese_chars": chinese_chars,
-            "english_words": english_words,
-            "numbers": numbers,
-            "punctuation": punctuation,
-            "avg_word_length": total_chars / total_words if total_words > 0 else 0
-        }
+        return TextFeatures(text).stats
     
     def detect_sentiment_tendency(self, text: str) -> Dict[str, Any]:
         """检测情感倾向（简单规则）"""
-        # 积极词汇
-        positive_words = ['好', '棒', '开心', '高兴', '喜欢', '爱', '满意', '成功', '优秀', '美好', '快乐', '幸福']
-        # 消极词汇
-        negative_words = ['坏', '差', '难过', '伤心', '讨厌', '恨', '失望', '失败', '糟糕', '痛苦', '悲伤', '愤怒']
-        
-        positive_count = sum(1 for word in positive_words if word in text)
-        negative_count = sum(1 for word in negative_words if word in text)
-        
-        if positive_count > negative_count:
-            sentiment = "positive"
-            confidence = min(0.9, 0.5 + (positive_count - negative_count) * 0.1)
-        elif negative_count > positive_count:
-            sentiment = "negative"
-            confidence = min(0.9, 0.5 + (negative_count - positive_count) * 0.1)
-        else:
-            sentiment = "neutral"
-            confidence = 0.5
-        
-        return {
-            "sentiment": sentiment,
-            "confidence": confidence,
-            "positive_score": positive_count,
-            "negative_score": negative_count
-        }
+        return TextFeatures(text).sentiment
     
-    def analyze_semantic(self, text: str) -> Dict[str, Any]:
-        """语义分析（使用 AI 服务）"""
-        if self.ai_service._client is None:
+    async def analyze_semantic(self, text: str) -> Dict[str, Any]:
+        """语义分析（使用 AI 服务，经由 LLM 网关异步调用）"""
+        if not self.ai_service.available:
             # 无 AI 服务时返回基础分析
             return {
                 "intent": "unknown",
@@ -125,20 +101,15 @@ class DecoderService:
     "summary": "简要总结"
 }}"""
             
-            resp = self.ai_service._client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
+            return await self.ai_service.gateway.chat_json(
+                "decoder.semantic",
+                [
                     {"role": "system", "content": "你是一个文本分析专家，擅长分析文本的语义、意图和主题。"},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.3,
-                max_tokens=200,
-                response_format={"type": "json_object"}
+                max_tokens=200
             )
-            
-            import json
-            result = json.loads(resp.choices[0].message.content or "{}")
-            return result
         except Exception:
             # 出错时返回基础分析
             return {
@@ -147,13 +118,13 @@ class DecoderService:
                 "summary": text[:50] + "..." if len(text) > 50 else text
             }
     
-    def translate_for_asd(self, text: str, scene: str) -> Dict[str, Any]:
+    async def translate_for_asd(self, text: str, scene: str) -> Dict[str, Any]:
         """ASD 社交翻译引擎：将复杂语言转换为简明表达"""
         # 获取场景对应的模板
         template = self.template_service.get_template(scene)
         
         # 如果 AI 可用，可以进一步优化翻译
-        if self.ai_service._client:
+        if self.ai_service.available:
             try:
                 prompt = f"""将以下文本翻译为自闭症患者容易理解的简明表达。
 要求：
@@ -172,20 +143,16 @@ class DecoderService:
     "what_to_do": "你应该怎么做（具体步骤）"
 }}"""
                 
-                resp = self.ai_service._client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
+                ai_translation = await self.ai_service.gateway.chat_json(
+                    "decoder.translate",
+                    [
                         {"role": "system", "content": "你是一个专门为自闭症患者提供社交理解的专家，擅长将复杂语言转换为简明、清晰的表达。"},
                         {"role": "user", "content": prompt}
                     ],
                     temperature=0.3,
-                    max_tokens=300,
-                    response_format={"type": "json_object"}
+                    max_tokens=300
                 )
                 
-                import json
-                ai_translation = json.loads(resp.choices[0].message.content or "{}")
-                
                 # 合并模板和 AI 翻译
                 return {
                     "simple_explanation": ai_translation.get("simple_explanation", template.get("simple_explanation", "")),
@@ -205,38 +172,79 @@ class DecoderService:
             "do_not": template.get("do_not", [])
         }
     
-    def analyze_social_signal(self, text: str, use_ai: bool = False) -> Dict[str, Any]:
+    async def analyze_social_signal(self, text: str, use_ai: bool = False) -> Dict[str, Any]:
         """综合分析社交信号（基础版本）"""
+        # 文本特征只计算一次，统计 / 情感倾向 / 规则场景共用
+        features = TextFeatures(text)
+        
         # 基础统计
-        stats = self.analyze_text_stats(text)
+        stats = features.stats
         
-        # 关键词提取
-        keywords = self.extract_keywords(text, top_k=10)
+        # 关键词提取（进程池，不在事件循环线程里分词）
+        keywords = await self.keyword_extractor.extract(text, 10)
         
         # 情感倾向
-        sentiment = self.detect_sentiment_tendency(text)
+        sentiment = features.sentiment
+        
+        # 规则场景（第一层关键词分类）
+        scene, scene_confidence = self.classifier.classify_by_rules(text, features)
         
         # 语义分析（可选，使用 AI）
         semantic = {}
         if use_ai:
-            semantic = self.analyze_semantic(text)
+            semantic = await self.analyze_semantic(text)
         
         return {
             "text": text,
             "stats": stats,
             "keywords": keywords,
             "sentiment": sentiment,
-            "semantic": semantic if semantic else None
+            "scene": {"scene": scene, "confidence": scene_confidence},
+            "semantic": semantic if semantic else None,
+            "rule_snapshot": features.rules.info()
         }
     
-    async def decode_social_signal(self, text: str, use_ai: bool = True, user_id: Optional[str] = None) -> Dict[str, Any]:
+    async def analyze_batch(self, texts: List[str], use_ai: bool = False, top_k: int = 10) -> List[Dict[str, Any]]:
+        """
+        批量分析社交信号：每条结果与 analyze_social_signal 结构相同
+        
+        整批一次扫描词库、一次分词，情感倾向与规则场景由稀疏文档-词矩阵与权重矩阵相乘得到，
+        适合批量接口和历史数据重处理（1k - 100k 条）
+        """
+        results = await asyncio.to_thread(get_batch_analyzer().analyze, texts, top_k=top_k)
+        if use_ai:
+            # 语义分析同时在途的条数不超过网关 decoder.semantic 的并发上限：
+            # 网关超时包含排队时间，一次全部发出时排在后面的调用会在排队中超时
+            semaphore = asyncio.Semaphore(self.ai_service.gateway.endpoint_limit("decoder.semantic"))
+
+            async def semantic_of(text: str) -> Dict[str, Any]:
+                async with semaphore:
+                    return await self.analyze_semantic(text)
+
+            semantics = await asyncio.gather(*(semantic_of(result["text"]) for result in results))
+            for result, semantic in zip(results, semantics):
+                result["semantic"] = semantic or None
+        return results
+    
+    async def decode_social_signal(
+        self,
+        text: str,
+        use_ai: bool = True,
+        user_id: Optional[str] = None,
+        ai_mode: Optional[str] = None,
+        latency_budget_ms: Optional[float] = None
+    ) -> Dict[str, Any]:
         """
         完整的社交解码：使用新的3级分类器 + ASD降复杂度引擎
         
         保持向后兼容：返回结构与原API相同，但内部使用新的架构
         """
-        # 使用新的协调器进行解码
-        result = await self.orchestrator.decode(text, use_ai=use_ai, enable_asd_simplification=True, user_id=user_id)
+        # 使用新的协调器进行解码（期间的 LLM 调用，含超出预算后在后台完成的，计入该用户的用量）
+        with llm_usage_user(user_id):
+            result = await self.orchestrator.decode(
+                text, use_ai=use_ai, enable_asd_simplification=True, user_id=user_id, ai_mode=ai_mode,
+                latency_budget_ms=latency_budget_ms
+            )
         
         # 转换为原有API格式（保持向后兼容）
         classification_trace = result.get("classification_trace", {})
@@ -281,11 +289,18 @@ class DecoderService:
             "suggestion": result.get("suggestion", {}),
             "risk": result.get("risk_analysis", {}),
             "analysis": result.get("analysis", {}),
+            "semantic": result.get("semantic"),
+            "ai_mode": result.get("ai_mode"),
+            # LLM 阶段超出延迟预算时为 True（结果来自规则）
+            "degraded": result.get("degraded", False),
+            "latency_budget": result.get("latency_budget"),
             "prompt_template": prompt_template,
             # 新增：完整的分类追踪（用于后台展示）
             "classification_trace": classification_trace,
             # 新增：分类解释（用于后台展示）
-            "classification_explanation": self.orchestrator.get_classification_explanation(classification_trace)
+            "classification_explanation": self.orchestrator.get_classification_explanation(classification_trace),
+            # 本次解码使用的规则版本
+            "rule_snapshot": result.get("rule_snapshot")
         }
 
 
@@ -3,24 +3,34 @@ from datetime import datetime, timedelta
 from services.decoder_service import DecoderService
 from services.db_service import DBService
 from services.ai_service import AIService
+from services.rules.active import get_active_rules
+from services.decoder.text_features import TextFeatures
+from services.decoder.keyword_extractor import get_keyword_extractor
 from core.utils import utc_now_iso
+from services.single_flight import single_flight
 
 
 class EmotionService:
     """情感导师服务：跟踪用户情绪状态，提供干预建议"""
     
-    def __init__(self):
-        self.decoder = DecoderService()  # 复用解码服务的情感分析
-        self.db = DBService()
-        self.ai_service = AIService()
+    def __init__(
+        self,
+        decoder: Optional[DecoderService] = None,
+        db: Optional[DBService] = None,
+        ai_service: Optional[AIService] = None,
+    ):
+        self.decoder = decoder or DecoderService()  # 复用解码服务的情感分析
+        self.db = db or DBService()
+        self.ai_service = ai_service or self.decoder.ai_service
     
     async def detect_user_emotion(self, text: str, user_id: Optional[str] = None) -> Dict[str, Any]:
         """检测用户当前情绪状态（用户自己说的话）"""
-        # 使用解码服务的情感分析
-        sentiment_result = self.decoder.detect_sentiment_tendency(text)
+        # 情感倾向和情绪词共用同一份文本特征；关键词提取在进程池中执行，不阻塞事件循环
+        features = TextFeatures(text)
+        sentiment_result = features.sentiment
         
         # 扩展情绪类型识别
-        emotion_type = self._classify_emotion_type(text, sentiment_result)
+        emotion_type = self._classify_emotion_type(text, sentiment_result, features)
         
         result = {
             "emotion": emotion_type,
@@ -29,7 +39,7 @@ class EmotionService:
             "intensity": self._calculate_intensity(text, sentiment_result),
             "positive_score": sentiment_result.get("positive_score", 0),
             "negative_score": sentiment_result.get("negative_score", 0),
-            "keywords": self.decoder.extract_keywords(text, top_k=5)
+            "keywords": await get_keyword_extractor().extract(text, top_k=5)
         }
         
         # 保存情绪记录
@@ -44,28 +54,19 @@ class EmotionService:
         
         return result
     
-    def _classify_emotion_type(self, text: str, sentiment: Dict[str, Any]) -> str:
+    def _classify_emotion_type(
+        self,
+        text: str,
+        sentiment: Dict[str, Any],
+        features: Optional[TextFeatures] = None
+    ) -> str:
         """分类情绪类型（更细粒度）"""
-        text_lower = text.lower()
-        
-        # 情绪关键词映射
-        emotion_keywords = {
-            "开心": ["开心", "高兴", "快乐", "愉快", "兴奋", "太棒了", "太好了", "真棒"],
-            "难过": ["难过", "伤心", "悲伤", "沮丧", "失落", "想哭"],
-            "生气": ["生气", "愤怒", "恼火", "烦躁", "讨厌", "烦死了"],
-            "焦虑": ["焦虑", "担心", "不安", "紧张", "害怕", "恐惧"],
-            "平静": ["平静", "放松", "舒服", "安心", "稳定"],
-            "疲惫": ["累", "疲惫", "疲倦", "困", "没精神"],
-            "失望": ["失望", "绝望", "无奈", "遗憾"],
-            "尴尬": ["尴尬", "不好意思", "难为情"],
-            "惊讶": ["惊讶", "震惊", "没想到", "居然"],
-            "无聊": ["无聊", "没意思", "空虚"]
-        }
+        features = features or TextFeatures(text)
         
-        # 匹配情绪关键词
-        for emotion, keywords in emotion_keywords.items():
-            if any(keyword in text_lower for keyword in keywords):
-                return emotion
+        # 匹配情绪关键词（词库按优先级排列，取第一个命中的情绪）
+        emotion = features.hits.first_label("emotion")
+        if emotion is not None:
+            return emotion
         
         # 基于情感倾向推断
         sentiment_type = sentiment.get("sentiment", "neutral")
@@ -116,6 +117,7 @@ class EmotionService:
         
         return emotion_records
     
+    @single_flight()
     async def analyze_emotion_trend(self, user_id: str, days: int = 7) -> Dict[str, Any]:
         """分析情绪趋势"""
         records = await self.get_emotion_history(user_id, days=days)
@@ -577,17 +579,11 @@ class EmotionService:
         intensity: float
     ) -> Dict[str, Any]:
         """检查情绪预警（使用可配置的阈值）"""
-        # 从配置服务获取阈值
-        try:
-            thresholds = await self.config_service.get_alert_thresholds()
-            intensity_high = thresholds.get("emotion_intensity_high", 0.7)
-            intensity_critical = thresholds.get("emotion_intensity_critical", 0.9)
-            consecutive_negative_count_threshold = thresholds.get("consecutive_negative_count", 3)
-        except Exception:
-            # 降级到默认值
-            intensity_high = 0.7
-            intensity_critical = 0.9
-            consecutive_negative_count_threshold = 3
+        # 阈值来自当前规则版本（由配置服务编译，无需在请求中读取配置）
+        thresholds = get_active_rules().alert_thresholds
+        intensity_high = thresholds.get("emotion_intensity_high", 0.7)
+        intensity_critical = thresholds.get("emotion_intensity_critical", 0.9)
+        consecutive_negative_count_threshold = thresholds.get("consecutive_negative_count", 3)
         
         # 获取最近的情绪记录
         recent_records = await self.get_emotion_history(user_id, days=3, limit=10)
@@ -649,6 +645,7 @@ class EmotionService:
         else:
             return "你的情绪状态正常，继续保持"
     
+    @single_flight()
     async def get_emotion_insights(
         self,
         user_id: str,
@@ -808,6 +805,7 @@ class EmotionService:
         }
 
     
+    @single_flight()
     async def get_emotion_visualization_data(
         self,
         user_id: str,
@@ -1026,6 +1024,7 @@ class EmotionService:
         else:
             return "你的情绪状态相对稳定，可以尝试一些新的活动来进一步提升情绪健康"
     
+    @single_flight()
     async def get_emotion_statistics(
         self,
         user_id: str,
@@ -15,10 +15,14 @@ from services.intervention_template_service import get_intervention_template_ser
 class InterventionService:
     """干预计划服务：依据目标、情绪、场景生成推荐步骤。"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        emotion_service: Optional[EmotionService] = None,
+        decoder_service: Optional[DecoderService] = None,
+    ):
         self.db = DBService()
-        self.emotion_service = EmotionService()
-        self.decoder_service = DecoderService()
+        self.emotion_service = emotion_service or EmotionService(decoder=decoder_service)
+        self.decoder_service = decoder_service or self.emotion_service.decoder
         self.prompt_service = get_prompt_service()
         self.profile_service = EmotionProfileService()
         self.template_service = get_intervention_template_service()
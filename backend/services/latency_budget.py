@@ -0,0 +1,198 @@
+"""
+延迟预算：请求可以声明整体延迟上限，慢阶段（LLM / 外部模型）超出预算时先返回规则结果
+
+- LatencyBudget 从创建时刻开始计时；run(stage, awaitable) 只等到截止时间，
+  超时返回 (False, None)，调用方改用规则 / 启发式结果并把响应标记为 degraded
+- 超时的调用不取消，转为后台任务继续执行：LLM 响应写入网关缓存 / 近似重复缓存，
+  完成回调（on_complete）可以把结果存入 LateResultStore，下一个相同请求直接拿到精炼结果
+- 后台任务数有上限（LATENCY_BUDGET_MAX_BACKGROUND），超出时直接取消，避免慢 provider 拖垮进程
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from core.config import settings
+from core.metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUDGET_STAGES = counter(
+    "latency_budget_stage_total", "Budgeted stages by outcome (within budget or missed)", ["stage", "outcome"]
+)
+LATENCY_BUDGET_BACKGROUND = counter(
+    "latency_budget_background_total", "Stages that missed their budget and finished in the background",
+    ["stage", "outcome"],
+)
+LATENCY_BUDGET_BACKGROUND_IN_FLIGHT = gauge(
+    "latency_budget_background_in_flight", "Over-budget stages still running in the background"
+)
+
+# 后台任务的强引用（事件循环只持有弱引用）
+_background_tasks: Set["asyncio.Task[Any]"] = set()
+_background_counts: Dict[str, int] = {"ok": 0, "error": 0, "dropped": 0}
+_late_result_stores: Dict[str, "LateResultStore"] = {}
+
+
+class LatencyBudget:
+    """一次请求的延迟预算（budget_ms 为 None / 0 时不限时）"""
+
+    def __init__(self, budget_ms: Optional[float] = None) -> None:
+        self.budget_ms = budget_ms if budget_ms and budget_ms > 0 else None
+        self._deadline = (
+            time.monotonic() + self.budget_ms / 1000 if self.budget_ms is not None else None
+        )
+        self.missed_stages: List[str] = []
+
+    @property
+    def limited(self) -> bool:
+        return self._deadline is not None
+
+    @property
+    def degraded(self) -> bool:
+        return bool(self.missed_stages)
+
+    def remaining(self) -> Optional[float]:
+        """剩余秒数（不限时返回 None）"""
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - time.monotonic())
+
+    async def run(
+        self,
+        stage: str,
+        awaitable: Awaitable[Any],
+        on_complete: Optional[Callable[[Any], None]] = None,
+    ) -> Tuple[bool, Any]:
+        """
+        在剩余预算内等待 awaitable
+
+        Returns:
+            (True, 结果)：预算内完成（awaitable 的异常照常抛出）
+            (False, None)：超出预算，awaitable 转为后台任务继续执行，完成后调用 on_complete(结果)
+        """
+        if self._deadline is None:
+            return True, await awaitable
+
+        task = asyncio.ensure_future(awaitable)
+        try:
+            await asyncio.wait({task}, timeout=self.remaining())
+        except asyncio.CancelledError:
+            # 请求本身被取消（如客户端断开）：调用照样在后台完成，结果留给下一个请求
+            _detach(stage, task, on_complete)
+            raise
+        if task.done():
+            LATENCY_BUDGET_STAGES.labels(stage=stage, outcome="within").inc()
+            return True, task.result()
+
+        LATENCY_BUDGET_STAGES.labels(stage=stage, outcome="missed").inc()
+        self.missed_stages.append(stage)
+        _detach(stage, task, on_complete)
+        return False, None
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "budget_ms": self.budget_ms,
+            "degraded": self.degraded,
+            "missed_stages": list(self.missed_stages),
+        }
+
+
+def _detach(stage: str, task: "asyncio.Task[Any]", on_complete: Optional[Callable[[Any], None]]) -> None:
+    """把超出预算的调用交给后台继续执行"""
+    if len(_background_tasks) >= settings.LATENCY_BUDGET_MAX_BACKGROUND:
+        task.cancel()
+        _background_counts["dropped"] += 1
+        LATENCY_BUDGET_BACKGROUND.labels(stage=stage, outcome="dropped").inc()
+        return
+
+    def _done(finished: "asyncio.Task[Any]") -> None:
+        _background_tasks.discard(finished)
+        LATENCY_BUDGET_BACKGROUND_IN_FLIGHT.set(len(_background_tasks))
+        if finished.cancelled():
+            outcome = "dropped"
+        elif finished.exception() is not None:
+            outcome = "error"
+            logger.warning("Background %s call failed: %s", stage, finished.exception())
+        else:
+            outcome = "ok"
+            if on_complete is not None:
+                try:
+                    on_complete(finished.result())
+                except Exception as exc:
+                    outcome = "error"
+                    logger.warning("Background %s completion hook failed: %s", stage, exc)
+        _background_counts[outcome] += 1
+        LATENCY_BUDGET_BACKGROUND.labels(stage=stage, outcome=outcome).inc()
+
+    _background_tasks.add(task)
+    LATENCY_BUDGET_BACKGROUND_IN_FLIGHT.set(len(_background_tasks))
+    task.add_done_callback(_done)
+
+
+async def cancel_background_tasks() -> None:
+    """进程退出前取消仍在后台执行的超预算调用"""
+    tasks = list(_background_tasks)
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class LateResultStore:
+    """超出预算后在后台完成的结果（LRU + TTL），下一个相同请求直接复用"""
+
+    def __init__(self, name: str, capacity: int = 1000, ttl: Optional[float] = None) -> None:
+        self.name = name
+        self.capacity = capacity
+        self.ttl = settings.LATENCY_BUDGET_RESULT_TTL if ttl is None else ttl
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._counts: Dict[str, int] = {"stored": 0, "hits": 0}
+
+    def get(self, key: Any) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        self._counts["hits"] += 1
+        return value
+
+    def pop(self, key: Any) -> Optional[Any]:
+        """取出并删除（只复用一次的结果，如陪伴回复）"""
+        value = self.get(key)
+        if value is not None:
+            del self._entries[key]
+        return value
+
+    def put(self, key: Any, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        self._counts["stored"] += 1
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "size": len(self._entries), "ttl": self.ttl, **self._counts}
+
+
+def get_late_result_store(name: str) -> LateResultStore:
+    """按名称获取后台结果存储（每个调用点一个实例）"""
+    store = _late_result_stores.get(name)
+    if store is None:
+        store = _late_result_stores[name] = LateResultStore(name)
+    return store
+
+
+def latency_budget_stats() -> Dict[str, Any]:
+    return {
+        "background_in_flight": len(_background_tasks),
+        "background": dict(_background_counts),
+        "late_results": [store.stats() for store in _late_result_stores.values()],
+    }
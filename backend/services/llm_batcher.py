@@ -0,0 +1,176 @@
+"""
+LLM 微批：把同一调用点上等待中的多条分类 / 精炼请求合并为一次结构化请求（返回结果数组）
+
+- 请求先进入队列，凑满 LLM_BATCH_MAX_SIZE 条或等待 LLM_BATCH_LINGER_MS 毫秒后一起发出；
+  队列按调用点在进程内共享，并发的多个请求（如多个 /decoder/decode）也会合并
+- 每条输入带 id，模型返回 {"results": [{"id": 0, ...}, ...]}，按 id 分发给各自的调用方；
+  整批失败或缺少某条结果时该条返回 None，由调用方退回单条请求
+- 批量请求不走响应缓存（每批组合都不同），单条结果由调用方的近似重复缓存复用
+- 记录每批条数、每批耗时和每条文本摊到的 token 数
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+from core.metrics import counter, histogram
+from services.llm_gateway import LLMGateway, Messages, get_llm_gateway
+from services.llm_usage import llm_usage_user
+
+logger = logging.getLogger(__name__)
+
+LLM_BATCH_SIZE = histogram(
+    "llm_batch_size", "Items packed into one micro-batched LLM call", ["endpoint"],
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+LLM_BATCH_SECONDS = histogram(
+    "llm_batch_seconds", "Wall time of one micro-batched LLM call", ["endpoint"]
+)
+LLM_BATCH_TOKENS_PER_ITEM = histogram(
+    "llm_batch_tokens_per_item", "Provider tokens per item in a micro-batched LLM call", ["endpoint"],
+    buckets=(25, 50, 100, 200, 400, 800),
+)
+LLM_BATCH_ITEMS = counter(
+    "llm_batch_items_total", "Micro-batched items by outcome", ["endpoint", "outcome"]
+)
+
+_llm_batchers: Dict[str, "LLMMicroBatcher"] = {}
+
+
+class LLMMicroBatcher:
+    """按数量 / 等待时间触发的微批队列（单事件循环使用）"""
+
+    def __init__(
+        self,
+        endpoint: str,
+        build_messages: Callable[[List[Any]], Messages],
+        max_tokens_per_item: int,
+        max_batch: Optional[int] = None,
+        linger_ms: Optional[float] = None,
+        gateway: Optional[LLMGateway] = None,
+        **params: Any,
+    ) -> None:
+        """
+        Args:
+            endpoint: 网关调用点名称（并发上限和指标按它区分）
+            build_messages: 输入列表 -> 消息列表；第 i 条输入在提示中的 id 为 i
+            max_tokens_per_item: 每条输入预留的输出 token 数（max_tokens 按批大小计算）
+            params: 透传给网关的参数（temperature 等）
+        """
+        self.endpoint = endpoint
+        self.build_messages = build_messages
+        self.max_tokens_per_item = max_tokens_per_item
+        self.max_batch = max(1, max_batch or settings.LLM_BATCH_MAX_SIZE)
+        self.linger = (settings.LLM_BATCH_LINGER_MS if linger_ms is None else linger_ms) / 1000
+        self.gateway = gateway or get_llm_gateway()
+        self.params = params
+        self._pending: List[Tuple[Any, "asyncio.Future[Optional[Dict[str, Any]]]"]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushing: set = set()
+        self._counts: Dict[str, float] = {"batches": 0, "items": 0, "failed_items": 0, "tokens": 0, "seconds": 0.0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_batch > 1 and self.gateway.available
+
+    async def submit(self, item: Any) -> Optional[Dict[str, Any]]:
+        """加入队列并等待所在批次的结果；失败返回 None"""
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[Optional[Dict[str, Any]]]" = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.linger, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(batch))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _run(self, batch: List[Tuple[Any, "asyncio.Future[Optional[Dict[str, Any]]]"]]) -> None:
+        items = [item for item, _ in batch]
+        start = time.perf_counter()
+        results: Dict[int, Dict[str, Any]] = {}
+        tokens = 0
+        try:
+            # 一批混合了多个用户的请求，不计入触发刷新的那个用户
+            with llm_usage_user(None):
+                response, tokens = await self.gateway.chat_json_with_usage(
+                    self.endpoint,
+                    self.build_messages(items),
+                    cache=False,
+                    max_tokens=60 + self.max_tokens_per_item * len(items),
+                    **self.params,
+                )
+            for entry in response.get("results", []):
+                if isinstance(entry, dict) and isinstance(entry.get("id"), int):
+                    results[entry["id"]] = entry
+        except Exception as exc:
+            logger.warning("Micro-batched %s call (%d items) failed: %s", self.endpoint, len(items), exc)
+
+        elapsed = time.perf_counter() - start
+        failed = 0
+        for index, (_, future) in enumerate(batch):
+            result = results.get(index)
+            failed += result is None
+            if not future.done():
+                future.set_result(result)
+
+        self._counts["batches"] += 1
+        self._counts["items"] += len(batch)
+        self._counts["failed_items"] += failed
+        self._counts["tokens"] += tokens
+        self._counts["seconds"] += elapsed
+        LLM_BATCH_SIZE.labels(endpoint=self.endpoint).observe(len(batch))
+        LLM_BATCH_SECONDS.labels(endpoint=self.endpoint).observe(elapsed)
+        if tokens:
+            LLM_BATCH_TOKENS_PER_ITEM.labels(endpoint=self.endpoint).observe(tokens / len(batch))
+        LLM_BATCH_ITEMS.labels(endpoint=self.endpoint, outcome="ok").inc(len(batch) - failed)
+        if failed:
+            LLM_BATCH_ITEMS.labels(endpoint=self.endpoint, outcome="failed").inc(failed)
+
+    def stats(self) -> Dict[str, Any]:
+        batches = self._counts["batches"]
+        items = self._counts["items"]
+        return {
+            "endpoint": self.endpoint,
+            "max_batch": self.max_batch,
+            "linger_ms": round(self.linger * 1000, 1),
+            "pending": len(self._pending),
+            "batches": int(batches),
+            "items": int(items),
+            "failed_items": int(self._counts["failed_items"]),
+            "avg_batch_size": round(items / batches, 2) if batches else 0.0,
+            "avg_batch_ms": round(self._counts["seconds"] / batches * 1000, 1) if batches else 0.0,
+            "tokens_per_item": round(self._counts["tokens"] / items, 1) if items else 0.0,
+        }
+
+
+def get_llm_batcher(
+    endpoint: str,
+    build_messages: Callable[[List[Any]], Messages],
+    max_tokens_per_item: int,
+    **params: Any,
+) -> LLMMicroBatcher:
+    """按调用点获取微批队列（同一调用点的所有调用方共享一个队列）"""
+    batcher = _llm_batchers.get(endpoint)
+    if batcher is None:
+        batcher = _llm_batchers[endpoint] = LLMMicroBatcher(
+            endpoint, build_messages, max_tokens_per_item, **params
+        )
+    return batcher
+
+
+def llm_batcher_stats() -> List[Dict[str, Any]]:
+    return [batcher.stats() for batcher in _llm_batchers.values()]
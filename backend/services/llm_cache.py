@@ -0,0 +1,301 @@
+"""
+LLM 响应缓存：内存 LRU（带 TTL）+ 持久层（Mongo，未配置 MONGO_URI 时为本地 SQLite 文件）
+
+- 缓存键为 (model, messages, 采样参数) 规范化 JSON 的 sha256，参数顺序不影响键
+- 默认只缓存确定性调用（temperature <= LLM_CACHE_MAX_TEMPERATURE）；
+  LLM_CACHE_ENDPOINTS 中的调用点（结构化 JSON 分析）不论 temperature 都缓存；
+  调用方也可以按次强制（cache=True）或跳过（cache=False）
+- 内存层未命中时查持久层，持久层命中后回填内存层；多个 worker 通过持久层共享结果
+- 持久层出错只记录日志，不影响 LLM 调用
+- 被 max_tokens 截断（finish_reason 为 length）或未通过调用方校验（如 JSON 解析失败）的回复不写入缓存，
+  见 stats() 中的 rejected_truncated / rejected_invalid
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from core.config import settings
+from core.metrics import counter
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_REQUESTS = counter(
+    "llm_cache_requests_total", "LLM response cache lookups", ["tier", "result"]
+)
+LLM_CACHE_REJECTED = counter(
+    "llm_cache_rejected_total", "LLM responses not stored because they were truncated or failed validation", ["reason"]
+)
+LLM_CACHE_BYTES_SAVED = counter(
+    "llm_cache_bytes_saved_total", "Response bytes served from the LLM cache instead of the provider"
+)
+LLM_CACHE_TOKENS_SAVED = counter(
+    "llm_cache_tokens_saved_total", "Provider tokens (prompt + completion) avoided by LLM cache hits"
+)
+
+# 缓存条目：(回复文本, 原调用消耗的 token 数)
+CacheEntry = Tuple[str, int]
+
+_llm_cache_instance: Optional["LLMResponseCache"] = None
+
+
+def cache_key(model: str, messages: Any, params: Dict[str, Any]) -> str:
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _MongoTier:
+    """Mongo 持久层（llm_cache 集合，expires_at 上的 TTL 索引由 DBService.ensure_indexes 创建）"""
+
+    name = "mongo"
+
+    def __init__(self, client: Any) -> None:
+        self._collection = client[settings.MONGO_DB].llm_cache
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        doc = await self._collection.find_one({"_id": key})
+        if doc is None or doc["expires_at"].replace(tzinfo=timezone.utc) <= datetime.now(timezone.utc):
+            return None
+        return doc["content"], doc.get("tokens", 0)
+
+    async def put(self, key: str, entry: CacheEntry, ttl: float) -> None:
+        content, tokens = entry
+        await self._collection.replace_one(
+            {"_id": key},
+            {
+                "_id": key,
+                "content": content,
+                "tokens": tokens,
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl),
+            },
+            upsert=True,
+        )
+
+    def close(self) -> None:
+        pass
+
+
+class _DiskTier:
+    """本地 SQLite 持久层（同一台机器上的 worker 共享一个文件）"""
+
+    name = "disk"
+
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, content TEXT NOT NULL, tokens INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, tokens FROM llm_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _put(self, key: str, entry: CacheEntry, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, content, tokens, expires_at) VALUES (?, ?, ?, ?)",
+                (key, entry[0], entry[1], now + ttl),
+            )
+            self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def put(self, key: str, entry: CacheEntry, ttl: float) -> None:
+        await asyncio.to_thread(self._put, key, entry, ttl)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LLMResponseCache:
+    """两级 LLM 响应缓存"""
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        ttl: Optional[float] = None,
+        max_temperature: Optional[float] = None,
+        endpoints: Optional[set] = None,
+        backend: Optional[str] = None,
+    ) -> None:
+        self.size = settings.LLM_CACHE_SIZE if size is None else size
+        self.ttl = settings.LLM_CACHE_TTL if ttl is None else ttl
+        self.max_temperature = (
+            settings.LLM_CACHE_MAX_TEMPERATURE if max_temperature is None else max_temperature
+        )
+        self.endpoints = endpoints if endpoints is not None else {
+            name.strip() for name in settings.LLM_CACHE_ENDPOINTS.split(",") if name.strip()
+        }
+        self.backend = backend or settings.LLM_CACHE_BACKEND
+        self._memory: "OrderedDict[str, Tuple[float, CacheEntry]]" = OrderedDict()
+        self._persistent: Any = None
+        self._persistent_ready = False
+        self._counts: Dict[str, int] = {
+            "memory_hits": 0, "persistent_hits": 0, "misses": 0, "bypassed": 0,
+            "rejected_truncated": 0, "rejected_invalid": 0,
+        }
+        self.bytes_saved = 0
+        self.tokens_saved = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and self.ttl > 0
+
+    def should_cache(self, endpoint: str, params: Dict[str, Any], cache: Optional[bool] = None) -> bool:
+        """cache=None 时按 temperature / LLM_CACHE_ENDPOINTS 自动判断"""
+        if not self.enabled or cache is False:
+            return False
+        if cache or endpoint in self.endpoints:
+            return True
+        temperature = params.get("temperature", 1.0)  # OpenAI 默认 temperature 为 1
+        if temperature is not None and temperature <= self.max_temperature:
+            return True
+        self._counts["bypassed"] += 1
+        LLM_CACHE_REQUESTS.labels(tier="none", result="bypass").inc()
+        return False
+
+    # ===== 持久层 =====
+
+    def _get_persistent(self) -> Any:
+        if self._persistent_ready:
+            return self._persistent
+        self._persistent_ready = True
+        backend = self.backend
+        try:
+            if backend == "auto":
+                from services.db_service import get_mongo_client
+
+                backend = "mongo" if get_mongo_client() is not None else "disk"
+            if backend == "mongo":
+                from services.db_service import get_mongo_client
+
+                client = get_mongo_client()
+                self._persistent = _MongoTier(client) if client is not None else None
+            elif backend == "disk":
+                self._persistent = _DiskTier(settings.LLM_CACHE_PATH)
+        except Exception as exc:
+            logger.warning("LLM cache persistent tier unavailable: %s", exc)
+            self._persistent = None
+        return self._persistent
+
+    # ===== 读写 =====
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        now = time.monotonic()
+        item = self._memory.get(key)
+        if item is not None:
+            expires_at, entry = item
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self._hit("memory", entry)
+                return entry
+            del self._memory[key]
+
+        persistent = self._get_persistent()
+        if persistent is not None:
+            try:
+                entry = await persistent.get(key)
+            except Exception as exc:
+                logger.debug("LLM cache %s lookup failed: %s", persistent.name, exc)
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+                self._hit("persistent", entry)
+                return entry
+
+        self._counts["misses"] += 1
+        LLM_CACHE_REQUESTS.labels(tier="none", result="miss").inc()
+        return None
+
+    async def put(self, key: str, content: str, tokens: int) -> None:
+        entry = (content, tokens)
+        self._remember(key, entry)
+        persistent = self._get_persistent()
+        if persistent is not None:
+            try:
+                await persistent.put(key, entry, self.ttl)
+            except Exception as exc:
+                logger.debug("LLM cache %s write failed: %s", persistent.name, exc)
+
+    def reject(self, reason: str) -> None:
+        """记录一次不写入缓存的回复（reason 为 truncated / invalid）"""
+        self._counts[f"rejected_{reason}"] += 1
+        LLM_CACHE_REJECTED.labels(reason=reason).inc()
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        self._memory[key] = (time.monotonic() + self.ttl, entry)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.size:
+            self._memory.popitem(last=False)
+
+    def _hit(self, tier: str, entry: CacheEntry) -> None:
+        content, tokens = entry
+        size = len(content.encode("utf-8"))
+        self._counts[f"{tier}_hits"] += 1
+        self.bytes_saved += size
+        self.tokens_saved += tokens
+        LLM_CACHE_REQUESTS.labels(tier=tier, result="hit").inc()
+        LLM_CACHE_BYTES_SAVED.inc(size)
+        LLM_CACHE_TOKENS_SAVED.inc(tokens)
+
+    def clear(self) -> None:
+        """清空内存层（持久层条目按 TTL 过期）"""
+        self._memory.clear()
+
+    def close(self) -> None:
+        if self._persistent is not None:
+            self._persistent.close()
+        self._persistent = None
+        self._persistent_ready = False
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self._counts["memory_hits"] + self._counts["persistent_hits"]
+        lookups = hits + self._counts["misses"]
+        return {
+            "enabled": self.enabled,
+            "backend": self._persistent.name if self._persistent is not None else None,
+            "size": len(self._memory),
+            "capacity": self.size,
+            "ttl": self.ttl,
+            "max_temperature": self.max_temperature,
+            "endpoints": sorted(self.endpoints),
+            **self._counts,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """获取 LLM 响应缓存单例"""
+    global _llm_cache_instance
+    if _llm_cache_instance is None:
+        _llm_cache_instance = LLMResponseCache()
+    return _llm_cache_instance
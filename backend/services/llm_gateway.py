@@ -0,0 +1,511 @@
+"""
+LLM 网关：进程内所有大模型调用的统一异步入口
+
+- 每个 provider 一个常驻 AsyncOpenAI 客户端，底层 httpx.AsyncClient 连接池在请求间复用；
+  配置了多个 provider 时慢调用对冲到备用 provider、失败时转移（services/llm_providers.py）
+- 每次调用都有超时（LLM_TIMEOUT，可按调用覆盖），超时包含排队等待并发名额的时间
+- 全局并发上限（LLM_MAX_CONCURRENCY）+ 按调用点（endpoint，如 "classifier.scene"）的并发上限
+  （LLM_ENDPOINT_CONCURRENCY，可用 LLM_ENDPOINT_LIMITS 单独覆盖），慢的调用点不会占满全局名额
+- 可缓存的调用先查两级响应缓存（services/llm_cache.py），命中时不请求 provider；
+  被 max_tokens 截断或未通过 validate 校验（chat_json 的 JSON 解析）的回复不写入缓存；
+  缓存未命中、相同请求已在途时等待那次调用的结果（single-flight），不再重复请求
+- chat_stream 逐段产出流式回复（首段文本延迟见 llm_time_to_first_token_seconds），
+  并发名额占用到流结束
+- 每次调用（含缓存命中 / 合并 / 失败）的 token、耗时、provider、模型、缓存状态记入用量账本
+  （services/llm_usage.py）；LLM_MAX_TOKENS 可按调用点覆盖 max_tokens
+- 调用方只拿到回复文本 / 解析后的 JSON；未配置 API Key 时 available 为 False，
+  调用会抛出 LLMUnavailableError，由调用方按原逻辑降级
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+from core.metrics import counter, gauge, histogram
+from services.llm_cache import LLMResponseCache, cache_key, get_llm_cache
+from services.llm_providers import LLMProvider, ProviderPool, build_providers
+from services.llm_usage import LLMUsageLedger, get_llm_usage_ledger
+from services.prompt_budget import estimate_tokens
+from services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+LLM_REQUESTS = counter(
+    "llm_requests_total", "LLM gateway calls by endpoint and outcome", ["endpoint", "outcome"]
+)
+LLM_IN_FLIGHT = gauge(
+    "llm_in_flight", "LLM calls holding a concurrency slot", ["endpoint"]
+)
+LLM_QUEUE_SECONDS = histogram(
+    "llm_queue_wait_seconds", "Time spent waiting for an LLM concurrency slot", ["endpoint"]
+)
+LLM_REQUEST_SECONDS = histogram(
+    "llm_request_seconds", "LLM call wall time including queueing", ["endpoint"]
+)
+LLM_FIRST_TOKEN_SECONDS = histogram(
+    "llm_time_to_first_token_seconds", "Time until the first streamed chunk including queueing", ["endpoint"]
+)
+
+Messages = List[Dict[str, Any]]
+# 回复文本的校验函数：抛出异常表示回复不可用（不写入缓存）
+Validator = Callable[[str], Any]
+
+_llm_gateway_instance: Optional["LLMGateway"] = None
+
+
+class LLMGatewayError(RuntimeError):
+    """LLM 调用失败"""
+
+
+class LLMUnavailableError(LLMGatewayError):
+    """未配置 LLM（无 API Key 或未安装 openai）"""
+
+
+class LLMTimeoutError(LLMGatewayError):
+    """LLM 调用超时（含排队时间）"""
+
+
+def parse_endpoint_limits(raw: str) -> Dict[str, int]:
+    """解析 "decoder.semantic=4,companion.reply=32" 形式的按调用点配置（并发上限 / max_tokens）"""
+    limits: Dict[str, int] = {}
+    for item in raw.split(","):
+        name, sep, value = item.partition("=")
+        if not sep:
+            continue
+        try:
+            limits[name.strip()] = max(1, int(value))
+        except ValueError:
+            logger.warning("Ignoring invalid LLM endpoint limit: %s", item)
+    return limits
+
+
+def _parse_json(content: str) -> Dict[str, Any]:
+    return json.loads(content or "{}")
+
+
+class LLMGateway:
+    """provider 池（常驻客户端 / 对冲 / 失败转移）+ 超时 + 全局 / 按调用点并发控制"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        model: str = "gpt-4o-mini",
+        timeout: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        endpoint_concurrency: Optional[int] = None,
+        endpoint_limits: Optional[Dict[str, int]] = None,
+        cache: Optional[LLMResponseCache] = None,
+        providers: Optional[List[LLMProvider]] = None,
+        usage: Optional[LLMUsageLedger] = None,
+    ) -> None:
+        self.timeout = timeout or settings.LLM_TIMEOUT
+        self.max_concurrency = max(1, max_concurrency or settings.LLM_MAX_CONCURRENCY)
+        self.endpoint_concurrency = max(1, endpoint_concurrency or settings.LLM_ENDPOINT_CONCURRENCY)
+        self.endpoint_limits = (
+            endpoint_limits if endpoint_limits is not None
+            else parse_endpoint_limits(settings.LLM_ENDPOINT_LIMITS)
+        )
+        self.cache = cache or get_llm_cache()
+        if providers is None:
+            # 启动时只有环境变量中的 openai 配置；配置服务中的 provider 在预热时由 load_providers 加载
+            providers = build_providers({
+                "default_provider": "openai",
+                "openai": {
+                    "api_key": api_key if api_key is not None else settings.OPENAI_API_KEY,
+                    "base_url": base_url,
+                    "model": model,
+                },
+            }, self.timeout)
+        self.pool = ProviderPool(providers)
+        # 被替换的 provider 池可能仍有在途请求，aclose 时统一关闭
+        self._retired_pools: List[ProviderPool] = []
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+        self._endpoint_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._calls: Dict[str, Dict[str, int]] = {}
+        # 缓存未命中的相同请求（同一缓存 key）在途时合并
+        self._single_flight = SingleFlight("llm_gateway")
+        self.max_tokens = parse_endpoint_limits(settings.LLM_MAX_TOKENS)
+        self.usage = usage or get_llm_usage_ledger()
+
+    @property
+    def available(self) -> bool:
+        return bool(self.pool.providers)
+
+    @property
+    def model(self) -> str:
+        """主 provider 的模型（响应缓存的 key 按它计算）"""
+        primary = self.pool.primary
+        return primary.model if primary is not None else "gpt-4o-mini"
+
+    # ===== provider =====
+
+    async def load_providers(self, config: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        按配置服务的 LLM_PROVIDER 配置重建 provider 池（默认 provider 为主，其余为对冲 / 转移备用），
+        返回生效的 provider 名；没有可用 provider（都未配置 API Key）时保留当前的池
+        """
+        if config is None:
+            from services.config_service import get_config_service
+
+            config = await get_config_service().get_llm_provider_config()
+        providers = build_providers(config, self.timeout)
+        # 配置未变化时保留当前的池（连接池和延迟窗口不丢失）
+        if providers and [p.signature for p in providers] != [p.signature for p in self.pool.providers]:
+            self._retired_pools.append(self.pool)
+            self.pool = ProviderPool(providers)
+        else:
+            await ProviderPool(providers).aclose()
+        return [provider.name for provider in self.pool.providers]
+
+    def endpoint_limit(self, endpoint: str) -> int:
+        """调用点的并发上限（LLM_ENDPOINT_LIMITS 中未单独配置时为 LLM_ENDPOINT_CONCURRENCY）"""
+        return self.endpoint_limits.get(endpoint, self.endpoint_concurrency)
+
+    def _endpoint_semaphore(self, endpoint: str) -> asyncio.Semaphore:
+        semaphore = self._endpoint_semaphores.get(endpoint)
+        if semaphore is None:
+            semaphore = self._endpoint_semaphores[endpoint] = asyncio.Semaphore(self.endpoint_limit(endpoint))
+        return semaphore
+
+    # ===== 调用 =====
+
+    async def chat(
+        self,
+        endpoint: str,
+        messages: Messages,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+        cache: Optional[bool] = None,
+        **params: Any,
+    ) -> str:
+        """
+        Chat Completions 调用，返回回复文本
+
+        Args:
+            endpoint: 调用点名称（并发上限和指标按它区分）
+            messages: OpenAI 格式的消息列表
+            model: 模型（默认使用当前 provider 的模型）
+            timeout: 本次调用超时秒数（默认 LLM_TIMEOUT）
+            cache: 是否使用响应缓存（None 按 temperature / LLM_CACHE_ENDPOINTS 自动判断）
+            params: 透传给 chat.completions.create 的参数（temperature、max_tokens 等）
+        """
+        content, _ = await self.chat_with_usage(endpoint, messages, model=model, timeout=timeout, cache=cache, **params)
+        return content
+
+    async def chat_with_usage(
+        self,
+        endpoint: str,
+        messages: Messages,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+        cache: Optional[bool] = None,
+        validate: Optional[Validator] = None,
+        **params: Any,
+    ) -> Tuple[str, int]:
+        """
+        与 chat 相同，同时返回本次消耗的 token 数（命中响应缓存时为 0）
+
+        validate 在写入响应缓存前校验回复文本，抛出异常时不缓存并把异常抛给调用方
+        """
+        if not self.available:
+            raise LLMUnavailableError("LLM is not configured")
+        model = model or self.model
+        timeout = timeout or self.timeout
+        params = self._with_max_tokens(endpoint, params)
+        start = time.perf_counter()
+
+        if not self.cache.should_cache(endpoint, params, cache):
+            content, usage = await self._call_with_timeout(
+                endpoint, messages, model, timeout, start, params, "bypass"
+            )
+            return content, usage["total_tokens"]
+
+        key = cache_key(model, messages, params)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            self._record(endpoint, "cache_hit", start)
+            self._record_usage(endpoint, "hit", "ok", start, {"provider": "none", "model": model})
+            return cached[0], 0
+
+        async def call_and_cache() -> Tuple[str, Dict[str, Any]]:
+            content, usage = await self._call_with_timeout(
+                endpoint, messages, model, timeout, start, params, "miss"
+            )
+            await self._store(key, content, usage, validate)
+            return content, usage
+
+        (content, usage), shared = await self._single_flight.do(key, call_and_cache)
+        if shared:
+            # 复用了相同请求的在途调用：不重复计 token
+            self._record(endpoint, "coalesced", start)
+            self._record_usage(endpoint, "coalesced", "ok", start, {"provider": "none", "model": model})
+            return content, 0
+        return content, usage["total_tokens"]
+
+    async def _store(
+        self, key: str, content: str, usage: Dict[str, Any], validate: Optional[Validator] = None
+    ) -> None:
+        """写入响应缓存：被 max_tokens 截断的回复不缓存；未通过 validate 的回复不缓存，异常照常抛出"""
+        if usage.get("finish_reason") == "length":
+            self.cache.reject("truncated")
+            return
+        if validate is not None:
+            try:
+                validate(content)
+            except Exception:
+                self.cache.reject("invalid")
+                raise
+        await self.cache.put(key, content, usage["total_tokens"])
+
+    async def _call_with_timeout(
+        self,
+        endpoint: str,
+        messages: Messages,
+        model: str,
+        timeout: float,
+        start: float,
+        params: Dict[str, Any],
+        cache_status: str,
+    ) -> Tuple[str, Dict[str, Any]]:
+        failure = {"provider": self.pool.primary.name if self.pool.primary else "none", "model": model}
+        try:
+            content, usage = await asyncio.wait_for(
+                self._call(endpoint, messages, model, timeout, start, params),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            self._record(endpoint, "timeout", start)
+            self._record_usage(endpoint, cache_status, "timeout", start, failure)
+            raise LLMTimeoutError(f"LLM call {endpoint} timed out after {timeout}s") from None
+        except Exception:
+            self._record(endpoint, "error", start)
+            self._record_usage(endpoint, cache_status, "error", start, failure)
+            raise
+        self._record(endpoint, "ok", start)
+        self._record_usage(endpoint, cache_status, "ok", start, usage, messages, content)
+        return content, usage
+
+    async def chat_json(
+        self,
+        endpoint: str,
+        messages: Messages,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+        cache: Optional[bool] = None,
+        **params: Any,
+    ) -> Dict[str, Any]:
+        """要求 JSON 输出（response_format=json_object）并解析为 dict"""
+        result, _ = await self.chat_json_with_usage(
+            endpoint, messages, model=model, timeout=timeout, cache=cache, **params
+        )
+        return result
+
+    async def chat_json_with_usage(
+        self,
+        endpoint: str,
+        messages: Messages,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+        cache: Optional[bool] = None,
+        **params: Any,
+    ) -> Tuple[Dict[str, Any], int]:
+        """chat_json，同时返回本次消耗的 token 数"""
+        params.setdefault("response_format", {"type": "json_object"})
+        content, tokens = await self.chat_with_usage(
+            endpoint, messages, model=model, timeout=timeout, cache=cache, validate=_parse_json, **params
+        )
+        return _parse_json(content), tokens
+
+    async def chat_stream(
+        self,
+        endpoint: str,
+        messages: Messages,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+        cache: Optional[bool] = None,
+        **params: Any,
+    ) -> AsyncIterator[str]:
+        """
+        流式 Chat Completions，逐段产出 provider 生成的文本
+
+        timeout 是整次流式调用（含排队）的上限；命中响应缓存时一次产出完整回复，
+        完整结束的流式回复按 chat 的规则写入缓存
+        """
+        if not self.available:
+            raise LLMUnavailableError("LLM is not configured")
+        model = model or self.model
+        timeout = timeout or self.timeout
+        params = self._with_max_tokens(endpoint, params)
+        start = time.perf_counter()
+        deadline = start + timeout
+
+        key = None
+        if self.cache.should_cache(endpoint, params, cache):
+            key = cache_key(model, messages, params)
+            cached = await self.cache.get(key)
+            if cached is not None:
+                self._record(endpoint, "cache_hit", start)
+                self._record_usage(endpoint, "hit", "ok", start, {"provider": "none", "model": model})
+                yield cached[0]
+                return
+
+        outcome = "error"
+        parts: List[str] = []
+        usage: Dict[str, Any] = {"model": model}
+        try:
+            async with self._slot(endpoint, start):
+                stream = self.pool.stream(endpoint, messages, model, timeout, params, usage)
+                try:
+                    while True:
+                        try:
+                            delta = await asyncio.wait_for(
+                                stream.__anext__(), timeout=max(0.0, deadline - time.perf_counter())
+                            )
+                        except StopAsyncIteration:
+                            break
+                        if not parts:
+                            LLM_FIRST_TOKEN_SECONDS.labels(endpoint=endpoint).observe(time.perf_counter() - start)
+                        parts.append(delta)
+                        yield delta
+                finally:
+                    await stream.aclose()
+            outcome = "ok"
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise LLMTimeoutError(f"LLM stream {endpoint} timed out after {timeout}s") from None
+        except (asyncio.CancelledError, GeneratorExit):
+            # 调用方提前结束（如客户端断开）
+            outcome = "cancelled"
+            raise
+        finally:
+            self._record(endpoint, outcome, start)
+            # 中途结束的流式调用按已产出的部分估算 token
+            self._record_usage(
+                endpoint, "miss" if key is not None else "bypass", outcome, start, usage, messages, "".join(parts)
+            )
+        if key is not None:
+            await self._store(key, "".join(parts), usage)
+
+    @asynccontextmanager
+    async def _slot(self, endpoint: str, start: float) -> AsyncIterator[None]:
+        """占用一个调用点名额和一个全局名额"""
+        if self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        # 先拿调用点名额再拿全局名额：某个调用点排满时不占用全局名额
+        async with self._endpoint_semaphore(endpoint):
+            async with self._global_semaphore:
+                LLM_QUEUE_SECONDS.labels(endpoint=endpoint).observe(time.perf_counter() - start)
+                self._in_flight[endpoint] = self._in_flight.get(endpoint, 0) + 1
+                LLM_IN_FLIGHT.labels(endpoint=endpoint).inc()
+                try:
+                    yield
+                finally:
+                    self._in_flight[endpoint] -= 1
+                    LLM_IN_FLIGHT.labels(endpoint=endpoint).dec()
+
+    async def _call(
+        self,
+        endpoint: str,
+        messages: Messages,
+        model: str,
+        timeout: float,
+        start: float,
+        params: Dict[str, Any],
+    ) -> Tuple[str, Dict[str, Any]]:
+        """返回（回复文本，用量：provider / model / prompt_tokens / completion_tokens / finish_reason）"""
+        async with self._slot(endpoint, start):
+            resp, provider = await self.pool.create(endpoint, messages, model, timeout, params)
+        choice = resp.choices[0]
+        usage: Dict[str, Any] = {
+            "provider": provider,
+            "model": resp.model or model,
+            "finish_reason": choice.finish_reason,
+        }
+        if resp.usage is not None:
+            usage["prompt_tokens"] = resp.usage.prompt_tokens
+            usage["completion_tokens"] = resp.usage.completion_tokens
+        return choice.message.content or "", usage
+
+    def _with_max_tokens(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """LLM_MAX_TOKENS 中配置了该调用点时覆盖调用方给出的 max_tokens"""
+        max_tokens = self.max_tokens.get(endpoint)
+        if max_tokens is None:
+            return params
+        return {**params, "max_tokens": max_tokens}
+
+    def _record_usage(
+        self,
+        endpoint: str,
+        cache_status: str,
+        outcome: str,
+        start: float,
+        usage: Dict[str, Any],
+        messages: Optional[Messages] = None,
+        content: str = "",
+    ) -> None:
+        """记入用量；请求了 provider 但没有 usage 时按文本估算，并补全 usage["total_tokens"]"""
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+        estimated = messages is not None and (prompt_tokens is None or completion_tokens is None)
+        if estimated:
+            prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in messages)
+            completion_tokens = estimate_tokens(content)
+        usage["total_tokens"] = (prompt_tokens or 0) + (completion_tokens or 0)
+        self.usage.record(
+            endpoint,
+            provider=usage.get("provider") or "none",
+            model=usage.get("model") or self.model,
+            cache=cache_status,
+            outcome=outcome,
+            latency=time.perf_counter() - start,
+            prompt_tokens=prompt_tokens or 0,
+            completion_tokens=completion_tokens or 0,
+            estimated=estimated,
+            truncated=usage.get("finish_reason") == "length",
+        )
+
+    def _record(self, endpoint: str, outcome: str, start: float) -> None:
+        LLM_REQUESTS.labels(endpoint=endpoint, outcome=outcome).inc()
+        LLM_REQUEST_SECONDS.labels(endpoint=endpoint).observe(time.perf_counter() - start)
+        calls = self._calls.setdefault(endpoint, {})
+        calls[outcome] = calls.get(outcome, 0) + 1
+
+    # ===== 生命周期 =====
+
+    async def aclose(self) -> None:
+        """进程退出前关闭连接池和缓存持久层"""
+        self.cache.close()
+        pools, self._retired_pools = [*self._retired_pools, self.pool], []
+        for pool in pools:
+            await pool.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "model": self.model,
+            "timeout": self.timeout,
+            "max_concurrency": self.max_concurrency,
+            "endpoint_concurrency": self.endpoint_concurrency,
+            "endpoint_limits": self.endpoint_limits,
+            "max_tokens": self.max_tokens,
+            "in_flight": dict(self._in_flight),
+            "calls": {endpoint: dict(outcomes) for endpoint, outcomes in self._calls.items()},
+            "cache": self.cache.stats(),
+            "providers": self.pool.stats(),
+            "single_flight": self._single_flight.stats(),
+        }
+
+
+def get_llm_gateway() -> LLMGateway:
+    """获取 LLM 网关单例"""
+    global _llm_gateway_instance
+    if _llm_gateway_instance is None:
+        _llm_gateway_instance = LLMGateway()
+    return _llm_gateway_instance
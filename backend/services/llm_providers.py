@@ -0,0 +1,389 @@
+"""
+LLM provider 池：配置服务 LLM_PROVIDER 中的每个 provider（openai / deepseek / 其它 OpenAI 兼容服务）
+各保持一个常驻 AsyncOpenAI 客户端（独立 httpx 连接池）
+
+- 默认 provider（default_provider）为主，其余按配置顺序作为备用；未配置 API Key 的 provider 跳过
+- 对冲请求：主 provider 的本次调用超过该调用点最近成功延迟的 LLM_HEDGE_PERCENTILE 分位数
+  （样本不足 LLM_HEDGE_MIN_SAMPLES 时不对冲）仍未返回时，向下一个 provider 发一份相同请求，
+  先成功的结果胜出，另一份取消
+- 失败转移：所有在途请求都失败时，依次改用下一个 provider；流式调用只在产出第一段文本前转移，不对冲
+- 每个 provider 按调用点记录延迟直方图（Prometheus）和最近延迟窗口（分位数见 stats）
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+try:
+    import httpx
+    from openai import AsyncOpenAI  # SDK v1.x
+except Exception:  # 未安装 openai / httpx 时兜底
+    httpx = None  # type: ignore
+    AsyncOpenAI = None  # type: ignore
+
+from core.config import settings
+from core.metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+LLM_PROVIDER_SECONDS = histogram(
+    "llm_provider_request_seconds", "Provider round-trip latency by endpoint and outcome",
+    ["provider", "endpoint", "outcome"],
+)
+LLM_HEDGES = counter(
+    "llm_hedged_requests_total", "Hedged duplicate requests by winner", ["endpoint", "winner"]
+)
+LLM_FAILOVERS = counter(
+    "llm_failovers_total", "Calls retried on the next provider after a failure", ["endpoint", "provider"]
+)
+
+# 未在配置中给出 base_url 时使用的默认地址
+DEFAULT_BASE_URLS: Dict[str, Optional[str]] = {
+    "openai": None,  # SDK 默认（OPENAI_BASE_URL）
+    "deepseek": "https://api.deepseek.com/v1",
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class LLMProvider:
+    """一个 OpenAI 兼容 provider：常驻客户端 + 按调用点的最近延迟窗口"""
+
+    def __init__(
+        self,
+        name: str,
+        api_key: str,
+        base_url: Optional[str] = None,
+        model: str = "gpt-4o-mini",
+        timeout: Optional[float] = None,
+        window: Optional[int] = None,
+    ) -> None:
+        self.name = name
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.timeout = timeout or settings.LLM_TIMEOUT
+        self.window = window or settings.LLM_HEDGE_WINDOW
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {"ok": 0, "error": 0, "cancelled": 0}
+        # 启动时即创建客户端和连接池，第一个请求不再承担构建开销
+        self.client = self._build_client()
+
+    @property
+    def signature(self) -> Tuple[str, Optional[str], str, str]:
+        return (self.name, self.base_url, self.api_key, self.model)
+
+    def _build_client(self) -> Any:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=self.timeout,
+        )
+        return AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            max_retries=settings.LLM_MAX_RETRIES,
+            http_client=http_client,
+        )
+
+    async def create(
+        self,
+        endpoint: str,
+        messages: List[Dict[str, Any]],
+        model: Optional[str],
+        timeout: float,
+        params: Dict[str, Any],
+    ) -> Any:
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            resp = await self.client.chat.completions.create(
+                model=model or self.model,
+                messages=messages,
+                timeout=timeout,
+                **params,
+            )
+            outcome = "ok"
+            return resp
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self._counts[outcome] += 1
+            LLM_PROVIDER_SECONDS.labels(provider=self.name, endpoint=endpoint, outcome=outcome).observe(elapsed)
+            if outcome == "ok":
+                latencies = self._latencies.get(endpoint)
+                if latencies is None:
+                    latencies = self._latencies[endpoint] = deque(maxlen=self.window)
+                latencies.append(elapsed)
+
+    async def stream(
+        self,
+        endpoint: str,
+        messages: List[Dict[str, Any]],
+        model: Optional[str],
+        timeout: float,
+        params: Dict[str, Any],
+        usage: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        流式调用（stream=True），逐段产出 provider 生成的文本
+
+        usage 不为 None 时写入 model / finish_reason，以及 provider 在最后一个分块中返回的
+        prompt_tokens / completion_tokens（LLM_STREAM_INCLUDE_USAGE）
+        """
+        start = time.perf_counter()
+        outcome = "error"
+        if settings.LLM_STREAM_INCLUDE_USAGE:
+            params = {"stream_options": {"include_usage": True}, **params}
+        try:
+            stream = await self.client.chat.completions.create(
+                model=model or self.model,
+                messages=messages,
+                timeout=timeout,
+                stream=True,
+                **params,
+            )
+            async for chunk in stream:
+                if usage is not None:
+                    usage["model"] = chunk.model or usage.get("model")
+                    if chunk.usage is not None:
+                        usage["prompt_tokens"] = chunk.usage.prompt_tokens
+                        usage["completion_tokens"] = chunk.usage.completion_tokens
+                    if chunk.choices and chunk.choices[0].finish_reason:
+                        usage["finish_reason"] = chunk.choices[0].finish_reason
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            outcome = "ok"
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "cancelled"
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self._counts[outcome] += 1
+            LLM_PROVIDER_SECONDS.labels(provider=self.name, endpoint=endpoint, outcome=outcome).observe(elapsed)
+
+    def latency_percentile(self, endpoint: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """该调用点最近成功调用延迟的 q 分位数（秒），样本不足返回 None"""
+        latencies = self._latencies.get(endpoint)
+        if latencies is None or len(latencies) < min_samples:
+            return None
+        return percentile(list(latencies), q)
+
+    async def aclose(self) -> None:
+        try:
+            await self.client.close()
+        except Exception as exc:
+            logger.warning("Failed to close LLM provider %s: %s", self.name, exc)
+
+    def stats(self) -> Dict[str, Any]:
+        latency = {}
+        for endpoint, values in self._latencies.items():
+            samples = list(values)
+            latency[endpoint] = {
+                "samples": len(samples),
+                "p50_ms": round(percentile(samples, 0.5) * 1000, 1),
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(samples, 0.99) * 1000, 1),
+            }
+        return {
+            "name": self.name,
+            "base_url": self.base_url,
+            "model": self.model,
+            "calls": dict(self._counts),
+            "latency": latency,
+        }
+
+
+def build_providers(config: Dict[str, Any], timeout: Optional[float] = None) -> List[LLMProvider]:
+    """
+    配置服务 LLM_PROVIDER 配置 -> provider 列表（默认 provider 在前）
+
+    openai 缺省使用 OPENAI_API_KEY / OPENAI_BASE_URL，deepseek 缺省使用 DEEPSEEK_API_KEY / DEEPSEEK_BASE_URL
+    """
+    if AsyncOpenAI is None:
+        return []
+    env_keys = {"openai": settings.OPENAI_API_KEY, "deepseek": settings.DEEPSEEK_API_KEY}
+    env_urls = {"openai": settings.OPENAI_BASE_URL, "deepseek": settings.DEEPSEEK_BASE_URL}
+    default = config.get("default_provider", "openai")
+    names = [name for name, value in config.items() if isinstance(value, dict)]
+    if default in names:
+        names.remove(default)
+        names.insert(0, default)
+
+    providers = []
+    for name in names:
+        provider_config = config[name]
+        api_key = provider_config.get("api_key") or env_keys.get(name)
+        if not api_key:
+            continue
+        base_url = provider_config.get("base_url") or env_urls.get(name) or DEFAULT_BASE_URLS.get(name)
+        providers.append(LLMProvider(
+            name,
+            api_key=api_key,
+            base_url=base_url,
+            model=provider_config.get("model", "gpt-4o-mini"),
+            timeout=timeout,
+        ))
+    return providers
+
+
+class ProviderPool:
+    """主 provider + 备用 provider：超过延迟分位数时对冲，失败时转移"""
+
+    def __init__(
+        self,
+        providers: List[LLMProvider],
+        hedge_enabled: Optional[bool] = None,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_samples: Optional[int] = None,
+        hedge_min_delay: Optional[float] = None,
+    ) -> None:
+        self.providers = providers
+        self.hedge_enabled = settings.LLM_HEDGE_ENABLED if hedge_enabled is None else hedge_enabled
+        self.hedge_percentile = settings.LLM_HEDGE_PERCENTILE if hedge_percentile is None else hedge_percentile
+        self.hedge_min_samples = settings.LLM_HEDGE_MIN_SAMPLES if hedge_min_samples is None else hedge_min_samples
+        self.hedge_min_delay = settings.LLM_HEDGE_MIN_DELAY if hedge_min_delay is None else hedge_min_delay
+        self._counts: Dict[str, int] = {"hedged": 0, "hedge_won": 0, "failovers": 0}
+
+    @property
+    def primary(self) -> Optional[LLMProvider]:
+        return self.providers[0] if self.providers else None
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """主 provider 超过多少秒未返回时发对冲请求（不对冲返回 None）"""
+        if not self.hedge_enabled or len(self.providers) < 2:
+            return None
+        threshold = self.providers[0].latency_percentile(endpoint, self.hedge_percentile, self.hedge_min_samples)
+        if threshold is None:
+            return None
+        return max(self.hedge_min_delay, threshold)
+
+    async def create(
+        self,
+        endpoint: str,
+        messages: List[Dict[str, Any]],
+        model: Optional[str],
+        timeout: float,
+        params: Dict[str, Any],
+    ) -> Tuple[Any, str]:
+        """返回（响应，实际应答的 provider 名）；model 只作用于主 provider，备用 provider 使用各自的模型"""
+        if not self.providers:
+            raise RuntimeError("No LLM provider configured")
+        fallbacks = iter(self.providers[1:])
+        attempts: Dict["asyncio.Task[Any]", LLMProvider] = {}
+
+        def start(provider: LLMProvider, provider_model: Optional[str] = None) -> None:
+            task = asyncio.ensure_future(provider.create(endpoint, messages, provider_model, timeout, params))
+            attempts[task] = provider
+
+        start(self.providers[0], model)
+        hedge_delay = self.hedge_delay(endpoint)
+        hedged = False
+        pending = set(attempts)
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                wait_timeout = hedge_delay if not hedged else None
+                done, pending = await asyncio.wait(
+                    pending, timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # 主 provider 超过延迟分位数仍未返回：向下一个 provider 发对冲请求
+                    hedged = True
+                    provider = next(fallbacks, None)
+                    if provider is not None:
+                        self._counts["hedged"] += 1
+                        start(provider)
+                        pending = {task for task in attempts if not task.done()}
+                    continue
+                for task in done:
+                    if task.exception() is None:
+                        winner = attempts[task]
+                        if hedged:
+                            won = winner is not self.providers[0]
+                            self._counts["hedge_won"] += int(won)
+                            LLM_HEDGES.labels(endpoint=endpoint, winner="hedge" if won else "primary").inc()
+                        return task.result(), winner.name
+                    error = task.exception()
+                    logger.warning("LLM provider %s failed on %s: %s", attempts[task].name, endpoint, error)
+                if not pending:
+                    # 在途请求全部失败：转移到下一个 provider
+                    provider = next(fallbacks, None)
+                    if provider is not None:
+                        self._counts["failovers"] += 1
+                        LLM_FAILOVERS.labels(endpoint=endpoint, provider=provider.name).inc()
+                        start(provider)
+                        pending = {task for task in attempts if not task.done()}
+                        hedged = True  # 转移后的请求不再对冲
+            raise error  # type: ignore[misc]
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # 标记已读取，避免未处理异常告警
+
+    async def stream(
+        self,
+        endpoint: str,
+        messages: List[Dict[str, Any]],
+        model: Optional[str],
+        timeout: float,
+        params: Dict[str, Any],
+        usage: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        流式调用：第一段文本之前失败时转移到下一个 provider，之后的失败直接抛给调用方
+
+        usage 不为 None 时另外写入实际应答的 provider 名（见 LLMProvider.stream）
+        """
+        if not self.providers:
+            raise RuntimeError("No LLM provider configured")
+        error: Optional[BaseException] = None
+        for index, provider in enumerate(self.providers):
+            if index:
+                self._counts["failovers"] += 1
+                LLM_FAILOVERS.labels(endpoint=endpoint, provider=provider.name).inc()
+            if usage is not None:
+                usage["provider"] = provider.name
+            stream = provider.stream(endpoint, messages, model if index == 0 else None, timeout, params, usage)
+            try:
+                try:
+                    first = await stream.__anext__()
+                except StopAsyncIteration:
+                    return
+                except Exception as exc:
+                    error = exc
+                    logger.warning("LLM provider %s failed on %s: %s", provider.name, endpoint, exc)
+                    continue
+                yield first
+                async for delta in stream:
+                    yield delta
+                return
+            finally:
+                await stream.aclose()
+        raise error  # type: ignore[misc]
+
+    async def aclose(self) -> None:
+        for provider in self.providers:
+            await provider.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedge_enabled": self.hedge_enabled,
+            "hedge_percentile": self.hedge_percentile,
+            "hedge_min_samples": self.hedge_min_samples,
+            "hedge_min_delay": self.hedge_min_delay,
+            **self._counts,
+            "providers": [provider.stats() for provider in self.providers],
+        }
@@ -0,0 +1,303 @@
+"""
+LLM 用量记录：每次经由网关的调用（含缓存命中 / 合并 / 失败）记录 prompt / completion token、耗时、
+provider、模型、调用阶段、缓存状态和用户
+
+- 调用阶段由调用点推出（classifier / refiner / risk / translate / semantic / decoder / companion，见 STAGES）
+- 用户通过 contextvar 传递：入口（解码 / 陪伴对话）用 llm_usage_user(user_id) 包住，
+  期间发起的调用（含派生的后台任务）都记到该用户；微批请求混合多个用户，不记用户
+- provider 未返回 usage 时（部分 OpenAI 兼容服务、未开启 LLM_STREAM_INCLUDE_USAGE 的流式调用）
+  按 prompt_budget.estimate_tokens 估算并标记 estimated
+- Prometheus：llm_usage_calls_total / llm_usage_tokens_total / llm_usage_latency_seconds /
+  llm_usage_call_tokens / llm_usage_truncated_total（不带用户标签，避免标签基数过大）
+- 按天聚合：(日期, 阶段, 调用点, provider, 模型, 缓存状态, 用户) -> 调用数 / 失败数 / token / 耗时；
+  进程内保留最近 LLM_USAGE_RETENTION_DAYS 天，配置了 Mongo 时每 LLM_USAGE_FLUSH_INTERVAL 秒
+  把增量 $inc 到 llm_usage_daily 集合（多个 worker 累加到同一文档），查询时优先读 Mongo
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from core.config import settings
+from core.metrics import counter, histogram
+
+try:
+    from pymongo import UpdateOne
+except Exception:  # 未安装 pymongo 时只保留进程内聚合
+    UpdateOne = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+LLM_USAGE_CALLS = counter(
+    "llm_usage_calls_total", "LLM calls by stage, provider, model, cache status and outcome",
+    ["stage", "endpoint", "provider", "model", "cache", "outcome"],
+)
+LLM_USAGE_TOKENS = counter(
+    "llm_usage_tokens_total", "Provider tokens by stage, provider, model and kind (prompt / completion)",
+    ["stage", "endpoint", "provider", "model", "kind"],
+)
+LLM_USAGE_LATENCY = histogram(
+    "llm_usage_latency_seconds", "LLM call latency by stage, provider and cache status",
+    ["stage", "provider", "cache"],
+)
+LLM_USAGE_CALL_TOKENS = histogram(
+    "llm_usage_call_tokens", "Tokens per provider call by stage and kind", ["stage", "kind"],
+    buckets=(25, 50, 100, 250, 500, 1000, 2000, 4000, 8000),
+)
+LLM_USAGE_TRUNCATED = counter(
+    "llm_usage_truncated_total", "Completions cut off by max_tokens (finish_reason=length)", ["endpoint"]
+)
+
+# 调用点前缀 -> 调用阶段（按最长前缀匹配）
+STAGES: Dict[str, str] = {
+    "classifier": "classifier",
+    "decoder.refine": "refiner",
+    "risk": "risk",
+    "decoder.translate": "translate",
+    "decoder.semantic": "semantic",
+    "decoder.fused": "decoder",
+    "companion": "companion",
+}
+
+# 聚合字段
+_FIELDS = ("calls", "errors", "prompt_tokens", "completion_tokens", "latency_ms_sum", "estimated", "truncated")
+_KEY_FIELDS = ("day", "stage", "endpoint", "provider", "model", "cache", "user_id")
+
+UsageKey = Tuple[str, str, str, str, str, str, str]
+
+_usage_user: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar("llm_usage_user", default=None)
+
+_llm_usage_ledger_instance: Optional["LLMUsageLedger"] = None
+
+
+@contextmanager
+def llm_usage_user(user_id: Optional[str]) -> Iterator[None]:
+    """期间（含派生的任务）发起的 LLM 调用记到 user_id"""
+    token = _usage_user.set(user_id)
+    try:
+        yield
+    finally:
+        try:
+            _usage_user.reset(token)
+        except ValueError:
+            # 跨 yield 使用时生成器可能在另一个 Context 中被关闭（如客户端断开后由事件循环回收），原 Context 已不再使用
+            pass
+
+
+def current_usage_user() -> Optional[str]:
+    return _usage_user.get()
+
+
+def endpoint_stage(endpoint: str) -> str:
+    best = ""
+    for prefix in STAGES:
+        if (endpoint == prefix or endpoint.startswith(prefix + ".") or endpoint.startswith(prefix + "_")) \
+                and len(prefix) > len(best):
+            best = prefix
+    return STAGES[best] if best else endpoint.split(".")[0]
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+class LLMUsageLedger:
+    """LLM 用量按天聚合（进程内 + Mongo 增量）"""
+
+    def __init__(self, retention_days: Optional[int] = None, persist: bool = True) -> None:
+        self.retention_days = retention_days or settings.LLM_USAGE_RETENTION_DAYS
+        self.persist = persist
+        self._days: Dict[UsageKey, Dict[str, float]] = {}
+        # 尚未写入 Mongo 的增量
+        self._pending: Dict[UsageKey, Dict[str, float]] = {}
+        self._current_day = ""
+        self._flush_lock = asyncio.Lock()
+
+    def record(
+        self,
+        endpoint: str,
+        provider: str,
+        model: str,
+        cache: str,
+        outcome: str,
+        latency: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        estimated: bool = False,
+        truncated: bool = False,
+        user_id: Optional[str] = None,
+    ) -> None:
+        """
+        Args:
+            cache: hit（响应缓存命中）/ coalesced（复用相同请求的在途调用）/ miss（可缓存、请求了 provider）/
+                bypass（不可缓存的调用）
+            outcome: ok / error / timeout / cancelled
+        """
+        stage = endpoint_stage(endpoint)
+        LLM_USAGE_CALLS.labels(
+            stage=stage, endpoint=endpoint, provider=provider, model=model, cache=cache, outcome=outcome
+        ).inc()
+        LLM_USAGE_LATENCY.labels(stage=stage, provider=provider, cache=cache).observe(latency)
+        if prompt_tokens or completion_tokens:
+            for kind, tokens in (("prompt", prompt_tokens), ("completion", completion_tokens)):
+                LLM_USAGE_TOKENS.labels(
+                    stage=stage, endpoint=endpoint, provider=provider, model=model, kind=kind
+                ).inc(tokens)
+                LLM_USAGE_CALL_TOKENS.labels(stage=stage, kind=kind).observe(tokens)
+        if truncated:
+            LLM_USAGE_TRUNCATED.labels(endpoint=endpoint).inc()
+
+        if user_id is None:
+            user_id = current_usage_user()
+        day = _today()
+        if day != self._current_day:
+            self._current_day = day
+            self._expire()
+        key: UsageKey = (day, stage, endpoint, provider, model, cache, user_id or "")
+        delta = {
+            "calls": 1,
+            "errors": int(outcome != "ok"),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency_ms_sum": latency * 1000,
+            "estimated": int(estimated),
+            "truncated": int(truncated),
+        }
+        for target in (self._days, self._pending) if self._collection() is not None else (self._days,):
+            totals = target.get(key)
+            if totals is None:
+                totals = target[key] = dict.fromkeys(_FIELDS, 0)
+                totals["latency_ms_max"] = 0.0
+            for field, value in delta.items():
+                totals[field] += value
+            totals["latency_ms_max"] = max(totals["latency_ms_max"], latency * 1000)
+
+    def _expire(self) -> None:
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        for key in [key for key in self._days if key[0] < cutoff]:
+            del self._days[key]
+
+    # ===== Mongo =====
+
+    def _collection(self) -> Any:
+        if not self.persist or UpdateOne is None:
+            return None
+        from services.db_service import get_mongo_client
+
+        client = get_mongo_client()
+        return client[settings.MONGO_DB].llm_usage_daily if client is not None else None
+
+    async def flush(self) -> int:
+        """把增量写入 Mongo，返回写入的文档数"""
+        async with self._flush_lock:
+            pending, self._pending = self._pending, {}
+            collection = self._collection()
+            if not pending or collection is None:
+                return 0
+            operations = []
+            for key, totals in pending.items():
+                fields = dict(zip(_KEY_FIELDS, key))
+                operations.append(UpdateOne(
+                    {"_id": "|".join(key)},
+                    {
+                        "$setOnInsert": fields,
+                        "$inc": {field: totals[field] for field in _FIELDS},
+                        "$max": {"latency_ms_max": totals["latency_ms_max"]},
+                    },
+                    upsert=True,
+                ))
+            try:
+                await collection.bulk_write(operations, ordered=False)
+            except Exception as exc:
+                # 写入失败时放回，下次一起写
+                logger.warning("LLM usage flush failed (%d rows kept for retry): %s", len(pending), exc)
+                for key, totals in pending.items():
+                    merged = self._pending.setdefault(key, dict.fromkeys(_FIELDS, 0) | {"latency_ms_max": 0.0})
+                    for field in _FIELDS:
+                        merged[field] += totals[field]
+                    merged["latency_ms_max"] = max(merged["latency_ms_max"], totals["latency_ms_max"])
+                return 0
+            return len(operations)
+
+    async def run_flush_loop(self, interval: float) -> None:
+        """定期把增量写入 Mongo"""
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    # ===== 查询 =====
+
+    async def query(
+        self,
+        days: int = 7,
+        group_by: Optional[List[str]] = None,
+        user_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        最近 days 天的用量，按 group_by（day / stage / endpoint / provider / model / cache / user_id 的组合，
+        默认 day + stage）汇总；配置了 Mongo 时查询 llm_usage_daily（先写入本进程的增量），否则查询进程内聚合
+        """
+        group_by = [field for field in (group_by or ["day", "stage"]) if field in _KEY_FIELDS]
+        since = (datetime.now(timezone.utc) - timedelta(days=max(1, days) - 1)).strftime("%Y-%m-%d")
+
+        collection = self._collection()
+        if collection is not None:
+            await self.flush()
+            match: Dict[str, Any] = {"day": {"$gte": since}}
+            if user_id is not None:
+                match["user_id"] = user_id
+            pipeline = [
+                {"$match": match},
+                {"$group": {
+                    "_id": {field: f"${field}" for field in group_by},
+                    **{field: {"$sum": f"${field}"} for field in _FIELDS},
+                    "latency_ms_max": {"$max": "$latency_ms_max"},
+                }},
+            ]
+            try:
+                rows = [
+                    {**doc.pop("_id"), **doc}
+                    async for doc in collection.aggregate(pipeline)
+                ]
+                return self._finish(rows, group_by)
+            except Exception as exc:
+                logger.warning("LLM usage query failed, falling back to in-process totals: %s", exc)
+
+        grouped: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        for key, totals in self._days.items():
+            fields = dict(zip(_KEY_FIELDS, key))
+            if fields["day"] < since or (user_id is not None and fields["user_id"] != user_id):
+                continue
+            group_key = tuple(fields[field] for field in group_by)
+            row = grouped.get(group_key)
+            if row is None:
+                row = grouped[group_key] = {
+                    **{field: fields[field] for field in group_by},
+                    **dict.fromkeys(_FIELDS, 0),
+                    "latency_ms_max": 0.0,
+                }
+            for field in _FIELDS:
+                row[field] += totals[field]
+            row["latency_ms_max"] = max(row["latency_ms_max"], totals["latency_ms_max"])
+        return self._finish(list(grouped.values()), group_by)
+
+    @staticmethod
+    def _finish(rows: List[Dict[str, Any]], group_by: List[str]) -> List[Dict[str, Any]]:
+        for row in rows:
+            row["total_tokens"] = row["prompt_tokens"] + row["completion_tokens"]
+            row["avg_latency_ms"] = round(row["latency_ms_sum"] / row["calls"], 1) if row["calls"] else 0.0
+            row["latency_ms_sum"] = round(row["latency_ms_sum"], 1)
+            row["latency_ms_max"] = round(row["latency_ms_max"], 1)
+        return sorted(rows, key=lambda row: tuple(str(row.get(field, "")) for field in group_by))
+
+
+def get_llm_usage_ledger() -> LLMUsageLedger:
+    """获取 LLM 用量记录单例"""
+    global _llm_usage_ledger_instance
+    if _llm_usage_ledger_instance is None:
+        _llm_usage_ledger_instance = LLMUsageLedger()
+    return _llm_usage_ledger_instance
@@ -0,0 +1,252 @@
+"""
+近似重复文本缓存：字符 n-gram MinHash + LSH 分桶，复用相似输入的 AI 分类结果
+
+- 文本先规范化：小写、去掉空白和标点、去掉句末语气词（吧 / 呢 / 啊 ...），
+  规范化后相同的文本直接精确命中
+- 规范化后不少于 NEAR_DUP_MIN_CHARS 个字符的文本做 MinHash（NumPy 向量化的 (a·x + b) mod p），
+  签名按 bands × rows 分桶；同桶候选再用 n-gram 集合的精确 Jaccard 复核，
+  不低于 NEAR_DUP_THRESHOLD 才算命中（LSH 只用于缩小候选范围）；
+  否定词（不 / 没 / 别 ...）必须完全一致，避免「想去」命中「不想去」
+- scope 把条目分组（如解码三级精炼按一、二级分类结果分组），只在同一 scope 内匹配
+- 命中质量：记录命中时的相似度分布；按 NEAR_DUP_AUDIT_RATE 抽样的命中会照常请求 provider，
+  比较两者结果是否一致（record_audit）
+"""
+from __future__ import annotations
+
+import random
+import re
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.metrics import counter, histogram
+
+NEAR_DUP_REQUESTS = counter(
+    "near_dup_cache_requests_total", "Near-duplicate cache lookups", ["cache", "result"]
+)
+NEAR_DUP_HIT_SIMILARITY = histogram(
+    "near_dup_cache_hit_similarity", "Jaccard similarity between a query and the cached input it reused",
+    ["cache"], buckets=(0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1.0),
+)
+NEAR_DUP_AUDITS = counter(
+    "near_dup_cache_audits_total", "Sampled near-duplicate hits re-checked against the provider", ["cache", "agree"]
+)
+
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+_PUNCTUATION_RE = re.compile(r'[\s\W_]+')
+# 句末语气词：只影响语气，不改变场景
+_TRAILING_PARTICLES = "吧呢啊呀嘛哦哈啦诶哎唉呗咯喔"
+# 否定词：改一个字就会反转意思，近似命中要求两边的否定词序列相同
+_NEGATIONS = frozenset("不没别非无未莫勿")
+
+_near_duplicate_caches: Dict[str, "NearDuplicateCache"] = {}
+
+
+def normalize_text(text: str) -> str:
+    normalized = _PUNCTUATION_RE.sub("", text.lower())
+    return normalized.rstrip(_TRAILING_PARTICLES) or normalized
+
+
+def shingles(normalized: str, ngram: int) -> FrozenSet[str]:
+    if len(normalized) <= ngram:
+        return frozenset([normalized])
+    return frozenset(normalized[i:i + ngram] for i in range(len(normalized) - ngram + 1))
+
+
+def negations(normalized: str) -> str:
+    return "".join(char for char in normalized if char in _NEGATIONS)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class _Entry:
+    __slots__ = ("scope", "normalized", "negations", "shingles", "band_keys", "value")
+
+    def __init__(self, scope: str, normalized: str, grams: FrozenSet[str], band_keys: List[bytes], value: Any):
+        self.scope = scope
+        self.normalized = normalized
+        self.negations = negations(normalized)
+        self.shingles = grams
+        self.band_keys = band_keys
+        self.value = value
+
+
+class NearDuplicateCache:
+    """按文本相似度命中的 LRU 缓存（进程内，单事件循环线程使用）"""
+
+    def __init__(
+        self,
+        name: str,
+        threshold: Optional[float] = None,
+        capacity: Optional[int] = None,
+        ngram: int = 2,
+        num_perm: int = 64,
+        bands: int = 16,
+        min_chars: Optional[int] = None,
+        audit_rate: Optional[float] = None,
+        seed: int = 1,
+    ) -> None:
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.name = name
+        self.threshold = settings.NEAR_DUP_THRESHOLD if threshold is None else threshold
+        self.capacity = settings.NEAR_DUP_CACHE_SIZE if capacity is None else capacity
+        self.ngram = ngram
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.min_chars = settings.NEAR_DUP_MIN_CHARS if min_chars is None else min_chars
+        self.audit_rate = settings.NEAR_DUP_AUDIT_RATE if audit_rate is None else audit_rate
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._exact: Dict[Tuple[str, str], int] = {}
+        self._buckets: List[Dict[bytes, set]] = [{} for _ in range(bands)]
+        self._next_id = 0
+        self._counts: Dict[str, int] = {"exact_hits": 0, "near_hits": 0, "misses": 0}
+        self._similarity_sum = 0.0
+        self._audits: Dict[str, int] = {"agree": 0, "disagree": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    # ===== MinHash / LSH =====
+
+    def _band_keys(self, scope: str, grams: FrozenSet[str]) -> List[bytes]:
+        hashes = np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+        # (a·x + b) mod p：a、b < 2^31，x < 2^32，乘积不会溢出 uint64
+        signature = ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+        prefix = scope.encode("utf-8") + b"\x00"
+        return [
+            prefix + signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    # ===== 读写 =====
+
+    def lookup(self, text: str, scope: str = "") -> Optional[Tuple[Any, float]]:
+        """返回（缓存值，与命中条目的 Jaccard 相似度），未命中返回 None"""
+        if not self.enabled:
+            return None
+        normalized = normalize_text(text)
+        entry_id = self._exact.get((scope, normalized))
+        if entry_id is not None:
+            return self._hit(entry_id, 1.0, "exact")
+
+        if len(normalized) < self.min_chars:
+            # 短文本改一个字就可能改变意思，只做规范化后的精确匹配
+            self._counts["misses"] += 1
+            NEAR_DUP_REQUESTS.labels(cache=self.name, result="miss").inc()
+            return None
+
+        grams = shingles(normalized, self.ngram)
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._band_keys(scope, grams)):
+            candidates.update(bucket.get(key, ()))
+        query_negations = negations(normalized)
+        best_id, best_similarity = None, 0.0
+        for candidate in candidates:
+            entry = self._entries[candidate]
+            if entry.negations != query_negations:
+                continue
+            similarity = jaccard(grams, entry.shingles)
+            if similarity > best_similarity:
+                best_id, best_similarity = candidate, similarity
+        if best_id is not None and best_similarity >= self.threshold:
+            return self._hit(best_id, best_similarity, "near")
+
+        self._counts["misses"] += 1
+        NEAR_DUP_REQUESTS.labels(cache=self.name, result="miss").inc()
+        return None
+
+    def put(self, text: str, value: Any, scope: str = "") -> None:
+        if not self.enabled:
+            return
+        normalized = normalize_text(text)
+        existing = self._exact.get((scope, normalized))
+        if existing is not None:
+            self._entries[existing].value = value
+            self._entries.move_to_end(existing)
+            return
+
+        grams = shingles(normalized, self.ngram)
+        band_keys = self._band_keys(scope, grams) if len(normalized) >= self.min_chars else []
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = _Entry(scope, normalized, grams, band_keys, value)
+        self._exact[(scope, normalized)] = entry_id
+        for bucket, key in zip(self._buckets, band_keys):
+            bucket.setdefault(key, set()).add(entry_id)
+        while len(self._entries) > self.capacity:
+            self._evict()
+
+    def _evict(self) -> None:
+        entry_id, entry = self._entries.popitem(last=False)
+        del self._exact[(entry.scope, entry.normalized)]
+        for bucket, key in zip(self._buckets, entry.band_keys):
+            members = bucket.get(key)
+            if members is not None:
+                members.discard(entry_id)
+                if not members:
+                    del bucket[key]
+
+    def _hit(self, entry_id: int, similarity: float, kind: str) -> Tuple[Any, float]:
+        self._entries.move_to_end(entry_id)
+        self._counts[f"{kind}_hits"] += 1
+        self._similarity_sum += similarity
+        NEAR_DUP_REQUESTS.labels(cache=self.name, result=f"{kind}_hit").inc()
+        NEAR_DUP_HIT_SIMILARITY.labels(cache=self.name).observe(similarity)
+        return self._entries[entry_id].value, similarity
+
+    # ===== 命中质量 =====
+
+    def should_audit(self) -> bool:
+        """命中后是否抽样复核（照常请求 provider 并比较结果）"""
+        return self.audit_rate > 0 and random.random() < self.audit_rate
+
+    def record_audit(self, agree: bool) -> None:
+        self._audits["agree" if agree else "disagree"] += 1
+        NEAR_DUP_AUDITS.labels(cache=self.name, agree=str(agree).lower()).inc()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._exact.clear()
+        for bucket in self._buckets:
+            bucket.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self._counts["exact_hits"] + self._counts["near_hits"]
+        lookups = hits + self._counts["misses"]
+        audits = self._audits["agree"] + self._audits["disagree"]
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "min_chars": self.min_chars,
+            **self._counts,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "avg_hit_similarity": round(self._similarity_sum / hits, 4) if hits else 0.0,
+            "audits": dict(self._audits),
+            "audit_agreement": round(self._audits["agree"] / audits, 4) if audits else None,
+        }
+
+
+def get_near_duplicate_cache(name: str) -> NearDuplicateCache:
+    """按名称获取近似重复缓存（每个调用点一个实例）"""
+    cache = _near_duplicate_caches.get(name)
+    if cache is None:
+        cache = _near_duplicate_caches[name] = NearDuplicateCache(name)
+    return cache
+
+
+def near_duplicate_cache_stats() -> List[Dict[str, Any]]:
+    return [cache.stats() for cache in _near_duplicate_caches.values()]
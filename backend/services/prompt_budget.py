@@ -0,0 +1,148 @@
+"""
+Prompt token 预算：按段估算 token 数，超出预算时按优先级截断 / 丢弃低优先级的段
+
+- estimate_tokens 为不依赖分词器的估算：CJK 字符每字 1 token，其余字符约 4 个 1 token
+  （对 gpt-4o / deepseek 的中英文混合文本略偏高，作为上限使用）
+- 各段按 priority 从低到高依次收缩（同优先级先收缩靠后的段）；required 段（persona、安全指令、
+  用户消息）不截断；截断后剩余不足 min_tokens 的段整段丢弃
+- keep="tail" 保留末尾（对话历史保留最近的轮次），keep="head" 保留开头（检索文档、场景说明）；
+  按行截断时丢掉被截断的半行
+- 每次装配的截断前 / 后 token 数按调用点记入 prompt_tokens 直方图，被截断 / 丢弃的段记入 prompt_sections_trimmed_total
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, NamedTuple
+
+from core.metrics import counter, histogram
+
+PROMPT_TOKENS = histogram(
+    "prompt_tokens", "Estimated prompt tokens before and after budget trimming", ["site", "stage"],
+    buckets=(100, 250, 500, 1000, 1500, 2000, 3000, 4000, 8000, 16000),
+)
+PROMPT_SECTIONS_TRIMMED = counter(
+    "prompt_sections_trimmed_total", "Prompt sections truncated or dropped to fit the token budget",
+    ["site", "section", "action"],
+)
+
+_CJK_RE = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+
+class PromptSection(NamedTuple):
+    name: str
+    text: str
+    priority: float = 0.0
+    required: bool = False
+    keep: str = "head"
+    min_tokens: int = 0
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "head") -> str:
+    """截断到不超过 max_tokens（估算）；keep="tail" 保留末尾"""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # 二分查找保留的字符数
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        part = text[-mid:] if keep == "tail" else text[:mid]
+        if estimate_tokens(part) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    # 截断点不在行边界时丢掉被截断的半行（只有一行时保留）
+    if keep == "tail":
+        part = text[len(text) - low:]
+        if text[len(text) - low - 1] == "\n":
+            return part
+        cut = part.find("\n")
+        return part[cut + 1:] if 0 <= cut < len(part) - 1 else part
+    part = text[:low]
+    if text[low] == "\n":
+        return part
+    cut = part.rfind("\n")
+    return part[:cut] if cut > 0 else part
+
+
+class PromptBudgetResult:
+    """装配结果：收缩后的各段（与输入同序，丢弃的段 text 为空）和截断前 / 后的 token 数"""
+
+    def __init__(self, sections: List[PromptSection], tokens_before: int, tokens_after: int,
+                 trimmed: Dict[str, str]) -> None:
+        self.sections = sections
+        self.tokens_before = tokens_before
+        self.tokens_after = tokens_after
+        self.trimmed = trimmed
+
+    def text(self, name: str) -> str:
+        for section in self.sections:
+            if section.name == name:
+                return section.text
+        return ""
+
+    def texts(self, prefix: str) -> List[str]:
+        """名称以 prefix 开头、未被丢弃的段（如 "doc:" 检索文档）"""
+        return [s.text for s in self.sections if s.name.startswith(prefix) and s.text]
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "trimmed": dict(self.trimmed),
+        }
+
+
+def fit_sections(sections: List[PromptSection], max_tokens: int, site: str) -> PromptBudgetResult:
+    """
+    按优先级把各段收缩到总计不超过 max_tokens（max_tokens <= 0 表示不限制）
+
+    只有 required 段时可能仍然超出预算，此时原样返回
+    """
+    tokens = [estimate_tokens(section.text) for section in sections]
+    before = sum(tokens)
+    fitted = list(sections)
+    trimmed: Dict[str, str] = {}
+    overflow = before - max_tokens if max_tokens > 0 else 0
+
+    order = sorted(range(len(sections)), key=lambda i: (sections[i].priority, -i))
+    for i in order:
+        if overflow <= 0:
+            break
+        section = sections[i]
+        if section.required or not tokens[i]:
+            continue
+        keep_tokens = tokens[i] - overflow
+        text = ""
+        if keep_tokens >= max(1, section.min_tokens):
+            text = truncate_to_tokens(section.text, keep_tokens, section.keep)
+        new_tokens = estimate_tokens(text)
+        overflow -= tokens[i] - new_tokens
+        tokens[i] = new_tokens
+        fitted[i] = section._replace(text=text)
+        action = "truncated" if text else "dropped"
+        trimmed[section.name] = action
+        PROMPT_SECTIONS_TRIMMED.labels(site=site, section=section.name.split(":")[0], action=action).inc()
+
+    after = sum(tokens)
+    PROMPT_TOKENS.labels(site=site, stage="before").observe(before)
+    PROMPT_TOKENS.labels(site=site, stage="after").observe(after)
+    return PromptBudgetResult(fitted, before, after, trimmed)
+
+
+def render_history(history: List[Dict[str, Any]], user_label: str = "User",
+                   assistant_label: str = "Companion") -> str:
+    lines = []
+    for log in history:
+        speaker = user_label if log.get("role") == "user" else assistant_label
+        lines.append(f"{speaker}: {log.get('content', '')}")
+    return "\n".join(lines)
+
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+from core.config import settings
 from services.companion.style_controller import StyleController
+from services.prompt_budget import PromptBudgetResult, PromptSection, fit_sections
 from services.template_service import TemplateService
 
 try:
@@ -26,6 +28,9 @@ class PromptCompiler:
     - 如果用户最近情绪低 / 敏感度高 -> 自动注入更温柔的语气
     - 如果是“冲突场景” -> 自动加入 ASD 解释模板
     - 如果存在风险 -> 注入安全风格与注意事项
+
+    编译结果受 PROMPT_COMPILER_MAX_TOKENS 约束：超出时先截掉记忆提示，再依次收缩 ASD 解释、语气调整；
+    基础模板和安全指令不截断
     """
 
     def __init__(self) -> None:
@@ -39,6 +44,7 @@ class PromptCompiler:
         user_state: Optional[Dict[str, Any]] = None,
         context: Optional[Dict[str, Any]] = None,
         memory: Optional[List[Dict[str, Any]]] = None,
+        max_tokens: Optional[int] = None,
     ) -> str:
         """
         编译 Prompt：
@@ -59,30 +65,49 @@ class PromptCompiler:
                     "risk": {...},
                 }
             memory: 历史对话或长期记忆列表（可选，用于少量摘要）
+            max_tokens: token 预算（默认 PROMPT_COMPILER_MAX_TOKENS，0 表示不限制）
         """
-        enhanced = template
-
-        # 1. 情绪 & Profile 驱动的语气调整（更温柔）
-        tone_block = self._build_tone_block(user_state)
-        if tone_block:
-            enhanced += f"\n\n[Tone adjustment]\n{tone_block}"
-
-        # 2. 场景为“冲突”等时，自动注入 ASD 解释模板
-        asd_block = self._build_asd_block(context)
-        if asd_block:
-            enhanced += f"\n\n[ASD-friendly explanation]\n{asd_block}"
+        prompt, _ = self.compile_with_report(template, user_state, context, memory, max_tokens)
+        return prompt
 
-        # 3. 风险相关的安全指令
-        safety_block = self._build_safety_block(user_state, context)
-        if safety_block:
-            enhanced += f"\n\n[Safety style]\n{safety_block}"
-
-        # 4. 如有需要，可基于 memory 做极简摘要指令
-        memory_hint = self._build_memory_hint(memory)
-        if memory_hint:
-            enhanced += f"\n\n[Memory hint]\n{memory_hint}"
+    def compile_with_report(
+        self,
+        template: str,
+        user_state: Optional[Dict[str, Any]] = None,
+        context: Optional[Dict[str, Any]] = None,
+        memory: Optional[List[Dict[str, Any]]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Tuple[str, PromptBudgetResult]:
+        """与 compile 相同，同时返回装配结果（截断前 / 后的 token 数、被截断的块）"""
+        sections = [
+            PromptSection("template", template, required=True),
+            # 1. 情绪 & Profile 驱动的语气调整（更温柔）
+            PromptSection("tone", self._build_tone_block(user_state), priority=60),
+            # 2. 场景为“冲突”等时，自动注入 ASD 解释模板
+            PromptSection("asd", self._build_asd_block(context), priority=50, min_tokens=30),
+            # 3. 风险相关的安全指令
+            PromptSection("safety", self._build_safety_block(user_state, context), required=True),
+            # 4. 如有需要，可基于 memory 做极简摘要指令
+            PromptSection("memory", self._build_memory_hint(memory), priority=10, min_tokens=10),
+        ]
+        budget = fit_sections(
+            sections,
+            settings.PROMPT_COMPILER_MAX_TOKENS if max_tokens is None else max_tokens,
+            site="prompt_compiler",
+        )
 
-        return enhanced
+        enhanced = template
+        for name, title in (
+            ("tone", "Tone adjustment"),
+            ("asd", "ASD-friendly explanation"),
+            ("safety", "Safety style"),
+            ("memory", "Memory hint"),
+        ):
+            block = budget.text(name)
+            if block:
+                enhanced += f"\n\n[{title}]\n{block}"
+
+        return enhanced, budget
 
     # ===== 内部构建块 =====
 
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+import json
 from typing import Dict, Any, Optional, List
 from statistics import mean
 
@@ -13,6 +15,7 @@ from services.emotion_providers import (
 )
 from services.emotion_service import EmotionService
 from services.emotion_fusion import EmotionFusionModule, FusionStrategy
+from services.latency_budget import LatencyBudget, get_late_result_store
 from core.config import settings
 
 
@@ -22,15 +25,18 @@ class RealTimeEmotionService:
     def __init__(
         self,
         fusion_strategy: Optional[FusionStrategy] = None,
-        fusion_weights: Optional[Dict[str, float]] = None
+        fusion_weights: Optional[Dict[str, float]] = None,
+        emotion_service: Optional[EmotionService] = None,
     ):
-        self.emotion_service = EmotionService()
+        self.emotion_service = emotion_service or EmotionService()
         self.text_provider = build_text_provider()
         self.voice_provider = build_voice_provider()
         self.face_provider = build_face_provider()
         self.text_fallback = HeuristicTextProvider()
         self.voice_fallback = HeuristicVoiceProvider()
         self.face_fallback = HeuristicFaceProvider()
+        # 超出延迟预算、在后台完成的外部模型结果（相同输入的下一次请求直接使用）
+        self.late_results = get_late_result_store("realtime.emotion")
         
         # 初始化融合模块（从配置或参数获取）
         if fusion_strategy is None:
@@ -64,6 +70,36 @@ class RealTimeEmotionService:
         result.setdefault("source", source)
         return result
 
+    async def _run_provider_within(
+        self,
+        provider,
+        payload: Dict[str, Any],
+        fallback,
+        source: str,
+        budget: LatencyBudget,
+    ) -> Dict[str, Any]:
+        """有延迟预算时外部模型 provider 在线程中执行，超出预算改用启发式 provider"""
+        if not budget.limited or type(provider) is type(fallback):
+            return self._run_provider(provider, payload, fallback, source)
+
+        key = (source, json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str))
+        result = self.late_results.get(key)
+        if result is None:
+            try:
+                completed, result = await budget.run(
+                    f"emotion.{source}",
+                    asyncio.to_thread(provider.analyze, payload),
+                    on_complete=lambda late: self.late_results.put(key, late),
+                )
+                if not completed:
+                    result = fallback.analyze(payload)
+            except Exception:
+                result = fallback.analyze(payload)
+        result = dict(result)
+        result.setdefault("details", payload)
+        result.setdefault("source", source)
+        return result
+
     def analyze_text(self, text: str) -> Dict[str, Any]:
         return self._run_provider(
             self.text_provider,
@@ -144,20 +180,40 @@ class RealTimeEmotionService:
         text: Optional[str] = None,
         voice_features: Optional[Dict[str, float]] = None,
         face_features: Optional[Dict[str, float]] = None,
+        latency_budget_ms: Optional[float] = None,
     ) -> Dict[str, Any]:
-        """综合分析入口。"""
-        modality_results: List[Dict[str, Any]] = []
+        """
+        综合分析入口。
+
+        latency_budget_ms：延迟预算（毫秒，默认 REALTIME_LATENCY_BUDGET_MS）；
+        外部模型 provider 超出预算时改用启发式结果，返回值 degraded 为 True
+        """
+        budget = LatencyBudget(
+            settings.REALTIME_LATENCY_BUDGET_MS if latency_budget_ms is None else latency_budget_ms
+        )
+        calls = []
 
         if text:
-            modality_results.append(self.analyze_text(text))
+            calls.append(self._run_provider_within(
+                self.text_provider, {"text": text}, self.text_fallback, "text", budget
+            ))
 
         if voice_features:
-            modality_results.append(self.analyze_voice(voice_features))
+            calls.append(self._run_provider_within(
+                self.voice_provider, voice_features, self.voice_fallback, "voice", budget
+            ))
 
         if face_features:
-            modality_results.append(self.analyze_face(face_features))
+            calls.append(self._run_provider_within(
+                self.face_provider, face_features, self.face_fallback, "face", budget
+            ))
+
+        # 各模态共用同一个预算，并行执行
+        modality_results: List[Dict[str, Any]] = list(await asyncio.gather(*calls))
 
         fused = await self.fuse_results(modality_results, user_id=user_id)
+        fused["degraded"] = budget.degraded
+        fused["latency_budget"] = budget.info()
 
         # 联动情感导师：同步记录情绪
         if user_id and text:
@@ -1,19 +1,25 @@
 """风险检测服务：检测情绪风险和安全问题"""
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from services.ai_service import AIService
 from services.emotion_profile_service import EmotionProfileService
-from services.config_service import get_config_service
+from services.rules.matcher import find_words
+from services.decoder.text_features import TextFeatures
 
 
 class RiskDetectionService:
     """风险检测服务：检测情绪风险和安全问题"""
     
-    def __init__(self):
-        self.ai_service = AIService()
+    def __init__(self, ai_service: Optional[AIService] = None):
+        self.ai_service = ai_service or AIService()
         self.profile_service = EmotionProfileService()
-        self.config_service = get_config_service()
     
-    async def detect(self, text: str, use_ai: bool = True, user_id: Optional[str] = None) -> Dict[str, Any]:
+    async def detect(
+        self,
+        text: str,
+        use_ai: bool = True,
+        user_id: Optional[str] = None,
+        features: Optional[TextFeatures] = None
+    ) -> Dict[str, Any]:
         """
         检测风险
         
@@ -21,6 +27,7 @@ class RiskDetectionService:
             text: 文本内容
             use_ai: 是否使用AI
             user_id: 用户ID（用于获取Profile）
+            features: 解码流水线共享的文本特征（未传入时自行计算）
         
         Returns:
             {
@@ -31,12 +38,14 @@ class RiskDetectionService:
                 "suggestions": ["建议1", "建议2"]
             }
         """
+        features = features or TextFeatures(text)
+        
         # 基础风险检测
-        base_risk = await self._detect_base_risk(text)
+        base_risk = await self._detect_base_risk(text, features)
         
         # 如果提供了用户ID，使用Profile进行个性化风险检测
         if user_id:
-            profile_risk = await self._detect_with_profile(text, user_id)
+            profile_risk = await self._detect_with_profile(text, user_id, features)
             # 合并结果
             risk_level = self._merge_risk_levels(base_risk["risk_level"], profile_risk["risk_level"])
             reasons = base_risk["reasons"] + profile_risk["reasons"]
@@ -47,13 +56,30 @@ class RiskDetectionService:
             suggestions = base_risk["suggestions"]
         
         # AI增强检测（如果启用）
-        if use_ai and self.ai_service._client:
+        if use_ai and self.ai_service.available:
             ai_risk = await self._detect_with_ai(text)
             if ai_risk["risk_level"] == "high" or risk_level == "low":
                 risk_level = ai_risk["risk_level"]
                 reasons.extend(ai_risk["reasons"])
                 suggestions.extend(ai_risk["suggestions"])
         
+        return self._build_result(risk_level, reasons, suggestions)
+    
+    def merge_ai_risk(self, result: Dict[str, Any], ai_risk: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        把外部得到的 AI 风险结果（如融合解码的一次调用）合并进规则检测结果（detect(use_ai=False) 的返回值），
+        合并规则与 detect 内的 AI 增强检测相同
+        """
+        risk_level = result["risk_level"]
+        reasons = list(result["reasons"])
+        suggestions = list(result["suggestions"])
+        if ai_risk.get("risk_level") == "high" or risk_level == "low":
+            risk_level = ai_risk.get("risk_level", risk_level)
+            reasons.extend(ai_risk.get("reasons", []))
+            suggestions.extend(ai_risk.get("suggestions", []))
+        return self._build_result(risk_level, reasons, suggestions)
+    
+    def _build_result(self, risk_level: str, reasons: List[str], suggestions: List[str]) -> Dict[str, Any]:
         return {
             "risk_level": risk_level,
             "risk_type": "情绪风险" if risk_level != "low" else "无风险",
@@ -62,46 +88,29 @@ class RiskDetectionService:
             "suggestions": list(set(suggestions))[:5]  # 去重并限制数量
         }
     
-    async def _detect_base_risk(self, text: str) -> Dict[str, Any]:
+    async def _detect_base_risk(self, text: str, features: Optional[TextFeatures] = None) -> Dict[str, Any]:
         """基础风险检测（规则，使用可配置的风险词库）"""
-        text_lower = text.lower()
-        
-        # 从配置服务获取风险词库
-        try:
-            risk_keywords = await self.config_service.get_risk_keywords()
-            high_risk_words = risk_keywords.get("high_risk", [])
-            medium_risk_words = risk_keywords.get("medium_risk", [])
-            
-            # 如果配置中没有，使用默认值
-            if not high_risk_words:
-                high_risk_words = ["想死", "不想活了", "绝望", "崩溃", "自杀", "自残"]
-            if not medium_risk_words:
-                medium_risk_words = ["难过", "痛苦", "受不了", "压力大", "焦虑", "害怕"]
-        except Exception:
-            # 降级到默认值
-            high_risk_words = ["想死", "不想活了", "绝望", "崩溃", "自杀", "自残"]
-            medium_risk_words = ["难过", "痛苦", "受不了", "压力大", "焦虑", "害怕"]
+        # 风险词库已由配置服务编译进当前规则版本（配置为空时使用默认值），这里不再读取配置
+        hits = (features or TextFeatures(text)).hits
         
         risk_level = "low"
         reasons = []
         suggestions = []
         
         # 检测高风险词汇
-        for word in high_risk_words:
-            if word in text_lower:
-                risk_level = "high"
-                reasons.append(f"检测到高风险词汇：{word}")
-                suggestions.append("建议立即寻求专业帮助或联系紧急支持")
-                break
+        high_hits = hits.matched("risk", "high_risk")
+        if high_hits:
+            risk_level = "high"
+            reasons.append(f"检测到高风险词汇：{high_hits[0]}")
+            suggestions.append("建议立即寻求专业帮助或联系紧急支持")
         
         # 检测中风险词汇
         if risk_level == "low":
-            for word in medium_risk_words:
-                if word in text_lower:
-                    risk_level = "medium"
-                    reasons.append(f"检测到负面情绪词汇：{word}")
-                    suggestions.append("建议关注情绪变化，考虑寻求支持")
-                    break
+            medium_hits = hits.matched("risk", "medium_risk")
+            if medium_hits:
+                risk_level = "medium"
+                reasons.append(f"检测到负面情绪词汇：{medium_hits[0]}")
+                suggestions.append("建议关注情绪变化，考虑寻求支持")
         
         return {
             "risk_level": risk_level,
@@ -109,8 +118,14 @@ class RiskDetectionService:
             "suggestions": suggestions
         }
     
-    async def _detect_with_profile(self, text: str, user_id: str) -> Dict[str, Any]:
+    async def _detect_with_profile(
+        self,
+        text: str,
+        user_id: str,
+        features: Optional[TextFeatures] = None
+    ) -> Dict[str, Any]:
         """基于Profile的个性化风险检测"""
+        features = features or TextFeatures(text)
         try:
             profile = await self.profile_service.get_profile(user_id)
             
@@ -119,8 +134,7 @@ class RiskDetectionService:
             suggestions = []
             
             # 检查触发词
-            text_lower = text.lower()
-            matched_triggers = [word for word in profile.trigger_words if word in text_lower]
+            matched_triggers = find_words(profile.trigger_words, features.text_lower)
             
             if matched_triggers:
                 risk_level = "medium"
@@ -129,7 +143,7 @@ class RiskDetectionService:
             
             # 检查敏感度阈值
             # 如果用户敏感度高，且检测到负面内容，提升风险等级
-            if profile.sensitivity > 0.7 and any(word in text_lower for word in ["拒绝", "批评", "冲突"]):
+            if profile.sensitivity > 0.7 and features.hits.count("sensitive", "sensitive") > 0:
                 if risk_level == "low":
                     risk_level = "medium"
                 reasons.append(f"基于你的敏感度（{profile.sensitivity}），检测到可能引起情绪波动的内容")
@@ -178,9 +192,9 @@ class RiskDetectionService:
     "suggestions": ["建议1", "建议2"]
 }}"""
             
-            resp = self.ai_service._client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
+            result = await self.ai_service.gateway.chat_json(
+                "risk.detect",
+                [
                     {
                         "role": "system",
                         "content": "你是一个情绪风险检测专家，擅长识别文本中的情绪风险和安全问题。"
@@ -188,13 +202,9 @@ class RiskDetectionService:
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.3,
-                max_tokens=200,
-                response_format={"type": "json_object"}
+                max_tokens=200
             )
             
-            import json
-            result = json.loads(resp.choices[0].message.content or "{}")
-            
             return {
                 "risk_level": result.get("risk_level", "low"),
                 "reasons": result.get("reasons", []),
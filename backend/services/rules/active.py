@@ -0,0 +1,201 @@
+"""
+运行时规则：由 ConfigService 中的配置编译出的不可变规则版本（词库 + 自动机 + 风险词 + 阈值）
+
+- 请求处理中通过 get_active_rules() 同步读取当前版本，不再 await 配置 I/O
+- 规则类配置变更（set_config / delete_config）后调用 RuleRegistry.reload() 重新编译，
+  内容指纹变化时版本号 +1 并原子替换（单次属性赋值）
+- 多 worker 部署时，其余 worker 通过 RULE_REFRESH_INTERVAL 定期 reload 获取变更
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from services.config_service import ConfigCategory, get_config_service
+from services.rules.matcher import LexiconMatcher
+from services.rules.snapshot import get_rule_snapshot
+
+logger = logging.getLogger(__name__)
+
+# 变更后需要重新编译规则的配置类别
+RULE_CATEGORIES = frozenset(
+    {
+        ConfigCategory.RISK_KEYWORDS,
+        ConfigCategory.BEHAVIOR_CLASSIFICATION,
+        ConfigCategory.ALERT_THRESHOLDS,
+        ConfigCategory.CLASSIFIER_RULES,
+    }
+)
+
+DEFAULT_ALERT_THRESHOLDS: Dict[str, Any] = {
+    "emotion_intensity_high": 0.7,
+    "emotion_intensity_critical": 0.9,
+    "consecutive_negative_count": 3,
+    "risk_level_high": 0.8,
+}
+
+DEFAULT_CLASSIFIER_RULES: Dict[str, Any] = {
+    "confidence_threshold": 0.7,
+    "use_ai_refinement": True,
+}
+
+_rule_registry_instance: Optional["RuleRegistry"] = None
+
+
+class ActiveRules:
+    """某一版本的运行时规则（只读，构建后不再修改）"""
+
+    def __init__(
+        self,
+        version: int,
+        lexicons: Dict[str, Dict[str, List[str]]],
+        matcher: LexiconMatcher,
+        thresholds: Dict[str, Dict[str, Any]],
+        fingerprint: str,
+    ) -> None:
+        self.version = version
+        self.lexicons = lexicons
+        self.matcher = matcher
+        self.thresholds = thresholds
+        self.fingerprint = fingerprint
+        self.built_at = time.time()
+
+    @property
+    def scene_keywords(self) -> Dict[str, List[str]]:
+        return self.lexicons["scene"]
+
+    @property
+    def risk_words(self) -> Dict[str, List[str]]:
+        return self.lexicons["risk"]
+
+    @property
+    def alert_thresholds(self) -> Dict[str, Any]:
+        return self.thresholds["alert"]
+
+    @property
+    def classifier_rules(self) -> Dict[str, Any]:
+        return self.thresholds["classifier"]
+
+    def info(self) -> Dict[str, Any]:
+        """写入解码响应的版本信息"""
+        return {"version": self.version, "hash": self.fingerprint[:12]}
+
+
+def _config_values(config: Dict[str, Any]) -> Dict[str, Any]:
+    """去掉已标记删除的配置项"""
+    return {
+        key: value
+        for key, value in config.items()
+        if not (isinstance(value, dict) and value.get("_deleted"))
+    }
+
+
+def _merge_settings(defaults: Dict[str, Any], config: Dict[str, Any], key: str) -> Dict[str, Any]:
+    """阈值类配置：数据库中存为 {key: {...}}，默认配置为平铺字典，两种形式都兼容"""
+    config = _config_values(config)
+    value = config.get(key)
+    if isinstance(value, dict):
+        return {**defaults, **value}
+    return {**defaults, **{k: v for k, v in config.items() if k in defaults}}
+
+
+def compile_rules(
+    version: int,
+    scene_config: Optional[Dict[str, List[str]]] = None,
+    risk_config: Optional[Dict[str, List[str]]] = None,
+    alert_config: Optional[Dict[str, Any]] = None,
+    classifier_config: Optional[Dict[str, Any]] = None,
+) -> ActiveRules:
+    """在快照默认词库的基础上合并配置，编译出一个规则版本"""
+    snapshot = get_rule_snapshot()
+    scene = {label: list(words) for label, words in snapshot.lexicons["scene"].items()}
+    for label, words in (scene_config or {}).items():
+        # 配置的关键词追加在默认关键词之后（保留默认值作为fallback）
+        scene[label] = list(dict.fromkeys([*scene.get(label, []), *words]))
+    risk = {
+        level: list((risk_config or {}).get(level) or words)
+        for level, words in snapshot.lexicons["risk"].items()
+    }
+    lexicons = {**snapshot.lexicons, "scene": scene, "risk": risk}
+    thresholds = {
+        "alert": _merge_settings(DEFAULT_ALERT_THRESHOLDS, alert_config or {}, "thresholds"),
+        "classifier": _merge_settings(DEFAULT_CLASSIFIER_RULES, classifier_config or {}, "rules"),
+    }
+    fingerprint = hashlib.sha256(
+        json.dumps(
+            {"snapshot": snapshot.source_hash, "lexicons": lexicons, "thresholds": thresholds},
+            ensure_ascii=False,
+            sort_keys=True,
+        ).encode("utf-8")
+    ).hexdigest()
+    # 词库与快照一致时直接复用快照中的自动机
+    matcher = snapshot.matcher if lexicons == snapshot.lexicons else LexiconMatcher.build(lexicons)
+    return ActiveRules(version, lexicons, matcher, thresholds, fingerprint)
+
+
+class RuleRegistry:
+    """持有当前规则版本；reload 时编译新版本并原子替换"""
+
+    def __init__(self) -> None:
+        self._current = compile_rules(version=1)
+        self._lock = asyncio.Lock()
+
+    @property
+    def current(self) -> ActiveRules:
+        return self._current
+
+    async def reload(self) -> ActiveRules:
+        """从 ConfigService 读取规则类配置（跳过缓存）并编译；内容未变化时保持当前版本"""
+        async with self._lock:
+            config_service = get_config_service()
+            for category in RULE_CATEGORIES:
+                config_service._clear_cache(category)
+            try:
+                risk_config = await config_service.get_risk_keywords()
+                behavior_config = await config_service.get_behavior_classification_rules()
+                alert_config = await config_service.get_alert_thresholds()
+                classifier_config = await config_service.get_classifier_rules()
+            except Exception as exc:
+                logger.warning("Rule reload failed, keeping version %s: %s", self._current.version, exc)
+                return self._current
+
+            scene_config = _config_values(behavior_config).get("scene_keywords") or {}
+            rules = await asyncio.to_thread(
+                compile_rules,
+                self._current.version + 1,
+                scene_config,
+                risk_config,
+                alert_config,
+                classifier_config,
+            )
+            if rules.fingerprint == self._current.fingerprint:
+                return self._current
+            self._current = rules
+            logger.info("Rule snapshot version %s activated (%s)", rules.version, rules.fingerprint[:12])
+            return rules
+
+    async def run_refresh_loop(self, interval: float) -> None:
+        """定期 reload（让其它 worker 上的配置变更在本 worker 生效）"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload()
+            except Exception as exc:
+                logger.warning("Periodic rule reload failed: %s", exc)
+
+
+def get_rule_registry() -> RuleRegistry:
+    """获取规则版本注册表单例"""
+    global _rule_registry_instance
+    if _rule_registry_instance is None:
+        _rule_registry_instance = RuleRegistry()
+    return _rule_registry_instance
+
+
+def get_active_rules() -> ActiveRules:
+    """当前生效的规则版本（同步读取，供请求处理使用）"""
+    return get_rule_registry().current
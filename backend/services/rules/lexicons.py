@@ -0,0 +1,68 @@
+"""规则词库：各分类器共用的默认关键词表（唯一数据源，编译进规则快照）"""
+from typing import Dict, List
+
+# 社交场景关键词（ClassifierService 第一层规则分类）
+SCENE_KEYWORDS: Dict[str, List[str]] = {
+    "拒绝": ["算了", "改天", "不方便", "下次", "以后", "不用了", "不用", "不必", "不需要", "不用麻烦"],
+    "冲突": ["烦", "讨厌", "又这样", "够了", "别说了", "闭嘴", "走开", "滚", "烦死了"],
+    "暗示": ["可能", "也许", "或者", "考虑", "看看", "再说", "到时候", "如果"],
+    "情绪": ["开心", "高兴", "难过", "伤心", "生气", "愤怒", "失望", "担心", "害怕"],
+    "请求": ["可以", "能不能", "请", "帮", "麻烦", "希望", "想要", "需要"],
+    "请求帮助": ["帮帮我", "能帮我", "可以帮我", "需要帮助", "求助", "帮忙"],
+    "提出改进建议": ["建议", "可以改进", "最好", "应该", "不如", "试试"],
+    "失望": ["失望", "没想到", "以为", "可惜", "遗憾"],
+    "无聊": ["无聊", "没意思", "没劲", "好无聊", "真无聊"],
+    "高兴": ["高兴", "开心", "快乐", "愉快", "兴奋", "太棒了"],
+    "尴尬": ["尴尬", "不好意思", "难为情", "不好意思", "有点尴尬"],
+    "恐惧": ["害怕", "恐惧", "担心", "担心", "不安", "害怕"],
+    "惊讶": ["惊讶", "没想到", "居然", "竟然", "天哪", "哇"],
+    "回应感谢": ["谢谢", "感谢", "多谢", "太感谢了", "谢谢你"],
+    "安慰": ["别难过", "没关系", "会好的", "别担心", "我理解"],
+    "抱怨": ["抱怨", "真烦", "太糟糕", "受不了", "真麻烦"],
+    "赞美": ["好", "棒", "优秀", "厉害", "不错", "很好", "太好了", "真棒"],
+    "批评": ["不好", "差", "糟糕", "不行", "不对", "错了", "不应该"],
+}
+
+# 情感倾向词（DecoderService / EmotionDirectionClassifier 的情感打分）
+SENTIMENT_WORDS: Dict[str, List[str]] = {
+    "positive": ["好", "棒", "开心", "高兴", "喜欢", "爱", "满意", "成功", "优秀", "美好", "快乐", "幸福"],
+    "negative": ["坏", "差", "难过", "伤心", "讨厌", "恨", "失望", "失败", "糟糕", "痛苦", "悲伤", "愤怒"],
+}
+
+# 情绪类型关键词（按优先级排列，先匹配者优先）
+EMOTION_KEYWORDS: Dict[str, List[str]] = {
+    "开心": ["开心", "高兴", "快乐", "愉快", "兴奋", "太棒了", "太好了", "真棒"],
+    "难过": ["难过", "伤心", "悲伤", "沮丧", "失落", "想哭"],
+    "生气": ["生气", "愤怒", "恼火", "烦躁", "讨厌", "烦死了"],
+    "焦虑": ["焦虑", "担心", "不安", "紧张", "害怕", "恐惧"],
+    "平静": ["平静", "放松", "舒服", "安心", "稳定"],
+    "疲惫": ["累", "疲惫", "疲倦", "困", "没精神"],
+    "失望": ["失望", "绝望", "无奈", "遗憾"],
+    "尴尬": ["尴尬", "不好意思", "难为情"],
+    "惊讶": ["惊讶", "震惊", "没想到", "居然"],
+    "无聊": ["无聊", "没意思", "空虚"],
+}
+
+# 极端负面词（二级分类器的风险情绪判断）
+EXTREME_WORDS: List[str] = ["绝望", "想死", "不想活了", "崩溃", "受不了"]
+
+# 风险词库默认值（ConfigService 默认配置 / RiskDetectionService 兜底）
+RISK_KEYWORDS: Dict[str, List[str]] = {
+    "high_risk": ["想死", "不想活了", "绝望", "崩溃", "自杀", "自残"],
+    "medium_risk": ["难过", "痛苦", "受不了", "压力大", "焦虑", "害怕"],
+}
+
+# 高敏感度用户的敏感内容词（Profile 个性化风险检测）
+SENSITIVE_WORDS: List[str] = ["拒绝", "批评", "冲突"]
+
+
+def default_lexicons() -> Dict[str, Dict[str, List[str]]]:
+    """按「词库 -> 标签 -> 词表」组织的全部默认词库"""
+    return {
+        "scene": {scene: list(words) for scene, words in SCENE_KEYWORDS.items()},
+        "sentiment": {label: list(words) for label, words in SENTIMENT_WORDS.items()},
+        "emotion": {label: list(words) for label, words in EMOTION_KEYWORDS.items()},
+        "extreme": {"extreme": list(EXTREME_WORDS)},
+        "risk": {label: list(words) for label, words in RISK_KEYWORDS.items()},
+        "sensitive": {"sensitive": list(SENSITIVE_WORDS)},
+    }
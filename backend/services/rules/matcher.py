@@ -0,0 +1,231 @@
+"""
+Aho-Corasick 多模式匹配：一次扫描文本，返回所有词库中全部命中词及其位置
+
+所有词库（场景 / 情感倾向 / 情绪 / 极端词 / 风险 / 敏感词）编译进同一个自动机。
+构建时把失败指针折叠进转移表（DFA），扫描时每个字符只做一次字典查找；
+自动机随规则快照一起序列化，输出表以 int32 CSR 数组存储（offsets / ids）。
+同一文本在一次解码中会被多个分类器查询，scan() 对最近的文本做了 LRU 缓存。
+"""
+from __future__ import annotations
+
+from array import array
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+SCAN_CACHE_SIZE = 1024
+
+
+class LexiconHit(NamedTuple):
+    lexicon: str
+    label: str
+    word: str
+    start: int
+    end: int
+
+
+class LexiconHits:
+    """一次扫描的命中结果（只读，可在多个消费方之间共享）"""
+
+    __slots__ = ("text", "_matcher", "_positions", "_by_label")
+
+    def __init__(self, text: str, matcher: "LexiconMatcher", positions: Dict[int, List[int]]) -> None:
+        self.text = text
+        self._matcher = matcher
+        self._positions = positions
+        by_label: Dict[Tuple[str, str], List[Tuple[int, str]]] = {}
+        for word_id in positions:
+            word = matcher.words[word_id]
+            for lexicon, label, index in matcher.entries[word_id]:
+                by_label.setdefault((lexicon, label), []).append((index, word))
+        for items in by_label.values():
+            items.sort()
+        self._by_label = by_label
+
+    @property
+    def hits(self) -> List[LexiconHit]:
+        """全部命中（按起始位置排序），同一个词属于多个词库时每个词库各一条"""
+        result = []
+        for word_id, starts in self._positions.items():
+            word = self._matcher.words[word_id]
+            labels = dict.fromkeys((lexicon, label) for lexicon, label, _ in self._matcher.entries[word_id])
+            for lexicon, label in labels:
+                for start in starts:
+                    result.append(LexiconHit(lexicon, label, word, start, start + len(word)))
+        result.sort(key=lambda hit: (hit.start, hit.end))
+        return result
+
+    def matched(self, lexicon: str, label: str) -> List[str]:
+        """命中的词，按词表中的顺序（与逐个 `word in text` 的结果一致，含词表中的重复项）"""
+        return [word for _, word in self._by_label.get((lexicon, label), ())]
+
+    def count(self, lexicon: str, label: str) -> int:
+        return len(self._by_label.get((lexicon, label), ()))
+
+    def labels(self, lexicon: str) -> List[str]:
+        """有命中的标签，按词库中标签的顺序"""
+        return [label for label in self._matcher.label_order.get(lexicon, ()) if (lexicon, label) in self._by_label]
+
+    def first_label(self, lexicon: str) -> Optional[str]:
+        """按词库中标签的顺序，返回第一个有命中的标签"""
+        for label in self._matcher.label_order.get(lexicon, ()):
+            if (lexicon, label) in self._by_label:
+                return label
+        return None
+
+    def positions(self, word: str) -> List[int]:
+        word_id = self._matcher.word_ids.get(word)
+        if word_id is None:
+            return []
+        return self._positions.get(word_id, [])
+
+    def starts_word(self, word: str) -> bool:
+        """词是否出现在文本开头或紧跟在空格之后"""
+        return any(start == 0 or self.text[start - 1] == " " for start in self.positions(word))
+
+
+class LexiconMatcher:
+    """多词库 Aho-Corasick 自动机"""
+
+    def __init__(
+        self,
+        words: List[str],
+        entries: List[List[Tuple[str, str, int]]],
+        label_order: Dict[str, List[str]],
+        delta: List[Dict[str, int]],
+        out_offsets: Sequence[int],
+        out_ids: Sequence[int],
+    ) -> None:
+        self.words = words
+        self.entries = entries
+        self.label_order = label_order
+        self.word_ids = {word: i for i, word in enumerate(words)}
+        self._delta = delta
+        self._out_offsets = out_offsets
+        self._out_ids = out_ids
+        # 每个状态的输出（word_id, 词长）；无输出的状态为空元组，扫描时可直接跳过
+        self._outputs = [
+            tuple((out_ids[k], len(words[out_ids[k]])) for k in range(out_offsets[i], out_offsets[i + 1]))
+            for i in range(len(out_offsets) - 1)
+        ]
+        self.scan = lru_cache(maxsize=SCAN_CACHE_SIZE)(self._scan)
+
+    @classmethod
+    def build(cls, lexicons: Dict[str, Dict[str, Sequence[str]]]) -> "LexiconMatcher":
+        """从「词库 -> 标签 -> 词表」构建自动机"""
+        words: List[str] = []
+        word_ids: Dict[str, int] = {}
+        entries: List[List[Tuple[str, str, int]]] = []
+        label_order: Dict[str, List[str]] = {}
+        for lexicon, labels in lexicons.items():
+            label_order[lexicon] = list(labels)
+            for label, label_words in labels.items():
+                for index, word in enumerate(label_words):
+                    if not word:
+                        continue
+                    if word not in word_ids:
+                        word_ids[word] = len(words)
+                        words.append(word)
+                        entries.append([])
+                    entries[word_ids[word]].append((lexicon, label, index))
+
+        # trie
+        goto: List[Dict[str, int]] = [{}]
+        terminal: List[List[int]] = [[]]
+        for word_id, word in enumerate(words):
+            state = 0
+            for ch in word:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][ch] = next_state
+                    goto.append({})
+                    terminal.append([])
+                state = next_state
+            terminal[state].append(word_id)
+
+        # BFS 计算失败指针，把失败链上的输出合并到当前状态，
+        # 并把失败状态的转移补进当前状态（BFS 序保证失败状态已补全）
+        fail = [0] * len(goto)
+        outputs: List[List[int]] = [list(ids) for ids in terminal]
+        delta: List[Dict[str, int]] = [dict(edges) for edges in goto]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in goto[state].items():
+                queue.append(next_state)
+                target = delta[fail[state]].get(ch, 0)
+                fail[next_state] = target if target != next_state else 0
+                outputs[next_state].extend(outputs[fail[next_state]])
+            for ch, target in delta[fail[state]].items():
+                delta[state].setdefault(ch, target)
+
+        out_offsets = array("i", [0])
+        out_ids = array("i")
+        for ids in outputs:
+            out_ids.extend(ids)
+            out_offsets.append(len(out_ids))
+        return cls(words, entries, label_order, delta, out_offsets, out_ids)
+
+    def _scan(self, text: str) -> LexiconHits:
+        return LexiconHits(text, self, self.scan_positions(text))
+
+    def scan_positions(self, text: str) -> Dict[int, List[int]]:
+        """只返回 word_id -> 起始位置列表（不构建 LexiconHits，批量分析直接使用）"""
+        delta, outputs = self._delta, self._outputs
+        positions: Dict[int, List[int]] = {}
+        state = 0
+        for i, ch in enumerate(text):
+            state = delta[state].get(ch, 0)
+            if outputs[state]:
+                for word_id, length in outputs[state]:
+                    positions.setdefault(word_id, []).append(i - length + 1)
+        return positions
+
+    # ===== 序列化（规则快照） =====
+
+    def to_sections(self) -> Dict[str, Any]:
+        return {
+            "matcher": {
+                "words": self.words,
+                "entries": self.entries,
+                "label_order": self.label_order,
+                "delta": self._delta,
+            },
+            "matcher_out_offsets": array("i", self._out_offsets),
+            "matcher_out_ids": array("i", self._out_ids),
+        }
+
+    @classmethod
+    def from_sections(cls, sections: Dict[str, Any]) -> "LexiconMatcher":
+        body = sections["matcher"]
+        return cls(
+            body["words"],
+            body["entries"],
+            body["label_order"],
+            body["delta"],
+            sections["matcher_out_offsets"],
+            sections["matcher_out_ids"],
+        )
+
+
+@lru_cache(maxsize=256)
+def _compile_word_list(words: Tuple[str, ...]) -> LexiconMatcher:
+    return LexiconMatcher.build({"words": {"words": words}})
+
+
+def find_words(words: Sequence[str], text: str) -> List[str]:
+    """
+    动态词表（配置的风险词、用户触发词等）的匹配：
+    返回 words 中出现在 text 里的词，顺序与 `[w for w in words if w in text]` 一致
+    """
+    if not words or not text:
+        return []
+    return _compile_word_list(tuple(words)).scan(text).matched("words", "words")
+
+
+def get_lexicon_matcher() -> LexiconMatcher:
+    """获取规则快照中的共享自动机"""
+    from services.rules.snapshot import get_rule_snapshot
+
+    return get_rule_snapshot().matcher
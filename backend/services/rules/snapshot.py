@@ -0,0 +1,246 @@
+"""
+规则快照：把词库、Aho-Corasick 自动机与 prompt 子场景模式编译后序列化为带版本的二进制文件，
+启动时通过 mmap 加载；只有源数据（词库 / prompt/*.json）的哈希变化时才重新构建。
+
+构建（部署 / 镜像构建阶段执行）：
+    python -m services.rules.snapshot            # 写入 settings.RULE_SNAPSHOT_PATH
+    python -m services.rules.snapshot --force    # 忽略哈希强制重建
+
+文件布局：
+    MAGIC(8) | <II: 格式版本, 头部长度> | 头部 JSON | 各 section 字节（8 字节对齐）
+头部 JSON 记录 source_hash、构建时间，以及每个 section 的 offset / length / kind。
+kind 为 "pickle" 的 section 反序列化后使用；"int32" 的 section 直接以 memoryview 指向 mmap，不做拷贝。
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.config import settings
+from services.rules.lexicons import default_lexicons
+from services.rules.matcher import LexiconMatcher
+
+MAGIC = b"ASDRULE\0"
+FORMAT_VERSION = 2
+_PREFIX = struct.Struct("<II")
+
+PROMPT_DIR = Path(__file__).resolve().parents[2] / "prompt"
+
+_rule_snapshot_instance: Optional["RuleSnapshot"] = None
+
+
+class RuleSnapshot:
+    """
+    编译后的规则数据（只读）
+
+    - lexicons: {"scene": {场景: [关键词]}, "sentiment": {...}, "emotion": {...}, ...}
+    - matcher: 覆盖全部 lexicons 的 Aho-Corasick 自动机
+    - templates: prompt 子场景模式，按模板文件顺序排列：
+        [{"template": "拒绝", "type": "委婉拒绝", "patterns": ["下次吧", ...]}, ...]
+    """
+
+    def __init__(
+        self,
+        lexicons: Dict[str, Dict[str, List[str]]],
+        templates: List[Dict[str, Any]],
+        source_hash: str,
+        built_at: Optional[float] = None,
+        matcher: Optional[LexiconMatcher] = None,
+    ) -> None:
+        self.lexicons = lexicons
+        self.templates = templates
+        self.matcher = matcher or LexiconMatcher.build(lexicons)
+        self.source_hash = source_hash
+        self.built_at = built_at or time.time()
+        self._mmap: Optional[mmap.mmap] = None
+
+    def sections(self) -> Dict[str, Any]:
+        return {"lexicons": self.lexicons, "templates": self.templates, **self.matcher.to_sections()}
+
+
+def _prompt_files(prompt_dir: Path) -> List[Path]:
+    if not prompt_dir.exists():
+        return []
+    return sorted(prompt_dir.glob("*.json"))
+
+
+def compute_source_hash(prompt_dir: Path = PROMPT_DIR) -> str:
+    """源数据哈希：格式版本 + 默认词库 + prompt/*.json 原始字节"""
+    digest = hashlib.sha256()
+    digest.update(f"format:{FORMAT_VERSION}".encode())
+    digest.update(json.dumps(default_lexicons(), ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    for path in _prompt_files(prompt_dir):
+        digest.update(path.name.encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def parse_templates(prompt_dir: Path) -> List[Dict[str, Any]]:
+    templates: List[Dict[str, Any]] = []
+    for path in _prompt_files(prompt_dir):
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                body = json.load(f)
+        except Exception:
+            continue
+        for sub_scene in body.get("sub_scenes", []):
+            templates.append(
+                {
+                    "template": path.stem,
+                    "type": sub_scene.get("type", ""),
+                    "patterns": [p.lower() for p in sub_scene.get("patterns", [])],
+                }
+            )
+    return templates
+
+
+def build_snapshot(prompt_dir: Path = PROMPT_DIR, source_hash: Optional[str] = None) -> RuleSnapshot:
+    """从源数据编译规则快照"""
+    return RuleSnapshot(
+        lexicons=default_lexicons(),
+        templates=parse_templates(prompt_dir),
+        source_hash=source_hash or compute_source_hash(prompt_dir),
+    )
+
+
+def save_snapshot(snapshot: RuleSnapshot, path: Path) -> None:
+    """写入二进制快照（先写临时文件再原子替换）"""
+    payloads: Dict[str, bytes] = {}
+    sections: Dict[str, Dict[str, Any]] = {}
+    offset = 0
+    for name, value in snapshot.sections().items():
+        if isinstance(value, array) and value.typecode == "i" and value.itemsize == 4:
+            data, kind = value.tobytes(), "int32"
+        else:
+            data, kind = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), "pickle"
+        payloads[name] = data
+        sections[name] = {"offset": offset, "length": len(data), "kind": kind}
+        offset += len(data) + (-len(data) % 8)
+    header = json.dumps(
+        {
+            "source_hash": snapshot.source_hash,
+            "built_at": snapshot.built_at,
+            "byteorder": sys.byteorder,
+            "sections": sections,
+        }
+    ).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + _PREFIX.size + len(header)) % 8)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+    with tmp_path.open("wb") as f:
+        f.write(MAGIC)
+        f.write(_PREFIX.pack(FORMAT_VERSION, len(header)))
+        f.write(header)
+        for data in payloads.values():
+            f.write(data)
+            f.write(b"\0" * (-len(data) % 8))
+    os.replace(tmp_path, path)
+
+
+def read_snapshot_header(mm: mmap.mmap) -> Optional[Dict[str, Any]]:
+    if mm[: len(MAGIC)] != MAGIC:
+        return None
+    version, header_len = _PREFIX.unpack_from(mm, len(MAGIC))
+    if version != FORMAT_VERSION:
+        return None
+    start = len(MAGIC) + _PREFIX.size
+    header = json.loads(bytes(mm[start : start + header_len]).decode("utf-8"))
+    header["data_offset"] = start + header_len
+    return header
+
+
+def load_snapshot(path: Path, expected_hash: Optional[str] = None) -> Optional[RuleSnapshot]:
+    """mmap 加载快照；格式版本或源哈希不一致时返回 None"""
+    try:
+        with path.open("rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    values: Dict[str, Any] = {}
+    try:
+        header = read_snapshot_header(mm)
+        if (
+            header is None
+            or header.get("byteorder") != sys.byteorder
+            or (expected_hash and header.get("source_hash") != expected_hash)
+        ):
+            mm.close()
+            return None
+        base = header["data_offset"]
+        view = memoryview(mm)
+        for name, section in header["sections"].items():
+            start = base + section["offset"]
+            end = start + section["length"]
+            if section["kind"] == "int32":
+                values[name] = view[start:end].cast("i")
+            else:
+                values[name] = pickle.loads(mm[start:end])
+        snapshot = RuleSnapshot(
+            lexicons=values["lexicons"],
+            templates=values["templates"],
+            source_hash=header["source_hash"],
+            built_at=header.get("built_at"),
+            matcher=LexiconMatcher.from_sections(values),
+        )
+    except Exception:
+        values.clear()
+        try:
+            mm.close()
+        except BufferError:
+            pass  # 仍有 memoryview 引用时交给 GC 回收
+        return None
+    snapshot._mmap = mm
+    return snapshot
+
+
+def load_or_build_snapshot(path: Optional[Path] = None, force: bool = False) -> RuleSnapshot:
+    """加载快照；源哈希变化（或 force）时重新构建并写回磁盘"""
+    path = Path(path or settings.RULE_SNAPSHOT_PATH)
+    source_hash = compute_source_hash()
+    if not force:
+        snapshot = load_snapshot(path, expected_hash=source_hash)
+        if snapshot is not None:
+            return snapshot
+    snapshot = build_snapshot(source_hash=source_hash)
+    try:
+        save_snapshot(snapshot, path)
+    except OSError:
+        pass  # 只读文件系统等情况下仅使用内存中的快照
+    return snapshot
+
+
+def get_rule_snapshot() -> RuleSnapshot:
+    """获取进程级规则快照单例"""
+    global _rule_snapshot_instance
+    if _rule_snapshot_instance is None:
+        _rule_snapshot_instance = load_or_build_snapshot()
+    return _rule_snapshot_instance
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the compiled rule snapshot")
+    parser.add_argument("--output", default=settings.RULE_SNAPSHOT_PATH)
+    parser.add_argument("--force", action="store_true", help="忽略源哈希，强制重建")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    snapshot = load_or_build_snapshot(Path(args.output), force=args.force)
+    print(
+        f"rule snapshot {args.output}: hash={snapshot.source_hash[:12]} "
+        f"templates={len(snapshot.templates)} ({(time.perf_counter() - start) * 1000:.1f} ms)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+模板 pattern 索引：把 prompt/*.json 全部 sub_scenes[].patterns 编译进一个自动机，
+一次扫描即可给所有子场景打分
+
+索引只在模板文件 mtime 变化时重建（检查间隔见 TEMPLATE_INDEX_CHECK_INTERVAL），
+/admin/templates/reload 可显式重建。多 worker 部署时 reload 只作用于处理该请求的 worker，
+其余 worker 会在下一次 mtime 检查时自动重建。
+"""
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import settings
+from services.prompt_service import get_prompt_service
+from services.rules.matcher import LexiconMatcher
+from services.rules.snapshot import PROMPT_DIR, get_rule_snapshot, parse_templates
+
+_template_index_instance: Optional["TemplatePatternIndex"] = None
+
+
+class TemplatePatternIndex:
+    """prompt 子场景 pattern 的预编译索引"""
+
+    def __init__(self, prompt_dir: Path = PROMPT_DIR, templates: Optional[List[Dict[str, Any]]] = None) -> None:
+        self.prompt_dir = prompt_dir
+        self.built_at = 0.0
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self._signature = self._mtime_signature()
+        self._state: Tuple[List[Dict[str, Any]], LexiconMatcher] = self._compile(
+            templates if templates is not None else parse_templates(prompt_dir)
+        )
+
+    @property
+    def templates(self) -> List[Dict[str, Any]]:
+        return self._state[0]
+
+    def _mtime_signature(self) -> Tuple[Tuple[str, int], ...]:
+        """目录与每个模板文件的 mtime（目录 mtime 覆盖新增 / 删除文件）"""
+        if not self.prompt_dir.exists():
+            return ()
+        entries = [("", self.prompt_dir.stat().st_mtime_ns)]
+        for path in sorted(self.prompt_dir.glob("*.json")):
+            entries.append((path.name, path.stat().st_mtime_ns))
+        return tuple(entries)
+
+    def _compile(self, templates: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], LexiconMatcher]:
+        # 标签为子场景在 templates 中的下标，保证命中结果按模板顺序排列
+        matcher = LexiconMatcher.build(
+            {"template": {str(i): sub_scene["patterns"] for i, sub_scene in enumerate(templates)}}
+        )
+        self.built_at = time.time()
+        return templates, matcher
+
+    def rebuild(self) -> int:
+        """重新解析 prompt/*.json 并重建索引，返回子场景数量"""
+        with self._lock:
+            self._signature = self._mtime_signature()
+            self._state = self._compile(parse_templates(self.prompt_dir))
+            self._last_check = time.monotonic()
+        # 同步清空 PromptService 的模板缓存，避免解码建议与索引使用不同版本的模板
+        get_prompt_service().load_template.cache_clear()
+        return len(self.templates)
+
+    def refresh_if_stale(self) -> bool:
+        """模板文件 mtime 变化时重建索引（按 TEMPLATE_INDEX_CHECK_INTERVAL 节流）"""
+        now = time.monotonic()
+        if now - self._last_check < settings.TEMPLATE_INDEX_CHECK_INTERVAL:
+            return False
+        self._last_check = now
+        if self._mtime_signature() == self._signature:
+            return False
+        self.rebuild()
+        return True
+
+    def best_match(self, text_lower: str) -> Tuple[Optional[Dict[str, Any]], float]:
+        """返回得分最高的子场景及分数（同分取模板顺序靠前者），未命中时返回 (None, 0.0)"""
+        templates, matcher = self._state
+        hits = matcher.scan(text_lower)
+        best_sub_scene = None
+        best_score = 0.0
+        for label in hits.labels("template"):
+            # 长模式权重更高
+            score = sum(len(pattern) / 10.0 + 1.0 for pattern in hits.matched("template", label))
+            if score > best_score:
+                best_score = score
+                best_sub_scene = templates[int(label)]
+        return best_sub_scene, best_score
+
+    def stats(self) -> Dict[str, Any]:
+        templates, matcher = self._state
+        return {
+            "templates": len({sub_scene["template"] for sub_scene in templates}),
+            "sub_scenes": len(templates),
+            "patterns": len(matcher.words),
+            "built_at": self.built_at,
+        }
+
+
+def get_template_index() -> TemplatePatternIndex:
+    """获取模板 pattern 索引单例（首次构建直接复用规则快照中已解析的 patterns）"""
+    global _template_index_instance
+    if _template_index_instance is None:
+        _template_index_instance = TemplatePatternIndex(templates=get_rule_snapshot().templates)
+    return _template_index_instance
@@ -0,0 +1,117 @@
+"""
+Single-flight：相同 key 的并发调用只执行一次，其余调用方等待同一个结果
+
+- 第一个调用方（leader）启动任务，任务完成前到达的相同 key 调用（follower）直接等待它的结果 / 异常；
+  任务结束即移出，不缓存结果（需要缓存的调用仍由 LLM 响应缓存 / 近似重复缓存负责）
+- 任务与调用方隔离（asyncio.shield）：某个调用方被取消（客户端断开）不会取消其他调用方仍在等待的任务
+- 所有调用方拿到同一个结果对象，被合并的方法不应返回调用方会原地修改的结果
+- @single_flight 装饰服务方法：默认按绑定后的全部参数（含 self、默认值）作为 key，
+  参数不可哈希时该次调用不合并；合并次数记入 single_flight_calls_total{role="follower"}
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, TypeVar
+
+from core.metrics import counter
+
+T = TypeVar("T")
+
+SINGLE_FLIGHT_CALLS = counter(
+    "single_flight_calls_total", "Single-flight calls by role (follower = duplicate suppressed)",
+    ["group", "role"],
+)
+
+_single_flight_groups: Dict[str, "SingleFlight"] = {}
+
+
+class SingleFlight:
+    """一组按 key 合并的在途调用（单事件循环使用）"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._calls: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self._counts: Dict[str, int] = {"leader": 0, "follower": 0, "bypass": 0}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """返回（结果，是否复用了其他调用方的在途调用）"""
+        try:
+            future = self._calls.get(key)
+        except TypeError:
+            # key 不可哈希：不合并
+            self._record("bypass")
+            return await func(), False
+        if future is not None:
+            self._record("follower")
+            return await asyncio.shield(future), True
+
+        self._record("leader")
+        future = asyncio.ensure_future(func())
+        self._calls[key] = future
+        future.add_done_callback(functools.partial(self._forget, key))
+        return await asyncio.shield(future), False
+
+    def _forget(self, key: Hashable, future: "asyncio.Future[Any]") -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            future.exception()  # 所有调用方都已取消时避免未读取异常的告警
+
+    def _record(self, role: str) -> None:
+        self._counts[role] += 1
+        SINGLE_FLIGHT_CALLS.labels(group=self.name, role=role).inc()
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self._counts["leader"] + self._counts["follower"]
+        return {
+            "group": self.name,
+            "in_flight": len(self._calls),
+            **self._counts,
+            "suppressed_ratio": round(self._counts["follower"] / calls, 4) if calls else 0.0,
+        }
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """按名称获取 single-flight 组"""
+    group = _single_flight_groups.get(name)
+    if group is None:
+        group = _single_flight_groups[name] = SingleFlight(name)
+    return group
+
+
+def single_flight(
+    name: Optional[str] = None,
+    key: Optional[Callable[..., Hashable]] = None,
+) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """
+    合并相同参数的并发调用
+
+    Args:
+        name: 组名（默认取被装饰函数的 __qualname__，如 "EmotionService.analyze_emotion_trend"）
+        key: 由调用参数计算 key 的函数（默认使用绑定后的全部参数）
+    """
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        group = get_single_flight(name or func.__qualname__)
+        signature = inspect.signature(func)
+
+        def default_key(*args: Any, **kwargs: Any) -> Hashable:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return tuple(bound.arguments.items())
+
+        make_key = key or default_key
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            result, _ = await group.do(make_key(*args, **kwargs), lambda: func(*args, **kwargs))
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def single_flight_stats() -> List[Dict[str, Any]]:
+    return [group.stats() for group in _single_flight_groups.values()]
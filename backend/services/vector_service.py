@@ -23,6 +23,7 @@ class VectorService:
                     ef = embedding_functions.OpenAIEmbeddingFunction(
                         api_key=settings.OPENAI_API_KEY,
                         model_name="text-embedding-3-small",
+                        api_base=settings.OPENAI_BASE_URL,  # 与 LLM 调用一致（如指向本地假 provider）
                     )
                 else:
                     ef = None
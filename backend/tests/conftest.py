@@ -0,0 +1,51 @@
+"""
+pytest 公共夹具（在 backend/ 目录下运行：python -m pytest）
+
+fake_openai：进程内启动的本地假 provider（benchmarks.fake_openai），整个测试会话共用一个，
+每个用例开始前清零统计；用 fake_openai.gateway() / fake_openai.ai_service() 得到指向它的网关 / AIService
+（网关的连接池绑定事件循环，须在用例自己的 asyncio.run 中创建并关闭）
+fake_openai_factory：按参数另外启动假 provider（对冲 / 失败转移等需要多个 provider 或注入故障的用例），用例结束时停止
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.fake_openai import FakeOpenAI  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def fake_openai_server():
+    fake = FakeOpenAI(ttft=0.01, per_token=0.0, latency_dist="fixed", seed=0)
+    fake.start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def fake_openai(fake_openai_server):
+    fake_openai_server.reset_stats()
+    return fake_openai_server
+
+
+@pytest.fixture
+def fake_openai_factory():
+    started = []
+
+    def start(**kwargs):
+        kwargs.setdefault("per_token", 0.0)
+        kwargs.setdefault("latency_dist", "fixed")
+        fake = FakeOpenAI(**kwargs)
+        fake.start()
+        started.append(fake)
+        return fake
+
+    yield start
+    for fake in started:
+        fake.stop()
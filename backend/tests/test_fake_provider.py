@@ -0,0 +1,71 @@
+import asyncio
+
+from benchmarks.fake_openai import FakeOpenAI
+
+
+def test_ai_service_reply_comes_from_provider(fake_openai):
+    async def main():
+        ai = fake_openai.ai_service()
+        try:
+            assert ai.available
+            return await ai.generate_reply("今天同学说下次吧，我该怎么办？")
+        finally:
+            await ai.gateway.aclose()
+
+    reply = asyncio.run(main())
+    assert reply
+    assert reply != "今天同学说下次吧，我该怎么办？"
+    assert fake_openai.stats()["companion"]["requests"] == 1
+
+
+def test_ai_service_stream_matches_chunks(fake_openai):
+    async def main():
+        ai = fake_openai.ai_service()
+        try:
+            return [delta async for delta in ai.generate_reply_stream("我有点紧张")]
+        finally:
+            await ai.gateway.aclose()
+
+    deltas = asyncio.run(main())
+    assert len(deltas) > 1
+    assert all(len(delta) <= fake_openai.stream_chunk_chars for delta in deltas)
+    stats = fake_openai.stats()["companion"]
+    assert stats["streamed"] == 1
+    assert stats["completion_tokens"] > 0
+
+
+def test_gateway_chat_json_parses_scene_family(fake_openai):
+    async def main():
+        gateway = fake_openai.gateway()
+        try:
+            return await gateway.chat_json(
+                "test.scene",
+                [{"role": "user", "content": '返回 JSON {"scene": ..., "confidence": ...}\n文本：我不想去，下次吧'}],
+                temperature=0,
+            )
+        finally:
+            await gateway.aclose()
+
+    result = asyncio.run(main())
+    assert set(result) >= {"scene", "confidence", "reason"}
+    assert 0 < result["confidence"] <= 1
+    assert fake_openai.stats()["scene"]["requests"] == 1
+
+
+def test_ai_service_falls_back_when_provider_fails():
+    fake = FakeOpenAI(ttft=0.0, per_token=0.0, latency_dist="fixed", error_rate=1.0, error_status=(400,))
+    fake.start()
+
+    async def main():
+        ai = fake.ai_service()
+        try:
+            return ai, await ai.generate_reply("我有点紧张")
+        finally:
+            await ai.gateway.aclose()
+
+    try:
+        ai, reply = asyncio.run(main())
+    finally:
+        fake.stop()
+    assert reply == ai.simple_reply("我有点紧张")
+    assert fake.stats()["companion"]["errors"] == 1
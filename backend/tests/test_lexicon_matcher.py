@@ -0,0 +1,44 @@
+from services.rules.matcher import LexiconHit, LexiconMatcher, find_words
+
+LEXICONS = {
+    "scene": {"拒绝": ["下次吧", "不去"], "邀请": ["一起去", "去"]},
+    "emotion": {"开心": ["开心"], "难过": ["难过"]},
+}
+
+
+def test_scan_returns_overlapping_hits_in_order():
+    matcher = LexiconMatcher.build(LEXICONS)
+    hits = matcher.scan("下次吧，我不去了，开心")
+    assert hits.hits == [
+        LexiconHit("scene", "拒绝", "下次吧", 0, 3),
+        LexiconHit("scene", "拒绝", "不去", 5, 7),
+        LexiconHit("scene", "邀请", "去", 6, 7),
+        LexiconHit("emotion", "开心", "开心", 9, 11),
+    ]
+    assert hits.labels("scene") == ["拒绝", "邀请"]
+    assert hits.first_label("scene") == "拒绝"
+    assert hits.first_label("emotion") == "开心"
+    assert hits.count("emotion", "难过") == 0
+    assert hits.positions("去") == [6]
+
+
+def test_matched_follows_word_list_order():
+    matcher = LexiconMatcher.build(LEXICONS)
+    text = "一起去吧，下次吧也行"
+    for lexicon, labels in LEXICONS.items():
+        for label, words in labels.items():
+            assert matcher.scan(text).matched(lexicon, label) == [word for word in words if word in text]
+
+
+def test_sections_round_trip():
+    matcher = LexiconMatcher.build(LEXICONS)
+    restored = LexiconMatcher.from_sections(matcher.to_sections())
+    for text in ("我们一起去吧", "不去，难过", ""):
+        assert restored.scan(text).hits == matcher.scan(text).hits
+
+
+def test_find_words_matches_naive_scan():
+    words = ["死", "不想活", "活", "想"]
+    for text in ("我不想活了", "没事", ""):
+        assert find_words(words, text) == [word for word in words if word in text]
+    assert find_words([], "任何文本") == []
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from services.llm_cache import LLMResponseCache
+
+SCENE_MESSAGES = [{"role": "user", "content": '返回 JSON {"scene": ..., "confidence": ...}\n文本：我不想去，下次吧'}]
+REPLY_MESSAGES = [{"role": "user", "content": "我有点紧张"}]
+
+
+def run(fake, call, times=2):
+    """用同一个网关连续调用 times 次，返回（各次结果或异常，缓存统计）"""
+    async def main():
+        gateway = fake.gateway(cache=LLMResponseCache(size=100, backend="none"))
+        outcomes = []
+        try:
+            for _ in range(times):
+                try:
+                    outcomes.append(await call(gateway))
+                except Exception as exc:
+                    outcomes.append(exc)
+            return outcomes, gateway.cache.stats()
+        finally:
+            await gateway.aclose()
+
+    return asyncio.run(main())
+
+
+def test_valid_json_reply_is_cached(fake_openai):
+    outcomes, stats = run(fake_openai, lambda gw: gw.chat_json("classifier.scene", SCENE_MESSAGES, temperature=0))
+    assert outcomes[0] == outcomes[1]
+    assert "scene" in outcomes[0]
+    assert fake_openai.stats()["scene"]["requests"] == 1
+    assert stats["memory_hits"] == 1
+
+
+def test_truncated_reply_is_not_cached(fake_openai):
+    outcomes, stats = run(
+        fake_openai,
+        lambda gw: gw.chat_json("classifier.scene", SCENE_MESSAGES, temperature=0, max_tokens=10),
+    )
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert fake_openai.stats()["scene"]["requests"] == 2
+    assert stats["memory_hits"] == 0
+    assert stats["rejected_truncated"] == 2
+
+
+def test_invalid_json_reply_is_not_cached(fake_openai):
+    outcomes, stats = run(fake_openai, lambda gw: gw.chat_json("classifier.scene", REPLY_MESSAGES, temperature=0))
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert fake_openai.stats()["companion"]["requests"] == 2
+    assert stats["memory_hits"] == 0
+    assert stats["rejected_invalid"] == 2
+
+
+def test_truncated_stream_is_not_cached(fake_openai):
+    async def stream(gateway):
+        return "".join([delta async for delta in gateway.chat_stream(
+            "companion.reply", REPLY_MESSAGES, cache=True, temperature=0, max_tokens=5
+        )])
+
+    outcomes, stats = run(fake_openai, stream)
+    assert outcomes[0] and outcomes[0] == outcomes[1]
+    assert fake_openai.stats()["companion"]["streamed"] == 2
+    assert stats["rejected_truncated"] == 2
+
+
+@pytest.mark.parametrize("max_tokens", [None, 1000])
+def test_complete_stream_is_cached(fake_openai, max_tokens):
+    params = {"max_tokens": max_tokens} if max_tokens else {}
+
+    async def stream(gateway):
+        return "".join([delta async for delta in gateway.chat_stream(
+            "companion.reply", REPLY_MESSAGES, cache=True, temperature=0, **params
+        )])
+
+    outcomes, stats = run(fake_openai, stream)
+    assert outcomes[0] == outcomes[1]
+    assert fake_openai.stats()["companion"]["streamed"] == 1
+    assert stats["memory_hits"] == 1
@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+import pytest
+
+from core.config import settings
+from services.llm_providers import LLMProvider, ProviderPool
+
+MESSAGES = [{"role": "user", "content": "我有点紧张"}]
+ENDPOINT = "companion.reply"
+
+
+@pytest.fixture(autouse=True)
+def no_sdk_retries(monkeypatch):
+    # 只测 provider 池自身的对冲 / 转移，不让 SDK 的自动重试掺进来
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 0)
+
+
+def make_pool(*fakes, **kwargs):
+    names = ("primary", "backup")
+    providers = [
+        LLMProvider(name, api_key="fake", base_url=fake.base_url, timeout=5)
+        for name, fake in zip(names, fakes)
+    ]
+    kwargs.setdefault("hedge_enabled", True)
+    kwargs.setdefault("hedge_percentile", 0.5)
+    kwargs.setdefault("hedge_min_samples", 1)
+    kwargs.setdefault("hedge_min_delay", 0.05)
+    return ProviderPool(providers, **kwargs)
+
+
+async def create(pool):
+    response, winner = await pool.create(ENDPOINT, MESSAGES, None, 5, {})
+    return response.choices[0].message.content, winner
+
+
+def test_slow_primary_triggers_hedge(fake_openai_factory):
+    primary = fake_openai_factory(ttft=0.01)
+    backup = fake_openai_factory(ttft=0.01)
+
+    async def main():
+        pool = make_pool(primary, backup)
+        try:
+            for _ in range(3):
+                assert (await create(pool))[1] == "primary"
+            assert pool.hedge_delay(ENDPOINT) == pytest.approx(0.05)
+            primary.ttft = 2.0
+            start = time.perf_counter()
+            content, winner = await create(pool)
+            return pool.stats(), content, winner, time.perf_counter() - start
+        finally:
+            await pool.aclose()
+
+    stats, content, winner, elapsed = asyncio.run(main())
+    assert content
+    assert winner == "backup"
+    assert elapsed < 1.0
+    assert stats["hedged"] == 1
+    assert stats["hedge_won"] == 1
+    assert stats["failovers"] == 0
+
+
+def test_first_successful_answer_wins(fake_openai_factory):
+    primary = fake_openai_factory(ttft=0.01)
+    backup = fake_openai_factory(ttft=2.0)
+
+    async def main():
+        pool = make_pool(primary, backup)
+        try:
+            await create(pool)
+            # 超过对冲延迟但仍比备用 provider 快：对冲已发出，主 provider 的结果先到
+            primary.ttft = 0.3
+            start = time.perf_counter()
+            _, winner = await create(pool)
+            return pool.stats(), winner, time.perf_counter() - start
+        finally:
+            await pool.aclose()
+
+    stats, winner, elapsed = asyncio.run(main())
+    assert winner == "primary"
+    assert elapsed < 1.0
+    assert stats["hedged"] == 1
+    assert stats["hedge_won"] == 0
+    assert backup.stats()["companion"]["requests"] == 1
+
+
+def test_no_hedge_without_latency_samples(fake_openai_factory):
+    primary = fake_openai_factory(ttft=0.2)
+    backup = fake_openai_factory(ttft=0.01)
+
+    async def main():
+        pool = make_pool(primary, backup)
+        try:
+            assert pool.hedge_delay(ENDPOINT) is None
+            return pool.stats(), (await create(pool))[1]
+        finally:
+            await pool.aclose()
+
+    stats, winner = asyncio.run(main())
+    assert winner == "primary"
+    assert stats["hedged"] == 0
+    assert backup.stats() == {}
+
+
+def test_primary_error_fails_over(fake_openai_factory):
+    primary = fake_openai_factory(ttft=0.01, error_rate=1.0, error_status=(500,))
+    backup = fake_openai_factory(ttft=0.01)
+
+    async def main():
+        pool = make_pool(primary, backup)
+        try:
+            content, winner = await create(pool)
+            return pool.stats(), content, winner
+        finally:
+            await pool.aclose()
+
+    stats, content, winner = asyncio.run(main())
+    assert content
+    assert winner == "backup"
+    assert stats["failovers"] == 1
+    assert stats["providers"][0]["calls"]["error"] == 1
+    assert primary.stats()["companion"]["errors"] == 1
+    assert backup.stats()["companion"]["requests"] == 1
+
+
+def test_all_providers_failing_raises(fake_openai_factory):
+    primary = fake_openai_factory(ttft=0.01, error_rate=1.0, error_status=(500,))
+    backup = fake_openai_factory(ttft=0.01, error_rate=1.0, error_status=(503,))
+
+    async def main():
+        pool = make_pool(primary, backup)
+        try:
+            await create(pool)
+        finally:
+            await pool.aclose()
+
+    with pytest.raises(Exception):
+        asyncio.run(main())
+    assert primary.stats()["companion"]["errors"] == 1
+    assert backup.stats()["companion"]["errors"] == 1
+
+
+def test_stream_fails_over_before_first_delta(fake_openai_factory):
+    primary = fake_openai_factory(ttft=0.01, error_rate=1.0, error_status=(500,))
+    backup = fake_openai_factory(ttft=0.01)
+
+    async def main():
+        pool = make_pool(primary, backup)
+        usage = {}
+        try:
+            deltas = [delta async for delta in pool.stream(ENDPOINT, MESSAGES, None, 5, {}, usage)]
+            return pool.stats(), deltas, usage
+        finally:
+            await pool.aclose()
+
+    stats, deltas, usage = asyncio.run(main())
+    assert deltas
+    assert usage["provider"] == "backup"
+    assert stats["failovers"] == 1
+    assert backup.stats()["companion"]["streamed"] == 1
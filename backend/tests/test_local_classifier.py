@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+import pytest
+
+from services.decoder.local_classifier import (
+    LabeledText,
+    LocalSceneClassifier,
+    LocalSceneModel,
+    char_ngrams,
+    split_samples,
+    train_model,
+)
+
+CORPUS = {
+    "拒绝": ["下次吧", "我不去了", "改天再说吧", "这次就算了", "我有事去不了", "不太方便"],
+    "邀请": ["一起去吃饭吧", "周末一起去玩", "要不要一起去看电影", "来我家玩吧", "一起去公园", "晚上一起吃饭"],
+    "感谢": ["谢谢你", "太感谢了", "谢谢你的帮助", "真的很感谢", "多谢你", "谢谢老师"],
+}
+
+
+def samples():
+    return [LabeledText(text, scene) for scene, texts in CORPUS.items() for text in texts]
+
+
+def test_char_ngrams_are_padded_and_unique():
+    grams = char_ngrams("下次 吧", (1, 2))
+    assert "^下" in grams and "吧$" in grams
+    assert len(grams) == len(set(grams))
+
+
+def test_train_and_predict():
+    model = train_model(samples(), min_count=1)
+    assert model.classes == sorted(CORPUS)
+    assert model.predict("谢谢你啊")[0] == "感谢"
+    assert model.predict("我们一起去吃饭")[0] == "邀请"
+    assert model.predict("下次再说吧")[0] == "拒绝"
+    proba = model.predict_proba("谢谢")
+    assert proba.shape == (3,)
+    assert proba.sum() == pytest.approx(1.0, abs=1e-5)
+
+
+def test_train_rejects_empty_samples():
+    with pytest.raises(ValueError):
+        train_model([])
+
+
+def test_save_load_round_trip(tmp_path):
+    model = train_model(samples(), min_count=1)
+    model.temperature = 1.5
+    path = tmp_path / "models" / "scene.npz"
+    model.save(path)
+
+    loaded = LocalSceneModel.load(path)
+    assert loaded.classes == model.classes
+    assert loaded.vocab == model.vocab
+    assert loaded.temperature == 1.5
+    assert loaded.ngram_range == model.ngram_range
+    for text in ("谢谢", "一起去", "不去", "完全无关的内容"):
+        np.testing.assert_allclose(loaded.predict_proba(text), model.predict_proba(text), rtol=1e-6)
+    assert list(path.parent.iterdir()) == [path]
+
+
+def test_classifier_loads_file_and_applies_min_confidence(tmp_path):
+    path = tmp_path / "scene.npz"
+    train_model(samples(), min_count=1).save(path)
+
+    classifier = LocalSceneClassifier(path=str(path), min_confidence=0.5, enabled=True)
+    assert classifier.model is not None
+    result = classifier.classify("谢谢你的帮助")
+    assert result is not None and result["final_scene"] == "感谢"
+    assert classifier.reload() is False
+
+    strict = LocalSceneClassifier(path=str(path), min_confidence=1.01, enabled=True)
+    assert strict.classify("谢谢你的帮助") is None
+    assert LocalSceneClassifier(path=str(path), enabled=False).classify("谢谢") is None
+
+
+def test_classifier_keeps_model_when_file_is_invalid(tmp_path):
+    path = tmp_path / "scene.npz"
+    train_model(samples(), min_count=1).save(path)
+    classifier = LocalSceneClassifier(path=str(path), min_confidence=0.5, enabled=True)
+    model = classifier.model
+
+    path.write_bytes(b"not a model")
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 10))
+    assert classifier.reload() is False
+    assert classifier.model is model
+    assert classifier.stats()["reload_errors"] == 1
+
+
+def test_split_samples_is_disjoint():
+    data = samples()
+    train, test = split_samples(data, 0.25, seed=0)
+    assert len(train) + len(test) == len(data)
+    assert not set(train) & set(test)
@@ -0,0 +1,63 @@
+import pytest
+
+from services.near_duplicate_cache import NearDuplicateCache, normalize_text
+
+BASE = "我明天想和同学一起去图书馆看书"
+
+
+def make_cache(**kwargs):
+    options = {"threshold": 0.7, "capacity": 100, "min_chars": 6, "audit_rate": 0.0}
+    options.update(kwargs)
+    return NearDuplicateCache("test", **options)
+
+
+def test_normalize_text_strips_punctuation_and_particles():
+    assert normalize_text("  好的，我知道了吧！") == "好的我知道了"
+    assert normalize_text("Hello, World") == "helloworld"
+    assert normalize_text("吧") == "吧"
+
+
+def test_exact_hit_after_normalization():
+    cache = make_cache()
+    cache.put(BASE, "value")
+    assert cache.lookup(BASE + "吧！") == ("value", 1.0)
+
+
+def test_near_duplicate_hit():
+    cache = make_cache()
+    cache.put(BASE, "value")
+    hit = cache.lookup("我明天想和同学一起去图书馆看看书")
+    assert hit is not None
+    value, similarity = hit
+    assert value == "value"
+    assert 0.7 <= similarity < 1.0
+
+
+def test_negation_guard():
+    cache = make_cache(threshold=0.5)
+    cache.put(BASE, "positive")
+    assert cache.lookup("我明天不想和同学一起去图书馆看书") is None
+    cache.put("我明天不想和同学一起去图书馆看书", "negative")
+    assert cache.lookup("我明天不想和同学一起去图书馆看看书")[0] == "negative"
+
+
+def test_short_text_requires_exact_match():
+    cache = make_cache(min_chars=10)
+    cache.put("我想去", "value")
+    assert cache.lookup("我想去啊") == ("value", 1.0)
+    assert cache.lookup("我想去吗") is None
+
+
+def test_scope_isolation_and_lru_eviction():
+    cache = make_cache(capacity=2)
+    cache.put(BASE, "a", scope="x")
+    assert cache.lookup(BASE, scope="y") is None
+    cache.put("今天老师表扬了我的作业写得很认真", "b")
+    cache.put("周末我们全家要去公园野餐放风筝", "c")
+    assert cache.lookup(BASE, scope="x") is None
+    assert cache.stats()["misses"] >= 2
+
+
+def test_rejects_uneven_bands():
+    with pytest.raises(ValueError):
+        NearDuplicateCache("test", num_perm=10, bands=3)
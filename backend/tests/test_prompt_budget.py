@@ -0,0 +1,65 @@
+from services.prompt_budget import PromptSection, estimate_tokens, fit_sections, truncate_to_tokens
+
+LINES = "line one\nline two\nline three"
+
+
+def test_estimate_tokens_counts_cjk_per_char():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("你好") == 2
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("你好abcd") == 3
+
+
+def test_truncate_keeps_whole_lines():
+    assert truncate_to_tokens(LINES, 100) == LINES
+    assert truncate_to_tokens(LINES, 0) == ""
+    assert truncate_to_tokens(LINES, 4) == "line one"
+    assert truncate_to_tokens(LINES, 4, keep="tail") == "line three"
+
+
+def test_truncate_single_line_within_budget():
+    text = "你" * 50
+    truncated = truncate_to_tokens(text, 10)
+    assert truncated == "你" * 10
+    assert truncate_to_tokens(text, 10, keep="tail") == "你" * 10
+
+
+def test_fit_sections_trims_lowest_priority_first():
+    sections = [
+        PromptSection("persona", "你" * 20, required=True),
+        PromptSection("history", "\n".join(["历史" * 5] * 4), priority=70, keep="tail"),
+        PromptSection("doc:0", "文" * 30, priority=30, min_tokens=10),
+        PromptSection("message", "问" * 10, required=True),
+    ]
+    result = fit_sections(sections, 71, site="test")
+
+    # history 的 3 个换行另算 1 个 token
+    assert result.tokens_before == 20 + 41 + 30 + 10
+    assert result.tokens_after == 71
+    assert result.trimmed == {"doc:0": "dropped"}
+    assert result.text("persona") == "你" * 20
+    assert result.text("message") == "问" * 10
+    assert result.texts("doc:") == []
+    assert result.text("history") == sections[1].text
+
+
+def test_fit_sections_truncates_history_from_the_head():
+    history = "\n".join(f"第{i}轮对话内容" for i in range(10))
+    sections = [
+        PromptSection("message", "问" * 10, required=True),
+        PromptSection("history", history, priority=70, keep="tail"),
+    ]
+    result = fit_sections(sections, 40, site="test")
+
+    assert result.trimmed == {"history": "truncated"}
+    assert result.tokens_after <= 40
+    assert history.endswith(result.text("history"))
+    assert result.text("history").startswith("第")
+
+
+def test_fit_sections_leaves_required_sections_over_budget():
+    sections = [PromptSection("message", "问" * 50, required=True)]
+    result = fit_sections(sections, 10, site="test")
+    assert result.text("message") == "问" * 50
+    assert result.trimmed == {}
+    assert fit_sections(sections, 0, site="test").tokens_after == 50
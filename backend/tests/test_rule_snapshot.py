@@ -0,0 +1,30 @@
+from services.rules.snapshot import MAGIC, build_snapshot, load_snapshot, save_snapshot
+
+TEXTS = ["下次吧，我最近有点忙", "谢谢你，我很开心", "", "abc 123"]
+
+
+def test_snapshot_round_trip(tmp_path):
+    snapshot = build_snapshot()
+    path = tmp_path / "rules.snapshot"
+    save_snapshot(snapshot, path)
+
+    loaded = load_snapshot(path, expected_hash=snapshot.source_hash)
+    assert loaded is not None
+    assert loaded.source_hash == snapshot.source_hash
+    assert loaded.lexicons == snapshot.lexicons
+    assert loaded.templates == snapshot.templates
+    assert loaded.matcher.words == snapshot.matcher.words
+    for text in TEXTS:
+        assert loaded.matcher.scan(text).hits == snapshot.matcher.scan(text).hits
+
+
+def test_snapshot_rejects_stale_hash_and_bad_files(tmp_path):
+    snapshot = build_snapshot()
+    path = tmp_path / "rules.snapshot"
+    save_snapshot(snapshot, path)
+    assert load_snapshot(path, expected_hash="stale") is None
+
+    assert load_snapshot(tmp_path / "missing.snapshot") is None
+    corrupt = tmp_path / "corrupt.snapshot"
+    corrupt.write_bytes(b"NOTRULES" + path.read_bytes()[len(MAGIC):])
+    assert load_snapshot(corrupt) is None
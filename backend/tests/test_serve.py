@@ -0,0 +1,107 @@
+import pytest
+
+import serve
+
+
+def make_server(**kwargs):
+    options = {"max_worker_crashes": 4, "crash_window": 60}
+    options.update(kwargs)
+    return serve.PreforkServer("127.0.0.1", 0, 2, 0, 0, 0, 5, 0, "info", **options)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(serve.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_crash_backoff_doubles(clock):
+    server = make_server()
+    delays = []
+    for pid in range(3):
+        server.record_crash(pid, 1)
+        delays.append(server._respawn_at - clock[0])
+    assert delays == [0.5, 1.0, 2.0]
+    assert not server._stopping
+
+
+def test_crash_backoff_is_capped(clock):
+    server = make_server(max_worker_crashes=0)
+    for pid in range(20):
+        server.record_crash(pid, 1)
+    assert server._respawn_at - clock[0] == serve._RESPAWN_BACKOFF_MAX
+    assert not server._stopping
+
+
+def test_crashes_outside_window_are_forgotten(clock):
+    server = make_server()
+    for pid in range(3):
+        server.record_crash(pid, 1)
+    clock[0] += 61
+    server.record_crash(3, 1)
+    assert len(server.crashes) == 1
+    assert server._respawn_at - clock[0] == 0.5
+    assert not server._stopping
+
+
+def test_crash_loop_stops_master(clock):
+    server = make_server()
+    for pid in range(4):
+        server.record_crash(pid, -9)
+    assert server._stopping
+    assert server.exit_code == 1
+
+
+def reap_all(server, timeout=5.0):
+    deadline = serve.time.monotonic() + timeout
+    while server.workers and serve.time.monotonic() < deadline:
+        server.reap_workers()
+        serve.time.sleep(0.01)
+    assert not server.workers
+
+
+def run_worker_with(server, monkeypatch, behaviour):
+    monkeypatch.setattr(server, "_run_worker", behaviour)
+    server.spawn_worker()
+    reap_all(server)
+
+
+def test_clean_worker_exit_is_not_a_crash(monkeypatch):
+    server = make_server()
+    run_worker_with(server, monkeypatch, lambda: 0)
+    assert not server.crashes
+    assert server._respawn_at == 0.0
+
+
+def test_failed_startup_exit_is_a_crash(monkeypatch):
+    server = make_server()
+    run_worker_with(server, monkeypatch, lambda: 3)
+    assert len(server.crashes) == 1
+    assert server._respawn_at > 0.0
+
+
+def test_worker_exception_is_a_crash(monkeypatch):
+    def fail():
+        raise RuntimeError("startup failed")
+
+    server = make_server(max_worker_crashes=2)
+    run_worker_with(server, monkeypatch, fail)
+    run_worker_with(server, monkeypatch, fail)
+    assert len(server.crashes) == 2
+    assert server._stopping
+    assert server.exit_code == 1
+
+
+def test_retired_worker_exit_is_not_a_crash(monkeypatch):
+    server = make_server()
+    monkeypatch.setattr(server, "_run_worker", lambda: 3)
+    pid = server.spawn_worker()
+    server.workers.pop(pid)
+    server.retiring[pid] = serve.time.monotonic()
+    deadline = serve.time.monotonic() + 5
+    while server.retiring and serve.time.monotonic() < deadline:
+        server.reap_workers()
+        serve.time.sleep(0.01)
+    assert not server.retiring
+    assert not server.crashes